@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del convertitore Akoma Ntoso -> Markdown.
+
+Misura:
+  1. il costo di dispatch per nodo: catena di ``tag.endswith(...)`` (come in
+     origine in clean_text_content) contro la tabella ``INLINE_DISPATCH``;
+  2. l'estrazione del testo su un articolo fortemente emendato (markup
+     ``<ins>/<ref>/<emphasis>`` annidato): versione ricorsiva originale contro
+     ``clean_text_content`` iterativo;
+  3. il tempo complessivo di ``generate_markdown_text`` sul documento;
+  4. il parsing del file con ciascun backend XML disponibile (etree, lxml);
+  5. hit rate della cache URI Akoma -> URL normattiva in una conversione con link.
+
+Con ``--profile`` stampa anche le funzioni più costose secondo cProfile.
+
+Usage:
+    python scripts/benchmark_converter.py [XML] [--repeat N] [--profile]
+
+Examples:
+    python scripts/benchmark_converter.py
+    python scripts/benchmark_converter.py test_data/20050516_005G0104_VIGENZA_20250130.xml --repeat 20
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import re
+import statistics
+import sys
+import time
+import timeit
+import xml.etree.ElementTree as ET
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from normattiva2md.constants import AKN_NAMESPACE  # noqa: E402
+from normattiva2md.akoma_utils import (  # noqa: E402
+    akoma_uri_to_normattiva_url,
+    akoma_url_cache_stats,
+    clear_akoma_url_cache,
+)
+from normattiva2md.markdown_converter import (  # noqa: E402
+    INLINE_DISPATCH,
+    build_url_cross_references,
+    clean_text_content,
+    generate_markdown_text,
+)
+from normattiva2md.xml_parser import AkomaDocument  # noqa: E402
+from normattiva2md.xml_backend import get_backend, lxml_available  # noqa: E402
+
+DEFAULT_XML = os.path.join(
+    ROOT_DIR, "test_data", "20050516_005G0104_VIGENZA_20250130.xml"
+)
+
+
+def legacy_inline_dispatch(tag):
+    """Catena di endswith equivalente al vecchio clean_text_content."""
+    if tag.endswith("strong"):
+        return "strong"
+    elif tag.endswith("emphasis"):
+        return "emphasis"
+    elif tag.endswith("ref"):
+        return "ref"
+    elif tag.endswith(("ins", "del")):
+        return "modification"
+    elif tag.endswith("footnote"):
+        return "footnote"
+    return "text"
+
+
+def legacy_clean_text_content(element, cross_references=None):
+    """
+    Versione ricorsiva originale (commit baseline), copiata senza modifiche.
+
+    Extracts text from an element, handling inline formatting and removing specific tags.
+    Also cleans up excessive whitespace and indentation.
+
+    Args:
+        element: XML element to process
+        cross_references: dict mapping Akoma URIs to local markdown file paths (optional)
+    """
+    text_parts = []
+    if element is None:
+        return ""
+
+    # Process element's own text
+    if element.text:
+        text_parts.append(element.text)
+
+    for child in element:
+        # Handle inline formatting
+        if child.tag.endswith("strong"):
+            text_parts.append(f"**{legacy_clean_text_content(child, cross_references)}**")
+        elif child.tag.endswith(
+            "emphasis" 
+        ):  # Akoma Ntoso often uses 'emphasis' for italics
+            text_parts.append(f"*{legacy_clean_text_content(child, cross_references)}*")
+        elif child.tag.endswith("ref"):
+            # Extract text content of <ref> tags
+            ref_text = legacy_clean_text_content(child, cross_references)
+            href = child.get("href")
+
+            # If cross_references is provided, try to create a markdown link
+            if cross_references and href:
+                # Se href è un URI Akoma, convertilo in URL normattiva.it
+                if href.startswith("/akn/"):
+                    normattiva_url = akoma_uri_to_normattiva_url(href)
+                    if normattiva_url:
+                        ref_text = f"[{ref_text}]({normattiva_url})"
+                # Altrimenti, cerca direttamente nel mapping (per compatibilità)
+                elif href in cross_references:
+                    ref_text = f"[{ref_text}]({cross_references[href]})"
+
+            text_parts.append(ref_text)
+        elif child.tag.endswith(("ins", "del")):
+            # For modifications, add double parentheses only if not already present
+            inner_text = legacy_clean_text_content(child, cross_references)
+            # Check if the text already has double parentheses
+            if inner_text.strip().startswith("((") and inner_text.strip().endswith("))"):
+                text_parts.append(inner_text)
+            else:
+                text_parts.append(f"(({inner_text}))")
+        elif child.tag.endswith("footnote"):
+            # Handle footnotes - extract footnote content and create markdown footnote reference
+            footnote_content = legacy_clean_text_content(child, cross_references)
+            if footnote_content:
+                # Generate a simple footnote reference (simplified - in practice would need global counter)
+                footnote_ref = f"[^{footnote_content[:10].replace(' ', '')}]"  # Simple hash-like ref
+                text_parts.append(footnote_ref)
+
+        else:
+            text_parts.append(
+                legacy_clean_text_content(child, cross_references) 
+            )  # Recursively get text from other children
+
+        # Process tail text
+        if child.tail:
+            text_parts.append(child.tail)
+
+    # Join all parts
+    full_text = "".join(text_parts)
+
+    # Replace multiple spaces with a single space, and strip leading/trailing whitespace
+    cleaned_text = re.sub(r"\s+", " ", full_text).strip()
+    
+    # Remove dash separators before inline AGGIORNAMENTO
+    cleaned_text = re.sub(r"\s*[-–—]{2,}\s*AGGIORNAMENTO", " AGGIORNAMENTO", cleaned_text)
+
+    return cleaned_text
+
+
+def build_amended_paragraph(depth=40, width=3):
+    """Paragrafo sintetico con ``depth`` livelli di ins/ref/emphasis annidati."""
+    akn = "{%s}" % AKN_NAMESPACE["akn"]
+    paragraph = ET.Element(f"{akn}p")
+    paragraph.text = "Il comma 1 \n   è sostituito dal seguente: "
+    current = paragraph
+    for level in range(depth):
+        tag = ("ins", "ref", "emphasis")[level % 3]
+        child = ET.SubElement(current, f"{akn}{tag}")
+        if tag == "ref":
+            child.set("href", "/akn/it/act/legge/stato/1990-08-07/241/!main#art_3")
+        child.text = f"  testo modificato livello {level}\n\t"
+        for sibling in range(width):
+            leaf = ET.SubElement(child, f"{akn}strong")
+            leaf.text = f" nota {sibling} "
+            leaf.tail = " ;\n "
+        child.tail = "  seguito  "
+        current = child
+    return paragraph
+
+
+def bench_amended_text(repeat):
+    """Restituisce i ms (minimo) per articolo emendato: ricorsivo contro iterativo."""
+    paragraph = build_amended_paragraph()
+    cross_references = {"/akn/": "/akn/"}
+    assert legacy_clean_text_content(paragraph, cross_references) == clean_text_content(
+        paragraph, cross_references
+    )
+    results = {}
+    for name, func in (
+        ("ricorsivo", legacy_clean_text_content),
+        ("iterativo", clean_text_content),
+    ):
+        best = min(
+            timeit.repeat(lambda: func(paragraph, cross_references), number=20, repeat=repeat)
+        )
+        results[name] = best / 20 * 1000
+    return results
+
+
+def bench_dispatch(tags, repeat):
+    """Restituisce i ns/nodo (minimo su ``repeat`` ripetizioni) per le due strategie."""
+    get_handler = INLINE_DISPATCH.get
+
+    def run_legacy():
+        for tag in tags:
+            legacy_inline_dispatch(tag)
+
+    def run_table():
+        for tag in tags:
+            get_handler(tag)
+
+    results = {}
+    for name, func in (("endswith", run_legacy), ("tabella", run_table)):
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        results[name] = best / len(tags) * 1e9
+    return results
+
+
+def bench_conversion(root, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generate_markdown_text(root, AKN_NAMESPACE)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def bench_parsing(xml_path, repeat):
+    """Restituisce i ms (minimo) di parsing del file per ogni backend disponibile."""
+    names = ["etree", "lxml"] if lxml_available() else ["etree"]
+    results = {}
+    for name in names:
+        backend = get_backend(name)
+        best = min(timeit.repeat(lambda: backend.parse(xml_path), number=1, repeat=repeat))
+        results[name] = best * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del convertitore Markdown")
+    parser.add_argument("xml", nargs="?", default=DEFAULT_XML, help="File XML Akoma Ntoso")
+    parser.add_argument("--repeat", type=int, default=10, help="Numero di ripetizioni")
+    parser.add_argument(
+        "--profile", action="store_true", help="Mostra il profilo cProfile della conversione"
+    )
+    args = parser.parse_args()
+
+    root = ET.parse(args.xml).getroot()
+    tags = [element.tag for element in root.iter()]
+
+    print(f"📄 {os.path.basename(args.xml)}: {len(tags)} nodi")
+
+    dispatch = bench_dispatch(tags, args.repeat)
+    print("\n⏱️  Dispatch per nodo:")
+    for name, ns_per_node in dispatch.items():
+        print(f"  - {name:<9} {ns_per_node:7.1f} ns/nodo")
+    print(f"  - speedup   {dispatch['endswith'] / dispatch['tabella']:.2f}x")
+
+    amended = bench_amended_text(args.repeat)
+    print("\n⏱️  Testo di un articolo fortemente emendato (40 livelli annidati):")
+    for name, ms in amended.items():
+        print(f"  - {name:<9} {ms:7.3f} ms")
+    print(f"  - speedup   {amended['ricorsivo'] / amended['iterativo']:.2f}x")
+
+    median, best = bench_conversion(root, args.repeat)
+    print("\n⏱️  generate_markdown_text:")
+    print(f"  - mediana {median * 1000:.1f} ms, migliore {best * 1000:.1f} ms")
+
+    parsing = bench_parsing(args.xml, args.repeat)
+    print("\n⏱️  Parsing del file:")
+    for name, ms in parsing.items():
+        print(f"  - {name:<9} {ms:7.1f} ms")
+    if not lxml_available():
+        print("  - lxml non installato (pip install normattiva2md[lxml])")
+
+    clear_akoma_url_cache()
+    cross_references = build_url_cross_references(AkomaDocument(root=root))
+    generate_markdown_text(root, AKN_NAMESPACE, cross_references=cross_references)
+    stats = akoma_url_cache_stats()
+    print("\n🔗 Cache URI Akoma -> URL (conversione con link):")
+    print(
+        f"  - {stats['hits']} hit, {stats['misses']} miss, "
+        f"hit rate {stats['hit_rate']:.0%} ({stats['currsize']}/{stats['maxsize']} voci)"
+    )
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        generate_markdown_text(root, AKN_NAMESPACE)
+        profiler.disable()
+        print("\n📊 Profilo (prime 15 funzioni per tempo cumulativo):")
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(15)
+
+
+if __name__ == "__main__":
+    main()
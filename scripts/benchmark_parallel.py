@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark del rendering parallelo del corpo (``workers`` / ``-j``).
+
+Replica il corpo della legge di esempio 10 e 50 volte e misura il tempo di
+``generate_markdown_text`` in sequenziale e con il process pool al variare
+della dimensione dei blocchi (elementi di ``<body>`` per blocco; ``auto`` =
+blocchi bilanciati per numero di nodi). Verifica anche che l'output sia
+identico a quello sequenziale.
+
+Usage:
+    python scripts/benchmark_parallel.py [XML] [--workers N] [--factors 10,50] [--repeat N]
+
+Examples:
+    python scripts/benchmark_parallel.py
+    python scripts/benchmark_parallel.py --workers 8 --factors 10,50,100
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from normattiva2md.constants import AKN_NAMESPACE  # noqa: E402
+from normattiva2md.markdown_converter import (  # noqa: E402
+    generate_markdown_text,
+    iter_markdown_fragments,
+)
+
+DEFAULT_XML = os.path.join(
+    ROOT_DIR, "test_data", "20050516_005G0104_VIGENZA_20250130.xml"
+)
+CHUNK_SIZES = (1, 4, 16, 64, None)
+
+
+def replicate_body(xml_path, factor):
+    """Documento con il corpo ripetuto ``factor`` volte."""
+    root = ET.parse(xml_path).getroot()
+    body = root.find(".//akn:body", AKN_NAMESPACE)
+    original = list(body)
+    for _ in range(factor - 1):
+        for element in original:
+            body.append(copy.deepcopy(element))
+    return root
+
+
+def best_time(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del rendering parallelo")
+    parser.add_argument("xml", nargs="?", default=DEFAULT_XML, help="File XML Akoma Ntoso")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Processi (default: CPU)"
+    )
+    parser.add_argument(
+        "--factors", default="10,50", help="Fattori di replica del corpo (default: 10,50)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Numero di ripetizioni")
+    args = parser.parse_args()
+
+    print(f"🧮 {args.workers} worker, {os.cpu_count()} CPU disponibili")
+    if (os.cpu_count() or 1) < 2:
+        print("⚠️  Una sola CPU: il benchmark misura solo l'overhead del process pool")
+
+    for factor in (int(value) for value in args.factors.split(",")):
+        root = replicate_body(args.xml, factor)
+        body = root.find(".//akn:body", AKN_NAMESPACE)
+        nodes = sum(1 for _ in root.iter())
+        print(f"\n📄 Corpo x{factor}: {len(body)} elementi, {nodes} nodi")
+
+        sequential, expected = best_time(
+            lambda: generate_markdown_text(root, AKN_NAMESPACE), args.repeat
+        )
+        print(f"  - sequenziale        {sequential * 1000:8.1f} ms")
+
+        for chunk_size in CHUNK_SIZES:
+            elapsed, markdown = best_time(
+                lambda: "".join(
+                    iter_markdown_fragments(
+                        root,
+                        AKN_NAMESPACE,
+                        workers=args.workers,
+                        chunk_size=chunk_size,
+                    )
+                ),
+                args.repeat,
+            )
+            label = "auto" if chunk_size is None else str(chunk_size)
+            status = "" if markdown == expected else "  ❌ output diverso"
+            print(
+                f"  - blocchi da {label:<6}  {elapsed * 1000:8.1f} ms  "
+                f"speedup {sequential / elapsed:5.2f}x{status}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,10 @@ setup(
         "requests>=2.25.0",
         "rich>=13.0.0,<14.0.0",
     ],
+    extras_require={
+        "lxml": ["lxml>=4.6.0"],
+        "async": ["httpx>=0.23.0"],
+    },
     # Pacchetti
     packages=find_packages(where="src"),
     package_dir={"": "src"},
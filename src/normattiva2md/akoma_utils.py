@@ -1,8 +1,11 @@
 import re
 import sys
-import xml.etree.ElementTree as ET
+from functools import lru_cache
+from urllib.parse import unquote
 from .constants import AKN_NAMESPACE
-from .normattiva_api import is_normattiva_url
+from .xml_backend import PARSE_ERRORS
+from .xml_parser import AkomaDocument
+from .normattiva_api import is_normattiva_url, normalize_normattiva_url
 
 
 def parse_article_reference(url):
@@ -34,83 +37,106 @@ def parse_article_reference(url):
     return None
 
 
+# Tipo di atto Akoma Ntoso -> (prefisso URN-NIR, l'URN include il numero).
+# Solo gli atti numerati supportano i link ad articoli specifici (~artN):
+# costituzione e codici no.
+AKN_TYPE_URN_PREFIX = {
+    "legge": ("urn:nir:stato:legge", True),
+    "decreto-legge": ("urn:nir:stato:decreto-legge", True),
+    "decretoLegge": ("urn:nir:stato:decreto-legge", True),
+    "decretoLegislativo": ("urn:nir:stato:decreto.legislativo", True),
+    "costituzione": ("urn:nir:stato:costituzione", False),
+    "decretoDelPresidenteDellaRepubblica": (
+        "urn:nir:stato:decreto.del.presidente.della.repubblica",
+        True,
+    ),
+    "regioDecreto": ("urn:nir:stato:regio.decreto", True),
+    "codice.civile": ("urn:nir:stato:codice.civile", False),
+    "codice.procedura.civile": ("urn:nir:stato:codice.procedura.civile", False),
+}
+
+# Numero massimo di URI memorizzati (condivisi tra conversioni nello stesso processo)
+AKOMA_URL_CACHE_SIZE = 4096
+
+
 def akoma_uri_to_normattiva_url(akoma_uri):
     """
     Converte un URI Akoma Ntoso in URL normattiva.it.
 
+    I risultati sono memorizzati in una cache LRU limitata, condivisa da
+    tutte le conversioni del processo (vedi ``akoma_url_cache_stats``).
+
     Args:
         akoma_uri: URI Akoma Ntoso (es. /akn/it/act/legge/stato/2003-07-29/229/!main#art_1)
 
     Returns:
         str or None: URL normattiva.it corrispondente o None se conversione fallisce
     """
-    try:
-        # Gestisci riferimenti ad articoli specifici (#art_X)
-        article_ref = None
-        if "#art_" in akoma_uri:
-            akoma_uri, article_part = akoma_uri.split("#art_", 1)
-            # Estrai il numero dell'articolo (può contenere lettere come 1-bis, 16-ter, etc.)
-            article_num = article_part.split("-")[
-                0
-            ]  # Prendi solo la parte prima di eventuali trattini
-            article_ref = f"~art{article_num}"
-
-        # Esempio: /akn/it/act/legge/stato/2003-07-29/229/!main
-        # Diventa: https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2003-07-29;229
-        parts = akoma_uri.strip("/").split("/")
-        if (
-            len(parts) >= 6
-            and parts[0] == "akn"
-            and parts[1] == "it"
-            and parts[2] == "act"
-        ):
-            tipo = parts[3]  # legge, decreto-legge, etc.
-            giurisdizione = parts[4]  # stato
-            data = parts[5]  # 2003-07-29
-            numero = parts[6]  # 229
-
-            # Gestisci tipi diversi
-            if tipo == "legge":
-                urn = f"urn:nir:stato:legge:{data.replace('-', '-')};{numero}"
-            elif tipo in ("decreto-legge", "decretoLegge"):
-                urn = f"urn:nir:stato:decreto-legge:{data.replace('-', '-')};{numero}"
-            elif tipo == "decretoLegislativo":
-                urn = f"urn:nir:stato:decreto.legislativo:{data.replace('-', '-')};{numero}"
-            elif tipo == "costituzione":
-                urn = f"urn:nir:stato:costituzione:{data.replace('-', '-')}"
-            elif tipo == "decretoDelPresidenteDellaRepubblica":
-                urn = f"urn:nir:stato:decreto.del.presidente.della.repubblica:{data.replace('-', '-')};{numero}"
-            elif tipo == "regioDecreto":
-                urn = f"urn:nir:stato:regio.decreto:{data.replace('-', '-')};{numero}"
-            elif tipo == "codice.civile":
-                urn = f"urn:nir:stato:codice.civile:{data.replace('-', '-')}"
-            elif tipo == "codice.procedura.civile":
-                urn = f"urn:nir:stato:codice.procedura.civile:{data.replace('-', '-')}"
-            else:
-                return None
-
-            url = f"https://www.normattiva.it/uri-res/N2Ls?{urn}"
-            # Only add article reference for document types that support it
-            # Costituzioni and codes don't support article-specific links
-            if article_ref and tipo not in (
-                "costituzione",
-                "codice.civile",
-                "codice.procedura.civile",
-            ):
-                url += article_ref
-            return url
-    except:
-        pass
+    if not isinstance(akoma_uri, str):
+        return None
+    return _resolve_akoma_uri(akoma_uri)
+
+
+@lru_cache(maxsize=AKOMA_URL_CACHE_SIZE)
+def _resolve_akoma_uri(akoma_uri):
+    # Gestisci riferimenti ad articoli specifici (#art_X)
+    article_ref = None
+    if "#art_" in akoma_uri:
+        akoma_uri, article_part = akoma_uri.split("#art_", 1)
+        # Solo la parte prima di eventuali trattini (1-bis -> 1)
+        article_ref = f"~art{article_part.split('-')[0]}"
+
+    # Esempio: /akn/it/act/legge/stato/2003-07-29/229/!main
+    # Diventa: https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2003-07-29;229
+    parts = akoma_uri.strip("/").split("/")
+    if len(parts) < 7 or parts[0] != "akn" or parts[1] != "it" or parts[2] != "act":
+        return None
 
-    return None
+    # parts: akn/it/act/<tipo>/<giurisdizione>/<data>/<numero>/...
+    entry = AKN_TYPE_URN_PREFIX.get(parts[3])
+    if entry is None:
+        return None
+    prefix, numbered = entry
+    data = parts[5]
+
+    if numbered:
+        url = f"https://www.normattiva.it/uri-res/N2Ls?{prefix}:{data};{parts[6]}"
+        if article_ref:
+            url += article_ref
+        return url
+    return f"https://www.normattiva.it/uri-res/N2Ls?{prefix}:{data}"
+
+
+def akoma_url_cache_stats():
+    """
+    Statistiche della cache di ``akoma_uri_to_normattiva_url``.
+
+    Returns:
+        dict: hits, misses, maxsize, currsize e hit_rate (0.0-1.0)
+    """
+    info = _resolve_akoma_uri.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "maxsize": info.maxsize,
+        "currsize": info.currsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+
+def clear_akoma_url_cache():
+    """Svuota la cache di ``akoma_uri_to_normattiva_url`` e azzera le statistiche."""
+    _resolve_akoma_uri.cache_clear()
 
 
-def extract_akoma_uris_from_xml(xml_file_path):
+def extract_akoma_uris_from_xml(xml_file_path, parser="auto"):
     """
     Estrae tutti gli URI Akoma Ntoso da un file XML.
 
     Args:
         xml_file_path: percorso al file XML
+        parser: backend XML ("auto", "lxml" o "etree")
 
     Returns:
         set: insieme di URI Akoma Ntoso trovati nel documento
@@ -118,16 +144,14 @@ def extract_akoma_uris_from_xml(xml_file_path):
     akoma_uris = set()
 
     try:
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
+        document = AkomaDocument(xml_file_path, parser=parser)
 
-        # Cerca tutti gli elementi con attributo href che inizia con /akn/
-        for element in root.findall(".//*[@href]"):
-            href = element.get("href")
-            if href and href.startswith("/akn/"):
+        # Tutti gli elementi con attributo href che inizia con /akn/
+        for _tag, href in document.hrefs:
+            if href.startswith("/akn/"):
                 akoma_uris.add(href)
 
-    except ET.ParseError:
+    except PARSE_ERRORS:
         pass
     except Exception:
         pass
@@ -135,27 +159,58 @@ def extract_akoma_uris_from_xml(xml_file_path):
     return akoma_uris
 
 
-def extract_cited_laws(xml_file_path):
+def citation_key(url):
+    """
+    Chiave che identifica l'atto indicato da un URL normattiva.it.
+
+    Grafie diverse dello stesso atto hanno la stessa chiave: riferimenti ad
+    articoli (``~art5``), versioni (``!vig=``, ``@originale``), data completa
+    o solo anno (``2005-03-07;82`` e ``2005;82``), maiuscole e separatori
+    nel tipo (``decreto.legislativo``, ``decreto-legislativo``).
+
+    Args:
+        url: URL normattiva.it (o URN NIR)
+
+    Returns:
+        str: URN normalizzato, oppure l'URL stesso se non contiene un URN
+    """
+    url = unquote(normalize_normattiva_url(url))
+    match = re.search(r"urn:nir:[^~!@&#\s]+", url, re.IGNORECASE)
+    if not match:
+        return url.split("#")[0]
+    parts = match.group(0).lower().split(":")
+    if len(parts) >= 5:
+        # urn:nir:<autorità>:<tipo>:<data>;<numero>
+        parts[3] = re.sub(r"[\s._-]+", ".", parts[3])
+        date_number = ":".join(parts[4:])
+        date_number = re.sub(r"^(\d{4})-\d{2}-\d{2}", r"\1", date_number)
+        parts = parts[:4] + [date_number]
+    return ":".join(parts)
+
+
+def extract_cited_laws(xml_source):
     """
     Estrae tutti gli URL delle leggi citate da un file XML Akoma Ntoso.
     Raggruppa per legge base, ignorando riferimenti a articoli specifici.
 
     Args:
-        xml_file_path: percorso al file XML
+        xml_source: percorso al file XML oppure AkomaDocument già analizzato
 
     Returns:
         set: insieme di URL unici delle leggi citate (senza riferimenti ad articoli)
     """
     cited_laws = set()
+    document = (
+        xml_source
+        if isinstance(xml_source, AkomaDocument)
+        else AkomaDocument(xml_source)
+    )
+    ref_tag = f"{{{AKN_NAMESPACE['akn']}}}ref"
 
     try:
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-
-        # Trova tutti i tag <ref> con href
-        for ref in root.findall(".//akn:ref[@href]", AKN_NAMESPACE):
-            href = ref.get("href")
-            if href and href.startswith("/akn/"):
+        # Tutti i tag <ref> con href (elenco già calcolato dal documento)
+        for tag, href in document.hrefs:
+            if tag == ref_tag and href.startswith("/akn/"):
                 # Converti URI Akoma Ntoso in URL normattiva.it
                 url = akoma_uri_to_normattiva_url(href)
                 if url and is_normattiva_url(url):
@@ -164,7 +219,7 @@ def extract_cited_laws(xml_file_path):
                     law_url = url.split("~")[0] if "~" in url else url
                     cited_laws.add(law_url)
 
-    except ET.ParseError as e:
+    except PARSE_ERRORS as e:
         print(f"Errore parsing XML per riferimenti: {e}", file=sys.stderr)
     except Exception as e:
         print(f"Errore estrazione riferimenti: {e}", file=sys.stderr)
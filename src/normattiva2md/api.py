@@ -18,11 +18,12 @@ Examples:
 
 from __future__ import annotations
 
+import io
 import logging
 import os
+import shutil
 import tempfile
-import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 from .constants import AKN_NAMESPACE
 from .exceptions import (
@@ -31,42 +32,75 @@ from .exceptions import (
     InvalidURLError,
     XMLFileNotFoundError,
 )
-from .markdown_converter import generate_markdown_text
+from .markdown_converter import build_url_cross_references, iter_markdown_fragments
 from .models import ConversionResult, SearchResult
+from .http_client import NormattivaClient, as_client
 from .normattiva_api import (
-    download_akoma_ntoso,
-    download_akoma_ntoso_via_export,
-    download_akoma_ntoso_via_opendata,
+    FetchContext,
     extract_params_from_normattiva_url,
     is_normattiva_url,
     normalize_normattiva_url,
     validate_normattiva_url,
 )
 from .utils import load_env_file
-from .xml_parser import (
-    construct_article_eid,
-    extract_metadata_from_xml,
-    filter_xml_to_article,
+from .resolution_cache import ResolutionCache, open_resolution_cache
+from .strategies import (
+    DEFAULT_HEDGE_DELAY,
+    caricaakn_metadata,
+    download_strategies,
+    get_strategy_stats,
+    run_strategies,
 )
+from .streaming_converter import StreamingMarkdownConverter
+from .retry import CircuitBreaker, RetryPolicy, as_circuit_breaker, as_retry_policy
+from .xml_cache import XMLCache, open_cache
+from .xml_backend import PARSE_ERRORS
+from .xml_parser import AkomaDocument, ArticleSelection, parse_article_selection
 
 logger = logging.getLogger(__name__)
 
 
 def convert_url(
     url: str,
-    article: Optional[str] = None,
+    article: Optional[Union[str, List[str]]] = None,
     with_urls: bool = False,
     force_opendata: bool = False,
     quiet: bool = False,
+    parser: str = "auto",
+    workers: Optional[int] = None,
+    client: Optional[NormattivaClient] = None,
+    cache: Union[XMLCache, str, bool, None] = None,
+    resolution_cache: Union[ResolutionCache, str, bool, None] = None,
+    keep_xml: Optional[str] = None,
+    hedge_delay: Optional[float] = DEFAULT_HEDGE_DELAY,
 ) -> Optional[ConversionResult]:
     """
     Converte documento da URL normattiva.it a Markdown.
 
+    Il documento viene scaricato con ``caricaAKN``, OpenData o export HTML:
+    se una strategia non termina entro ``hedge_delay`` secondi parte anche la
+    successiva e vince il primo XML valido (vedi ``strategies``).
+
+    Con rendering sequenziale (``workers`` None o 1) e parser "auto" o
+    "etree" il documento ``caricaAKN`` viene convertito mentre arriva: i
+    blocchi della risposta alimentano direttamente il parser incrementale,
+    senza file temporanei. Negli altri casi (lxml, rendering parallelo,
+    fallback OpenData/export) l'XML viene prima scaricato su disco.
+
     Args:
         url: URL normattiva.it del documento
-        article: Articolo specifico da estrarre (es: "4", "16bis")
+        article: Articoli da estrarre: singolo, lista o intervalli (es: "4", "16bis", "1,3,5-7")
         with_urls: Genera link markdown per riferimenti normativi
         quiet: Disabilita logging info
+        parser: Backend XML ("auto" usa lxml se installato, "lxml", "etree")
+        workers: Processi per il rendering parallelo del corpo (None/1 = sequenziale, 0 = tutte le CPU)
+        client: NormattivaClient da usare (default: client condiviso del processo)
+        cache: Cache XML su disco: XMLCache, directory, True (directory predefinita) o None
+        resolution_cache: Cache URL -> parametri di download: ResolutionCache,
+            file SQLite, False o None (persistita nella directory di ``cache``, se attiva)
+        keep_xml: Percorso in cui salvare anche l'XML scaricato (opzionale)
+        hedge_delay: Secondi prima di avviare in parallelo la strategia di
+            download successiva (0 = tutte subito, None = solo dopo un fallimento)
 
     Returns:
         ConversionResult con markdown e metadata, oppure None se conversione fallisce
@@ -74,6 +108,7 @@ def convert_url(
     Raises:
         InvalidURLError: URL non valido o dominio non permesso
         ConversionError: Errore grave durante conversione
+        ConversionError: Intervallo di articoli invertito (es: "7-5")
 
     Examples:
         >>> result = convert_url("https://www.normattiva.it/uri-res/N2Ls?urn:...")
@@ -102,64 +137,89 @@ def convert_url(
             f"URL non valido: {e}. L'URL deve essere HTTPS e dominio normattiva.it"
         )
 
+    # Selezione validata prima di qualsiasi richiesta di rete
+    selection = _article_selection(article)
+
     if not quiet:
         logger.info(f"Conversione URL: {normalized_url}")
 
     # Extract parameters from URL
     params = None
-    session = None
+    session = as_client(client)
+    xml_cache = open_cache(cache)
+    # La pagina dell'atto viene caricata una volta per tutte le strategie
+    context = FetchContext()
     if not force_opendata:
         params, session = extract_params_from_normattiva_url(
-            normalized_url, quiet=quiet
+            normalized_url,
+            session=session,
+            quiet=quiet,
+            resolution_cache=open_resolution_cache(resolution_cache, xml_cache),
+            context=context,
         )
 
-    # Download XML to temp file
-    with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as tmp:
-        xml_path = tmp.name
+    # Con rendering sequenziale il documento caricaAKN viene convertito
+    # mentre arriva; le altre strategie producono un file da convertire dopo
+    converter = None
+    if params and parser in ("auto", "etree") and workers in (None, 1):
+        streamed_metadata = caricaakn_metadata(params, normalized_url)
+        if article:
+            streamed_metadata["article"] = str(selection) if selection else article
+        output = io.StringIO()
+        converter = StreamingMarkdownConverter(
+            output,
+            metadata=streamed_metadata,
+            article_ref=selection,
+            with_urls=with_urls,
+            merge_metadata=True,
+        )
 
-    try:
-        if params and not force_opendata:
-            success = download_akoma_ntoso(params, xml_path, session, quiet=quiet)
-            if not success:
-                logger.warning(f"Download fallito per {url}")
-                return None
+    workdir = None
+    if keep_xml:
+        xml_path = keep_xml
+    else:
+        workdir = tempfile.mkdtemp(prefix="normattiva2md_")
+        xml_path = os.path.join(workdir, "document.xml")
 
-            # Build metadata
-            metadata = {
-                "dataGU": params["dataGU"],
-                "codiceRedaz": params["codiceRedaz"],
-                "dataVigenza": params["dataVigenza"],
-                "url": normalized_url,
-                "url_xml": (
-                    "https://www.normattiva.it/do/atto/caricaAKN"
-                    f"?dataGU={params['dataGU']}"
-                    f"&codiceRedaz={params['codiceRedaz']}"
-                    f"&dataVigenza={params['dataVigenza']}"
-                ),
-            }
-        else:
-            success, metadata, session = download_akoma_ntoso_via_opendata(
-                normalized_url, xml_path, session=session, quiet=quiet
+    try:
+        strategies = download_strategies(
+            normalized_url,
+            params,
+            quiet=quiet,
+            cache=xml_cache,
+            on_chunk=converter.feed if converter is not None else None,
+            keep_file=converter is None or bool(keep_xml),
+            context=context,
+        )
+        try:
+            winner, metadata = run_strategies(
+                strategies, xml_path, session, hedge_delay=hedge_delay, quiet=quiet
             )
-            if not success:
-                success, metadata, session = download_akoma_ntoso_via_export(
-                    normalized_url, xml_path, session=session, quiet=quiet
-                )
-            if not success:
-                logger.warning(f"Download fallito per {url}")
-                return None
+        except PARSE_ERRORS as e:
+            raise ConversionError(
+                f"Errore parsing XML: {e}. "
+                f"Il file potrebbe essere corrotto o non essere un documento Akoma Ntoso valido."
+            )
+        if winner is None:
+            logger.warning(f"Download fallito per {url}")
+            return None
+
+        if converter is not None and winner == "caricaAKN":
+            return _streamed_result(converter, output, normalized_url, selection, quiet)
 
-        # Add article to metadata if specified
+        # Add article selection to metadata if specified
         if article:
-            metadata["article"] = article
+            metadata["article"] = str(selection) if selection else article
 
         # Convert using internal function
         result = _convert_xml_internal(
             xml_path,
-            article=article,
+            selection=selection,
             with_urls=with_urls,
             metadata=metadata,
             quiet=quiet,
+            parser=parser,
+            workers=workers,
         )
 
         if result:
@@ -169,29 +229,59 @@ def convert_url(
         return result
 
     finally:
-        # Cleanup temp file
-        try:
-            os.unlink(xml_path)
-        except OSError:
-            pass
+        # Cleanup temp files
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _streamed_result(converter, output, url, selection, quiet):
+    """Completa la conversione avvenuta durante il download ``caricaAKN``."""
+    try:
+        converter.close()
+    except PARSE_ERRORS as e:
+        raise ConversionError(
+            f"Errore parsing XML: {e}. "
+            f"Il file potrebbe essere corrotto o non essere un documento Akoma Ntoso valido."
+        )
+    except Exception as e:
+        raise ConversionError(f"Errore durante conversione: {e}")
+
+    for label in converter.missing_articles:
+        logger.warning(f"Articolo '{label}' non trovato nel documento")
+    if selection and not converter.article_found:
+        return None
+
+    if not quiet:
+        logger.info("Conversione completata")
+
+    return ConversionResult(
+        markdown=output.getvalue(),
+        metadata=converter.metadata,
+        url=url,
+        url_xml=converter.metadata["url_xml"],
+    )
 
 
 def convert_xml(
     xml_path: str,
-    article: Optional[str] = None,
+    article: Optional[Union[str, List[str]]] = None,
     with_urls: bool = False,
     metadata: Optional[Dict] = None,
     quiet: bool = False,
+    parser: str = "auto",
+    workers: Optional[int] = None,
 ) -> Optional[ConversionResult]:
     """
     Converte file XML locale a Markdown.
 
     Args:
         xml_path: Path al file XML Akoma Ntoso
-        article: Articolo specifico da estrarre
+        article: Articoli da estrarre (es: "4", "1,3,5-7,16bis" o ["1", "5-7"])
         with_urls: Genera link markdown per riferimenti
         metadata: Metadata opzionali da includere nel front matter
         quiet: Disabilita logging info
+        parser: Backend XML ("auto" usa lxml se installato, "lxml", "etree")
+        workers: Processi per il rendering parallelo del corpo (None/1 = sequenziale, 0 = tutte le CPU)
 
     Returns:
         ConversionResult con markdown e metadata, oppure None se conversione fallisce
@@ -199,6 +289,7 @@ def convert_xml(
     Raises:
         XMLFileNotFoundError: File XML non esiste
         ConversionError: Errore parsing XML
+        ConversionError: Intervallo di articoli invertito (es: "7-5")
 
     Examples:
         >>> result = convert_xml("path/to/file.xml")
@@ -209,7 +300,12 @@ def convert_xml(
         ...     "file.xml",
         ...     metadata={'source': 'custom', 'dataGU': '20220101'}
         ... )
+
+        >>> # Più articoli e intervalli da un solo parsing
+        >>> result = convert_xml("file.xml", article="1,3,5-7,16bis")
     """
+    selection = _article_selection(article)
+
     # Check file exists
     if not os.path.exists(xml_path):
         raise XMLFileNotFoundError(
@@ -221,82 +317,91 @@ def convert_xml(
 
     return _convert_xml_internal(
         xml_path,
-        article=article,
+        selection=selection,
         with_urls=with_urls,
         metadata=metadata,
         quiet=quiet,
+        parser=parser,
+        workers=workers,
     )
 
 
+def _article_selection(article):
+    """
+    Selezione di articoli per ``article`` (None se assente o in formato non
+    riconosciuto: viene convertito tutto il documento).
+
+    Raises:
+        ConversionError: intervallo con gli estremi invertiti
+    """
+    if not article:
+        return None
+    try:
+        return parse_article_selection(article)
+    except ValueError as e:
+        raise ConversionError(f"Selezione articoli non valida: {e}")
+
+
 def _convert_xml_internal(
     xml_path: str,
-    article: Optional[str] = None,
+    selection: Optional[ArticleSelection] = None,
     with_urls: bool = False,
     metadata: Optional[Dict] = None,
     quiet: bool = False,
+    parser: str = "auto",
+    workers: Optional[int] = None,
 ) -> Optional[ConversionResult]:
     """
     Internal conversion function used by both convert_url and convert_xml.
     """
+    if workers is not None and workers < 0:
+        raise ConversionError(f"Numero di worker non valido: {workers}")
+
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
+        # Parse once and share the tree across link mapping, filtering and metadata
+        document = AkomaDocument(xml_path, parser=parser)
+        root = document.root
 
         # Build cross references if with_urls
         cross_references = None
         if with_urls:
-            from .akoma_utils import akoma_uri_to_normattiva_url
-
-            cross_references = {}
-            for ref in root.iter():
-                if ref.tag.endswith("ref") and ref.get("href"):
-                    href = ref.get("href")
-                    if href and href.startswith("/akn/"):
-                        normattiva_url = akoma_uri_to_normattiva_url(href)
-                        if normattiva_url:
-                            cross_references[normattiva_url] = normattiva_url
-                    elif href and is_normattiva_url(href):
-                        cross_references[href] = href
-
-        # Filter to specific article if requested
-        article_eid = None
-        if article:
-            article_eid = construct_article_eid(article)
-            if article_eid:
-                filtered_root = filter_xml_to_article(root, article_eid, AKN_NAMESPACE)
-                if filtered_root is None:
-                    logger.warning(f"Articolo '{article}' non trovato nel documento")
-                    return None
-                root = filtered_root
+            cross_references = build_url_cross_references(document)
+
+        # Filter to the requested articles: all of them come from this single parse
+        if selection:
+            filtered_root, missing = document.filter_to_articles(selection)
+            for label in missing:
+                logger.warning(f"Articolo '{label}' non trovato nel documento")
+            if filtered_root is None:
+                return None
+            root = filtered_root
 
         # Extract metadata from XML if not provided
         if metadata is None:
-            metadata = extract_metadata_from_xml(root)
+            metadata = document.metadata
         else:
             # Merge XML metadata with provided metadata
-            xml_metadata = extract_metadata_from_xml(root)
-            merged = {**xml_metadata, **metadata}
+            merged = {**document.metadata, **metadata}
             metadata = merged
 
-        # Generate markdown
-        markdown = generate_markdown_text(
-            root,
-            ns=AKN_NAMESPACE,
-            metadata=metadata,
-            cross_references=cross_references,
-        )
+        # Markdown is rendered on demand: result.markdown materialises the
+        # text, result.save()/write_to() stream the fragments
+        front_matter = dict(metadata)
+
+        def render():
+            return _iter_markdown(root, front_matter, cross_references, workers)
 
         if not quiet:
             logger.info("Conversione completata")
 
         return ConversionResult(
-            markdown=markdown,
+            fragments=render,
             metadata=metadata,
             url=metadata.get("url"),
             url_xml=metadata.get("url_xml"),
         )
 
-    except ET.ParseError as e:
+    except PARSE_ERRORS as e:
         raise ConversionError(
             f"Errore parsing XML: {e}. "
             f"Il file potrebbe essere corrotto o non essere un documento Akoma Ntoso valido."
@@ -305,6 +410,20 @@ def _convert_xml_internal(
         raise ConversionError(f"Errore durante conversione: {e}")
 
 
+def _iter_markdown(root, metadata, cross_references, workers=None):
+    """Genera i frammenti Markdown riportando gli errori come ConversionError."""
+    try:
+        yield from iter_markdown_fragments(
+            root,
+            ns=AKN_NAMESPACE,
+            metadata=metadata,
+            cross_references=cross_references,
+            workers=workers,
+        )
+    except Exception as e:
+        raise ConversionError(f"Errore durante conversione: {e}")
+
+
 def search_law(
     query: str,
     exa_api_key: Optional[str] = None,
@@ -465,6 +584,15 @@ class Converter:
         exa_api_key: Exa API key configurata
         quiet: Flag quiet mode
         keep_xml: Flag per mantenere XML scaricati
+        parser: Backend XML usato per il parsing
+        workers: Processi per il rendering parallelo (None = sequenziale)
+        client: NormattivaClient riusato per tutti i download
+        cache: XMLCache dei documenti scaricati (None = disattivata)
+        resolution_cache: ResolutionCache URL -> parametri (in memoria se non persistita)
+        hedge_delay: Secondi prima di avviare la strategia di download successiva
+
+    I ritentativi e il circuit breaker del client sono configurabili con
+    ``retry`` e ``circuit_breaker``; ``metrics()`` ne restituisce i contatori.
 
     Examples:
         >>> conv = Converter(exa_api_key="...", quiet=True)
@@ -478,6 +606,14 @@ class Converter:
         exa_api_key: Optional[str] = None,
         quiet: bool = False,
         keep_xml: bool = False,
+        parser: str = "auto",
+        workers: Optional[int] = None,
+        client: Optional[NormattivaClient] = None,
+        cache: Union[XMLCache, str, bool, None] = None,
+        resolution_cache: Union[ResolutionCache, str, None] = None,
+        retry: Union[RetryPolicy, int, bool, None] = None,
+        circuit_breaker: Union[CircuitBreaker, int, bool, None] = None,
+        hedge_delay: Optional[float] = DEFAULT_HEDGE_DELAY,
     ):
         """
         Inizializza converter con configurazione.
@@ -486,16 +622,42 @@ class Converter:
             exa_api_key: Exa API key (default: usa EXA_API_KEY da ENV)
             quiet: Disabilita tutti i log info
             keep_xml: Mantiene file XML scaricati temporanei
+            parser: Backend XML ("auto" usa lxml se installato, "lxml", "etree")
+            workers: Processi per il rendering parallelo (None/1 = sequenziale, 0 = tutte le CPU)
+            client: NormattivaClient per i download (default: client condiviso)
+            cache: Cache XML su disco: XMLCache, directory, True (directory predefinita) o None
+            resolution_cache: ResolutionCache o file SQLite (default: accanto alla
+                cache XML se attiva, altrimenti in memoria)
+            retry: RetryPolicy, numero di ritentativi o False (default: quelli del client)
+            circuit_breaker: CircuitBreaker, soglia di errori consecutivi o False
+                (default: quello del client)
+            hedge_delay: Secondi prima di avviare in parallelo la strategia di
+                download successiva (0 = tutte subito, None = solo dopo un fallimento)
         """
         load_env_file()
         self.exa_api_key = exa_api_key or os.getenv("EXA_API_KEY")
         self.quiet = quiet
         self.keep_xml = keep_xml
+        self.parser = parser
+        self.workers = workers
+        self.hedge_delay = hedge_delay
+        if client is None and (retry is not None or circuit_breaker is not None):
+            # Configurazione propria: il client condiviso resta invariato
+            client = NormattivaClient()
+        self.client = as_client(client)
+        if retry is not None:
+            self.client.retry = as_retry_policy(retry)
+        if circuit_breaker is not None:
+            self.client.circuit_breaker = as_circuit_breaker(circuit_breaker)
+        self.cache = open_cache(cache)
+        self.resolution_cache = open_resolution_cache(
+            resolution_cache, self.cache
+        ) or ResolutionCache()
 
     def convert_url(
         self,
         url: str,
-        article: Optional[str] = None,
+        article: Optional[Union[str, List[str]]] = None,
         with_urls: bool = False,
     ) -> Optional[ConversionResult]:
         """
@@ -503,10 +665,13 @@ class Converter:
 
         Stesso comportamento di convert_url() standalone ma usa:
         - self.quiet per logging
+        - self.client per riusare le connessioni HTTP
+        - self.cache per non riscaricare documenti già ottenuti
+        - self.resolution_cache per non ricaricare la pagina di URL già risolti
 
         Args:
             url: URL normattiva.it del documento
-            article: Articolo specifico da estrarre
+            article: Articoli da estrarre (es: "4", "1,3,5-7,16bis" o ["1", "5-7"])
             with_urls: Genera link markdown per riferimenti
 
         Returns:
@@ -517,12 +682,25 @@ class Converter:
             article=article,
             with_urls=with_urls,
             quiet=self.quiet,
+            parser=self.parser,
+            workers=self.workers,
+            client=self.client,
+            cache=self.cache,
+            resolution_cache=self.resolution_cache,
+            hedge_delay=self.hedge_delay,
         )
 
+    def metrics(self) -> Dict:
+        """
+        Contatori di rete del client (ritentativi, circuit breaker, limite di
+        frequenza) e statistiche delle strategie di download.
+        """
+        return {**self.client.metrics(), "strategies": get_strategy_stats().stats()}
+
     def convert_xml(
         self,
         xml_path: str,
-        article: Optional[str] = None,
+        article: Optional[Union[str, List[str]]] = None,
         with_urls: bool = False,
         metadata: Optional[Dict] = None,
     ) -> Optional[ConversionResult]:
@@ -531,7 +709,7 @@ class Converter:
 
         Args:
             xml_path: Path al file XML
-            article: Articolo specifico da estrarre
+            article: Articoli da estrarre (es: "4", "1,3,5-7,16bis" o ["1", "5-7"])
             with_urls: Genera link markdown per riferimenti
             metadata: Metadata opzionali
 
@@ -544,6 +722,8 @@ class Converter:
             with_urls=with_urls,
             metadata=metadata,
             quiet=self.quiet,
+            parser=self.parser,
+            workers=self.workers,
         )
 
     def search(
@@ -575,7 +755,7 @@ class Converter:
     def search_and_convert(
         self,
         query: str,
-        article: Optional[str] = None,
+        article: Optional[Union[str, List[str]]] = None,
         with_urls: bool = False,
         use_best: bool = True,
     ) -> Optional[ConversionResult]:
@@ -584,7 +764,7 @@ class Converter:
 
         Args:
             query: Query di ricerca
-            article: Articolo specifico da estrarre
+            article: Articoli da estrarre (es: "4", "1,3,5-7,16bis" o ["1", "5-7"])
             with_urls: Genera link markdown
             use_best: Se True usa miglior risultato automaticamente
 
@@ -0,0 +1,426 @@
+"""
+Motore di download asincrono per conversioni in batch ad alta concorrenza.
+
+Esegue con ``asyncio`` gli stessi flussi di ``normattiva_api`` (estrazione
+dei parametri, download ``caricaAKN``, ricerca OpenData) usati dalla parte
+sincrona: la logica è una sola, cambia solo il trasporto.
+
+Il trasporto è ``httpx`` (extra opzionale ``pip install normattiva2md[async]``).
+``AsyncNormattivaClient`` limita le richieste contemporanee verso ciascun
+host con un semaforo, così centinaia di download possono girare in un solo
+thread senza sovraccaricare normattiva.it. Le richieste ``stream=True``
+arrivano a pezzi con ``aiter_bytes()`` in un file temporaneo (in memoria
+finché è piccolo) e la lettura si ferma appena supera ``max_bytes``: un
+corpo enorme non viene mai tenuto tutto in RAM.
+
+Examples:
+    >>> async def main(urls):
+    ...     async with AsyncNormattivaClient(max_per_host=8) as client:
+    ...         return await asyncio.gather(
+    ...             *(extract_params_async(url, client, quiet=True) for url in urls)
+    ...         )
+"""
+
+import asyncio
+import json
+import tempfile
+from urllib.parse import urlparse
+
+import requests
+
+from .constants import (
+    CONNECT_TIMEOUT,
+    DEFAULT_TIMEOUT,
+    DOWNLOAD_CHUNK_SIZE,
+    HTTP_MAX_PER_HOST,
+)
+from .http_client import DEFAULT_HEADERS, Sleep
+from .rate_limit import get_default_rate_limiter
+from .retry import as_circuit_breaker, as_retry_policy, is_server_failure
+from .normattiva_api import (
+    FetchContext,
+    download_akoma_ntoso_flow,
+    extract_params_flow,
+    opendata_batch_flow,
+    opendata_flow,
+)
+
+try:
+    import httpx
+except ImportError:  # httpx è opzionale
+    httpx = None
+
+# Sotto questa soglia il corpo di una risposta in streaming resta in memoria
+SPOOL_MAX_MEMORY = 16 * DOWNLOAD_CHUNK_SIZE
+
+
+class AsyncResponse:
+    """
+    Risposta ``httpx`` con l'interfaccia di ``requests.Response`` usata dai flussi.
+
+    Con ``body`` (file temporaneo riempito da una richiesta ``stream=True``)
+    ``iter_content`` legge dal file invece che dal corpo già caricato.
+    """
+
+    def __init__(self, response, body=None):
+        self._response = response
+        self._body = body
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(getattr(response, "url", ""))
+
+    @property
+    def content(self):
+        if self._body is None:
+            return self._response.content
+        self._body.seek(0)
+        return self._body.read()
+
+    @property
+    def text(self):
+        if self._body is None:
+            return self._response.text
+        return self.content.decode(self._response.encoding or "utf-8", "replace")
+
+    def json(self):
+        if self._body is None:
+            return self._response.json()
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        if self._body is None:
+            # httpx ha già letto il corpo: i blocchi vengono solo ritagliati
+            content = self._response.content
+            for start in range(0, len(content), chunk_size):
+                yield content[start : start + chunk_size]
+            return
+        self._body.seek(0)
+        while True:
+            chunk = self._body.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        """Libera il file temporaneo del corpo."""
+        if self._body is not None:
+            self._body.close()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+
+def _httpx_options(kwargs):
+    """Traduce le opzioni in stile ``requests`` in quelle di ``httpx``."""
+    options = {"follow_redirects": kwargs.pop("allow_redirects", True)}
+    data = kwargs.pop("data", None)
+    if isinstance(data, (str, bytes)):
+        options["content"] = data
+    elif data is not None:
+        # Lista di coppie (form con chiavi ripetute) -> dizionario di liste
+        form = {}
+        for name, value in data.items() if isinstance(data, dict) else data:
+            form.setdefault(name, []).append(value)
+        options["data"] = form
+    timeout = kwargs.pop("timeout", None)
+    if isinstance(timeout, tuple):
+        options["timeout"] = httpx.Timeout(timeout[1], connect=timeout[0])
+    elif timeout is not None:
+        options["timeout"] = timeout
+    kwargs.pop("verify", None)
+    kwargs.pop("stream", None)
+    options.update(kwargs)
+    return options
+
+
+async def _spool(response, max_bytes=None):
+    """
+    Copia il corpo di una risposta httpx in streaming in un file temporaneo.
+
+    Si ferma al primo blocco che porta il totale oltre ``max_bytes``: quel
+    blocco viene tenuto, così il flusso vede il superamento e lo segnala
+    con il proprio messaggio.
+
+    Returns:
+        SpooledTemporaryFile: il corpo letto, riavvolto all'inizio
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    size = 0
+    try:
+        async for chunk in response.aiter_bytes():
+            body.write(chunk)
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                break
+    except BaseException:
+        body.close()
+        raise
+    body.seek(0)
+    return body
+
+
+class AsyncNormattivaClient:
+    """
+    Client HTTP asincrono con limite di concorrenza per host.
+
+    Args:
+        client: ``httpx.AsyncClient`` esistente, oppure qualsiasi oggetto con
+            ``await client.request(method, url, headers=..., **kwargs)`` che
+            accetti le opzioni in stile ``requests`` (default: nuovo
+            ``httpx.AsyncClient``)
+        timeout: timeout di default, numero o tupla (connessione, lettura)
+        max_per_host: richieste contemporanee massime verso lo stesso host
+        headers: header aggiuntivi per tutte le richieste
+        rate_limiter: ``RateLimiter`` per host (default: il limitatore
+            condiviso del processo; False = nessun limite)
+        retry: ``RetryPolicy``, numero di ritentativi o False
+        circuit_breaker: ``CircuitBreaker``, soglia di errori o False
+
+    Raises:
+        ImportError: ``client`` non indicato e httpx non installato
+    """
+
+    def __init__(
+        self,
+        client=None,
+        timeout=(CONNECT_TIMEOUT, DEFAULT_TIMEOUT),
+        max_per_host=HTTP_MAX_PER_HOST,
+        headers=None,
+        rate_limiter=None,
+        retry=None,
+        circuit_breaker=None,
+    ):
+        if client is None:
+            if httpx is None:
+                raise ImportError(
+                    "Il download asincrono richiede httpx: pip install normattiva2md[async]"
+                )
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=None, max_keepalive_connections=max_per_host
+                )
+            )
+        self.client = client
+        self._httpx = httpx is not None and isinstance(client, httpx.AsyncClient)
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.rate_limiter = rate_limiter
+        self.retry = as_retry_policy(retry)
+        self.circuit_breaker = as_circuit_breaker(circuit_breaker)
+        self._semaphores = {}
+
+    def _semaphore(self, url):
+        host = urlparse(url).netloc
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return semaphore
+
+    async def request(self, method, url, headers=None, **kwargs):
+        """
+        Esegue una richiesta rispettando concorrenza e frequenza per host.
+
+        Gli errori di trasporto di httpx diventano ``requests.RequestException``,
+        come nel client sincrono.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        headers = {**self.headers, **(headers or {})}
+        limiter = None
+        if self.rate_limiter is not False:
+            limiter = self.rate_limiter or get_default_rate_limiter()
+        breaker = self.circuit_breaker
+        attempt = 0
+        while True:
+            attempt += 1
+            if breaker is not None:
+                breaker.before_request(url)
+            try:
+                async with self._semaphore(url):
+                    if limiter is not None:
+                        delay = limiter.reserve(url)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    response = await self._send(method, url, headers, dict(kwargs))
+            except requests.RequestException as e:
+                if breaker is not None:
+                    breaker.record(url, success=False)
+                delay = self._retry_delay(method, attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                if limiter is not None:
+                    limiter.observe(url, response)
+                if breaker is not None:
+                    breaker.record(url, success=not is_server_failure(response))
+                delay = self._retry_delay(method, attempt, response=response)
+                if delay is None:
+                    return response
+                close = getattr(response, "close", None)
+                if close is not None:
+                    close()
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, method, attempt, response=None, error=None):
+        if self.retry is None:
+            return None
+        return self.retry.next_delay(method, attempt, response=response, error=error)
+
+    async def _send(self, method, url, headers, kwargs):
+        max_bytes = kwargs.pop("max_bytes", None)
+        if not self._httpx:
+            return await self.client.request(method, url, headers=headers, **kwargs)
+        stream = kwargs.pop("stream", False)
+        options = _httpx_options(kwargs)
+        try:
+            if not stream:
+                response = await self.client.request(
+                    method, url, headers=headers, **options
+                )
+                return AsyncResponse(response)
+            follow_redirects = options.pop("follow_redirects")
+            request = self.client.build_request(method, url, headers=headers, **options)
+            response = await self.client.send(
+                request, stream=True, follow_redirects=follow_redirects
+            )
+            try:
+                body = await _spool(response, max_bytes)
+            finally:
+                await response.aclose()
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return AsyncResponse(response, body=body)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        """Chiude le connessioni del client."""
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+async def run_async(flow, client):
+    """
+    Esegue un flusso di ``normattiva_api`` con un client asincrono.
+
+    Controparte di ``http_client.run_sync``: le ``Request`` vengono attese
+    su ``client`` e le ``Sleep`` diventano ``asyncio.sleep``.
+
+    Returns:
+        il valore restituito dal generatore
+    """
+    try:
+        step = next(flow)
+        while True:
+            if isinstance(step, Sleep):
+                await asyncio.sleep(step.seconds)
+                step = flow.send(None)
+                continue
+            try:
+                response = await client.request(
+                    step.method, step.url, headers=step.headers, **step.kwargs
+                )
+            except requests.RequestException as e:
+                step = flow.throw(e)
+            else:
+                step = flow.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def extract_params_async(
+    url, client, quiet=False, resolution_cache=None, context=None
+):
+    """Versione asincrona di ``extract_params_from_normattiva_url`` (solo i parametri)."""
+    return await run_async(
+        extract_params_flow(
+            url, quiet=quiet, resolution_cache=resolution_cache, context=context
+        ),
+        client,
+    )
+
+
+async def download_akoma_ntoso_async(
+    params, output_path, client, quiet=False, cache=None
+):
+    """Versione asincrona di ``download_akoma_ntoso``."""
+    return await run_async(
+        download_akoma_ntoso_flow(params, output_path, quiet=quiet, cache=cache),
+        client,
+    )
+
+
+async def download_akoma_ntoso_via_opendata_async(
+    url, output_path, client, quiet=False, cache=None, context=None
+):
+    """
+    Versione asincrona di ``download_akoma_ntoso_via_opendata``.
+
+    Returns:
+        tuple: (success, metadata)
+    """
+    return await run_async(
+        opendata_flow(url, output_path, quiet=quiet, cache=cache, context=context),
+        client,
+    )
+
+
+async def download_akoma_ntoso_via_opendata_batch_async(
+    items, client, quiet=False, cache=None
+):
+    """
+    Versione asincrona di ``download_akoma_ntoso_via_opendata_batch``.
+
+    Returns:
+        dict: URL -> metadata dell'atto scaricato, oppure None
+    """
+    return await run_async(opendata_batch_flow(items, quiet=quiet, cache=cache), client)
+
+
+async def fetch_document_async(
+    url, output_path, client, quiet=False, cache=None, resolution_cache=None
+):
+    """
+    Parametri e XML di un atto: ``caricaAKN`` con fallback OpenData.
+
+    Returns:
+        dict o None: metadati (``dataGU``, ``codiceRedaz``, ``dataVigenza``,
+        ``url``, ``url_xml``) se il download è riuscito
+    """
+    context = FetchContext()
+    params = await extract_params_async(
+        url, client, quiet=quiet, resolution_cache=resolution_cache, context=context
+    )
+    if params:
+        if not await download_akoma_ntoso_async(
+            params, output_path, client, quiet=quiet, cache=cache
+        ):
+            return None
+        return {
+            **params,
+            "url": url,
+            "url_xml": (
+                "https://www.normattiva.it/do/atto/caricaAKN"
+                f"?dataGU={params['dataGU']}"
+                f"&codiceRedaz={params['codiceRedaz']}"
+                f"&dataVigenza={params['dataVigenza']}"
+            ),
+        }
+    success, metadata = await download_akoma_ntoso_via_opendata_async(
+        url, output_path, client, quiet=quiet, cache=cache, context=context
+    )
+    return metadata if success else None
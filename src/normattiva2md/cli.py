@@ -2,9 +2,14 @@ import os
 import sys
 import argparse
 import tempfile
-import xml.etree.ElementTree as ET
+from datetime import datetime
 
-from .constants import VERSION
+from .constants import (
+    HTTP_MAX_PER_HOST,
+    REFERENCES_MAX_DOCUMENTS,
+    REFERENCES_WORKERS,
+    VERSION,
+)
 
 
 def print_rich_help():
@@ -124,7 +129,7 @@ def print_rich_help():
     filter_table.add_column("Option", style="bold yellow")
     filter_table.add_column("Description")
 
-    filter_table.add_row("--art", "Filtra a singolo articolo (es: 4, 16bis)")
+    filter_table.add_row("--art", "Filtra ad articoli singoli, elenchi o intervalli (es: 4, 16bis, 1,3,5-7)")
     filter_table.add_row("-c, --completo", "Forza conversione completa con URL ~artN")
     console.print(filter_table)
     console.print()
@@ -157,6 +162,12 @@ def print_rich_help():
 
     debug_table.add_row("-q, --quiet", "Disabilita output non essenziali")
     debug_table.add_row("--keep-xml", "Mantiene file XML scaricati")
+    debug_table.add_row("--cache-dir [DIR]", "Riusa gli XML già scaricati (cache su disco)")
+    debug_table.add_row("--rate REQ_S", "Richieste al secondo verso normattiva.it")
+    debug_table.add_row("--retries N", "Ritentativi per errori di rete o 5xx")
+    debug_table.add_row("--hedge-delay S", "Attesa prima del metodo di download successivo")
+    debug_table.add_row("--ref-workers N", "Leggi citate scaricate in parallelo")
+    debug_table.add_row("--depth N", "Livelli di citazioni seguiti da --with-references")
     console.print(debug_table)
     console.print()
 
@@ -170,6 +181,7 @@ def print_rich_help():
         f'{cmd_display} --search "legge stanca" -o output.md',
         f"{cmd_display} --art 16bis input.xml > output.md",
         f"{cmd_display} --with-references <url> laws_dir/",
+        f"{cmd_display} cache stats",
     ]
 
     for example in examples:
@@ -209,14 +221,30 @@ from .normattiva_api import (
     normalize_normattiva_url,
     validate_normattiva_url,
     extract_params_from_normattiva_url,
-    download_akoma_ntoso,
-    download_akoma_ntoso_via_export,
-    download_akoma_ntoso_via_opendata,
+    FetchContext,
 )
+from .strategies import DEFAULT_HEDGE_DELAY, download_strategies, run_strategies
 from .exa_api import lookup_normattiva_url
 from .akoma_utils import parse_article_reference
-from .xml_parser import construct_article_eid
+from .xml_backend import PARSER_CHOICES, get_backend
+from .http_client import get_default_client
+from .rate_limit import DEFAULT_BURST, DEFAULT_RATE, configure_default_rate_limiter
+from .retry import (
+    DEFAULT_BREAKER_THRESHOLD,
+    DEFAULT_MAX_RETRIES,
+    as_circuit_breaker,
+    as_retry_policy,
+)
+from .resolution_cache import (
+    DEFAULT_VIGENZA_TTL,
+    RESOLUTION_DB_NAME,
+    ResolutionCache,
+    open_resolution_cache,
+)
+from .xml_cache import DEFAULT_CACHE_MAX_MB, XMLCache, open_cache
+from .xml_parser import AkomaDocument, ArticleSelection, parse_article_selection
 from .markdown_converter import convert_akomantoso_to_markdown_improved
+from .streaming_converter import convert_akomantoso_to_markdown_streaming
 from .multi_document import convert_with_references
 from .provvedimenti_api import (
     extract_law_params_from_url,
@@ -226,9 +254,121 @@ from .provvedimenti_api import (
 from .validation import MarkdownValidator, StructureComparer
 
 
-def perform_validation(xml_path, md_path, quiet=False):
+def convert_xml_file(
+    xml_path, output_file, document=None, streaming=False, workers=None, **options
+):
+    """
+    Converte un file XML con il motore scelto.
+
+    Il motore ad albero riusa ``document`` (già analizzato o da analizzare una
+    sola volta) e può convertire il corpo su ``workers`` processi; il motore in
+    streaming legge sempre il file a blocchi in un solo processo.
+    """
+    if streaming:
+        return convert_akomantoso_to_markdown_streaming(xml_path, output_file, **options)
+    return convert_akomantoso_to_markdown_improved(
+        xml_path, output_file, document=document, workers=workers, **options
+    )
+
+
+def run_cache_command(argv, cmd_display="normattiva2md"):
+    """
+    Sottocomando ``cache``: statistiche e pulizia della cache XML.
+
+    Returns:
+        int: exit code
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"{cmd_display} cache",
+        description="Gestione della cache dei file XML Akoma Ntoso scaricati",
+    )
+    parser.add_argument("action", choices=("stats", "prune"), help="Operazione")
+    parser.add_argument(
+        "--cache-dir", default=None, metavar="DIR", help="Directory della cache"
+    )
+    parser.add_argument(
+        "--max-size",
+        type=float,
+        default=None,
+        metavar="MB",
+        help=f"prune: spazio massimo da mantenere (default: {DEFAULT_CACHE_MAX_MB} MB)",
+    )
+    parser.add_argument(
+        "--older-than",
+        type=float,
+        default=None,
+        metavar="GIORNI",
+        help="prune: rimuove anche le voci non usate da più di GIORNI giorni",
+    )
+    args = parser.parse_args(argv)
+
+    cache = XMLCache(args.cache_dir)
+    if args.action == "prune":
+        max_bytes = None if args.max_size is None else int(args.max_size * 1024 * 1024)
+        older_than = None if args.older_than is None else args.older_than * 86400
+        try:
+            removed = cache.prune(max_bytes=max_bytes, older_than=older_than)
+        except OSError as e:
+            print(f"❌ Errore durante la pulizia della cache: {e}", file=sys.stderr)
+            return 1
+        print(f"🧹 Rimosse {removed} voci dalla cache", file=sys.stderr)
+
+    stats = cache.stats()
+    print(f"📦 Cache: {stats['cache_dir']}")
+    print(f"  - voci: {stats['entries']} ({stats['objects']} contenuti distinti)")
+    print(
+        f"  - spazio: {stats['stored_bytes'] / 1024 / 1024:.1f} MB su "
+        f"{stats['max_bytes'] / 1024 / 1024:.0f} MB "
+        f"(XML originali {stats['original_bytes'] / 1024 / 1024:.1f} MB, "
+        f"compressione {stats['compression_ratio']:.1f}x)"
+    )
+    if stats["oldest_access"] is not None:
+        oldest = datetime.fromtimestamp(stats["oldest_access"]).strftime("%Y-%m-%d %H:%M")
+        newest = datetime.fromtimestamp(stats["newest_access"]).strftime("%Y-%m-%d %H:%M")
+        print(f"  - ultimo accesso: {oldest} .. {newest}")
+    resolutions_path = os.path.join(cache.cache_dir, RESOLUTION_DB_NAME)
+    if os.path.exists(resolutions_path):
+        resolutions = ResolutionCache(resolutions_path)
+        print(f"  - URL risolti: {resolutions.stats()['entries']}")
+        resolutions.close()
+    return 0
+
+
+def print_revalidation_summary(xml_cache, resolutions):
+    """Stampa quante pagine e XML in cache sono stati rivalidati o riscaricati."""
+    revalidated = redownloaded = 0
+    for cache in (xml_cache, resolutions):
+        if cache is not None:
+            revalidated += cache.revalidated
+            redownloaded += cache.redownloaded
+    if revalidated or redownloaded:
+        print(
+            f"🔁 Cache: {revalidated} rivalidati senza cambiamenti, "
+            f"{redownloaded} riscaricati perché cambiati",
+            file=sys.stderr,
+        )
+
+
+def print_network_summary(client):
+    """Stampa ritentativi e aperture del circuit breaker, se ce ne sono stati."""
+    metrics = client.metrics()
+    retry = metrics["retry"] or {}
+    breaker = metrics["circuit_breaker"] or {}
+    if retry.get("retries") or retry.get("gave_up") or breaker.get("opened"):
+        print(
+            f"🔁 Rete: {retry.get('retries', 0)} ritentativi, "
+            f"{retry.get('gave_up', 0)} richieste fallite dopo i ritentativi, "
+            f"circuito aperto {breaker.get('opened', 0)} volte",
+            file=sys.stderr,
+        )
+
+
+def perform_validation(xml_path, md_path, quiet=False, document=None):
     """
     Esegue la validazione strutturale e il confronto tra XML e Markdown.
+
+    Se viene passato ``document`` (AkomaDocument) l'albero già analizzato per
+    la conversione viene riusato invece di rileggere il file.
     """
     if not os.path.exists(md_path):
         return False
@@ -240,8 +380,9 @@ def perform_validation(xml_path, md_path, quiet=False):
         with open(md_path, "r", encoding="utf-8") as f:
             md_text = f.read()
 
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
+        if document is None:
+            document = AkomaDocument(xml_path)
+        root = document.root
 
         v_report = validator.validate(md_text)
         c_report = comparer.compare(root, md_text)
@@ -273,6 +414,10 @@ def main():
     cmd = os.path.basename(sys.argv[0]) or "normattiva2md"
     cmd_display = cmd if not cmd.endswith(".py") else "normattiva2md"
 
+    # Sottocomando di gestione della cache XML
+    if len(sys.argv) > 1 and sys.argv[1] == "cache":
+        sys.exit(run_cache_command(sys.argv[2:], cmd_display))
+
     # Check if help is requested or no arguments
     if len(sys.argv) == 1 or "--help" in sys.argv or "-h" in sys.argv:
         print_rich_help()
@@ -334,6 +479,9 @@ def main():
     {cmd_display} --art 4 input.xml output.md
     {cmd_display} --art 16bis "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2022;53" output.md
     {cmd_display} --art 3 --with-urls "input.xml" > output.md
+
+    # Più articoli e intervalli da un solo download/parsing
+    {cmd_display} --art 1,3,5-7,16bis input.xml estratto.md
             """,
     )
 
@@ -426,7 +574,109 @@ def main():
     parser.add_argument(
         "--art",
         dest="article_filter",
-        help="Filtra output a singolo articolo (es: 4, 16bis, 3ter). Sovrascrive ~artN nell'URL",
+        help="Filtra output ad articoli singoli, elenchi o intervalli (es: 4, 16bis, 1,3,5-7). Sovrascrive ~artN nell'URL",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Converte leggendo l'XML a blocchi (memoria ridotta per documenti molto grandi)",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=PARSER_CHOICES,
+        default="auto",
+        help="Parser XML: auto (lxml se installato), lxml o etree (libreria standard)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        nargs="?",
+        const=True,
+        default=None,
+        metavar="DIR",
+        help="Riusa i file XML già scaricati da una cache su disco (default: ~/.cache/normattiva2md)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        metavar="REQ_S",
+        help=f"Richieste al secondo verso normattiva.it (default: {DEFAULT_RATE:g}); con --cache-dir il limite vale per tutti i processi",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=DEFAULT_BURST,
+        metavar="N",
+        help=f"Richieste consecutive consentite senza attesa (default: {DEFAULT_BURST})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        metavar="N",
+        help=f"Ritentativi per errori di rete o 5xx, con backoff esponenziale (default: {DEFAULT_MAX_RETRIES}, 0 = nessuno)",
+    )
+    parser.add_argument(
+        "--breaker-threshold",
+        type=int,
+        default=DEFAULT_BREAKER_THRESHOLD,
+        metavar="N",
+        help=f"Errori consecutivi dopo cui le richieste a un host falliscono subito per un po' (default: {DEFAULT_BREAKER_THRESHOLD}, 0 = mai)",
+    )
+    parser.add_argument(
+        "--hedge-delay",
+        type=float,
+        default=DEFAULT_HEDGE_DELAY,
+        metavar="SECONDI",
+        help=f"Secondi prima di avviare in parallelo il metodo di download successivo (caricaAKN, OpenData, export) se il precedente non ha ancora finito (default: {DEFAULT_HEDGE_DELAY:g}, 0 = tutti subito)",
+    )
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Con --cache-dir: rivalida pagine e XML in cache col server (ETag/Last-Modified o hash)",
+    )
+    parser.add_argument(
+        "--vigenza-ttl",
+        type=float,
+        default=DEFAULT_VIGENZA_TTL / 3600,
+        metavar="ORE",
+        help="Con --cache-dir: ore di validità della data di vigenza risolta per un URL (default: 24)",
+    )
+    parser.add_argument(
+        "--ref-workers",
+        type=int,
+        default=REFERENCES_WORKERS,
+        metavar="N",
+        help=f"Con --with-references: leggi citate scaricate e convertite in parallelo (default: {REFERENCES_WORKERS})",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Con --with-references: livelli di citazioni da seguire (default: 1 = solo le leggi citate dalla principale)",
+    )
+    parser.add_argument(
+        "--max-documents",
+        type=int,
+        default=None,
+        metavar="N",
+        help=f"Con --with-references: leggi citate da scaricare al massimo (default: nessun limite con --depth 1, {REFERENCES_MAX_DOCUMENTS} con --depth maggiore)",
+    )
+    parser.add_argument(
+        "--max-per-host",
+        type=int,
+        default=HTTP_MAX_PER_HOST,
+        metavar="N",
+        help=f"Richieste contemporanee massime verso normattiva.it (default: {HTTP_MAX_PER_HOST})",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Processi per il rendering parallelo del corpo (0 = tutte le CPU)",
     )
     args = parser.parse_args()
 
@@ -442,6 +692,60 @@ def main():
     # Sebbene load_env_file sia in utils.py, la sua chiamata deve essere qui per inizializzare le variabili d'ambiente prima dell'uso.
     load_env_file()
 
+    # Verifica subito che il parser XML richiesto sia disponibile
+    try:
+        get_backend(args.parser)
+    except ImportError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    xml_cache = open_cache(args.cache_dir, revalidate=args.revalidate)
+    if args.rate <= 0 or args.burst < 1:
+        print("❌ --rate deve essere > 0 e --burst >= 1", file=sys.stderr)
+        sys.exit(1)
+    if args.retries < 0 or args.breaker_threshold < 0:
+        print("❌ --retries e --breaker-threshold devono essere >= 0", file=sys.stderr)
+        sys.exit(1)
+    if args.hedge_delay < 0:
+        print("❌ --hedge-delay deve essere >= 0", file=sys.stderr)
+        sys.exit(1)
+    if args.ref_workers < 1 or args.max_per_host < 1:
+        print("❌ --ref-workers e --max-per-host devono essere >= 1", file=sys.stderr)
+        sys.exit(1)
+    if args.depth < 1 or (args.max_documents is not None and args.max_documents < 0):
+        print("❌ --depth deve essere >= 1 e --max-documents >= 0", file=sys.stderr)
+        sys.exit(1)
+    client = get_default_client()
+    client.retry = as_retry_policy(args.retries)
+    client.circuit_breaker = as_circuit_breaker(args.breaker_threshold)
+    client.max_per_host = args.max_per_host
+    # Con una cache su disco il token bucket è condiviso tra processi
+    configure_default_rate_limiter(
+        args.rate,
+        args.burst,
+        state_dir=os.path.join(xml_cache.cache_dir, "ratelimit") if xml_cache else None,
+    )
+    if args.vigenza_ttl < 0:
+        print("❌ --vigenza-ttl deve essere un numero >= 0", file=sys.stderr)
+        sys.exit(1)
+    # --revalidate: ogni URL già risolto viene ricontrollato (richiesta condizionale)
+    resolutions = open_resolution_cache(
+        None, xml_cache, ttl=0 if args.revalidate else args.vigenza_ttl * 3600
+    )
+
+    # Validate -j/--jobs parameter
+    if args.jobs is not None:
+        if args.jobs < 0:
+            print("❌ -j/--jobs deve essere un numero >= 0", file=sys.stderr)
+            sys.exit(1)
+        if args.streaming:
+            if not args.quiet:
+                print(
+                    "⚠️  -j/--jobs ignorato con --streaming (conversione in un solo processo)",
+                    file=sys.stderr,
+                )
+            args.jobs = None
+
     # Validate --provvedimenti parameter
     if args.provvedimenti:
         if not input_source or not is_normattiva_url(input_source):
@@ -485,20 +789,28 @@ def main():
     # Determine quiet mode (output to stdout or --quiet flag)
     quiet_mode = args.quiet or output_file is None
 
-    # Convert --art parameter to article eId
+    # Convert --art parameter to an article selection (eIds and ranges)
     article_filter = args.article_filter
     article_filter_eid = None
     if article_filter:
-        article_filter_eid = construct_article_eid(article_filter)
+        try:
+            article_filter_eid = parse_article_selection(article_filter)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
         if not article_filter_eid:
             print(
-                f"❌ Formato articolo invalido: '{article_filter}'. Usa formato: numero[estensione] (es: 4, 16bis, 3ter)",
+                f"❌ Formato articolo invalido: '{article_filter}'. Usa formato: numero[estensione], anche in elenchi e intervalli (es: 4, 16bis, 1,3,5-7)",
                 file=sys.stderr,
             )
             sys.exit(1)
         if not quiet_mode:
+            eids = ", ".join(
+                start if start == end else f"{start}..{end}"
+                for _label, start, end in article_filter_eid.ranges
+            )
             print(
-                f"Filtro articolo attivato: {article_filter} (eId: {article_filter_eid})",
+                f"Filtro articolo attivato: {article_filter} (eId: {eids})",
                 file=sys.stderr,
             )
 
@@ -625,7 +937,18 @@ def main():
         # Handle --with-references mode
         if args.with_references:
             success = convert_with_references(
-                input_source, output_file, args.quiet, args.keep_xml, args.completo
+                input_source,
+                output_file,
+                args.quiet,
+                args.keep_xml,
+                args.completo,
+                cache=xml_cache,
+                resolution_cache=resolutions,
+                workers=args.ref_workers,
+                depth=args.depth,
+                max_documents=args.max_documents,
+                parser=args.parser,
+                jobs=args.jobs,
             )
             if not success:
                 sys.exit(1)
@@ -665,11 +988,17 @@ def main():
 
             # Estrai parametri dalla pagina (se non forziamo OpenData)
             params = None
-            session = None
+            session = get_default_client()
+            # Pagina dell'atto condivisa con i fallback OpenData ed export
+            fetch_context = FetchContext()
             if not args.opendata:
                 # Show progress even when output goes to stdout (unless --quiet)
                 params, session = extract_params_from_normattiva_url(
-                    input_source, quiet=args.quiet
+                    input_source,
+                    session=session,
+                    quiet=args.quiet,
+                    resolution_cache=resolutions,
+                    context=fetch_context,
                 )
 
             if not quiet_mode:
@@ -696,43 +1025,27 @@ def main():
             )
             os.close(temp_fd)  # Close file descriptor, we'll write with requests
 
-            # Scarica XML
-            if params and not args.opendata:
-                if not download_akoma_ntoso(
-                    params, xml_temp_path, session, quiet=quiet_mode
-                ):
-                    print(
-                        "❌ Errore durante il download del file XML",
-                        file=sys.stderr,
-                    )
-                    sys.exit(1)
-                metadata = {
-                    "dataGU": params["dataGU"],
-                    "codiceRedaz": params["codiceRedaz"],
-                    "dataVigenza": params["dataVigenza"],
-                    "url": input_source,
-                    "url_xml": (
-                        "https://www.normattiva.it/do/atto/caricaAKN"
-                        f"?dataGU={params['dataGU']}"
-                        f"&codiceRedaz={params['codiceRedaz']}"
-                        f"&dataVigenza={params['dataVigenza']}"
-                    ),
-                }
-            else:
-                # Show progress even when output goes to stdout (unless --quiet)
-                success, metadata, session = download_akoma_ntoso_via_opendata(
-                    input_source, xml_temp_path, session=session, quiet=args.quiet
+            # Scarica XML: caricaAKN, OpenData ed export in gara
+            strategies = download_strategies(
+                input_source,
+                params,
+                quiet=quiet_mode,
+                cache=xml_cache,
+                context=fetch_context,
+            )
+            _, metadata = run_strategies(
+                strategies,
+                xml_temp_path,
+                session,
+                hedge_delay=args.hedge_delay,
+                quiet=quiet_mode,
+            )
+            if metadata is None:
+                print(
+                    "❌ Errore durante il download del file XML",
+                    file=sys.stderr,
                 )
-                if not success:
-                    success, metadata, session = download_akoma_ntoso_via_export(
-                        input_source, xml_temp_path, session=session, quiet=args.quiet
-                    )
-                if not success:
-                    print(
-                        "❌ Errore durante il download via fallback OpenData/HTML",
-                        file=sys.stderr,
-                    )
-                    sys.exit(1)
+                sys.exit(1)
 
             # Converti a Markdown
             if not quiet_mode:
@@ -740,16 +1053,24 @@ def main():
 
             # Add article reference to metadata if present (or if overridden by --completo)
             if article_ref:
-                metadata["article"] = article_ref
+                metadata["article"] = (
+                    article_ref.metadata_value()
+                    if isinstance(article_ref, ArticleSelection)
+                    else article_ref
+                )
             elif args.completo and parse_article_reference(input_source):
                 # Note that complete conversion was forced
                 metadata["article"] = parse_article_reference(
                     input_source
                 )  # Include original article ref for reference
 
-            success = convert_akomantoso_to_markdown_improved(
+            xml_document = AkomaDocument(xml_temp_path, parser=args.parser)
+            success = convert_xml_file(
                 xml_temp_path,
                 output_file,
+                document=xml_document,
+                streaming=args.streaming,
+                workers=args.jobs,
                 metadata=metadata,
                 article_ref=article_ref,
                 with_urls=args.with_urls,
@@ -770,7 +1091,9 @@ def main():
                 # Validazione strutturale
                 if args.validate:
                     if output_file:
-                        perform_validation(xml_temp_path, output_file, quiet_mode)
+                        perform_validation(
+                            xml_temp_path, output_file, quiet_mode, xml_document
+                        )
                     elif not quiet_mode:
                         print(
                             "⚠️ Validazione saltata: output a stdout non supportato con --validate",
@@ -798,6 +1121,10 @@ def main():
                 print("❌ Errore durante la conversione", file=sys.stderr)
                 sys.exit(1)
 
+        if not quiet_mode:
+            print_revalidation_summary(xml_cache, resolutions)
+            print_network_summary(get_default_client())
+
     else:
         # Gestione file XML locale
         if not quiet_mode:
@@ -811,9 +1138,13 @@ def main():
                     f"Conversione da file XML locale: '{input_source}' (output a stdout)...",
                     file=sys.stderr,
                 )
-        success = convert_akomantoso_to_markdown_improved(
+        xml_document = AkomaDocument(input_source, parser=args.parser)
+        success = convert_xml_file(
             input_source,
             output_file,
+            document=xml_document,
+            streaming=args.streaming,
+            workers=args.jobs,
             metadata=None,
             article_ref=article_filter_eid,
             with_urls=args.with_urls,
@@ -826,7 +1157,9 @@ def main():
             # Validazione strutturale
             if args.validate:
                 if output_file:
-                    perform_validation(input_source, output_file, quiet_mode)
+                    perform_validation(
+                        input_source, output_file, quiet_mode, xml_document
+                    )
                 elif not quiet_mode:
                     print(
                         "⚠️ Validazione saltata: output a stdout non supportato con --validate",
@@ -6,5 +6,32 @@ ELI_NAMESPACE = {"eli": "http://data.europa.eu/eli/ontology#"}
 ALLOWED_DOMAINS = ["www.normattiva.it", "normattiva.it"]
 MAX_FILE_SIZE_MB = 50
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+# Blocchi dei download in streaming
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 DEFAULT_TIMEOUT = 30
 VERSION = "2.1.10"
+
+# HTTP client (connessioni riusate verso normattiva.it)
+USER_AGENT = f"Akoma2MD/{VERSION} (https://github.com/ondata/akoma2md)"
+CONNECT_TIMEOUT = 10
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 10
+# Richieste contemporanee per host (motore asincrono e download paralleli)
+HTTP_MAX_PER_HOST = 6
+# Leggi citate scaricate e convertite in parallelo con --with-references
+REFERENCES_WORKERS = 4
+# Limiti della visita del grafo delle citazioni con --depth > 1: atti
+# scaricati in totale e URL visitati per livello
+REFERENCES_MAX_DOCUMENTS = 500
+REFERENCES_MAX_FRONTIER = 1000
+
+# Ricerca asincrona OpenData: controlli di stato da 0,5 s raddoppiati fino a
+# 8 s, entro un tempo massimo complessivo; una ricerca per finestra di giorni
+OPENDATA_POLL_INITIAL = 0.5
+OPENDATA_POLL_MAX = 8.0
+OPENDATA_DEADLINE = 120
+OPENDATA_BATCH_MAX_DAYS = 31
+# Dimensione massima dello ZIP di una collezione OpenData (può contenere
+# tutti gli atti di una finestra; ogni XML resta entro MAX_FILE_SIZE_MB)
+OPENDATA_MAX_COLLECTION_MB = 500
+OPENDATA_MAX_COLLECTION_BYTES = OPENDATA_MAX_COLLECTION_MB * 1024 * 1024
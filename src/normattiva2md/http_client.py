@@ -0,0 +1,379 @@
+"""
+Client HTTP condiviso per normattiva.it.
+
+``NormattivaClient`` possiede una ``requests.Session`` con un pool di
+connessioni keep-alive (``HTTPAdapter``), gli header comuni e i timeout di
+default. Lo stesso client viene riusato da API, ``Converter``, CLI e
+download multi-documento, così le chiamate successive verso
+www.normattiva.it non ripetono handshake TLS e connessione.
+
+``response_validators`` e ``conditional_headers`` servono alle richieste
+condizionali (ETag / Last-Modified) usate per rivalidare le copie in cache.
+
+I flussi di download di ``normattiva_api`` non fanno I/O di rete
+direttamente: sono generatori che producono ``Request`` (e ``Sleep``) e
+ricevono le risposte. ``run_sync`` li esegue con un ``NormattivaClient``;
+``async_client.run_async`` esegue gli stessi generatori con un client
+asincrono.
+"""
+
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .constants import (
+    CONNECT_TIMEOUT,
+    DEFAULT_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    USER_AGENT,
+)
+from .rate_limit import get_default_rate_limiter
+from .retry import as_circuit_breaker, as_retry_policy, is_server_failure
+
+NOT_MODIFIED = 304
+
+DEFAULT_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept-Language": "it-IT,it;q=0.9,en;q=0.8",
+    "Connection": "keep-alive",
+}
+
+
+def _no_release():
+    pass
+
+
+def _release_on_close(response, release):
+    """Fa liberare il posto dell'host alla chiusura di ``response``."""
+    close = getattr(response, "close", None)
+
+    def close_and_release():
+        try:
+            if close is not None:
+                close()
+        finally:
+            release()
+
+    response.close = close_and_release
+
+
+class NormattivaClient:
+    """
+    Sessione HTTP riusabile con pool di connessioni.
+
+    Espone ``get``/``post``/``put`` con la stessa firma di una
+    ``requests.Session``: gli header passati si sommano a quelli di default e,
+    se non indicati, vengono applicati timeout (connessione, lettura) e
+    verifica TLS.
+
+    Args:
+        session: sessione esistente da avvolgere (default: nuova sessione
+            con ``HTTPAdapter`` dimensionato come indicato)
+        timeout: timeout di default, numero o tupla (connessione, lettura)
+        pool_connections: numero di host tenuti nel pool
+        pool_maxsize: connessioni riusabili per host (utile con più thread)
+        headers: header aggiuntivi per tutte le richieste
+        rate_limiter: ``RateLimiter`` applicato a ogni richiesta (default: il
+            limitatore condiviso del processo; False = nessun limite)
+        retry: ``RetryPolicy``, numero di ritentativi o False (default:
+            ``RetryPolicy()``, solo per richieste idempotenti)
+        circuit_breaker: ``CircuitBreaker``, soglia di errori consecutivi o
+            False (default: ``CircuitBreaker()``)
+        max_per_host: richieste contemporanee massime verso lo stesso host
+            quando il client è usato da più thread (None = nessun limite)
+
+    Examples:
+        >>> with NormattivaClient() as client:
+        ...     response = client.get("https://www.normattiva.it/")
+    """
+
+    def __init__(
+        self,
+        session=None,
+        timeout=(CONNECT_TIMEOUT, DEFAULT_TIMEOUT),
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        headers=None,
+        rate_limiter=None,
+        retry=None,
+        circuit_breaker=None,
+        max_per_host=None,
+    ):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.timeout = timeout
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.rate_limiter = rate_limiter
+        self.retry = as_retry_policy(retry)
+        self.circuit_breaker = as_circuit_breaker(circuit_breaker)
+        self.max_per_host = max_per_host
+        self._semaphores = {}
+        self._semaphores_lock = threading.Lock()
+
+    def _limiter(self):
+        if self.rate_limiter is False:
+            return None
+        return self.rate_limiter or get_default_rate_limiter()
+
+    def _acquire(self, url):
+        """
+        Occupa un posto dell'host di ``url`` e restituisce la funzione che lo
+        libera (senza ``max_per_host`` non occupa nulla).
+
+        La funzione può essere chiamata più volte: il posto viene liberato
+        una volta sola.
+        """
+        if not self.max_per_host:
+            return _no_release
+        host = urlparse(url).netloc
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+        semaphore.acquire()
+        held = threading.Lock()
+
+        def release():
+            if held.acquire(blocking=False):
+                semaphore.release()
+
+        return release
+
+    def request(self, method, url, headers=None, **kwargs):
+        """
+        Esegue una richiesta con ritentativi, circuit breaker e limiti per host.
+
+        Con ``max_per_host`` una risposta ``stream=True`` tiene occupato il
+        posto dell'host finché non viene chiusa: il limite vale per tutto il
+        download, non solo per l'attesa degli header. ``max_bytes`` viene
+        ignorato: ``requests`` legge già il corpo a pezzi e il limite lo
+        applica il flusso.
+        """
+        kwargs.pop("max_bytes", None)
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("verify", True)
+        headers = {**self.headers, **(headers or {})}
+        send = getattr(self.session, method.lower())
+        limiter = self._limiter()
+        breaker = self.circuit_breaker
+        attempt = 0
+        while True:
+            attempt += 1
+            if breaker is not None:
+                breaker.before_request(url)
+            release = self._acquire(url)
+            try:
+                if limiter is not None:
+                    limiter.wait(url)
+                response = send(url, headers=headers, **kwargs)
+            except requests.RequestException as e:
+                release()
+                if breaker is not None:
+                    breaker.record(url, success=False)
+                delay = self._retry_delay(method, attempt, error=e)
+                if delay is None:
+                    raise
+            except BaseException:
+                release()
+                raise
+            else:
+                if kwargs.get("stream") and release is not _no_release:
+                    _release_on_close(response, release)
+                else:
+                    release()
+                if limiter is not None:
+                    limiter.observe(url, response)
+                if breaker is not None:
+                    breaker.record(url, success=not is_server_failure(response))
+                delay = self._retry_delay(method, attempt, response=response)
+                if delay is None:
+                    return response
+                # La risposta scartata rilascia subito la connessione al pool
+                response.close()
+            time.sleep(delay)
+
+    def _retry_delay(self, method, attempt, response=None, error=None):
+        if self.retry is None:
+            return None
+        return self.retry.next_delay(method, attempt, response=response, error=error)
+
+    def metrics(self):
+        """Contatori di ritentativi, circuit breaker e limite di frequenza."""
+        limiter = self._limiter()
+        return {
+            "retry": self.retry.stats() if self.retry else None,
+            "circuit_breaker": (
+                self.circuit_breaker.stats() if self.circuit_breaker else None
+            ),
+            "rate_limiter": limiter.stats() if limiter else None,
+        }
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def close(self):
+        """Chiude le connessioni del pool."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Request:
+    """
+    Richiesta HTTP prodotta da un flusso (non ancora eseguita).
+
+    Args:
+        method: metodo HTTP ("GET", "POST", "PUT")
+        url: URL di destinazione
+        headers: header specifici della richiesta
+        **kwargs: opzioni in stile ``requests`` (``data``, ``allow_redirects``...);
+            con ``stream=True`` ``max_bytes`` indica al client la dimensione
+            massima del corpo che il flusso è disposto a leggere
+    """
+
+    __slots__ = ("method", "url", "headers", "kwargs")
+
+    def __init__(self, method, url, headers=None, **kwargs):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        return f"Request({self.method!r}, {self.url!r})"
+
+
+class Sleep:
+    """Pausa richiesta da un flusso (es. tra due interrogazioni di stato)."""
+
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+
+class FlowCancelled(Exception):
+    """Flusso interrotto da ``run_sync`` perché ne è stata chiesta la cancellazione."""
+
+
+def run_sync(flow, session=None, cancel=None):
+    """
+    Esegue un flusso di richieste con un client sincrono.
+
+    Ogni ``Request`` prodotta da ``flow`` viene inviata con ``session`` e la
+    risposta rimandata al generatore; gli errori di rete
+    (``requests.RequestException``) vengono sollevati dentro il generatore,
+    che li gestisce come farebbe con una chiamata diretta.
+
+    Args:
+        flow: generatore che produce ``Request``/``Sleep``
+        session: NormattivaClient o sessione requests (default: client condiviso)
+        cancel: ``threading.Event`` che interrompe il flusso prima della
+            richiesta successiva o durante una pausa (opzionale)
+
+    Returns:
+        il valore restituito dal generatore
+
+    Raises:
+        FlowCancelled: ``cancel`` impostato prima della fine del flusso
+    """
+    client = as_client(session)
+    try:
+        step = next(flow)
+        while True:
+            if cancel is not None and cancel.is_set():
+                flow.close()
+                raise FlowCancelled()
+            if isinstance(step, Sleep):
+                if cancel is None:
+                    time.sleep(step.seconds)
+                elif cancel.wait(step.seconds):
+                    continue
+                step = flow.send(None)
+                continue
+            try:
+                response = client.request(
+                    step.method, step.url, headers=step.headers, **step.kwargs
+                )
+            except requests.RequestException as e:
+                step = flow.throw(e)
+            else:
+                step = flow.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_default_client():
+    """Client condiviso dal processo (creato al primo uso)."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = NormattivaClient()
+        return _default_client
+
+
+def as_client(session=None):
+    """
+    Restituisce un ``NormattivaClient`` per ``session``.
+
+    ``None`` dà il client condiviso; un ``NormattivaClient`` viene restituito
+    così com'è; qualsiasi altro oggetto con ``get``/``post``/``put`` (una
+    ``requests.Session``) viene avvolto senza cambiarne il pool.
+    """
+    if session is None:
+        return get_default_client()
+    if isinstance(session, NormattivaClient):
+        return session
+    return NormattivaClient(session=session)
+
+
+def response_validators(response):
+    """
+    Validatori HTTP (``etag``, ``last_modified``) di una risposta.
+
+    Restituisce solo quelli inviati dal server: un dizionario vuoto indica che
+    la risorsa va confrontata per contenuto.
+    """
+    headers = getattr(response, "headers", None) or {}
+    validators = {}
+    for header, key in (("ETag", "etag"), ("Last-Modified", "last_modified")):
+        value = headers.get(header)
+        if isinstance(value, str) and value:
+            validators[key] = value
+    return validators
+
+
+def conditional_headers(validators):
+    """Header ``If-None-Match``/``If-Modified-Since`` per una richiesta condizionale."""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
@@ -0,0 +1,150 @@
+"""
+Manifest di una raccolta ``--with-references``, per riprendere le esecuzioni
+interrotte.
+
+Il file ``manifest.json`` nella cartella della raccolta registra per ogni
+legge citata lo stato (``done`` o ``failed``), i parametri di download, il
+file Markdown prodotto, il suo hash SHA-256 e le leggi che cita. Viene
+riscritto in modo atomico (file temporaneo + ``os.replace``) dopo ogni atto,
+così un'interruzione lascia sempre un manifest valido.
+
+Rieseguendo lo stesso comando gli atti completati, con il file ancora
+presente e integro, vengono saltati; quelli falliti vengono ritentati.
+L'indice ``index.md`` viene costruito dal manifest.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path):
+    """Hash SHA-256 del contenuto di ``path``, oppure None se non leggibile."""
+    hasher = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(64 * 1024), b""):
+                hasher.update(block)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+class RunManifest:
+    """
+    Stato delle leggi citate di una raccolta.
+
+    Args:
+        folder_path: cartella della raccolta
+        url: URL della legge principale; un manifest di un'altra legge
+            viene ignorato
+
+    Attributes:
+        resumed: atti completati ripresi da un'esecuzione precedente
+    """
+
+    def __init__(self, folder_path, url):
+        self.folder_path = folder_path
+        self.path = os.path.join(folder_path, MANIFEST_NAME)
+        self.url = url
+        self.items = {}
+        self.resumed = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION and data.get("url") == self.url:
+            self.items = data.get("items", {})
+
+    def _save(self):
+        data = {"version": MANIFEST_VERSION, "url": self.url, "items": self.items}
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".manifest-", suffix=".tmp", dir=self.folder_path
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def completed(self, url):
+        """
+        Voce di ``url`` se l'atto è già stato convertito e il file è integro,
+        altrimenti None.
+        """
+        with self._lock:
+            entry = self.items.get(url)
+        if not entry or entry.get("status") != "done":
+            return None
+        output = os.path.join(self.folder_path, entry["output"])
+        if file_sha256(output) != entry.get("sha256"):
+            return None
+        return entry
+
+    def record(self, url, status, params=None, output=None, cited=None, error=None):
+        """
+        Registra l'esito di una legge citata e salva il manifest.
+
+        Args:
+            url: URL della legge citata
+            status: "done" o "failed"
+            params: parametri di download (se risolti)
+            output: file Markdown relativo alla cartella (es. ``refs/x.md``)
+            cited: URL delle leggi citate dall'atto (visita in profondità)
+            error: descrizione dell'errore
+        """
+        entry = {"status": status, "updated": time.time()}
+        if params:
+            entry["params"] = {
+                key: params[key] for key in ("dataGU", "codiceRedaz", "dataVigenza")
+            }
+        if output:
+            entry["output"] = output
+            if status == "done":
+                entry["sha256"] = file_sha256(os.path.join(self.folder_path, output))
+        if cited is not None:
+            entry["cited"] = sorted(cited)
+        if error:
+            entry["error"] = error
+        with self._lock:
+            self.items[url] = entry
+            self._save()
+
+    def outputs(self):
+        """File Markdown degli atti completati, ordinati."""
+        with self._lock:
+            return sorted(
+                {
+                    entry["output"]
+                    for entry in self.items.values()
+                    if entry.get("status") == "done" and entry.get("output")
+                }
+            )
+
+    def stats(self):
+        """Atti completati, falliti e ripresi."""
+        with self._lock:
+            statuses = [entry.get("status") for entry in self.items.values()]
+        return {
+            "done": statuses.count("done"),
+            "failed": statuses.count("failed"),
+            "resumed": self.resumed,
+        }
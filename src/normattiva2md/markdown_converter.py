@@ -1,12 +1,37 @@
 import re
 import sys
 import os
-import xml.etree.ElementTree as ET
+from functools import lru_cache
 from .constants import AKN_NAMESPACE, MAX_FILE_SIZE_BYTES, MAX_FILE_SIZE_MB
-from .xml_parser import extract_metadata_from_xml, filter_xml_to_article
+from .xml_backend import PARSE_ERRORS
+from .xml_parser import AkomaDocument
 from .akoma_utils import akoma_uri_to_normattiva_url
 from .normattiva_api import is_normattiva_url
 
+# Characters buffered by MarkdownSink before each write to the output
+SINK_BUFFER_SIZE = 64 * 1024
+
+# Precompiled patterns used by the renderer (compiled once at import)
+_WHITESPACE_RE = re.compile(r"\s+")
+_AGGIORNAMENTO_DASH_RE = re.compile(r"\s*[-–—]{2,}\s*AGGIORNAMENTO")
+_SEPARATOR_ONLY_RE = re.compile(r"^[-()]+$")
+_CAPO_RE = re.compile(r"\bCapo\s+[IVX]+", re.IGNORECASE)
+_SEZIONE_RE = re.compile(r"\bSezione\s+[IVX]+", re.IGNORECASE)
+_CHAPTER_HEADING_RE = re.compile(r"^((?:Capo|Sezione)\s+[IVX]+)\s+(.+)$", re.IGNORECASE)
+_ATTACHMENT_ARTICLE_HEADING_RE = re.compile(
+    r"(Art\.?\s*\d+(?:-\w+)?\.?\s*(\(\([^)]*\)\)|\([^)]*\))?)"
+)
+_ATTACHMENT_PREFIX_RE = re.compile(r"^(.*?)(?:\s+Art\.)")
+_ATTACHMENT_TITLE_RE = re.compile(r"^(?P<title>[A-Z][A-Z0-9' .-]{3,})\s+Art\.")
+_ATTACHMENT_ARTICLE_RE = re.compile(
+    r"^Art\.?\s*(?P<num>\d+[A-Za-z-]*)\.?\s*(?P<title>\([^)]*\))?\s*(?P<body>.*)$"
+)
+
+@lru_cache(maxsize=512)
+def _paragraph_number_pattern(num):
+    """Pattern stripping a repeated paragraph number ("1", "2-bis", ...) from its text."""
+    return re.compile(r"^" + re.escape(num) + r"\.?\s*")
+
 def generate_front_matter(metadata):
     """
     Generate YAML front matter from metadata dictionary.
@@ -53,8 +78,8 @@ def parse_chapter_heading(heading_text):
     Returns: {'type': 'capo'|'sezione'|'both', 'capo': ..., 'sezione': ...}
     """
     # Cerca pattern "Capo" e "Sezione"
-    has_capo = re.search(r"\bCapo\s+[IVX]+", heading_text, re.IGNORECASE)
-    has_sezione = re.search(r"\bSezione\s+[IVX]+", heading_text, re.IGNORECASE)
+    has_capo = _CAPO_RE.search(heading_text)
+    has_sezione = _SEZIONE_RE.search(heading_text)
 
     result = {"type": "", "capo": "", "sezione": ""}
     # Caso 1: Contiene sia Capo che Sezione
@@ -97,8 +122,7 @@ def format_heading_with_separator(heading_text):
         legislative_suffix = "))"
 
     # Pattern per Capo o Sezione
-    pattern = r"^((?:Capo|Sezione)\s+[IVX]+)\s+(.+)$"
-    match = re.match(pattern, text_to_format, re.IGNORECASE)
+    match = _CHAPTER_HEADING_RE.match(text_to_format)
 
     if match:
         prefix = match.group(1)  # "Capo I" o "Sezione I"
@@ -108,83 +132,175 @@ def format_heading_with_separator(heading_text):
 
     return heading_text
 
+class TagDispatcher:
+    """
+    Dispatch table from fully qualified tags ("{namespace}localname") to handlers.
+
+    ``rules`` is an ordered list of ``(suffixes, handler)`` pairs reproducing the
+    original ``tag.endswith(...)`` chains; ``exact`` maps tags that must match
+    exactly (as ``findall("./akn:x")`` does). The table is filled at import time
+    for the Akoma Ntoso name of every suffix; any other tag is resolved once with
+    the same rules and memoized, so each node costs a single dict lookup.
+    """
+
+    def __init__(self, rules=(), exact=None, default=None, namespace=AKN_NAMESPACE["akn"]):
+        self._rules = [
+            ((suffixes,) if isinstance(suffixes, str) else tuple(suffixes), handler)
+            for suffixes, handler in rules
+        ]
+        self._exact = dict(exact or {})
+        self._default = default
+        self._table = dict(self._exact)
+        for suffixes, _handler in self._rules:
+            for suffix in suffixes:
+                tag = f"{{{namespace}}}{suffix}"
+                if tag not in self._table:
+                    self._table[tag] = self._resolve(tag)
+
+    def _resolve(self, tag):
+        if tag in self._exact:
+            return self._exact[tag]
+        for suffixes, handler in self._rules:
+            if tag.endswith(suffixes):
+                return handler
+        return self._default
+
+    def get(self, tag):
+        """Return the handler for ``tag`` (the default handler if none matches)."""
+        try:
+            return self._table[tag]
+        except KeyError:
+            handler = self._table[tag] = self._resolve(tag)
+            return handler
+
+
+def _render_strong(element, text, cross_references):
+    return f"**{text}**"
+
+def _render_emphasis(element, text, cross_references):
+    # Akoma Ntoso often uses 'emphasis' for italics
+    return f"*{text}*"
+
+def _render_ref(element, text, cross_references):
+    href = element.get("href")
+
+    # If cross_references is provided, try to create a markdown link
+    if cross_references and href:
+        # Se href è un URI Akoma, convertilo in URL normattiva.it
+        if href.startswith("/akn/"):
+            normattiva_url = akoma_uri_to_normattiva_url(href)
+            if normattiva_url:
+                return _markdown_link(text, normattiva_url)
+        # Altrimenti, cerca direttamente nel mapping (per compatibilità)
+        elif href in cross_references:
+            return _markdown_link(text, cross_references[href])
+    return text
+
+def _markdown_link(text, target):
+    # The link target joins the surrounding text, so its whitespace is collapsed too
+    return f"[{text}]({_WHITESPACE_RE.sub(' ', f'{target}')})"
+
+def _render_modification(element, text, cross_references):
+    # For modifications, add double parentheses only if not already present
+    stripped = text.strip()
+    if stripped.startswith("((") and stripped.endswith("))"):
+        return text
+    return f"(({text}))"
+
+def _render_footnote(element, text, cross_references):
+    # Generate a simple footnote reference (simplified - in practice would need global counter)
+    if text:
+        return f"[^{text[:10].replace(' ', '')}]"  # Simple hash-like ref
+    return ""
+
+def _render_inline_text(element, text, cross_references):
+    return text
+
+# Inline handlers receive (element, cleaned inner text, cross_references)
+INLINE_DISPATCH = TagDispatcher(
+    [
+        ("strong", _render_strong),
+        ("emphasis", _render_emphasis),
+        ("ref", _render_ref),
+        (("ins", "del"), _render_modification),
+        ("footnote", _render_footnote),
+    ],
+    default=_render_inline_text,
+)
+
+def _append_piece(parts, piece, ends_space):
+    """
+    Append an already collapsed piece, merging the whitespace at the seam.
+
+    Returns the new "ends with space" state. A frame starts with the state set
+    to True, so leading whitespace is dropped exactly as ``str.strip`` would.
+    """
+    if ends_space and piece[:1] == " ":
+        piece = piece[1:]
+    if not piece:
+        return ends_space
+    parts.append(piece)
+    return piece[-1] == " "
+
 def clean_text_content(element, cross_references=None):
     """
     Extracts text from an element, handling inline formatting and removing specific tags.
     Also cleans up excessive whitespace and indentation.
 
+    The tree is walked with an explicit stack: every raw text/tail is collapsed
+    once when it is collected, and each nested element only strips its edges
+    (plus the AGGIORNAMENTO dash cleanup when that word is present), giving the
+    same result as normalising every level separately.
+
     Args:
         element: XML element to process
         cross_references: dict mapping Akoma URIs to local markdown file paths (optional)
     """
-    text_parts = []
     if element is None:
         return ""
 
+    get_handler = INLINE_DISPATCH.get
+    collapse = _WHITESPACE_RE.sub
+    stack = []
+    node = element
+    children = iter(element)
+    parts = []
+    ends_space = True
+
     # Process element's own text
     if element.text:
-        text_parts.append(element.text)
-
-    for child in element:
-        # Handle inline formatting
-        if child.tag.endswith("strong"):
-            text_parts.append(f"**{clean_text_content(child, cross_references)}**")
-        elif child.tag.endswith(
-            "emphasis" 
-        ):  # Akoma Ntoso often uses 'emphasis' for italics
-            text_parts.append(f"*{clean_text_content(child, cross_references)}*")
-        elif child.tag.endswith("ref"):
-            # Extract text content of <ref> tags
-            ref_text = clean_text_content(child, cross_references)
-            href = child.get("href")
-
-            # If cross_references is provided, try to create a markdown link
-            if cross_references and href:
-                # Se href è un URI Akoma, convertilo in URL normattiva.it
-                if href.startswith("/akn/"):
-                    normattiva_url = akoma_uri_to_normattiva_url(href)
-                    if normattiva_url:
-                        ref_text = f"[{ref_text}]({normattiva_url})"
-                # Altrimenti, cerca direttamente nel mapping (per compatibilità)
-                elif href in cross_references:
-                    ref_text = f"[{ref_text}]({cross_references[href]})"
-
-            text_parts.append(ref_text)
-        elif child.tag.endswith(("ins", "del")):
-            # For modifications, add double parentheses only if not already present
-            inner_text = clean_text_content(child, cross_references)
-            # Check if the text already has double parentheses
-            if inner_text.strip().startswith("((") and inner_text.strip().endswith("))"):
-                text_parts.append(inner_text)
-            else:
-                text_parts.append(f"(({inner_text}))")
-        elif child.tag.endswith("footnote"):
-            # Handle footnotes - extract footnote content and create markdown footnote reference
-            footnote_content = clean_text_content(child, cross_references)
-            if footnote_content:
-                # Generate a simple footnote reference (simplified - in practice would need global counter)
-                footnote_ref = f"[^{footnote_content[:10].replace(' ', '')}]"  # Simple hash-like ref
-                text_parts.append(footnote_ref)
-
-        else:
-            text_parts.append(
-                clean_text_content(child, cross_references) 
-            )  # Recursively get text from other children
+        ends_space = _append_piece(parts, collapse(" ", element.text), ends_space)
+
+    while True:
+        child = next(children, None)
+        if child is not None:
+            # Descend: the child's text is normalised in its own frame
+            stack.append((node, children, parts, ends_space))
+            node, children, parts, ends_space = child, iter(child), [], True
+            if child.text:
+                ends_space = _append_piece(parts, collapse(" ", child.text), ends_space)
+            continue
 
-        # Process tail text
-        if child.tail:
-            text_parts.append(child.tail)
+        # Close the frame: strip trailing space, then dash separators
+        cleaned_text = "".join(parts)
+        if ends_space and cleaned_text:
+            cleaned_text = cleaned_text[:-1]
+        if "AGGIORNAMENTO" in cleaned_text:
+            # Remove dash separators before inline AGGIORNAMENTO
+            cleaned_text = _AGGIORNAMENTO_DASH_RE.sub(" AGGIORNAMENTO", cleaned_text)
 
-    # Join all parts
-    full_text = "".join(text_parts)
+        if not stack:
+            return cleaned_text
 
-    # Replace multiple spaces with a single space, and strip leading/trailing whitespace
-    cleaned_text = re.sub(r"\s+", " ", full_text).strip()
-    
-    # Remove dash separators before inline AGGIORNAMENTO
-    cleaned_text = re.sub(r"\s*[-–—]{2,}\s*AGGIORNAMENTO", " AGGIORNAMENTO", cleaned_text)
+        # Handle inline formatting (strong, emphasis, ref, ins/del, footnote)
+        finished = node
+        node, children, parts, ends_space = stack.pop()
+        piece = get_handler(finished.tag)(finished, cleaned_text, cross_references)
+        ends_space = _append_piece(parts, piece, ends_space)
 
-    return cleaned_text
+        # Process tail text
+        if finished.tail:
+            ends_space = _append_piece(parts, collapse(" ", finished.tail), ends_space)
 
 
 def process_content_with_paragraphs(content_element, ns, cross_references=None):
@@ -216,7 +332,7 @@ def process_content_with_paragraphs(content_element, ns, cross_references=None):
         p_text = clean_text_content(p_elem, cross_references).strip()
         
         # Skip empty, dash-only, or parentheses-only lines
-        if not p_text or re.match(r"^[-()]+$", p_text):
+        if not p_text or _SEPARATOR_ONLY_RE.match(p_text):
             continue
             
         # Check if this is an AGGIORNAMENTO header
@@ -231,6 +347,29 @@ def process_content_with_paragraphs(content_element, ns, cross_references=None):
     
     return "".join(parts)
 
+def build_url_cross_references(document, cross_references=None):
+    """
+    Map every normattiva.it URL cited in the document to itself (for --with-urls).
+
+    Args:
+        document: AkomaDocument to scan (uses its cached href list)
+        cross_references: existing mapping to extend (optional)
+    """
+    cross_references = cross_references or {}
+    for tag, href in document.hrefs:
+        if not tag.endswith("ref"):
+            continue
+        # Convert Akoma URI to Normattiva URL if needed
+        if href.startswith("/akn/"):
+            normattiva_url = akoma_uri_to_normattiva_url(href)
+        elif is_normattiva_url(href):
+            normattiva_url = href
+        else:
+            normattiva_url = None
+        if normattiva_url:
+            cross_references[normattiva_url] = normattiva_url
+    return cross_references
+
 def convert_akomantoso_to_markdown_improved(
     xml_file_path,
     markdown_file_path=None,
@@ -238,27 +377,11 @@ def convert_akomantoso_to_markdown_improved(
     article_ref=None,
     cross_references=None,
     with_urls=False,
+    document=None,
+    parser="auto",
+    workers=None,
 ):
     try:
-        # If with_urls is enabled, build cross-reference mapping from <ref> tags
-        if with_urls:
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
-            cross_references = cross_references or {}
-            # Find all <ref> tags with href
-            for ref in root.iter():
-                if ref.tag.endswith("ref") and ref.get("href"):
-                    href = ref.get("href")
-                    # Convert Akoma URI to Normattiva URL if needed
-                    if href and href.startswith("/akn/"):
-                        normattiva_url = akoma_uri_to_normattiva_url(href)
-                    elif href and is_normattiva_url(href):
-                        normattiva_url = href
-                    else:
-                        normattiva_url = None
-                    if normattiva_url:
-                        cross_references[normattiva_url] = normattiva_url
-
         # Check file size before parsing (XML bomb protection)
         file_size = os.path.getsize(xml_file_path)
         if file_size > MAX_FILE_SIZE_BYTES:
@@ -268,116 +391,217 @@ def convert_akomantoso_to_markdown_improved(
             )
             return False
 
-        # Parse XML with defusedxml would be better, but using size limit for now
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
+        # Parse XML once: the same document serves link mapping, filtering and metadata
+        if document is None:
+            document = AkomaDocument(xml_file_path, parser=parser)
+        root = document.root
+
+        # If with_urls is enabled, build cross-reference mapping from <ref> tags
+        if with_urls:
+            cross_references = build_url_cross_references(document, cross_references)
 
-        # Filter XML to specific article if requested
+        # Filter XML to the requested articles (eId, list of eIds or ArticleSelection)
         if article_ref:
-            filtered_root = filter_xml_to_article(root, article_ref, AKN_NAMESPACE)
-            if filtered_root is None:
-                # Article not found - continue with empty body but include metadata
+            filtered_root, missing = document.filter_to_articles(article_ref)
+            for label in missing:
                 print(
-                    f"⚠️  Warning: Article '{article_ref}' not found in document",
+                    f"⚠️  Warning: Article '{label}' not found in document",
                     file=sys.stderr,
                 )
+            if filtered_root is None:
+                # No article found - continue with empty body but include metadata
                 # Create empty root to generate metadata-only output
-                filtered_root = ET.Element(root.tag, root.attrib)
+                filtered_root = document.backend.Element(root.tag, root.attrib)
                 # Copy meta elements for metadata extraction
                 for meta_elem in root.findall('.//akn:meta', AKN_NAMESPACE):
-                    filtered_root.append(meta_elem)
+                    filtered_root.append(document.backend.graft(meta_elem))
             root = filtered_root
 
         # Extract metadata from XML if not provided (for local files)
         if metadata is None:
-            metadata = extract_metadata_from_xml(root)
+            metadata = document.metadata
 
-        markdown_fragments = generate_markdown_fragments(
-            root, AKN_NAMESPACE, metadata, cross_references
+        # Rendered lazily while writing: the front matter goes out first
+        markdown_fragments = iter_markdown_fragments(
+            root, AKN_NAMESPACE, metadata, cross_references, workers
         )
-    except ET.ParseError as e:
+    except PARSE_ERRORS as e:
         print(f"Errore durante il parsing del file XML: {e}", file=sys.stderr)
         return False
     except FileNotFoundError:
-        print(f"❌ Errore: Il file '{xml_file_path}' non trovato.\n", file=sys.stderr)
-        print("Per usare akoma2md, puoi:", file=sys.stderr)
-        print("  1. Fornire un URL di normattiva.it:", file=sys.stderr)
-        print(
-            "     akoma2md 'https://www.normattiva.it/uri-res/N2Ls?urn:...' output.md",
-            file=sys.stderr,
-        )
-        print("  2. Fornire il percorso di un file XML locale:", file=sys.stderr)
-        print("     akoma2md percorso/al/file.xml output.md", file=sys.stderr)
-        print("  3. Cercare una legge per nome con -s:", file=sys.stderr)
-        print("     akoma2md -s 'legge stanca' output.md", file=sys.stderr)
-        print(
-            "     akoma2md -s 'legge stanca' --exa-api-key 'your-key' output.md",
-            file=sys.stderr,
-        )
+        print_missing_xml_help(xml_file_path)
         return False
     except Exception as e:
         print(f"Si è verificato un errore inatteso: {e}", file=sys.stderr)
         return False
 
-    markdown_text = "".join(markdown_fragments)
-
     if markdown_file_path is None:
-        sys.stdout.write(markdown_text)
+        try:
+            MarkdownSink(sys.stdout).write_all(markdown_fragments)
+        except Exception as e:
+            print(f"Si è verificato un errore inatteso: {e}", file=sys.stderr)
+            return False
         return True
 
+    # Write next to the destination and rename only on success (no partial files)
+    partial_path = f"{markdown_file_path}.part"
     try:
-        with open(markdown_file_path, "w", encoding="utf-8") as f:
-            f.write(markdown_text)
+        with open(partial_path, "w", encoding="utf-8") as f:
+            MarkdownSink(f).write_all(markdown_fragments)
+        os.replace(partial_path, markdown_file_path)
         print(
             f"Conversione completata. Il file Markdown è stato salvato in '{markdown_file_path}'",
             file=sys.stderr,
         )
         return True
     except IOError as e:
+        _remove_partial(partial_path)
         print(f"Errore durante la scrittura del file Markdown: {e}", file=sys.stderr)
         return False
+    except Exception as e:
+        _remove_partial(partial_path)
+        print(f"Si è verificato un errore inatteso: {e}", file=sys.stderr)
+        return False
 
-def generate_markdown_fragments(root, ns, metadata=None, cross_references=None):
-    """Build the markdown fragments for a parsed Akoma Ntoso document."""
-
-    fragments = []
-
-    # Extract document title for later use
-    doc_title_fragments = extract_document_title(root, ns)
 
-    # Generate body content
-    preamble_fragments = extract_preamble_fragments(root, ns, cross_references)
-    body_elements_fragments = extract_body_fragments(root, ns, cross_references)
-    attachment_fragments = extract_attachments_fragments(root, ns, cross_references)
+def _remove_partial(partial_path):
+    try:
+        os.remove(partial_path)
+    except OSError:
+        pass
+
+def print_missing_xml_help(xml_file_path):
+    """Print the "file not found" error with the usage hints to stderr."""
+
+    print(f"❌ Errore: Il file '{xml_file_path}' non trovato.\n", file=sys.stderr)
+    print("Per usare akoma2md, puoi:", file=sys.stderr)
+    print("  1. Fornire un URL di normattiva.it:", file=sys.stderr)
+    print(
+        "     akoma2md 'https://www.normattiva.it/uri-res/N2Ls?urn:...' output.md",
+        file=sys.stderr,
+    )
+    print("  2. Fornire il percorso di un file XML locale:", file=sys.stderr)
+    print("     akoma2md percorso/al/file.xml output.md", file=sys.stderr)
+    print("  3. Cercare una legge per nome con -s:", file=sys.stderr)
+    print("     akoma2md -s 'legge stanca' output.md", file=sys.stderr)
+    print(
+        "     akoma2md -s 'legge stanca' --exa-api-key 'your-key' output.md",
+        file=sys.stderr,
+    )
+
+def iter_markdown_fragments(
+    root,
+    ns=AKN_NAMESPACE,
+    metadata=None,
+    cross_references=None,
+    workers=None,
+    chunk_size=None,
+):
+    """Yield the Markdown fragments of a parsed document in output order.
 
-    body_fragments = []
-    body_fragments.extend(preamble_fragments)
-    body_fragments.extend(body_elements_fragments)
-    body_fragments.extend(attachment_fragments)
+    The front matter comes first and each body element is rendered only when
+    the consumer asks for it, so writers can start emitting output before the
+    whole document has been converted.
 
-    # Join body content (NO downgrade - proper hierarchy from parsing)
-    body_text = "".join(body_fragments)
+    With ``workers`` > 1 (0 = all CPUs) the body is split into contiguous
+    chunks rendered in a process pool; see ``parallel_renderer``.
+    """
 
-    # Add front matter if metadata is available
+    # Front matter if metadata is available
     if metadata:
         front_matter = generate_front_matter(metadata)
         if front_matter:
-            fragments.append(front_matter)
+            yield front_matter
 
-    # Add document title as H1
-    fragments.extend(doc_title_fragments)
+    # Document title as H1, then preamble, body and attachments
+    yield from extract_document_title(root, ns)
+    yield from extract_preamble_fragments(root, ns, cross_references)
+    if workers is not None and workers != 1:
+        from .parallel_renderer import iter_body_fragments_parallel
 
-    # Add downgraded body content
-    fragments.append(body_text)
+        yield from iter_body_fragments_parallel(
+            root, ns, cross_references, workers, chunk_size
+        )
+    else:
+        yield from extract_body_fragments(root, ns, cross_references)
+    yield from extract_attachments_fragments(root, ns, cross_references)
 
-    return fragments
+def generate_markdown_fragments(root, ns, metadata=None, cross_references=None):
+    """Build the list of markdown fragments for a parsed Akoma Ntoso document."""
+
+    return list(iter_markdown_fragments(root, ns, metadata, cross_references))
 
 def generate_markdown_text(
-    root, ns=AKN_NAMESPACE, metadata=None, cross_references=None
+    root, ns=AKN_NAMESPACE, metadata=None, cross_references=None, workers=None
 ):
     """Return the Markdown rendering for the provided Akoma Ntoso root."""
 
-    return "".join(generate_markdown_fragments(root, ns, metadata, cross_references))
+    return "".join(
+        iter_markdown_fragments(root, ns, metadata, cross_references, workers)
+    )
+
+def write_markdown(
+    root, output, ns=AKN_NAMESPACE, metadata=None, cross_references=None, workers=None
+):
+    """Render the document straight into ``output`` (any object with ``write()``).
+
+    Returns the number of characters written.
+    """
+
+    sink = MarkdownSink(output)
+    sink.write_all(
+        iter_markdown_fragments(root, ns, metadata, cross_references, workers)
+    )
+    return sink.chars_written
+
+class MarkdownSink:
+    """Buffered writer for Markdown fragments.
+
+    Fragments are collected until ``buffer_size`` characters are pending and
+    then handed to ``output.write()`` in a single call. The first fragment
+    (front matter, or the title) is flushed immediately so that a reader of
+    stdout or of the file sees output before the body is rendered.
+    """
+
+    def __init__(self, output, buffer_size=SINK_BUFFER_SIZE):
+        self.output = output
+        self.buffer_size = buffer_size
+        self.chars_written = 0
+        self._pending = []
+        self._pending_size = 0
+        self._first = True
+
+    def write(self, fragment):
+        if not fragment:
+            return
+        self._pending.append(fragment)
+        self._pending_size += len(fragment)
+        if self._first:
+            self._first = False
+            self.flush()
+        elif self._pending_size >= self.buffer_size:
+            self._drain()
+
+    def write_all(self, fragments):
+        """Write every fragment of an iterable, then flush."""
+        for fragment in fragments:
+            self.write(fragment)
+        self.flush()
+
+    def flush(self):
+        self._drain()
+        flush = getattr(self.output, "flush", None)
+        if flush is not None:
+            flush()
+
+    def _drain(self):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self.output.write(text)
+        self.chars_written += len(text)
 
 def extract_document_title(root, ns):
     """Convert the `<docTitle>` element to a Markdown H1 if present."""
@@ -388,74 +612,109 @@ def extract_document_title(root, ns):
     return []
 
 def extract_preamble_fragments(root, ns, cross_references=None):
-    """Collect Markdown fragments representing the document preamble."""
+    """Yield Markdown fragments representing the document preamble."""
 
-    fragments = []
     preamble = root.find(".//akn:preamble", ns)
-    if preamble is None:
-        return fragments
+    if preamble is not None:
+        yield from process_preamble(preamble, ns, cross_references)
+
+def _render_preamble_text(element, ns, cross_references):
+    text = clean_text_content(element, cross_references)
+    return [f"{text}\n\n"] if text else []
+
+def _render_preamble_citations(element, ns, cross_references):
+    fragments = []
+    for citation in element.findall("./akn:citation", ns):
+        text = clean_text_content(citation, cross_references)
+        if text:
+            fragments.append(f"{text}\n\n")
+    return fragments
 
+# Preamble handlers receive (element, ns, cross_references) and return fragments
+PREAMBLE_DISPATCH = TagDispatcher(
+    [
+        (("formula", "p"), _render_preamble_text),
+        ("citations", _render_preamble_citations),
+    ]
+)
+
+def process_preamble(preamble, ns, cross_references=None):
+    """Convert a `<preamble>` element (formula, citations, p) to fragments."""
+
+    fragments = []
     for element in preamble:
-        if element.tag.endswith("formula") or element.tag.endswith("p"):
-            text = clean_text_content(element, cross_references)
-            if text:
-                fragments.append(f"{text}\n\n")
-        elif element.tag.endswith("citations"):
-            for citation in element.findall("./akn:citation", ns):
-                text = clean_text_content(citation, cross_references)
-                if text:
-                    fragments.append(f"{text}\n\n")
+        handler = PREAMBLE_DISPATCH.get(element.tag)
+        if handler is not None:
+            fragments.extend(handler(element, ns, cross_references))
     return fragments
 
 def extract_body_fragments(root, ns, cross_references=None):
-    """Traverse body nodes and delegate conversion to specialised handlers."""
+    """Traverse body nodes and yield their fragments one element at a time."""
 
-    fragments = []
     body = root.find(".//akn:body", ns)
     if body is None:
-        return fragments
+        return
 
     for element in body:
-        fragments.extend(process_body_element(element, ns, cross_references))
-    return fragments
+        yield from process_body_element(element, ns, cross_references)
 
 
 def extract_attachments_fragments(root, ns, cross_references=None):
-    """Collect attachment fragments that live outside the main body."""
+    """Yield attachment fragments that live outside the main body."""
 
-    fragments = []
     attachments_container = root.find(".//akn:attachments", ns)
     if attachments_container is None:
-        return fragments
+        return
 
     attachment_elements = attachments_container.findall("./akn:attachment", ns)
     if not attachment_elements:
-        return fragments
+        return
 
-    fragments.append("## Allegati\n\n")
+    yield "## Allegati\n\n"
     for attachment in attachment_elements:
-        fragments.extend(process_attachment(attachment, ns, cross_references))
-
-    return fragments
+        yield from process_attachment(attachment, ns, cross_references)
 
 def process_body_element(element, ns, cross_references=None):
     """Process a direct child of `<body>` producing Markdown fragments."""
 
-    if element.tag.endswith("title"):
-        return process_title(element, ns, cross_references)
-    if element.tag.endswith("part"):
-        return process_part(element, ns, cross_references)
-    if element.tag.endswith("chapter"):
-        return process_chapter(element, ns, cross_references)
-    if element.tag.endswith("article"):
-        article_fragments = []
-        process_article(
-            element, article_fragments, ns, level=2, cross_references=cross_references
-        )
-        return article_fragments
-    if element.tag.endswith("attachment"):
-        return process_attachment(element, ns, cross_references)
-    return []
+    handler = BODY_DISPATCH.get(element.tag)
+    if handler is None:
+        return []
+    return handler(element, ns, cross_references)
+
+def _process_body_article(article_element, ns, cross_references=None):
+    article_fragments = []
+    process_article(
+        article_element, article_fragments, ns, level=2, cross_references=cross_references
+    )
+    return article_fragments
+
+def _process_nested_article(article_element, ns, cross_references, level):
+    article_fragments = []
+    process_article(
+        article_element, article_fragments, ns, level=level, cross_references=cross_references
+    )
+    return article_fragments
+
+def _process_nested_section(section_element, ns, cross_references, level):
+    return process_section(section_element, ns, cross_references)
+
+def _process_nested_chapter(chapter_element, ns, cross_references, level):
+    return process_chapter(chapter_element, ns, cross_references)
+
+# Children of structural containers: (element, ns, cross_references, article level) -> fragments
+CHAPTER_DISPATCH = TagDispatcher(
+    [
+        ("section", _process_nested_section),
+        ("article", _process_nested_article),
+    ]
+)
+CONTAINER_DISPATCH = TagDispatcher(
+    [
+        ("chapter", _process_nested_chapter),
+        ("article", _process_nested_article),
+    ]
+)
 
 def process_chapter(chapter_element, ns, cross_references=None):
     """
@@ -501,16 +760,9 @@ def process_chapter(chapter_element, ns, cross_references=None):
 
     # Process child elements
     for child in chapter_element:
-        if child.tag.endswith("section"):
-            chapter_fragments.extend(process_section(child, ns, cross_references))
-        elif child.tag.endswith("article"):
-            process_article(
-                child,
-                chapter_fragments,
-                ns,
-                level=article_level,
-                cross_references=cross_references,
-            )
+        handler = CHAPTER_DISPATCH.get(child.tag)
+        if handler is not None:
+            chapter_fragments.extend(handler(child, ns, cross_references, article_level))
 
     return chapter_fragments
 
@@ -546,16 +798,9 @@ def process_title(title_element, ns, cross_references=None):
 
     # Process any nested content (chapters, articles, etc.)
     for child in title_element:
-        if child.tag.endswith("chapter"):
-            title_fragments.extend(process_chapter(child, ns, cross_references))
-        elif child.tag.endswith("article"):
-            process_article(
-                child,
-                title_fragments,
-                ns,
-                level=3,
-                cross_references=cross_references,
-            )
+        handler = CONTAINER_DISPATCH.get(child.tag)
+        if handler is not None:
+            title_fragments.extend(handler(child, ns, cross_references, 3))
 
     return title_fragments
 
@@ -572,16 +817,9 @@ def process_part(part_element, ns, cross_references=None):
 
     # Process nested content (chapters, articles, etc.)
     for child in part_element:
-        if child.tag.endswith("chapter"):
-            part_fragments.extend(process_chapter(child, ns, cross_references))
-        elif child.tag.endswith("article"):
-            process_article(
-                child,
-                part_fragments,
-                ns,
-                level=3,
-                cross_references=cross_references,
-            )
+        handler = CONTAINER_DISPATCH.get(child.tag)
+        if handler is not None:
+            part_fragments.extend(handler(child, ns, cross_references, 3))
 
     return part_fragments
 
@@ -603,15 +841,13 @@ def process_attachment(attachment_element, ns, cross_references=None):
         first_p = attachment_element.find(".//akn:p", ns)
         if first_p is not None:
             raw_text = "".join(first_p.itertext())
-            raw_text = re.sub(r"\s+", " ", raw_text).strip()
-            match = re.match(
-                r"(Art\.?\s*\d+(?:-\w+)?\.?\s*(\(\([^)]*\)\)|\([^)]*\))?)", raw_text
-            )
+            raw_text = _WHITESPACE_RE.sub(" ", raw_text).strip()
+            match = _ATTACHMENT_ARTICLE_HEADING_RE.match(raw_text)
             if match:
                 clean_heading = match.group(1)
                 heading_from_paragraph = True
             else:
-                prefix_match = re.match(r"^(.*?)(?:\s+Art\.)", raw_text)
+                prefix_match = _ATTACHMENT_PREFIX_RE.match(raw_text)
                 if prefix_match:
                     clean_heading = prefix_match.group(1).strip()
                     heading_from_prefix = True
@@ -636,7 +872,7 @@ def process_attachment(attachment_element, ns, cross_references=None):
                 text = process_content_with_paragraphs(para_content, ns, cross_references) if para_content is not None else ""
                 
                 if text and clean_heading:
-                    normalized = re.sub(r"\s+", " ", text).strip()
+                    normalized = _WHITESPACE_RE.sub(" ", text).strip()
                     if normalized.startswith(clean_heading):
                         trimmed = normalized[len(clean_heading):].lstrip()
                         if heading_from_paragraph:
@@ -646,12 +882,9 @@ def process_attachment(attachment_element, ns, cross_references=None):
 
                 # Promote uppercase title lines (e.g. "CODICE CIVILE") to a heading
                 if text:
-                    normalized = re.sub(r"\s+", " ", text).strip()
+                    normalized = _WHITESPACE_RE.sub(" ", text).strip()
                     if not heading_from_paragraph:
-                        title_match = re.match(
-                            r"^(?P<title>[A-Z][A-Z0-9' .-]{3,})\s+Art\.",
-                            normalized,
-                        )
+                        title_match = _ATTACHMENT_TITLE_RE.match(normalized)
                         if title_match:
                             title = title_match.group("title").strip()
                             if title and title == title.upper() and len(title) <= 80:
@@ -661,10 +894,7 @@ def process_attachment(attachment_element, ns, cross_references=None):
                             attachment_fragments.append(f"## {normalized}\n\n")
                             continue
                 if text:
-                    art_match = re.match(
-                        r"^Art\.?\s*(?P<num>\d+[A-Za-z-]*)\.?\s*(?P<title>\([^)]*\))?\s*(?P<body>.*)$",
-                        text,
-                    )
+                    art_match = _ATTACHMENT_ARTICLE_RE.match(text)
                     if art_match:
                         num = art_match.group("num")
                         title = art_match.group("title") or ""
@@ -674,7 +904,7 @@ def process_attachment(attachment_element, ns, cross_references=None):
                         if body.startswith("))"):
                             body = body[2:].lstrip()
                         if title:
-                            title = re.sub(r"\s+", " ", title).strip()
+                            title = _WHITESPACE_RE.sub(" ", title).strip()
                             title = title.replace("(( ", "((").replace("( (", "((")
                             title = title.replace(") )", "))")
                         heading = f"Art. {num}."
@@ -694,19 +924,23 @@ def process_attachment(attachment_element, ns, cross_references=None):
         return attachment_fragments
 
     for child in attachment_element:
-        if child.tag.endswith("chapter"):
-            attachment_fragments.extend(process_chapter(child, ns, cross_references))
-        elif child.tag.endswith("article"):
-            process_article(
-                child,
-                attachment_fragments,
-                ns,
-                level=3,
-                cross_references=cross_references,
-            )
+        handler = CONTAINER_DISPATCH.get(child.tag)
+        if handler is not None:
+            attachment_fragments.extend(handler(child, ns, cross_references, 3))
 
     return attachment_fragments
 
+# Handlers for direct children of <body>: (element, ns, cross_references) -> fragments
+BODY_DISPATCH = TagDispatcher(
+    [
+        ("title", process_title),
+        ("part", process_part),
+        ("chapter", process_chapter),
+        ("article", _process_body_article),
+        ("attachment", process_attachment),
+    ]
+)
+
 def process_table(table_element, ns, cross_references=None):
     """
     Convert an Akoma Ntoso table element to basic Markdown table format.
@@ -771,105 +1005,116 @@ def process_article(
             heading_prefix = "#" * level
             markdown_content_list.append(f"{heading_prefix} {article_num}\n\n")
 
-    # Process paragraphs and lists within articles
+    # Process paragraphs, lists, tables and quoted structures within articles
     for child_of_article in article_element:
-        if child_of_article.tag.endswith("paragraph"):
-            para_num_element = child_of_article.find("./akn:num", ns)
-            para_content_element = child_of_article.find("./akn:content", ns)
-            para_list_element = child_of_article.find("./akn:list", ns)
-
-            # Check if paragraph contains a list
-            if para_list_element is not None:
-                # Handle intro element in lists (like in Article 1)
-                intro_element = para_list_element.find("./akn:intro", ns)
-                if intro_element is not None:
-                    intro_text = clean_text_content(intro_element, cross_references)
-                    if intro_text:
-                        # Remove double dots from paragraph numbering
-                        para_num = para_num_element.text.strip().rstrip(".")
-                        markdown_content_list.append(f"{para_num}. {intro_text}\n\n")
-                    elif intro_text:
-                        markdown_content_list.append(f"{intro_text}\n\n")
-
-                for list_item in para_list_element.findall("./akn:point", ns):
-                    list_num_element = list_item.find("./akn:num", ns)
-                    list_content_element = list_item.find("./akn:content", ns)
-
-                    list_item_text = (
-                        clean_text_content(list_content_element, cross_references)
-                        if list_content_element is not None
-                        else ""
-                    )
-
-                    if list_num_element is not None:
-                        markdown_content_list.append(
-                            f"- {list_num_element.text.strip()} {list_item_text}\n"
-                        )
-                    elif list_item_text:
-                        markdown_content_list.append(f"- {list_item_text}\n")
-                markdown_content_list.append("\n")  # Add a newline after a list
-            else:
-                # Handle regular paragraph content
-                paragraph_text = (
-                    process_content_with_paragraphs(para_content_element, ns, cross_references)
-                    if para_content_element is not None
-                    else ""
-                )
-
-                # Remove duplicate number if present at the beginning of the paragraph text
-                if para_num_element is not None:
-                    num_to_remove = para_num_element.text.strip().rstrip(".")
-                    # Regex to match the number followed by a period and optional space at the beginning of the string
-                    pattern = r"^" + re.escape(num_to_remove) + r"\.?\s*"
-                    paragraph_text = re.sub(pattern, "", paragraph_text, 1)
-
-                if para_num_element is not None and paragraph_text:
-                    # Remove double dots from paragraph numbering and ensure single dot
-                    para_num = para_num_element.text.strip().rstrip(".")
-                    markdown_content_list.append(f"{para_num}. {paragraph_text}\n\n")
-                elif paragraph_text:
-                    # If no number but there's text, just append the text
-                    markdown_content_list.append(f"{paragraph_text}\n\n")
-
-        elif child_of_article.tag.endswith("list"):
-            # Handle intro element in lists (like in Article 1)
-            intro_element = child_of_article.find("./akn:intro", ns)
-            if intro_element is not None:
-                intro_text = clean_text_content(intro_element, cross_references)
-                if intro_text:
-                    markdown_content_list.append(f"{intro_text}\n\n")
-
-            for list_item in child_of_article.findall("./akn:point", ns):
-                list_num_element = list_item.find("./akn:num", ns)
-                list_content_element = list_item.find("./akn:content", ns)
-
-                list_item_text = (
-                    clean_text_content(list_content_element, cross_references)
-                    if list_content_element is not None
-                    else ""
-                )
-
-                if list_num_element is not None:
-                    markdown_content_list.append(
-                        f"- {list_num_element.text.strip()} {list_item_text}\n"
-                    )
-                elif list_item_text:
-                    markdown_content_list.append(f"- {list_item_text}\n")
-            markdown_content_list.append("\n")  # Add a newline after a list
-
-        elif child_of_article.tag.endswith("table"):
-            # Handle tables - convert to basic markdown table format
-            table_markdown = process_table(child_of_article, ns, cross_references)
-            if table_markdown:
-                markdown_content_list.append(table_markdown)
-                markdown_content_list.append("\n")
-
-        elif child_of_article.tag.endswith("quotedStructure"):
-            # Handle quoted structures - wrap in markdown blockquote
-            quoted_content = clean_text_content(child_of_article, cross_references)
-            if quoted_content:
-                # Split into lines and add > prefix to each line
-                lines = quoted_content.split("\n")
-                quoted_lines = [f"> {line}" for line in lines if line.strip()]
-                markdown_content_list.append("\n".join(quoted_lines))
-                markdown_content_list.append("\n")
+        handler = ARTICLE_BLOCK_DISPATCH.get(child_of_article.tag)
+        if handler is not None:
+            handler(child_of_article, markdown_content_list, ns, cross_references)
+
+def _render_list_point(list_item, markdown_content_list, ns, cross_references):
+    list_num_element = list_item.find("./akn:num", ns)
+    list_content_element = list_item.find("./akn:content", ns)
+
+    list_item_text = (
+        clean_text_content(list_content_element, cross_references)
+        if list_content_element is not None
+        else ""
+    )
+
+    if list_num_element is not None:
+        markdown_content_list.append(
+            f"- {list_num_element.text.strip()} {list_item_text}\n"
+        )
+    elif list_item_text:
+        markdown_content_list.append(f"- {list_item_text}\n")
+
+# List item handlers; only <point> children are rendered, as findall("./akn:point")
+LIST_ITEM_DISPATCH = TagDispatcher(exact={f"{{{AKN_NAMESPACE['akn']}}}point": _render_list_point})
+
+def _render_list_items(list_element, markdown_content_list, ns, cross_references):
+    for list_item in list_element:
+        handler = LIST_ITEM_DISPATCH.get(list_item.tag)
+        if handler is not None:
+            handler(list_item, markdown_content_list, ns, cross_references)
+    markdown_content_list.append("\n")  # Add a newline after a list
+
+def _render_article_paragraph(paragraph, markdown_content_list, ns, cross_references):
+    para_num_element = paragraph.find("./akn:num", ns)
+    para_content_element = paragraph.find("./akn:content", ns)
+    para_list_element = paragraph.find("./akn:list", ns)
+
+    # Check if paragraph contains a list
+    if para_list_element is not None:
+        # Handle intro element in lists (like in Article 1)
+        intro_element = para_list_element.find("./akn:intro", ns)
+        if intro_element is not None:
+            intro_text = clean_text_content(intro_element, cross_references)
+            if intro_text:
+                # Remove double dots from paragraph numbering
+                para_num = para_num_element.text.strip().rstrip(".")
+                markdown_content_list.append(f"{para_num}. {intro_text}\n\n")
+            elif intro_text:
+                markdown_content_list.append(f"{intro_text}\n\n")
+
+        _render_list_items(para_list_element, markdown_content_list, ns, cross_references)
+        return
+
+    # Handle regular paragraph content
+    paragraph_text = (
+        process_content_with_paragraphs(para_content_element, ns, cross_references)
+        if para_content_element is not None
+        else ""
+    )
+
+    # Remove duplicate number if present at the beginning of the paragraph text
+    if para_num_element is not None:
+        num_to_remove = para_num_element.text.strip().rstrip(".")
+        # Match the number followed by a period and optional space at the beginning
+        # of the string (patterns cached: "1", "2", ... repeat in every article)
+        pattern = _paragraph_number_pattern(num_to_remove)
+        paragraph_text = pattern.sub("", paragraph_text, 1)
+
+    if para_num_element is not None and paragraph_text:
+        # Remove double dots from paragraph numbering and ensure single dot
+        para_num = para_num_element.text.strip().rstrip(".")
+        markdown_content_list.append(f"{para_num}. {paragraph_text}\n\n")
+    elif paragraph_text:
+        # If no number but there's text, just append the text
+        markdown_content_list.append(f"{paragraph_text}\n\n")
+
+def _render_article_list(list_element, markdown_content_list, ns, cross_references):
+    # Handle intro element in lists (like in Article 1)
+    intro_element = list_element.find("./akn:intro", ns)
+    if intro_element is not None:
+        intro_text = clean_text_content(intro_element, cross_references)
+        if intro_text:
+            markdown_content_list.append(f"{intro_text}\n\n")
+
+    _render_list_items(list_element, markdown_content_list, ns, cross_references)
+
+def _render_article_table(table_element, markdown_content_list, ns, cross_references):
+    # Handle tables - convert to basic markdown table format
+    table_markdown = process_table(table_element, ns, cross_references)
+    if table_markdown:
+        markdown_content_list.append(table_markdown)
+        markdown_content_list.append("\n")
+
+def _render_quoted_structure(quoted_element, markdown_content_list, ns, cross_references):
+    # Handle quoted structures - wrap in markdown blockquote
+    quoted_content = clean_text_content(quoted_element, cross_references)
+    if quoted_content:
+        # Split into lines and add > prefix to each line
+        lines = quoted_content.split("\n")
+        quoted_lines = [f"> {line}" for line in lines if line.strip()]
+        markdown_content_list.append("\n".join(quoted_lines))
+        markdown_content_list.append("\n")
+
+# Article block handlers: (element, markdown_content_list, ns, cross_references)
+ARTICLE_BLOCK_DISPATCH = TagDispatcher(
+    [
+        ("paragraph", _render_article_paragraph),
+        ("list", _render_article_list),
+        ("table", _render_article_table),
+        ("quotedStructure", _render_quoted_structure),
+    ]
+)
@@ -8,10 +8,11 @@ from __future__ import annotations
 
 import sys
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from .markdown_converter import MarkdownSink
 
 
-@dataclass
 class ConversionResult:
     """
     Risultato di una conversione XML → Markdown.
@@ -19,6 +20,12 @@ class ConversionResult:
     Contiene sia il contenuto Markdown che i metadata estratti dal documento.
     Può essere usato direttamente come stringa o salvato su file.
 
+    Il Markdown può essere fornito già pronto (``markdown``) oppure come
+    funzione che produce i frammenti (``fragments``): in questo caso il testo
+    completo viene costruito solo al primo accesso a ``markdown``, mentre
+    ``save()`` e ``write_to()`` scrivono i frammenti man mano che vengono
+    generati.
+
     Attributes:
         markdown: Contenuto Markdown completo del documento
         metadata: Dictionary con metadata (dataGU, codiceRedaz, etc.)
@@ -31,15 +38,63 @@ class ConversionResult:
         >>> print(result.metadata['dataGU'])
         >>> result.save("output.md")
         >>>
-        >>> # Conversione automatica a stringa
-        >>> with open("out.md", "w") as f:
-        ...     f.write(str(result))
+        >>> # Scrittura incrementale su uno stream
+        >>> result.write_to(sys.stdout)
     """
 
-    markdown: str
-    metadata: Dict[str, str]
-    url: Optional[str] = None
-    url_xml: Optional[str] = None
+    def __init__(
+        self,
+        markdown: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        url: Optional[str] = None,
+        url_xml: Optional[str] = None,
+        fragments: Optional[Callable[[], Iterable[str]]] = None,
+    ):
+        if markdown is None and fragments is None:
+            markdown = ""
+        self._markdown = markdown
+        self._fragments = fragments if markdown is None else None
+        self.metadata = metadata if metadata is not None else {}
+        self.url = url
+        self.url_xml = url_xml
+
+    @property
+    def markdown(self) -> str:
+        """Contenuto Markdown completo (generato e memorizzato al primo accesso)."""
+        if self._markdown is None:
+            self._markdown = "".join(self._fragments())
+            self._fragments = None
+        return self._markdown
+
+    @markdown.setter
+    def markdown(self, value: str) -> None:
+        self._markdown = value
+        self._fragments = None
+
+    def iter_fragments(self) -> Iterator[str]:
+        """
+        Itera sui frammenti Markdown nell'ordine di output.
+
+        Se il testo completo non è ancora stato costruito, i frammenti vengono
+        generati al momento senza materializzare l'intero documento.
+        """
+        if self._markdown is not None:
+            return iter((self._markdown,))
+        return iter(self._fragments())
+
+    def write_to(self, output: TextIO) -> int:
+        """
+        Scrive il Markdown su un oggetto con metodo ``write()`` (file, stdout, StringIO).
+
+        Args:
+            output: Destinazione della scrittura
+
+        Returns:
+            Numero di caratteri scritti
+        """
+        sink = MarkdownSink(output)
+        sink.write_all(self.iter_fragments())
+        return sink.chars_written
 
     def __str__(self) -> str:
         """
@@ -53,6 +108,25 @@ class ConversionResult:
         """
         return self.markdown
 
+    def __repr__(self) -> str:
+        """Rappresentazione tecnica del risultato."""
+        return (
+            f"ConversionResult(metadata={self.metadata!r}, url={self.url!r}, "
+            f"url_xml={self.url_xml!r})"
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ConversionResult):
+            return NotImplemented
+        return (self.markdown, self.metadata, self.url, self.url_xml) == (
+            other.markdown,
+            other.metadata,
+            other.url,
+            other.url_xml,
+        )
+
+    __hash__ = None
+
     def save(self, path: str, encoding: str = "utf-8") -> None:
         """
         Salva contenuto markdown su file.
@@ -71,7 +145,7 @@ class ConversionResult:
         """
         try:
             with open(path, "w", encoding=encoding) as f:
-                f.write(self.markdown)
+                self.write_to(f)
         except IOError as e:
             print(f"Errore durante salvataggio file: {e}", file=sys.stderr)
             raise
@@ -89,9 +163,15 @@ class ConversionResult:
             >>> print(result.title)
             "Legge 9 gennaio 2004, n. 4"
         """
-        for line in self.markdown.split("\n"):
-            if line.startswith("# "):
-                return line[2:].strip()
+        # Il titolo è tra i primi frammenti: non serve generare tutto il documento
+        pending = ""
+        for fragment in self.iter_fragments():
+            *lines, pending = (pending + fragment).split("\n")
+            for line in lines:
+                if line.startswith("# "):
+                    return line[2:].strip()
+        if pending.startswith("# "):
+            return pending[2:].strip()
         return None
 
     @property
@@ -1,10 +1,19 @@
 import os
 import sys
-import time
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .constants import (
+    REFERENCES_MAX_DOCUMENTS,
+    REFERENCES_MAX_FRONTIER,
+    REFERENCES_WORKERS,
+)
 from .normattiva_api import extract_params_from_normattiva_url, download_akoma_ntoso
-from .akoma_utils import extract_cited_laws
+from .http_client import as_client
+from .akoma_utils import citation_key, extract_cited_laws
+from .manifest import RunManifest
 from .markdown_converter import convert_akomantoso_to_markdown_improved
+from .xml_parser import AkomaDocument
 
 
 def build_cross_references_mapping_from_urls(url_to_file_mapping):
@@ -20,9 +29,14 @@ def build_cross_references_mapping_from_urls(url_to_file_mapping):
     return url_to_file_mapping
 
 
-def create_index_file(folder_path, main_params, cited_urls, successful, failed):
+def create_index_file(
+    folder_path, main_params, cited_urls, successful, failed, manifest=None
+):
     """
     Crea un file indice che elenca tutte le leggi scaricate.
+
+    Con ``manifest`` l'elenco viene dal manifest della raccolta (anche gli
+    atti convertiti in esecuzioni precedenti), altrimenti dai file in ``refs/``.
     """
     index_path = os.path.join(folder_path, "index.md")
 
@@ -36,8 +50,12 @@ def create_index_file(folder_path, main_params, cited_urls, successful, failed):
 
         if successful > 0:
             f.write("## Leggi Citare Scaricate\n\n")
-            refs_path = os.path.join(folder_path, "refs")
-            for filename in sorted(os.listdir(refs_path)):
+            if manifest is not None:
+                filenames = [os.path.basename(output) for output in manifest.outputs()]
+            else:
+                refs_path = os.path.join(folder_path, "refs")
+                filenames = sorted(os.listdir(refs_path))
+            for filename in filenames:
                 if filename.endswith(".md"):
                     f.write(f"- [{filename}](./refs/{filename})\n")
             f.write("\n")
@@ -45,8 +63,332 @@ def create_index_file(folder_path, main_params, cited_urls, successful, failed):
         f.write(f"[Legge principale](./main.md)\n")
 
 
+def _cited_metadata(cited_url, cited_params):
+    return {
+        "dataGU": cited_params["dataGU"],
+        "codiceRedaz": cited_params["codiceRedaz"],
+        "dataVigenza": cited_params["dataVigenza"],
+        "url": cited_url,
+        "url_xml": f"https://www.normattiva.it/do/atto/caricaAKN?dataGU={cited_params['dataGU']}&codiceRedaz={cited_params['codiceRedaz']}&dataVigenza={cited_params['dataVigenza']}",
+    }
+
+
+def _resolve_cited_law(cited_url, session, resolution_cache):
+    """Parametri di download di una legge citata, oppure None."""
+    try:
+        cited_params, _ = extract_params_from_normattiva_url(
+            cited_url,
+            session=session,
+            quiet=True,
+            resolution_cache=resolution_cache,
+        )
+    except Exception as e:
+        print(f"❌ Errore elaborazione {cited_url}: {e}", file=sys.stderr)
+        return None
+    return cited_params
+
+
+def _convert_cited_law(
+    cited_url,
+    cited_params,
+    folder_path,
+    session,
+    keep_xml,
+    cache,
+    follow=False,
+    parser="auto",
+):
+    """
+    Scarica e converte una legge citata in ``refs/``.
+
+    Args:
+        follow: se True estrae anche le leggi citate dall'atto
+        parser: backend XML ("auto", "lxml" o "etree")
+
+    Returns:
+        tuple: (successo, messaggio di avanzamento, leggi citate dall'atto)
+    """
+    cited_filename = f"{cited_params['codiceRedaz']}_{cited_params['dataGU']}.md"
+    cited_md_path = os.path.join(folder_path, "refs", cited_filename)
+    cited_xml_temp = os.path.join(
+        folder_path, f"temp_{cited_params['codiceRedaz']}.xml"
+    )
+    children = set()
+    try:
+        if not download_akoma_ntoso(
+            cited_params, cited_xml_temp, session, quiet=True, cache=cache
+        ):
+            return False, f"❌ Errore download: {cited_url}", children
+        try:
+            options = {}
+            if follow:
+                # Il documento viene analizzato una volta per citazioni e conversione
+                document = AkomaDocument(cited_xml_temp, parser=parser)
+                children = extract_cited_laws(document)
+                options["document"] = document
+            if convert_akomantoso_to_markdown_improved(
+                cited_xml_temp,
+                cited_md_path,
+                _cited_metadata(cited_url, cited_params),
+                parser=parser,
+                **options,
+            ):
+                return True, f"✅ Convertita: {cited_filename}", children
+            return False, f"❌ Errore conversione: {cited_filename}", children
+        finally:
+            # Rimuovi XML temporaneo
+            if not keep_xml:
+                try:
+                    os.remove(cited_xml_temp)
+                except OSError:
+                    pass
+    except Exception as e:
+        return False, f"❌ Errore elaborazione {cited_url}: {e}", children
+
+
+def _resumable(manifest, urls, follow):
+    """Voce del manifest di un atto da non rielaborare, oppure None."""
+    for url in urls:
+        entry = manifest.completed(url)
+        # Per seguire le citazioni serve l'elenco registrato
+        if entry is not None and (not follow or "cited" in entry):
+            return entry
+    return None
+
+
+def crawl_cited_laws(
+    cited_urls,
+    folder_path,
+    session,
+    workers=REFERENCES_WORKERS,
+    quiet=False,
+    keep_xml=False,
+    cache=None,
+    resolution_cache=None,
+    depth=1,
+    max_documents=None,
+    max_frontier=None,
+    visited=None,
+    manifest=None,
+    parser="auto",
+):
+    """
+    Scarica e converte in parallelo le leggi citate in ``folder_path/refs``.
+
+    Visita in ampiezza il grafo delle citazioni fino a ``depth`` livelli:
+    il livello 1 sono ``cited_urls``, il livello 2 le leggi citate da
+    queste e così via. Gli URL sono deduplicati per ``citation_key``, così
+    ogni atto viene scaricato una volta sola anche se raggiungibile da più
+    percorsi o citato con grafie diverse.
+
+    Per ogni livello un pool di ``workers`` thread risolve prima i parametri
+    degli URL, poi scarica e converte gli atti (più URN possono indicare lo
+    stesso file: vale l'ultimo, come nell'elaborazione sequenziale). La
+    cortesia verso normattiva.it è affidata al client condiviso (limite di
+    frequenza e ``max_per_host``).
+
+    Args:
+        cited_urls: URL delle leggi citate dal documento principale
+        folder_path: cartella della raccolta (contiene ``refs/``)
+        session: NormattivaClient condiviso dai thread
+        workers: thread del pool (1 = sequenziale)
+        depth: livelli di citazioni da seguire (1 = solo le leggi citate)
+        max_documents: atti da scaricare al massimo (None = nessun limite con
+            ``depth=1``, ``REFERENCES_MAX_DOCUMENTS`` oltre)
+        max_frontier: URL da visitare al massimo per livello (None = nessun
+            limite con ``depth=1``, ``REFERENCES_MAX_FRONTIER`` oltre)
+        visited: chiavi ``citation_key`` già visitate (es. il documento principale)
+        manifest: RunManifest aggiornato dopo ogni atto; gli atti già
+            completati vengono saltati (opzionale)
+        parser: backend XML ("auto", "lxml" o "etree")
+
+    Returns:
+        tuple: (mapping URL -> ``refs/<file>.md``, leggi convertite, leggi fallite)
+    """
+    if depth > 1:
+        # I limiti servono solo a non far esplodere la visita oltre le
+        # citazioni dirette: con depth=1 si scarica tutto, come prima
+        if max_documents is None:
+            max_documents = REFERENCES_MAX_DOCUMENTS
+        if max_frontier is None:
+            max_frontier = REFERENCES_MAX_FRONTIER
+    visited = set() if visited is None else visited
+    url_to_file_mapping = {}
+    outcomes = {}  # file markdown -> successo
+    key_files = {}  # citation_key -> file markdown
+    successful_downloads = 0
+    failed_downloads = 0
+    attempted = 0
+    skipped = 0
+
+    frontier = list(cited_urls)
+    with ThreadPoolExecutor(max_workers=max(1, workers or 1)) as pool:
+        for level in range(1, depth + 1):
+            # Una sola visita per atto: le altre grafie diventano alias
+            aliases = {}
+            for url in frontier:
+                key = citation_key(url)
+                if key in visited:
+                    if key in key_files:
+                        url_to_file_mapping.setdefault(url, f"refs/{key_files[key]}")
+                    continue
+                aliases.setdefault(key, []).append(url)
+            keys = list(aliases)
+            if max_frontier is not None and len(keys) > max_frontier:
+                skipped += len(keys) - max_frontier
+                keys = keys[:max_frontier]
+            if max_documents is not None:
+                budget = max(0, max_documents - attempted)
+                skipped += max(0, len(keys) - budget)
+                keys = keys[:budget]
+            if not keys:
+                break
+            visited.update(keys)
+            follow = level < depth
+
+            # Atti completati in un'esecuzione precedente (con le loro citazioni)
+            resumed = {}
+            if manifest is not None:
+                for key in keys:
+                    entry = _resumable(manifest, aliases[key], follow)
+                    if entry is not None:
+                        resumed[key] = entry
+            pending = [key for key in keys if key not in resumed]
+            resolved = dict(
+                zip(
+                    pending,
+                    pool.map(
+                        lambda key: _resolve_cited_law(
+                            aliases[key][0], session, resolution_cache
+                        ),
+                        pending,
+                    ),
+                )
+            )
+
+            targets = {}  # file markdown -> (URL, parametri)
+            level_files = {}  # chiave -> file markdown
+            order = []  # file markdown del livello, in ordine di visita
+            children = {}  # file markdown -> leggi citate
+            for key in keys:
+                cited_url = aliases[key][0]
+                if key in resumed:
+                    entry = resumed[key]
+                    cited_filename = os.path.basename(entry["output"])
+                    outcomes[cited_filename] = True
+                    children.setdefault(cited_filename, entry.get("cited", ()))
+                    manifest.resumed += 1
+                else:
+                    cited_params = resolved[key]
+                    if not cited_params:
+                        if not quiet:
+                            print(
+                                f"⚠️  Impossibile estrarre parametri da: {cited_url}",
+                                file=sys.stderr,
+                            )
+                        failed_downloads += 1
+                        if manifest is not None:
+                            for url in aliases[key]:
+                                manifest.record(
+                                    url, "failed", error="parametri non estratti"
+                                )
+                        continue
+                    cited_filename = (
+                        f"{cited_params['codiceRedaz']}_{cited_params['dataGU']}.md"
+                    )
+                    # Un file già prodotto a un livello precedente non si riscarica
+                    if cited_filename not in outcomes:
+                        targets[cited_filename] = (cited_url, cited_params)
+                for url in aliases[key]:
+                    url_to_file_mapping[url] = f"refs/{cited_filename}"
+                level_files[key] = key_files[key] = cited_filename
+                if cited_filename not in order:
+                    order.append(cited_filename)
+            attempted += len(keys)
+
+            if not quiet:
+                if resumed:
+                    print(
+                        f"⏭️  Livello {level}: {len(resumed)} leggi citate già convertite",
+                        file=sys.stderr,
+                    )
+                print(
+                    f"📥 Livello {level}: download di {len(targets)} leggi citate con {workers} thread...",
+                    file=sys.stderr,
+                )
+            futures = {
+                pool.submit(
+                    _convert_cited_law,
+                    cited_url,
+                    cited_params,
+                    folder_path,
+                    session,
+                    keep_xml,
+                    cache,
+                    follow,
+                    parser,
+                ): cited_filename
+                for cited_filename, (cited_url, cited_params) in targets.items()
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                success, message, cited = future.result()
+                cited_filename = futures[future]
+                outcomes[cited_filename] = success
+                children[cited_filename] = cited
+                if manifest is not None:
+                    # Salvataggio dopo ogni atto: un'interruzione non perde il lavoro fatto
+                    _, cited_params = targets[cited_filename]
+                    for key, filename in level_files.items():
+                        if filename != cited_filename or key in resumed:
+                            continue
+                        for url in aliases[key]:
+                            manifest.record(
+                                url,
+                                "done" if success else "failed",
+                                params=cited_params,
+                                output=f"refs/{cited_filename}",
+                                cited=cited if follow and success else None,
+                                error=None if success else message,
+                            )
+                if not quiet:
+                    print(f"[{done}/{len(futures)}] {message}", file=sys.stderr)
+
+            # Ogni atto conta come nella versione sequenziale, anche se condivide il file
+            for cited_filename in level_files.values():
+                if outcomes[cited_filename]:
+                    successful_downloads += 1
+                else:
+                    failed_downloads += 1
+
+            # Frontiera del livello successivo, in ordine stabile
+            frontier = [
+                url
+                for cited_filename in order
+                for url in sorted(children.get(cited_filename, ()))
+            ]
+
+    if skipped and not quiet:
+        print(
+            f"⚠️  {skipped} leggi citate non visitate per i limiti di frontiera o di documenti",
+            file=sys.stderr,
+        )
+    return url_to_file_mapping, successful_downloads, failed_downloads
+
+
 def convert_with_references(
-    url, output_dir=None, quiet=False, keep_xml=False, force_complete=False
+    url,
+    output_dir=None,
+    quiet=False,
+    keep_xml=False,
+    force_complete=False,
+    client=None,
+    cache=None,
+    resolution_cache=None,
+    workers=REFERENCES_WORKERS,
+    depth=1,
+    max_documents=None,
+    parser="auto",
+    jobs=None,
 ):
     """
     Scarica e converte una legge con tutte le sue riferimenti, creando una struttura di cartelle.
@@ -56,6 +398,18 @@ def convert_with_references(
         quiet: se True, modalità silenziosa
         keep_xml: se True, mantiene i file XML temporanei
         force_complete: se True, forza download legge completa anche con URL articolo-specifico
+        client: NormattivaClient condiviso da tutti i download (default: client del processo)
+        cache: XMLCache consultata per legge principale e citate (opzionale)
+        resolution_cache: ResolutionCache degli URL già risolti (opzionale)
+        workers: leggi citate scaricate e convertite in parallelo
+        depth: livelli di citazioni da seguire (1 = solo le leggi citate
+            dalla legge principale)
+        max_documents: leggi citate da scaricare al massimo (None = nessun
+            limite con ``depth=1``, ``REFERENCES_MAX_DOCUMENTS`` oltre)
+        parser: backend XML ("auto", "lxml" o "etree") per tutti gli atti
+        jobs: processi per il rendering della legge principale (None =
+            sequenziale); le citate sono già convertite in parallelo dai
+            ``workers``
 
     Returns:
         bool: True se il processo è completato con successo
@@ -65,7 +419,11 @@ def convert_with_references(
         if not quiet:
             print(f"🔍 Analisi legge principale: {url}", file=sys.stderr)
 
-        params, session = extract_params_from_normattiva_url(url, quiet=quiet)
+        # Un solo client (e pool di connessioni) per legge principale e citate
+        session = as_client(client)
+        params, session = extract_params_from_normattiva_url(
+            url, session=session, quiet=quiet, resolution_cache=resolution_cache
+        )
         if not params:
             print(
                 "❌ Impossibile estrarre parametri dalla legge principale",
@@ -90,7 +448,9 @@ def convert_with_references(
 
         # Scarica legge principale
         xml_temp_path = os.path.join(folder_path, f"{params['codiceRedaz']}.xml")
-        if not download_akoma_ntoso(params, xml_temp_path, session, quiet=quiet):
+        if not download_akoma_ntoso(
+            params, xml_temp_path, session, quiet=quiet, cache=cache
+        ):
             print(
                 "❌ Errore durante il download della legge principale", file=sys.stderr
             )
@@ -102,7 +462,10 @@ def convert_with_references(
                 f"🔗 Estrazione riferimenti dalla legge principale...", file=sys.stderr
             )
 
-        cited_urls = extract_cited_laws(xml_temp_path)
+        # Il documento principale viene analizzato una sola volta e riusato
+        # per riferimenti, prima conversione e riconversione con i link
+        main_document = AkomaDocument(xml_temp_path, parser=parser)
+        cited_urls = extract_cited_laws(main_document)
         if not quiet:
             print(f"📋 Trovate {len(cited_urls)} leggi uniche citate", file=sys.stderr)
 
@@ -122,6 +485,9 @@ def convert_with_references(
             xml_temp_path,
             main_md_path,
             metadata=metadata,
+            document=main_document,
+            parser=parser,
+            workers=jobs,
         ):
             print(
                 "❌ Errore durante la conversione della legge principale",
@@ -129,94 +495,25 @@ def convert_with_references(
             )
             return False
 
-        # Scarica e converte leggi citate
-        successful_downloads = 0
-        failed_downloads = 0
-        url_to_file_mapping = {}  # Mappa URL originali ai percorsi dei file
-
-        for i, cited_url in enumerate(cited_urls, 1):
-            if not quiet:
-                print(
-                    f"📥 [{i}/{len(cited_urls)}] Download legge citata: {cited_url}",
-                    file=sys.stderr,
-                )
-
-            try:
-                # Estrai parametri dalla URL citata
-                cited_params, cited_session = extract_params_from_normattiva_url(
-                    cited_url, quiet=True
-                )
-                if not cited_params:
-                    if not quiet:
-                        print(
-                            f"⚠️  Impossibile estrarre parametri da: {cited_url}",
-                            file=sys.stderr,
-                        )
-                    failed_downloads += 1
-                    continue
-
-                # Crea nome file per la legge citata
-                cited_filename = (
-                    f"{cited_params['codiceRedaz']}_{cited_params['dataGU']}.md"
-                )
-                cited_md_path = os.path.join(refs_path, cited_filename)
-
-                # Mappa l'URL originale al percorso del file
-                url_to_file_mapping[cited_url] = f"refs/{cited_filename}"
-
-                # Scarica XML temporaneo per la legge citata
-                cited_xml_temp = os.path.join(
-                    folder_path, f"temp_{cited_params['codiceRedaz']}.xml"
-                )
-                if download_akoma_ntoso(
-                    cited_params, cited_xml_temp, cited_session, quiet=True
-                ):
-                    # Converti a markdown
-                    cited_metadata = {
-                        "dataGU": cited_params["dataGU"],
-                        "codiceRedaz": cited_params["codiceRedaz"],
-                        "dataVigenza": cited_params["dataVigenza"],
-                        "url": cited_url,
-                        "url_xml": f"https://www.normattiva.it/do/atto/caricaAKN?dataGU={cited_params['dataGU']}&codiceRedaz={cited_params['codiceRedaz']}&dataVigenza={cited_params['dataVigenza']}",
-                    }
-
-                    if convert_akomantoso_to_markdown_improved(
-                        cited_xml_temp, cited_md_path, cited_metadata
-                    ):
-                        successful_downloads += 1
-                        if not quiet:
-                            print(f"✅ Convertita: {cited_filename}", file=sys.stderr)
-                    else:
-                        failed_downloads += 1
-                        if not quiet:
-                            print(
-                                f"❌ Errore conversione: {cited_filename}",
-                                file=sys.stderr,
-                            )
-
-                    # Rimuovi XML temporaneo
-                    if not keep_xml:
-                        try:
-                            os.remove(cited_xml_temp)
-                        except OSError:
-                            pass
-                else:
-                    failed_downloads += 1
-                    if not quiet:
-                        print(f"❌ Errore download: {cited_url}", file=sys.stderr)
-
-            except Exception as e:
-                failed_downloads += 1
-                if not quiet:
-                    print(f"❌ Errore elaborazione {cited_url}: {e}", file=sys.stderr)
-
-            # Rate limiting: wait 1 second between requests to be respectful to normattiva.it
-            if not quiet:
-                print(
-                    f"⏳ Attesa 1 secondo prima del prossimo download...",
-                    file=sys.stderr,
-                )
-            time.sleep(1)
+        # Manifest della raccolta: un'esecuzione interrotta riprende da qui
+        manifest = RunManifest(folder_path, url)
+
+        # Scarica e converte leggi citate (in parallelo)
+        url_to_file_mapping, successful_downloads, failed_downloads = crawl_cited_laws(
+            cited_urls,
+            folder_path,
+            session,
+            workers=workers,
+            quiet=quiet,
+            keep_xml=keep_xml,
+            cache=cache,
+            resolution_cache=resolution_cache,
+            depth=depth,
+            max_documents=max_documents,
+            visited={citation_key(url)},
+            manifest=manifest,
+            parser=parser,
+        )
 
         # Costruisci mapping cross-references basato sugli URL originali
         cross_references = build_cross_references_mapping_from_urls(url_to_file_mapping)
@@ -233,6 +530,9 @@ def convert_with_references(
                 main_md_path,
                 metadata=metadata,
                 cross_references=cross_references,
+                document=main_document,
+                parser=parser,
+                workers=jobs,
             ):
                 print(
                     "⚠️  Avviso: riconversione con collegamenti fallita, mantengo versione senza link",
@@ -241,7 +541,12 @@ def convert_with_references(
 
         # Crea file indice
         create_index_file(
-            folder_path, params, cited_urls, successful_downloads, failed_downloads
+            folder_path,
+            params,
+            cited_urls,
+            successful_downloads,
+            failed_downloads,
+            manifest=manifest,
         )
 
         # Rimuovi XML principale se non richiesto
@@ -256,6 +561,11 @@ def convert_with_references(
                 f"\n✅ Completato! {successful_downloads} leggi citate scaricate, {failed_downloads} fallite",
                 file=sys.stderr,
             )
+            if manifest.resumed:
+                print(
+                    f"⏭️  {manifest.resumed} leggi citate riprese da un'esecuzione precedente",
+                    file=sys.stderr,
+                )
             if cross_references:
                 print(
                     f"🔗 Collegamenti incrociati aggiunti: {len(cross_references)} riferimenti",
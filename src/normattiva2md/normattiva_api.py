@@ -1,11 +1,15 @@
+import hashlib
+import itertools
 import json
 import os
 import re
 import sys
+import tempfile
+import threading
 import time
 import zipfile
+from contextlib import nullcontext
 from datetime import datetime
-from io import BytesIO
 from urllib.parse import parse_qs, urlparse
 
 import requests
@@ -13,11 +17,41 @@ import requests
 from .provvedimenti_api import extract_law_params_from_url
 from .constants import (
     ALLOWED_DOMAINS,
-    DEFAULT_TIMEOUT,
-    VERSION,
+    DOWNLOAD_CHUNK_SIZE,
     MAX_FILE_SIZE_BYTES,
     MAX_FILE_SIZE_MB,
+    OPENDATA_BATCH_MAX_DAYS,
+    OPENDATA_DEADLINE,
+    OPENDATA_MAX_COLLECTION_BYTES,
+    OPENDATA_MAX_COLLECTION_MB,
+    OPENDATA_POLL_INITIAL,
+    OPENDATA_POLL_MAX,
 )
+from .http_client import (
+    NOT_MODIFIED,
+    FlowCancelled,
+    Request,
+    Sleep,
+    as_client,
+    conditional_headers,
+    response_validators,
+    run_sync,
+)
+from .xml_cache import load_cached_xml
+
+# Header specifici per tipo di richiesta; User-Agent, lingua e timeout
+# sono quelli di default del NormattivaClient
+PAGE_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+DOWNLOAD_HEADERS = {**PAGE_HEADERS, "Referer": "https://www.normattiva.it/"}
+OPENDATA_HEADERS = {"Accept": "application/json"}
+OPENDATA_BASE_URL = "https://api.normattiva.it/t/normattiva.api/bff-opendata/v1"
+
+# Byte iniziali esaminati per riconoscere un documento XML
+_SNIFF_BYTES = 500
+# Data di vigenza esplicita in un URL normattiva (``!vig=AAAA-MM-GG``)
+_VIGENZA_PATTERN = re.compile(r"!vig=(\d{4})-(\d{2})-(\d{2})")
 
 
 def normalize_normattiva_url(url):
@@ -118,7 +152,81 @@ def is_normattiva_export_url(url):
     return "/esporta/attoCompleto" in url and is_normattiva_url(url)
 
 
-def extract_params_from_normattiva_url(url, session=None, quiet=False):
+class FetchContext:
+    """
+    Stato condiviso dai flussi di una singola conversione.
+
+    La pagina HTML di un atto serve a più strategie: all'estrazione dei
+    parametri ``caricaAKN`` e, se il link manca, alla ricerca OpenData e al
+    form di export. Con un ``FetchContext`` comune la pagina viene caricata
+    una volta sola e i parametri di export ricavati una volta sola.
+
+    Attributes:
+        reused: pagine servite dal contesto invece che dalla rete
+    """
+
+    def __init__(self):
+        self._pages = {}
+        self._export_meta = {}
+        self._lock = threading.Lock()
+        self.reused = 0
+
+    def page(self, url):
+        """HTML della pagina di ``url`` se già caricata, altrimenti None."""
+        with self._lock:
+            html = self._pages.get(normalize_normattiva_url(url))
+            if html is not None:
+                self.reused += 1
+            return html
+
+    def store_page(self, url, html):
+        """Memorizza l'HTML della pagina di ``url``."""
+        with self._lock:
+            self._pages[normalize_normattiva_url(url)] = html
+
+    def export_metadata(self, url):
+        """Parametri di export della pagina di ``url`` (vedi ``_extract_export_metadata``)."""
+        key = normalize_normattiva_url(url)
+        with self._lock:
+            if key in self._export_meta:
+                return self._export_meta[key]
+            html = self._pages.get(key)
+        if html is None:
+            return None
+        export_meta = _extract_export_metadata(html)
+        with self._lock:
+            self._export_meta[key] = export_meta
+        return export_meta
+
+
+def _page_flow(url, headers, context):
+    """
+    HTML della pagina di ``url``: dal contesto se già caricata, altrimenti
+    dalla rete (e memorizzato nel contesto).
+
+    Raises:
+        requests.RequestException: errore di rete o risposta HTTP di errore
+    """
+    if context is not None:
+        html = context.page(url)
+        if html is not None:
+            return html
+    response = yield Request("GET", url, headers=headers)
+    response.raise_for_status()
+    if context is not None:
+        context.store_page(url, response.text)
+    return response.text
+
+
+def _page_export_metadata(url, html, context):
+    if context is not None:
+        return context.export_metadata(url)
+    return _extract_export_metadata(html)
+
+
+def extract_params_from_normattiva_url(
+    url, session=None, quiet=False, resolution_cache=None, context=None
+):
     """
     Scarica la pagina normattiva e estrae i parametri necessari per il download
 
@@ -130,12 +238,50 @@ def extract_params_from_normattiva_url(url, session=None, quiet=False):
 
     Args:
         url: URL della norma su normattiva.it
-        session: sessione requests da usare (opzionale)
+        session: NormattivaClient o sessione requests (default: client condiviso)
         quiet: se True, stampa solo errori
+        resolution_cache: ResolutionCache da consultare prima di caricare
+            la pagina (opzionale); per un URL con ``!vig=`` basta la
+            risoluzione dello stesso URN senza vigenza
+        context: FetchContext in cui conservare la pagina per i fallback
+            OpenData ed export (opzionale)
 
     Returns:
         tuple: (params dict, session)
     """
+    session = as_client(session)
+    params = run_sync(
+        extract_params_flow(
+            url, quiet=quiet, resolution_cache=resolution_cache, context=context
+        ),
+        session,
+    )
+    return params, session
+
+
+def _pinned_params(url, resolution_cache):
+    """
+    Parametri di un URL con vigenza esplicita (``!vig=AAAA-MM-GG``) ricavati
+    dalla risoluzione, anche scaduta, dello stesso URL senza vigenza:
+    ``dataGU`` e ``codiceRedaz`` non cambiano e la data di vigenza è quella
+    indicata. None se l'URL non è vincolato o l'URN base non è in cache.
+    """
+    match = _VIGENZA_PATTERN.search(url)
+    if match is None:
+        return None
+    immutable = resolution_cache.get_immutable(url[: match.start()] + url[match.end() :])
+    if immutable is None:
+        return None
+    return {**immutable, "dataVigenza": "".join(match.groups())}
+
+
+def extract_params_flow(url, quiet=False, resolution_cache=None, context=None):
+    """
+    Flusso di ``extract_params_from_normattiva_url`` (vedi ``run_sync``).
+
+    Returns:
+        dict o None: parametri di download
+    """
     url = normalize_normattiva_url(url)
 
     # Reject export URLs as they require authentication
@@ -152,32 +298,79 @@ def extract_params_from_normattiva_url(url, session=None, quiet=False):
             "   https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:AAAA-MM-GG;N",
             file=sys.stderr,
         )
-        return None, session
+        return None
+
+    known = None
+    if resolution_cache is not None:
+        cached = resolution_cache.get(url)
+        if cached is not None:
+            if not quiet:
+                print(f"📦 Parametri dalla cache: {url}", file=sys.stderr)
+            return cached
+        pinned = _pinned_params(url, resolution_cache)
+        if pinned is not None:
+            if not quiet:
+                print(f"📦 Parametri dalla cache dell'URN base: {url}", file=sys.stderr)
+            resolution_cache.put(url, pinned)
+            return pinned
+        # Voce scaduta: la pagina viene richiesta in modo condizionale
+        known = resolution_cache.entry(url)
 
     # For permalink URLs, visit the page and extract parameters from HTML
     if not quiet:
         print(f"Caricamento pagina {url}...", file=sys.stderr)
 
-    if session is None:
-        session = requests.Session()
-
-    headers = {
-        "User-Agent": f"Akoma2MD/{VERSION} (https://github.com/ondata/akoma2md)",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "it-IT,it;q=0.9,en;q=0.8",
-    }
+    headers = PAGE_HEADERS
+    if known is not None:
+        headers = {**PAGE_HEADERS, **conditional_headers(known)}
 
     try:
-        response = session.get(
-            url, headers=headers, timeout=DEFAULT_TIMEOUT, verify=True
-        )
+        response = yield Request("GET", url, headers=headers)
         response.raise_for_status()
     except requests.RequestException as e:
         print(f"Errore nel caricamento della pagina: {e}", file=sys.stderr)
-        return None, session
+        # dataGU e codiceRedaz di una risoluzione scaduta restano validi:
+        # si scarica la versione vigente oggi (senza aggiornare la cache)
+        if known is None:
+            return None
+        print(
+            "⚠️  Uso i parametri in cache con la data di vigenza odierna",
+            file=sys.stderr,
+        )
+        return {
+            "dataGU": known["dataGU"],
+            "codiceRedaz": known["codiceRedaz"],
+            "dataVigenza": datetime.now().strftime("%Y%m%d"),
+        }
 
-    html = response.text
+    page_sha256 = None
+    if resolution_cache is not None:
+        if known is not None and response.status_code == NOT_MODIFIED:
+            if not quiet:
+                print("🔁 Pagina non modificata (304)", file=sys.stderr)
+            return resolution_cache.touch(url)
+        # Senza validatori dal server si confronta il contenuto
+        page_sha256 = hashlib.sha256(response.text.encode("utf-8")).hexdigest()
+        if known is not None and page_sha256 == known["page_sha256"]:
+            if not quiet:
+                print("🔁 Pagina invariata", file=sys.stderr)
+            return resolution_cache.touch(url)
+
+    if context is not None:
+        context.store_page(url, response.text)
+    params = _extract_params_from_page(response.text, quiet)
+    if params is not None and resolution_cache is not None:
+        resolution_cache.put(
+            url,
+            params,
+            validators=response_validators(response),
+            page_sha256=page_sha256,
+        )
+    return params
 
+
+def _extract_params_from_page(html, quiet):
+    """Parametri di download dall'HTML della pagina normattiva, oppure None."""
     # Prova a leggere direttamente il link caricaAKN (più affidabile)
     params = {}
     link_match = re.search(r'href="([^"]*caricaAKN[^"]*)"', html, re.I)
@@ -193,7 +386,7 @@ def extract_params_from_normattiva_url(url, session=None, quiet=False):
             params["dataVigenza"] = query["dataVigenza"][0]
 
         if all(k in params for k in ["dataGU", "codiceRedaz", "dataVigenza"]):
-            return params, session
+            return params
 
     # Se il link caricaAKN non è presente, ritorna None per tentare il fallback
     if not link_match:
@@ -202,7 +395,7 @@ def extract_params_from_normattiva_url(url, session=None, quiet=False):
                 "⚠️  Link caricaAKN non trovato, tentativo con fallback...",
                 file=sys.stderr,
             )
-        return None, session
+        return None
 
     # Estrai parametri dagli input hidden usando regex (fallback)
 
@@ -237,80 +430,132 @@ def extract_params_from_normattiva_url(url, session=None, quiet=False):
             "Errore: impossibile estrarre tutti i parametri necessari", file=sys.stderr
         )
         print(f"Parametri trovati: {params}", file=sys.stderr)
-        return None, session
+        return None
 
-    return params, session
+    return params
 
 
-def download_akoma_ntoso(params, output_path, session=None, quiet=False):
+def download_akoma_ntoso(
+    params, output_path, session=None, quiet=False, cache=None, on_chunk=None
+):
     """
     Scarica il documento Akoma Ntoso usando i parametri estratti
 
     Args:
         params: dizionario con dataGU, codiceRedaz, dataVigenza
-        output_path: percorso dove salvare il file XML
-        session: sessione requests da usare (opzionale)
+        output_path: percorso dove salvare il file XML (None = nessun file,
+            solo con ``on_chunk``)
+        session: NormattivaClient o sessione requests (default: client condiviso)
         quiet: se True, stampa solo errori
+        cache: XMLCache da consultare prima del download (opzionale)
+        on_chunk: funzione chiamata con ogni blocco dell'XML appena arriva,
+            ad esempio il ``feed`` di un parser incrementale (opzionale)
+
+    Returns:
+        bool: True se il download è riuscito
+    """
+    return run_sync(
+        download_akoma_ntoso_flow(
+            params, output_path, quiet=quiet, cache=cache, on_chunk=on_chunk
+        ),
+        session,
+    )
+
+
+def download_akoma_ntoso_flow(
+    params, output_path, quiet=False, cache=None, on_chunk=None, cancel=None
+):
+    """
+    Flusso di ``download_akoma_ntoso`` (vedi ``run_sync``).
+
+    ``cancel`` (``threading.Event``) interrompe anche il download del corpo:
+    la risposta viene chiusa al blocco successivo.
 
     Returns:
         bool: True se il download è riuscito
     """
+    known = None
+    if cache is not None and cache.revalidate:
+        known = cache.entry(params)
+    elif load_cached_xml(cache, params, output_path, quiet=quiet, on_chunk=on_chunk):
+        return True
+
     url = f"https://www.normattiva.it/do/atto/caricaAKN?dataGU={params['dataGU']}&codiceRedaz={params['codiceRedaz']}&dataVigenza={params['dataVigenza']}"
 
     if not quiet:
         print(f"Download Akoma Ntoso da: {url}", file=sys.stderr)
 
-    if session is None:
-        session = requests.Session()
-
-    headers = {
-        "User-Agent": f"Akoma2MD/{VERSION} (https://github.com/ondata/akoma2md)",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "it-IT,it;q=0.9,en;q=0.8",
-        "Referer": "https://www.normattiva.it/",
-    }
-
     try:
-        response = session.get(
+        headers = DOWNLOAD_HEADERS
+        if known is not None:
+            headers = {**DOWNLOAD_HEADERS, **conditional_headers(known)}
+        response = yield Request(
+            "GET",
             url,
             headers=headers,
-            timeout=DEFAULT_TIMEOUT,
             allow_redirects=True,
-            verify=True,
+            stream=True,
+            max_bytes=MAX_FILE_SIZE_BYTES,
         )
-        response.raise_for_status()
+        if known is not None and response.status_code == NOT_MODIFIED:
+            _close(response)
+            if load_cached_xml(
+                cache, params, output_path, quiet=quiet, on_chunk=on_chunk
+            ):
+                cache.count_revalidation(changed=False)
+                return True
+            # Contenuto sparito dalla cache nel frattempo: download completo
+            known = None
+            response = yield Request(
+                "GET",
+                url,
+                headers=DOWNLOAD_HEADERS,
+                allow_redirects=True,
+                stream=True,
+                max_bytes=MAX_FILE_SIZE_BYTES,
+            )
+        _raise_for_status(response)
 
-        # Check file size before processing
-        content_length = response.headers.get("content-length")
-        if content_length and int(content_length) > MAX_FILE_SIZE_BYTES:
-            print(
-                f"❌ Errore: file troppo grande ({int(content_length) / 1024 / 1024:.1f}MB). Massimo consentito: {MAX_FILE_SIZE_MB}MB",
-                file=sys.stderr,
+        # La cache riceve i blocchi insieme al file e a on_chunk
+        writer = cache.writer(params, url_xml=url) if cache is not None else None
+        consumers = [c for c in (writer and writer.write, on_chunk) if c is not None]
+        try:
+            digest = _stream_xml(
+                response,
+                output_path,
+                output_path + ".debug.html" if output_path else None,
+                "❌ Errore: la risposta non è un file XML valido",
+                on_chunk=_fan_out(consumers),
+                cancel=cancel,
             )
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if digest is None:
+            if writer is not None:
+                writer.abort()
             return False
-
-        # Verifica che sia XML
-        if response.content[:5] == b"<?xml" or b"<akomaNtoso" in response.content[:500]:
-            with open(output_path, "wb") as f:
-                f.write(response.content)
-            if not quiet:
+        if writer is not None:
+            writer.commit(validators=response_validators(response))
+            # Server senza validatori: l'hash dice se il testo è cambiato
+            if known is not None:
+                cache.count_revalidation(changed=digest != known["sha256"])
+        if not quiet:
+            if output_path:
                 print(f"✅ File XML salvato in: {output_path}", file=sys.stderr)
-            return True
-        else:
-            print(f"❌ Errore: la risposta non è un file XML valido", file=sys.stderr)
-            # Salva comunque per debug
-            debug_path = output_path + ".debug.html"
-            with open(debug_path, "wb") as f:
-                f.write(response.content)
-            print(f"   Risposta salvata in: {debug_path}", file=sys.stderr)
-            return False
+            else:
+                print("✅ File XML scaricato", file=sys.stderr)
+        return True
 
     except requests.RequestException as e:
         print(f"❌ Errore durante il download: {e}", file=sys.stderr)
         return False
 
 
-def download_akoma_ntoso_via_export(url, output_path, session=None, quiet=False):
+def download_akoma_ntoso_via_export(
+    url, output_path, session=None, quiet=False, cache=None, context=None
+):
     """
     Tenta il download Akoma Ntoso passando dal form di export HTML.
 
@@ -319,37 +564,54 @@ def download_akoma_ntoso_via_export(url, output_path, session=None, quiet=False)
     Args:
         url: URL normattiva.it dell'atto
         output_path: percorso dove salvare il file XML
-        session: sessione requests da usare (opzionale)
+        session: NormattivaClient o sessione requests (default: client condiviso)
         quiet: se True, stampa solo errori
+        cache: XMLCache da consultare prima dell'export (opzionale)
+        context: FetchContext con la pagina già caricata (opzionale)
 
     Returns:
         tuple: (success, metadata, session)
     """
-    if session is None:
-        session = requests.Session()
+    session = as_client(session)
+    success, metadata = run_sync(
+        export_flow(url, output_path, quiet=quiet, cache=cache, context=context),
+        session,
+    )
+    return success, metadata, session
 
-    headers = {
-        "User-Agent": f"Akoma2MD/{VERSION} (https://github.com/ondata/akoma2md)",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "it-IT,it;q=0.9,en;q=0.8",
-        "Referer": "https://www.normattiva.it/",
-    }
+
+def export_flow(url, output_path, quiet=False, cache=None, context=None, cancel=None):
+    """
+    Flusso di ``download_akoma_ntoso_via_export`` (vedi ``run_sync``);
+    ``cancel`` interrompe anche il download dell'XML esportato.
+
+    Returns:
+        tuple: (success, metadata)
+    """
+    headers = DOWNLOAD_HEADERS
 
     try:
-        response = session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT, verify=True)
-        response.raise_for_status()
+        html = yield from _page_flow(url, headers, context)
     except requests.RequestException as e:
         print(f"Errore nel caricamento della pagina: {e}", file=sys.stderr)
-        return False, None, session
+        return False, None
 
-    html = response.text
-    export_meta = _extract_export_metadata(html)
+    export_meta = _page_export_metadata(url, html, context)
     if not export_meta:
         print(
             "❌ ERRORE: impossibile estrarre i parametri per l'export HTML.",
             file=sys.stderr,
         )
-        return False, None, session
+        return False, None
+
+    metadata = {
+        "dataGU": export_meta["dataGU"],
+        "codiceRedaz": export_meta["codiceRedaz"],
+        "dataVigenza": export_meta["dataVigenza"],
+        "url": url,
+    }
+    if load_cached_xml(cache, export_meta, output_path, quiet=quiet):
+        return True, metadata
 
     export_url = (
         "https://www.normattiva.it/atto/vediMenuExport?"
@@ -359,64 +621,214 @@ def download_akoma_ntoso_via_export(url, output_path, session=None, quiet=False)
     )
 
     try:
-        export_page = session.get(
-            export_url,
-            headers={**headers, "Referer": url},
-            timeout=DEFAULT_TIMEOUT,
-            verify=True,
+        export_page = yield Request(
+            "GET", export_url, headers={**headers, "Referer": url}
         )
         export_page.raise_for_status()
     except requests.RequestException as e:
         print(f"❌ Errore nel caricamento del menu export: {e}", file=sys.stderr)
-        return False, None, session
+        return False, None
 
     payload = _build_export_payload(export_page.text)
     if not payload:
         print("❌ ERRORE: impossibile costruire payload export.", file=sys.stderr)
-        return False, None, session
+        return False, None
 
     # Forza export XML
     payload.append(("generaXml", "Esporta XML"))
 
     try:
-        export_response = session.post(
+        export_response = yield Request(
+            "POST",
             "https://www.normattiva.it/do/atto/export",
             data=payload,
             headers={**headers, "Referer": export_url},
-            timeout=DEFAULT_TIMEOUT,
-            verify=True,
+            stream=True,
+            max_bytes=MAX_FILE_SIZE_BYTES,
+        )
+        _raise_for_status(export_response)
+        digest = _stream_xml(
+            export_response,
+            output_path,
+            output_path + ".export.debug.html",
+            "❌ Errore: export non ha restituito XML valido",
+            cancel=cancel,
         )
-        export_response.raise_for_status()
     except requests.RequestException as e:
         print(f"❌ Errore durante il download via export: {e}", file=sys.stderr)
-        return False, None, session
-
-    if (
-        export_response.content[:5] == b"<?xml"
-        or b"<akomaNtoso" in export_response.content[:500]
-    ):
-        with open(output_path, "wb") as f:
-            f.write(export_response.content)
-        if not quiet:
-            print(f"✅ File XML (export) salvato in: {output_path}", file=sys.stderr)
-        metadata = {
-            "dataGU": export_meta["dataGU"],
-            "codiceRedaz": export_meta["codiceRedaz"],
-            "dataVigenza": export_meta["dataVigenza"],
-            "url": url,
-        }
-        return True, metadata, session
+        return False, None
+
+    if digest is None:
+        return False, None
+    if cache is not None:
+        cache.put_file(export_meta, output_path, sha256=digest)
+    if not quiet:
+        print(f"✅ File XML (export) salvato in: {output_path}", file=sys.stderr)
+    return True, metadata
+
+
+def _close(response):
+    close = getattr(response, "close", None)
+    if close is not None:
+        close()
+
+
+def _looks_like_xml(head):
+    """True se i primi byte sono di un documento XML o Akoma Ntoso."""
+    return head[:5] == b"<?xml" or b"<akomaNtoso" in head[:_SNIFF_BYTES]
+
+
+def _download_to_file(response, f, limit, cancel=None):
+    """
+    Copia a blocchi il corpo di ``response`` nel file aperto ``f`` e chiude
+    la risposta.
+
+    Returns:
+        bool: False se il corpo supera ``limit`` byte (download interrotto)
+
+    Raises:
+        requests.RequestException: connessione interrotta durante il download
+        FlowCancelled: download interrotto da ``cancel``
+    """
+    try:
+        content_length = response.headers.get("content-length")
+        if content_length and int(content_length) > limit:
+            return False
+        chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+        if cancel is not None:
+            chunks = _cancellable(chunks, cancel)
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            if size > limit:
+                return False
+            f.write(chunk)
+        return True
+    finally:
+        _close(response)
+
+
+def _cancellable(chunks, cancel):
+    """Blocchi di ``chunks`` fino a quando ``cancel`` non viene impostato."""
+    for chunk in chunks:
+        if cancel.is_set():
+            raise FlowCancelled()
+        yield chunk
+
+
+def _raise_for_status(response):
+    """``raise_for_status`` che chiude la risposta in streaming in caso di errore."""
+    try:
+        response.raise_for_status()
+    except BaseException:
+        _close(response)
+        raise
+
+
+def _fan_out(consumers):
+    """Una sola funzione che passa ogni blocco a tutte quelle in ``consumers``."""
+    if not consumers:
+        return None
+    if len(consumers) == 1:
+        return consumers[0]
+
+    def feed(chunk):
+        for consumer in consumers:
+            consumer(chunk)
 
-    # Salva HTML di errore per debug
-    debug_path = output_path + ".export.debug.html"
-    with open(debug_path, "wb") as f:
-        f.write(export_response.content)
-    print("❌ Errore: export non ha restituito XML valido", file=sys.stderr)
-    print(f"   Risposta salvata in: {debug_path}", file=sys.stderr)
-    return False, None, session
+    return feed
 
 
-def download_akoma_ntoso_via_opendata(url, output_path, session=None, quiet=False):
+def _stream_xml(
+    response, output_path, debug_path, not_xml_message, on_chunk=None, cancel=None
+):
+    """
+    Scrive su disco a blocchi una risposta scaricata con ``stream=True``.
+
+    I primi byte decidono se è XML (``<?xml`` o ``<akomaNtoso``): altrimenti
+    la risposta finisce in ``debug_path``. Il download si interrompe appena
+    supera ``MAX_FILE_SIZE_BYTES``, anche senza ``Content-Length``; il file di
+    destinazione viene sostituito solo a download completato.
+
+    Args:
+        output_path: file dell'XML (None = nessun file)
+        debug_path: file per le risposte non XML (None = nessun file)
+        not_xml_message: errore da stampare se la risposta non è XML
+        on_chunk: funzione chiamata con ogni blocco di una risposta XML
+        cancel: ``threading.Event``; se impostato il download si ferma al
+            blocco successivo, la risposta viene chiusa e il file parziale
+            rimosso
+
+    Returns:
+        str o None: SHA-256 dell'XML salvato; None se la risposta è troppo
+        grande o non è XML (l'errore è già stato stampato)
+
+    Raises:
+        requests.RequestException: connessione interrotta durante il download
+        FlowCancelled: download interrotto da ``cancel``
+    """
+    try:
+        content_length = response.headers.get("content-length")
+        if content_length and int(content_length) > MAX_FILE_SIZE_BYTES:
+            print(
+                f"❌ Errore: file troppo grande ({int(content_length) / 1024 / 1024:.1f}MB). Massimo consentito: {MAX_FILE_SIZE_MB}MB",
+                file=sys.stderr,
+            )
+            return None
+
+        chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+        if cancel is not None:
+            chunks = _cancellable(chunks, cancel)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= _SNIFF_BYTES:
+                break
+        is_xml = _looks_like_xml(head)
+
+        target = output_path if is_xml else debug_path
+        part_path = target + ".part" if target else None
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(part_path, "wb") if part_path else nullcontext() as f:
+                for chunk in itertools.chain((head,), chunks):
+                    size += len(chunk)
+                    if size > MAX_FILE_SIZE_BYTES:
+                        break
+                    hasher.update(chunk)
+                    if f is not None:
+                        f.write(chunk)
+                    if is_xml and on_chunk is not None and chunk:
+                        on_chunk(chunk)
+            if size > MAX_FILE_SIZE_BYTES:
+                if part_path:
+                    os.remove(part_path)
+                print(
+                    f"❌ Errore: file troppo grande (oltre {MAX_FILE_SIZE_MB}MB), download interrotto",
+                    file=sys.stderr,
+                )
+                return None
+            if part_path:
+                os.replace(part_path, target)
+        except BaseException:
+            if part_path and os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+    finally:
+        _close(response)
+
+    if not is_xml:
+        print(not_xml_message, file=sys.stderr)
+        if debug_path:
+            print(f"   Risposta salvata in: {debug_path}", file=sys.stderr)
+        return None
+    return hasher.hexdigest()
+
+
+def download_akoma_ntoso_via_opendata(
+    url, output_path, session=None, quiet=False, cache=None, context=None
+):
     """
     Tenta il download Akoma Ntoso via API OpenData (collezioni ZIP).
 
@@ -425,237 +837,468 @@ def download_akoma_ntoso_via_opendata(url, output_path, session=None, quiet=Fals
     Args:
         url: URL normattiva.it dell'atto
         output_path: percorso dove salvare il file XML
-        session: sessione requests da usare (opzionale)
+        session: NormattivaClient o sessione requests (default: client condiviso)
         quiet: se True, stampa solo errori
+        cache: XMLCache da consultare prima della ricerca OpenData (opzionale)
+        context: FetchContext con la pagina già caricata (opzionale)
 
     Returns:
         tuple: (success, metadata, session)
     """
-    if session is None:
-        session = requests.Session()
+    session = as_client(session)
+    success, metadata = run_sync(
+        opendata_flow(url, output_path, quiet=quiet, cache=cache, context=context),
+        session,
+    )
+    return success, metadata, session
 
-    headers = {
-        "User-Agent": f"Akoma2MD/{VERSION} (https://github.com/ondata/akoma2md)",
-        "Accept": "application/json",
-        "Accept-Language": "it-IT,it;q=0.9,en;q=0.8",
-    }
 
+def download_akoma_ntoso_via_opendata_batch(
+    items, session=None, quiet=False, cache=None
+):
+    """
+    Scarica via API OpenData più atti con una sola ricerca asincrona per
+    finestra di pubblicazione (vedi ``opendata_batch_flow``).
+
+    Args:
+        items: coppie (URL normattiva.it, percorso del file XML)
+        session: NormattivaClient o sessione requests (default: client condiviso)
+        quiet: se True, stampa solo errori
+        cache: XMLCache da consultare prima della ricerca (opzionale)
+
+    Returns:
+        dict: URL -> metadata dell'atto scaricato, oppure None
+    """
+    return run_sync(
+        opendata_batch_flow(items, quiet=quiet, cache=cache), as_client(session)
+    )
+
+
+def opendata_flow(url, output_path, quiet=False, cache=None, context=None, cancel=None):
+    """
+    Flusso di ``download_akoma_ntoso_via_opendata`` (vedi ``run_sync``);
+    ``cancel`` interrompe anche il download dello ZIP della collezione.
+
+    Returns:
+        tuple: (success, metadata)
+    """
     if not quiet:
         print("🔄 Tentativo download via API OpenData...", file=sys.stderr)
 
+    export_meta = yield from _opendata_page_flow(url, context)
+    if export_meta is None:
+        return False, None
+
+    # La ricerca asincrona OpenData è lenta: prima si guarda in cache
+    metadata = _opendata_from_cache(url, export_meta, output_path, cache, quiet)
+    if metadata is not None:
+        return True, metadata
+
+    return (
+        yield from _opendata_single_flow(
+            url, export_meta, output_path, quiet, cache, cancel=cancel
+        )
+    )
+
+
+def opendata_batch_flow(items, quiet=False, cache=None):
+    """
+    Flusso di ``download_akoma_ntoso_via_opendata_batch`` (vedi ``run_sync``).
+
+    Gli atti non in cache vengono raggruppati per data di pubblicazione in
+    finestre di al massimo ``OPENDATA_BATCH_MAX_DAYS`` giorni: per ogni
+    finestra una sola ricerca asincrona produce uno ZIP da cui si estraggono
+    tutti gli atti richiesti. Gli atti che non compaiono nello ZIP vengono
+    cercati singolarmente. Ogni ricerca ha a disposizione
+    ``OPENDATA_DEADLINE`` secondi, contati dal suo avvio.
+
+    Returns:
+        dict: URL -> metadata dell'atto scaricato, oppure None
+    """
+    results = {}
+    pending = []
+    for url, output_path in items:
+        export_meta = yield from _opendata_page_flow(url)
+        if export_meta is None:
+            results[url] = None
+            continue
+        metadata = _opendata_from_cache(url, export_meta, output_path, cache, quiet)
+        if metadata is not None:
+            results[url] = metadata
+        else:
+            pending.append((url, output_path, export_meta))
+
+    for window in _publication_windows(pending):
+        first = window[0][2]["dataGU_human"]
+        last = window[-1][2]["dataGU_human"]
+        if not quiet:
+            print(
+                f"🔄 Ricerca OpenData di {len(window)} atti pubblicati dal {first} al {last}...",
+                file=sys.stderr,
+            )
+        payload = _opendata_payload(
+            {
+                "dataInizioPubblicazione": f"{first}T00:00:00.000Z",
+                "dataFinePubblicazione": f"{last}T23:59:59.999Z",
+            }
+        )
+        deadline = time.monotonic() + OPENDATA_DEADLINE
+        collection = yield from _opendata_collection_flow(payload, deadline, quiet)
+
+        missing = window
+        if collection is not None:
+            missing = []
+            download_url, collection_file = collection
+            try:
+                with collection_file, zipfile.ZipFile(collection_file) as zf:
+                    for url, output_path, export_meta in window:
+                        if _extract_from_collection(
+                            zf, export_meta, output_path, cache, download_url
+                        ):
+                            results[url] = _opendata_metadata(
+                                url, export_meta, download_url
+                            )
+                        else:
+                            missing.append((url, output_path, export_meta))
+            except zipfile.BadZipFile:
+                print("⚠️  ZIP OpenData non valido", file=sys.stderr)
+                missing = window
+
+        for url, output_path, export_meta in missing:
+            success, metadata = yield from _opendata_single_flow(
+                url, export_meta, output_path, quiet, cache
+            )
+            results[url] = metadata if success else None
+
+    return results
+
+
+def _opendata_page_flow(url, context=None):
+    """Parametri di export dalla pagina dell'atto, oppure None."""
     try:
-        response = session.get(
-            url, headers={**headers, "Accept": "text/html"}, timeout=DEFAULT_TIMEOUT
+        html = yield from _page_flow(
+            url, {**OPENDATA_HEADERS, "Accept": "text/html"}, context
         )
-        response.raise_for_status()
     except requests.RequestException as e:
         print(f"Errore nel caricamento della pagina: {e}", file=sys.stderr)
-        return False, None, session
+        return None
 
-    export_meta = _extract_export_metadata(response.text)
+    export_meta = _page_export_metadata(url, html, context)
     if not export_meta:
         print(
             "❌ ERRORE: impossibile estrarre i parametri dalla pagina per l'API OpenData.",
             file=sys.stderr,
         )
-        return False, None, session
-
-    anno, numero = extract_law_params_from_url(url)
-    if not anno or not numero:
-        print(
-            "❌ ERRORE: impossibile estrarre anno/numero provvedimento dall'URL.",
-            file=sys.stderr,
-        )
-        return False, None, session
+    return export_meta
 
-    base_url = "https://api.normattiva.it/t/normattiva.api/bff-opendata/v1"
-    nuova_ricerca_url = f"{base_url}/api/v1/ricerca-asincrona/nuova-ricerca"
 
-    payload = {
-        "formato": "AKN",
-        "richiestaExport": "M",
-        "modalita": "C",
-        "tipoRicerca": "A",
-        "parametriRicerca": {
-            "dataInizioPubblicazione": f"{export_meta['dataGU_human']}T00:00:00.000Z",
-            "dataFinePubblicazione": f"{export_meta['dataGU_human']}T23:59:59.999Z",
-            "numeroProvvedimento": int(numero),
-            "annoProvvedimento": int(anno),
-        },
+def _opendata_metadata(url, export_meta, url_xml):
+    return {
+        "dataGU": export_meta["dataGU"],
+        "codiceRedaz": export_meta["codiceRedaz"],
+        "dataVigenza": export_meta["dataVigenza"],
+        "url": url,
+        "url_xml": url_xml,
     }
 
-    relaxed_payload = {
+
+def _opendata_from_cache(url, export_meta, output_path, cache, quiet):
+    """Metadata dell'atto se era in cache (e copiato in ``output_path``), altrimenti None."""
+    if not load_cached_xml(cache, export_meta, output_path, quiet=quiet):
+        return None
+    cached_entry = cache.entry(export_meta) or {}
+    return _opendata_metadata(url, export_meta, cached_entry.get("url_xml"))
+
+
+def _opendata_payload(parametri_ricerca):
+    return {
         "formato": "AKN",
         "richiestaExport": "M",
         "modalita": "C",
         "tipoRicerca": "A",
-        "parametriRicerca": {
-            "numeroProvvedimento": int(numero),
-            "annoProvvedimento": int(anno),
-        },
+        "parametriRicerca": parametri_ricerca,
     }
 
-    def _run_async_search(search_payload):
-        try:
-            ricerca_response = session.post(
-                nuova_ricerca_url,
-                headers={**headers, "Content-Type": "application/json"},
-                data=json.dumps(search_payload),
-                timeout=DEFAULT_TIMEOUT,
-            )
-            ricerca_response.raise_for_status()
-        except requests.RequestException as e:
-            print(f"❌ Errore avvio ricerca OpenData: {e}", file=sys.stderr)
-            return None, None, None
-
-        token = ricerca_response.text.strip().strip('"')
-        if not token:
-            print("❌ ERRORE: token ricerca OpenData non valido.", file=sys.stderr)
-            return None, None, None
-
-        # Conferma ricerca (opzionale)
-        conferma_url = f"{base_url}/api/v1/ricerca-asincrona/conferma-ricerca"
+
+def _publication_windows(pending):
+    """Raggruppa gli atti in finestre di pubblicazione di al massimo OPENDATA_BATCH_MAX_DAYS."""
+    windows = []
+    for item in sorted(pending, key=lambda item: item[2]["dataGU"]):
+        published = _parse_yyyymmdd(item[2]["dataGU"])
+        if windows:
+            start = _parse_yyyymmdd(windows[-1][0][2]["dataGU"])
+            if published and start and (published - start).days < OPENDATA_BATCH_MAX_DAYS:
+                windows[-1].append(item)
+                continue
+        windows.append([item])
+    return windows
+
+
+def _poll_delays(deadline):
+    """
+    Attese tra i controlli di stato della ricerca: brevi all'inizio, poi
+    raddoppiate fino a ``OPENDATA_POLL_MAX``, senza superare ``deadline``
+    (``time.monotonic``).
+    """
+    delay = OPENDATA_POLL_INITIAL
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        yield min(delay, remaining)
+        delay = min(delay * 2, OPENDATA_POLL_MAX)
+
+
+def _opendata_search_flow(search_payload, deadline, quiet):
+    """
+    Avvia una ricerca asincrona OpenData e ne attende il completamento.
+
+    Returns:
+        tuple: (stato, dati dell'ultimo controllo, token)
+    """
+    try:
+        ricerca_response = yield Request(
+            "POST",
+            f"{OPENDATA_BASE_URL}/api/v1/ricerca-asincrona/nuova-ricerca",
+            headers={**OPENDATA_HEADERS, "Content-Type": "application/json"},
+            data=json.dumps(search_payload),
+        )
+        ricerca_response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"❌ Errore avvio ricerca OpenData: {e}", file=sys.stderr)
+        return None, None, None
+
+    token = ricerca_response.text.strip().strip('"')
+    if not token:
+        print("❌ ERRORE: token ricerca OpenData non valido.", file=sys.stderr)
+        return None, None, None
+
+    # Conferma ricerca (opzionale)
+    try:
+        yield Request(
+            "PUT",
+            f"{OPENDATA_BASE_URL}/api/v1/ricerca-asincrona/conferma-ricerca",
+            headers={**OPENDATA_HEADERS, "Content-Type": "application/json"},
+            data=json.dumps({"token": token}),
+        )
+    except requests.RequestException:
+        pass
+
+    status_url = f"{OPENDATA_BASE_URL}/api/v1/ricerca-asincrona/check-status/{token}"
+    stato = None
+    status_data = None
+
+    if not quiet:
+        print(
+            "⏳ Preparazione collezione OpenData",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+    delays = _poll_delays(deadline)
+    while True:
         try:
-            session.put(
-                conferma_url,
-                headers={**headers, "Content-Type": "application/json"},
-                data=json.dumps({"token": token}),
-                timeout=DEFAULT_TIMEOUT,
-            )
+            status_response = yield Request("GET", status_url, headers=OPENDATA_HEADERS)
+            if status_response.status_code == 303:
+                stato = 3
+                break
+            status_response.raise_for_status()
+            status_data = status_response.json()
+            stato = status_data.get("stato")
+            if stato == 3:
+                break
         except requests.RequestException:
             pass
 
-        status_url = f"{base_url}/api/v1/ricerca-asincrona/check-status/{token}"
-        stato = None
-        status_data = None
-
+        delay = next(delays, None)
+        if delay is None:
+            break
         if not quiet:
-            print(
-                "⏳ Preparazione collezione OpenData",
-                end="",
-                file=sys.stderr,
-                flush=True,
-            )
+            print(".", end="", file=sys.stderr, flush=True)
+        yield Sleep(delay)
 
-        for _ in range(60):
-            try:
-                status_response = session.get(
-                    status_url, headers=headers, timeout=DEFAULT_TIMEOUT
-                )
-                if status_response.status_code == 303:
-                    stato = 3
-                    break
-                status_response.raise_for_status()
-                status_data = status_response.json()
-                stato = status_data.get("stato")
-                if stato == 3:
-                    break
-            except requests.RequestException:
-                pass
+    if not quiet:
+        print()  # New line after progress dots
 
-            if not quiet:
-                print(".", end="", file=sys.stderr, flush=True)
-            time.sleep(2)
+    return stato, status_data, token
+
+
+def _opendata_collection_flow(search_payload, deadline, quiet, cancel=None):
+    """
+    Ricerca asincrona e download della collezione ZIP risultante.
+
+    Lo ZIP viene scritto a blocchi in un file temporaneo, entro
+    ``OPENDATA_MAX_COLLECTION_BYTES``; il file viene eliminato alla chiusura.
+
+    Returns:
+        tuple o None: (URL di download, file temporaneo dello ZIP); None se
+        la ricerca non è completata, non ha risultati o il download fallisce
+    """
+    stato, status_data, token = yield from _opendata_search_flow(
+        search_payload, deadline, quiet
+    )
+    if stato != 3:
+        if not quiet:
+            print("⚠️  Ricerca OpenData non completata in tempo utile", file=sys.stderr)
+        return None
+    if status_data and status_data.get("totAtti") == 0:
+        if not quiet:
+            print("⚠️  Ricerca OpenData senza risultati", file=sys.stderr)
+        return None
 
+    download_url = (
+        f"{OPENDATA_BASE_URL}/api/v1/collections/download/collection-asincrona/{token}"
+    )
+    collection_file = tempfile.TemporaryFile(prefix="normattiva-opendata-")
+    try:
+        download_response = yield Request(
+            "GET",
+            download_url,
+            headers=OPENDATA_HEADERS,
+            stream=True,
+            max_bytes=OPENDATA_MAX_COLLECTION_BYTES,
+        )
+        _raise_for_status(download_response)
+        complete = _download_to_file(
+            download_response, collection_file, OPENDATA_MAX_COLLECTION_BYTES, cancel
+        )
+    except requests.RequestException as e:
+        collection_file.close()
         if not quiet:
-            print()  # New line after progress dots
+            print(f"⚠️  Errore download collezione OpenData: {e}", file=sys.stderr)
+        return None
+    except BaseException:
+        collection_file.close()
+        raise
+    if not complete:
+        collection_file.close()
+        print(
+            f"⚠️  Collezione OpenData troppo grande (oltre {OPENDATA_MAX_COLLECTION_MB}MB), download interrotto",
+            file=sys.stderr,
+        )
+        return None
+    collection_file.seek(0)
+    return download_url, collection_file
 
-        return stato, status_data, token
 
-    payloads = [payload, relaxed_payload]
-    download_url = None
-    selected = None
+def _extract_from_collection(zf, export_meta, output_path, cache, download_url):
+    """
+    Copia in ``output_path`` l'XML dell'atto ``export_meta`` presente nello ZIP.
 
-    for idx, current_payload in enumerate(payloads):
-        stato, status_data, token = _run_async_search(current_payload)
-        if stato != 3:
-            if idx == 0:
-                continue
-            print(
-                "❌ ERRORE: ricerca OpenData non completata in tempo utile.",
-                file=sys.stderr,
-            )
-            return False, None, session
-
-        if status_data and status_data.get("totAtti") == 0:
-            if idx == 0:
-                if not quiet:
-                    print(
-                        "⚠️  Ricerca OpenData senza risultati, ritento senza filtro data...",
-                        file=sys.stderr,
-                    )
-                continue
-            print(
-                "❌ ERRORE: ricerca OpenData non ha restituito risultati.",
-                file=sys.stderr,
-            )
-            return False, None, session
+    In una collezione con più atti vengono considerati solo i file con il
+    codice redazionale dell'atto. Il file viene copiato a blocchi solo se non
+    supera ``MAX_FILE_SIZE_BYTES`` e i primi byte sono XML.
+
+    Returns:
+        bool: True se l'XML dell'atto è stato estratto
+    """
+    target_date = _parse_yyyymmdd(export_meta.get("dataVigenza"))
+    selected = _select_akoma_file_from_zip(
+        zf, target_date, codice_redaz=export_meta["codiceRedaz"]
+    )
+    if not selected:
+        return False
+    too_big = f"⚠️  {selected}: file troppo grande nello ZIP OpenData (oltre {MAX_FILE_SIZE_MB}MB)"
+    if zf.getinfo(selected).file_size > MAX_FILE_SIZE_BYTES:
+        print(too_big, file=sys.stderr)
+        return False
 
-        download_url = (
-            f"{base_url}/api/v1/collections/download/collection-asincrona/{token}"
+    part_path = output_path + ".part"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with zf.open(selected) as src:
+            head = src.read(_SNIFF_BYTES)
+            if not _looks_like_xml(head):
+                print(
+                    f"⚠️  {selected}: il file nello ZIP OpenData non è XML",
+                    file=sys.stderr,
+                )
+                return False
+            chunks = iter(lambda: src.read(DOWNLOAD_CHUNK_SIZE), b"")
+            with open(part_path, "wb") as dst:
+                for chunk in itertools.chain((head,), chunks):
+                    size += len(chunk)
+                    if size > MAX_FILE_SIZE_BYTES:
+                        break
+                    hasher.update(chunk)
+                    dst.write(chunk)
+        if size > MAX_FILE_SIZE_BYTES:
+            os.remove(part_path)
+            print(too_big, file=sys.stderr)
+            return False
+        os.replace(part_path, output_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    if cache is not None:
+        cache.put_file(
+            export_meta, output_path, url_xml=download_url, sha256=hasher.hexdigest()
         )
+    return True
 
-        try:
-            download_response = session.get(
-                download_url, headers=headers, timeout=DEFAULT_TIMEOUT
-            )
-            download_response.raise_for_status()
-        except requests.RequestException as e:
-            if idx == 0:
-                if not quiet:
-                    print(
-                        "⚠️  Errore download collezione OpenData, ritento senza filtro data...",
-                        file=sys.stderr,
-                    )
-                continue
-            print(f"❌ Errore download collezione OpenData: {e}", file=sys.stderr)
-            return False, None, session
 
+def _opendata_single_flow(url, export_meta, output_path, quiet, cache, cancel=None):
+    """
+    Ricerca OpenData di un solo atto: prima per data di pubblicazione, anno e
+    numero, poi (se non trova nulla) solo per anno e numero. Le due ricerche
+    condividono ``OPENDATA_DEADLINE`` secondi, contati da questa chiamata.
+
+    Returns:
+        tuple: (success, metadata)
+    """
+    anno, numero = extract_law_params_from_url(url)
+    if not anno or not numero:
+        print(
+            "❌ ERRORE: impossibile estrarre anno/numero provvedimento dall'URL.",
+            file=sys.stderr,
+        )
+        return False, None
+
+    deadline = time.monotonic() + OPENDATA_DEADLINE
+    law = {"numeroProvvedimento": int(numero), "annoProvvedimento": int(anno)}
+    payloads = [
+        _opendata_payload(
+            {
+                "dataInizioPubblicazione": f"{export_meta['dataGU_human']}T00:00:00.000Z",
+                "dataFinePubblicazione": f"{export_meta['dataGU_human']}T23:59:59.999Z",
+                **law,
+            }
+        ),
+        _opendata_payload(law),
+    ]
+
+    for idx, payload in enumerate(payloads):
+        if idx and not quiet:
+            print("⚠️  Ritento la ricerca OpenData senza filtro data...", file=sys.stderr)
+        collection = yield from _opendata_collection_flow(
+            payload, deadline, quiet, cancel=cancel
+        )
+        if collection is None:
+            continue
+        download_url, collection_file = collection
         try:
-            with zipfile.ZipFile(BytesIO(download_response.content)) as zf:
-                target_date = _parse_yyyymmdd(export_meta.get("dataVigenza"))
-                selected = _select_akoma_file_from_zip(zf, target_date)
-                if not selected:
-                    if idx == 0:
-                        if not quiet:
-                            print(
-                                "⚠️  ZIP OpenData senza XML AKN, ritento senza filtro data...",
-                                file=sys.stderr,
-                            )
-                        continue
-                    print(
-                        "❌ ERRORE: nessun XML Akoma Ntoso trovato nel pacchetto OpenData.",
-                        file=sys.stderr,
-                    )
-                    return False, None, session
-                with zf.open(selected) as src, open(output_path, "wb") as dst:
-                    dst.write(src.read())
-            break
+            with collection_file, zipfile.ZipFile(collection_file) as zf:
+                found = _extract_from_collection(
+                    zf, export_meta, output_path, cache, download_url
+                )
         except zipfile.BadZipFile:
-            if idx == 0:
-                if not quiet:
-                    print(
-                        "⚠️  ZIP OpenData non valido, ritento senza filtro data...",
-                        file=sys.stderr,
-                    )
-                continue
-            print("❌ ERRORE: file ZIP OpenData non valido.", file=sys.stderr)
-            return False, None, session
-
-    if not selected:
-        return False, None, session
+            if not quiet:
+                print("⚠️  ZIP OpenData non valido", file=sys.stderr)
+            continue
+        if not found:
+            if not quiet:
+                print("⚠️  ZIP OpenData senza XML AKN dell'atto", file=sys.stderr)
+            continue
 
-    if not quiet:
-        print(f"✅ File XML (OpenData) salvato in: {output_path}", file=sys.stderr)
+        if not quiet:
+            print(f"✅ File XML (OpenData) salvato in: {output_path}", file=sys.stderr)
+        return True, _opendata_metadata(url, export_meta, download_url)
 
-    metadata = {
-        "dataGU": export_meta["dataGU"],
-        "codiceRedaz": export_meta["codiceRedaz"],
-        "dataVigenza": export_meta["dataVigenza"],
-        "url": url,
-        "url_xml": download_url,
-    }
-    return True, metadata, session
+    print("❌ ERRORE: download via API OpenData non riuscito.", file=sys.stderr)
+    return False, None
 
 
 def _extract_export_metadata(html):
@@ -730,11 +1373,13 @@ def _build_export_payload(html):
     return payload
 
 
-def _select_akoma_file_from_zip(zf, target_date):
+def _select_akoma_file_from_zip(zf, target_date, codice_redaz=None):
     candidates = []
     originals = []
     for name in zf.namelist():
         lower = name.lower()
+        if codice_redaz and f"_{codice_redaz.lower()}_" not in os.path.basename(lower):
+            continue
         if not lower.endswith(".xml"):
             continue
         if "vigenza_" in lower:
@@ -0,0 +1,186 @@
+"""
+Rendering parallelo del corpo di documenti molto grandi.
+
+Gli elementi figli di ``<body>`` (capi, articoli, parti) si convertono in modo
+indipendente una volta noti i riferimenti incrociati: vengono divisi in
+blocchi contigui e convertiti in un ``ProcessPoolExecutor``. I risultati
+tornano nell'ordine del documento, quindi l'output è identico a quello
+sequenziale.
+
+Dove il sistema supporta ``fork`` i worker ereditano l'albero già analizzato e
+ricevono solo gli intervalli di indici da convertire; altrimenti ogni blocco
+viene serializzato e rianalizzato nel worker.
+"""
+
+import multiprocessing
+import os
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from .constants import AKN_NAMESPACE
+from .markdown_converter import process_body_element
+from .xml_backend import backend_for
+
+# Con chunk_size non indicato, blocchi per worker (bilanciati per numero di nodi)
+CHUNKS_PER_WORKER = 4
+
+# Sotto questa soglia di nodi nel corpo il costo dei processi supera il guadagno
+MIN_PARALLEL_NODES = 2000
+
+_CHUNK_OPEN = b"<chunk>"
+_CHUNK_CLOSE = b"</chunk>"
+
+# Stato del processo worker, impostato una sola volta da _init_worker
+_worker_ns = AKN_NAMESPACE
+_worker_cross_references = None
+
+# Elementi del corpo ereditati dai worker creati con fork
+_shared_elements = None
+_shared_lock = threading.Lock()
+
+
+def resolve_workers(workers):
+    """
+    Normalizza il numero di worker richiesto.
+
+    ``None`` o 1 significano rendering sequenziale; 0 usa tutte le CPU.
+
+    Raises:
+        ValueError: numero di worker negativo
+    """
+    if workers is None:
+        return 1
+    if workers < 0:
+        raise ValueError(f"Numero di worker non valido: {workers}")
+    if workers == 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def split_body(elements, workers, chunk_size=None):
+    """
+    Divide gli elementi del corpo in blocchi contigui.
+
+    Args:
+        elements: figli di ``<body>`` nell'ordine del documento
+        workers: numero di processi
+        chunk_size: elementi per blocco; se None i blocchi sono
+            ``workers * CHUNKS_PER_WORKER`` bilanciati per numero di nodi
+
+    Returns:
+        list: liste di elementi, nell'ordine del documento
+    """
+    if not elements:
+        return []
+    if chunk_size:
+        return [
+            elements[start : start + chunk_size]
+            for start in range(0, len(elements), chunk_size)
+        ]
+
+    weights = [sum(1 for _ in element.iter()) for element in elements]
+    target = sum(weights) / (workers * CHUNKS_PER_WORKER)
+    chunks = []
+    current = []
+    current_weight = 0
+    for element, weight in zip(elements, weights):
+        current.append(element)
+        current_weight += weight
+        if current_weight >= target:
+            chunks.append(current)
+            current = []
+            current_weight = 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def serialize_chunk(elements):
+    """Serializza un blocco di elementi in un unico documento ``<chunk>``."""
+    serialize = backend_for(elements[0]).serialize
+    return _CHUNK_OPEN + b"".join(serialize(element) for element in elements) + _CHUNK_CLOSE
+
+
+def _fork_context():
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def _init_worker(ns, cross_references):
+    global _worker_ns, _worker_cross_references
+    _worker_ns = ns
+    _worker_cross_references = cross_references
+
+
+def render_chunk(data, ns=None, cross_references=None):
+    """Converte un blocco serializzato e restituisce il Markdown del blocco."""
+    if ns is None:
+        ns = _worker_ns
+        cross_references = _worker_cross_references
+    fragments = []
+    for element in ET.fromstring(data):
+        fragments.extend(process_body_element(element, ns, cross_references))
+    return "".join(fragments)
+
+
+def _render_range(bounds):
+    start, end = bounds
+    fragments = []
+    for element in _shared_elements[start:end]:
+        fragments.extend(
+            process_body_element(element, _worker_ns, _worker_cross_references)
+        )
+    return "".join(fragments)
+
+
+def iter_body_fragments_parallel(
+    root, ns=AKN_NAMESPACE, cross_references=None, workers=None, chunk_size=None
+):
+    """
+    Genera il Markdown del corpo convertendo i blocchi in processi separati.
+
+    Con un solo worker, o con un corpo troppo piccolo, il rendering resta
+    sequenziale nel processo corrente. I blocchi vengono restituiti nell'ordine
+    del documento appena disponibili.
+    """
+    body = root.find(".//akn:body", ns)
+    if body is None:
+        return
+
+    workers = resolve_workers(workers)
+    elements = list(body)
+    small = chunk_size is None and sum(1 for _ in body.iter()) < MIN_PARALLEL_NODES
+    chunks = split_body(elements, workers, chunk_size) if workers > 1 and not small else []
+    if len(chunks) < 2:
+        for element in elements:
+            yield from process_body_element(element, ns, cross_references)
+        return
+
+    global _shared_elements
+    context = _fork_context()
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(ns, cross_references),
+    )
+    with executor:
+        if context is None:
+            results = executor.map(render_chunk, map(serialize_chunk, chunks))
+        else:
+            bounds = []
+            start = 0
+            for chunk in chunks:
+                bounds.append((start, start + len(chunk)))
+                start += len(chunk)
+            # I worker vengono creati (fork) durante map(): da lì in poi
+            # hanno la propria copia degli elementi
+            with _shared_lock:
+                _shared_elements = elements
+                try:
+                    results = executor.map(_render_range, bounds)
+                finally:
+                    _shared_elements = None
+        yield from results
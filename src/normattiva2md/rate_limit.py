@@ -0,0 +1,199 @@
+"""
+Limite di frequenza delle richieste verso ciascun host (token bucket).
+
+Ogni host ha un secchio di ``burst`` gettoni che si ricarica a ``rate``
+gettoni al secondo: le richieste consumano un gettone e, a secchio vuoto,
+attendono solo il tempo necessario. Così una serie di download procede alla
+massima velocità cortese invece di una pausa fissa dopo ogni richiesta.
+
+Con ``state_dir`` lo stato dei secchi è in un file per host protetto da
+``fcntl.flock``, condiviso da tutti i processi che usano la stessa directory
+(dove ``fcntl`` non c'è, ogni processo ha il proprio secchio).
+
+Un ``Retry-After`` del server (429/503) sospende l'host per il tempo
+indicato, per tutti gli utenti del limitatore.
+"""
+
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: limite solo all'interno del processo
+    fcntl = None
+
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+RETRY_AFTER_STATUSES = (429, 503)
+
+
+def parse_retry_after(value, now=None):
+    """
+    Secondi di attesa indicati da un header ``Retry-After``.
+
+    Accetta sia il numero di secondi sia una data HTTP; None se assente o non
+    valido.
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+class RateLimiter:
+    """
+    Token bucket per host, opzionalmente condiviso tra processi.
+
+    Args:
+        rate: richieste al secondo consentite per host
+        burst: richieste consecutive consentite senza attesa
+        state_dir: directory dei file di stato condivisi tra processi
+            (None = solo in questo processo)
+
+    Attributes:
+        waits, waited: attese imposte e secondi totali di attesa
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, state_dir=None):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate deve essere > 0 e burst >= 1")
+        self.rate = float(rate)
+        self.burst = burst
+        self.state_dir = state_dir if fcntl is not None else None
+        self.waits = 0
+        self.waited = 0.0
+        self._buckets = {}
+        self._lock = threading.Lock()
+        if self.state_dir is not None:
+            os.makedirs(self.state_dir, exist_ok=True)
+
+    # Stato di un secchio: gettoni, ultimo aggiornamento, sospensione
+
+    def _new_state(self, now):
+        return {"tokens": float(self.burst), "updated": now, "blocked_until": 0.0}
+
+    def _update(self, host, change):
+        """Applica ``change(state, now)`` allo stato di ``host`` e ne restituisce il valore."""
+        with self._lock:
+            now = time.time()
+            if self.state_dir is None:
+                state = self._buckets.setdefault(host, self._new_state(now))
+                return change(state, now)
+            path = os.path.join(self.state_dir, f"{host.replace(':', '_')}.bucket")
+            with open(path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read())
+                    except ValueError:
+                        state = self._new_state(now)
+                    result = change(state, now)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            return result
+
+    def reserve(self, url):
+        """
+        Prenota una richiesta verso l'host di ``url``.
+
+        Returns:
+            float: secondi da attendere prima di inviarla
+        """
+
+        def take(state, now):
+            elapsed = max(0.0, now - state["updated"])
+            state["tokens"] = min(self.burst, state["tokens"] + elapsed * self.rate)
+            state["updated"] = now
+            state["tokens"] -= 1
+            # Gettoni negativi = richieste già prenotate in attesa
+            delay = max(0.0, -state["tokens"] / self.rate)
+            return max(delay, state["blocked_until"] - now)
+
+        delay = self._update(urlparse(url).netloc, take)
+        if delay > 0:
+            with self._lock:
+                self.waits += 1
+                self.waited += delay
+        return delay
+
+    def wait(self, url):
+        """Attende (bloccando) il proprio turno per una richiesta a ``url``."""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def defer(self, url, seconds):
+        """Sospende le richieste all'host di ``url`` per ``seconds`` secondi."""
+
+        def block(state, now):
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+
+        self._update(urlparse(url).netloc, block)
+
+    def observe(self, url, response):
+        """Applica l'eventuale ``Retry-After`` di una risposta 429/503."""
+        if getattr(response, "status_code", None) not in RETRY_AFTER_STATUSES:
+            return None
+        headers = getattr(response, "headers", None) or {}
+        seconds = parse_retry_after(headers.get("Retry-After"))
+        if seconds:
+            self.defer(url, seconds)
+        return seconds
+
+    def stats(self):
+        """Configurazione e attese accumulate."""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "shared": self.state_dir is not None,
+                "waits": self.waits,
+                "waited": self.waited,
+            }
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_default_rate_limiter():
+    """Limitatore condiviso dal processo (creato al primo uso)."""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
+
+
+def configure_default_rate_limiter(
+    rate=DEFAULT_RATE, burst=DEFAULT_BURST, state_dir=None
+):
+    """
+    Sostituisce il limitatore condiviso (usato dai client creati senza un
+    limitatore esplicito, compreso quello di default).
+
+    Returns:
+        RateLimiter
+    """
+    global _default_limiter
+    with _default_lock:
+        _default_limiter = RateLimiter(rate, burst, state_dir=state_dir)
+        return _default_limiter
@@ -0,0 +1,216 @@
+"""
+Cache della risoluzione URL normattiva -> parametri di download.
+
+Per scaricare un atto servono ``dataGU``, ``codiceRedaz`` e ``dataVigenza``,
+che ``extract_params_from_normattiva_url`` ricava dalla pagina HTML. Per un
+dato URN i primi due non cambiano mai e vengono conservati senza scadenza; la
+data di vigenza può cambiare con un nuovo testo consolidato e resta valida per
+``ttl`` secondi. Gli URL con data di vigenza esplicita
+(``!vig=AAAA-MM-GG``) non scadono; ``!vig=`` senza data (versione vigente
+oggi) scade come gli altri.
+
+Scaduto il TTL, la pagina viene richiesta in modo condizionale
+(``If-None-Match``/``If-Modified-Since``): un 304, o una pagina con lo stesso
+hash se il server non invia validatori, conferma la voce senza estrarre di
+nuovo i parametri.
+
+La cache vive in memoria e, se si indica ``path``, viene persistita in SQLite.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from .normattiva_api import _VIGENZA_PATTERN
+
+# Validità della data di vigenza risolta (secondi)
+DEFAULT_VIGENZA_TTL = 24 * 3600
+RESOLUTION_DB_NAME = "resolutions.sqlite"
+
+# Colonna SQLite, tipo, chiave della voce in memoria
+_COLUMNS = (
+    ("data_gu", "TEXT NOT NULL", "dataGU"),
+    ("codice_redaz", "TEXT NOT NULL", "codiceRedaz"),
+    ("data_vigenza", "TEXT NOT NULL", "dataVigenza"),
+    ("resolved_at", "REAL NOT NULL", "resolved_at"),
+    ("etag", "TEXT", "etag"),
+    ("last_modified", "TEXT", "last_modified"),
+    ("page_sha256", "TEXT", "page_sha256"),
+)
+_FIELDS = tuple(field for _, _, field in _COLUMNS)
+_COLUMN_NAMES = ", ".join(name for name, _, _ in _COLUMNS)
+_PARAM_KEYS = ("dataGU", "codiceRedaz", "dataVigenza")
+
+
+class ResolutionCache:
+    """
+    Cache URL -> ``{dataGU, codiceRedaz, dataVigenza}``.
+
+    Ogni voce conserva anche i validatori HTTP della pagina (``etag``,
+    ``last_modified``) e l'hash del suo contenuto, per rivalidarla a scadenza
+    del TTL senza ripetere l'estrazione.
+
+    Args:
+        path: file SQLite per la persistenza (None = solo memoria)
+        ttl: validità in secondi della data di vigenza
+
+    Attributes:
+        hits, stale, misses: contatori delle letture in questo processo
+        revalidated, redownloaded: pagine scadute confermate invariate
+            (304 o stesso hash) oppure cambiate
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_VIGENZA_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.redownloaded = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._create_table()
+            for row in self._db.execute(f"SELECT url, {_COLUMN_NAMES} FROM resolutions"):
+                self._entries[row[0]] = dict(zip(_FIELDS, row[1:]))
+
+    def _create_table(self):
+        columns = ", ".join(f"{name} {kind}" for name, kind, _ in _COLUMNS)
+        with self._db:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS resolutions (url TEXT PRIMARY KEY, {columns})"
+            )
+            # Database creati prima dell'aggiunta dei validatori
+            existing = {row[1] for row in self._db.execute("PRAGMA table_info(resolutions)")}
+            for name, kind, _ in _COLUMNS:
+                if name not in existing:
+                    self._db.execute(f"ALTER TABLE resolutions ADD COLUMN {name} {kind}")
+
+    def _store(self, url, entry):
+        self._entries[url] = entry
+        if self._db is not None:
+            placeholders = ", ".join("?" for _ in _COLUMNS)
+            with self._db:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO resolutions (url, {_COLUMN_NAMES}) "
+                    f"VALUES (?, {placeholders})",
+                    (url, *(entry[field] for field in _FIELDS)),
+                )
+
+    def _is_fresh(self, url, resolved_at):
+        # Solo una data esplicita: ``!vig=`` vuoto indica la versione vigente oggi
+        pinned = _VIGENZA_PATTERN.search(url) is not None
+        return pinned or time.time() - resolved_at < self.ttl
+
+    def get(self, url):
+        """
+        Parametri risolti per ``url`` se ancora validi, altrimenti None.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+            if not self._is_fresh(url, entry["resolved_at"]):
+                self.stale += 1
+                return None
+            self.hits += 1
+            return {key: entry[key] for key in _PARAM_KEYS}
+
+    def entry(self, url):
+        """Voce completa (parametri, validatori, hash della pagina) oppure None."""
+        with self._lock:
+            entry = self._entries.get(url)
+            return dict(entry) if entry else None
+
+    def get_immutable(self, url):
+        """``{dataGU, codiceRedaz}`` per ``url`` anche se la vigenza è scaduta, o None."""
+        entry = self.entry(url)
+        if entry is None:
+            return None
+        return {"dataGU": entry["dataGU"], "codiceRedaz": entry["codiceRedaz"]}
+
+    def put(self, url, params, validators=None, page_sha256=None):
+        """
+        Registra la risoluzione di ``url``.
+
+        Se ``url`` era già presente la pagina è cambiata e la voce conta tra
+        quelle riscaricate.
+        """
+        validators = validators or {}
+        entry = {key: params[key] for key in _PARAM_KEYS}
+        entry.update(
+            resolved_at=time.time(),
+            etag=validators.get("etag"),
+            last_modified=validators.get("last_modified"),
+            page_sha256=page_sha256,
+        )
+        with self._lock:
+            if url in self._entries:
+                self.redownloaded += 1
+            self._store(url, entry)
+
+    def touch(self, url):
+        """
+        Conferma come ancora valida la voce di ``url`` (pagina non modificata).
+
+        Returns:
+            dict: parametri della voce
+        """
+        with self._lock:
+            entry = dict(self._entries[url], resolved_at=time.time())
+            self._store(url, entry)
+            self.revalidated += 1
+            return {key: entry[key] for key in _PARAM_KEYS}
+
+    def stats(self):
+        """Voci e contatori di hit/scaduti/miss e rivalidazioni."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale": self.stale,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "redownloaded": self.redownloaded,
+                "ttl": self.ttl,
+                "path": self.path,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def open_resolution_cache(resolution_cache=None, xml_cache=None, ttl=DEFAULT_VIGENZA_TTL):
+    """
+    Normalizza l'opzione ``resolution_cache`` dell'API.
+
+    Args:
+        resolution_cache: ``ResolutionCache`` già creata, path del file SQLite,
+            False (disattivata) o None
+        xml_cache: ``XMLCache`` in uso; con ``resolution_cache=None`` le
+            risoluzioni vengono persistite nella sua directory
+        ttl: validità in secondi della data di vigenza (se la cache viene creata)
+
+    Returns:
+        ResolutionCache o None
+    """
+    if resolution_cache is False:
+        return None
+    if isinstance(resolution_cache, ResolutionCache):
+        return resolution_cache
+    if resolution_cache is not None:
+        return ResolutionCache(os.fspath(resolution_cache), ttl=ttl)
+    if xml_cache is not None:
+        return ResolutionCache(
+            os.path.join(xml_cache.cache_dir, RESOLUTION_DB_NAME), ttl=ttl
+        )
+    return None
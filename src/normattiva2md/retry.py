@@ -0,0 +1,232 @@
+"""
+Ritentativi con backoff esponenziale e circuit breaker per host.
+
+``RetryPolicy`` decide se e dopo quanto ripetere una richiesta fallita: solo
+metodi idempotenti (GET, HEAD, PUT...), solo errori di rete o risposte
+transitorie (429, 5xx), con attesa ``backoff * 2**n`` limitata a
+``max_backoff`` e distribuita a caso ("full jitter") per non sincronizzare
+i client.
+
+``CircuitBreaker`` conta i fallimenti consecutivi per host: oltre la soglia
+il circuito si apre e le richieste falliscono subito con
+``CircuitOpenError`` per ``reset_timeout`` secondi; poi una richiesta di
+prova decide se richiuderlo.
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET = 30.0
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Richiesta rifiutata senza inviarla: circuito aperto per l'host."""
+
+
+def is_server_failure(response):
+    """True per le risposte che indicano un problema del server (5xx)."""
+    status = getattr(response, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+class RetryPolicy:
+    """
+    Politica di ritentativo per le richieste HTTP.
+
+    Args:
+        max_retries: ritentativi dopo il primo tentativo (0 = nessuno)
+        backoff: attesa base in secondi
+        max_backoff: attesa massima in secondi
+        jitter: se False l'attesa è esattamente ``backoff * 2**n``
+
+    Attributes:
+        retries: ritentativi eseguiti
+        gave_up: richieste fallite anche dopo l'ultimo tentativo
+    """
+
+    def __init__(
+        self,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        max_backoff=DEFAULT_MAX_BACKOFF,
+        jitter=True,
+    ):
+        if max_retries < 0:
+            raise ValueError("max_retries deve essere >= 0")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retries = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def backoff_delay(self, attempt):
+        """Attesa prima del ritentativo numero ``attempt`` (da 1)."""
+        cap = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, cap) if self.jitter else cap
+
+    def next_delay(self, method, attempt, response=None, error=None):
+        """
+        Secondi di attesa prima di ripetere la richiesta, oppure None.
+
+        Args:
+            method: metodo HTTP della richiesta
+            attempt: tentativi già eseguiti (da 1)
+            response: risposta ricevuta (se non c'è stato un errore)
+            error: eccezione sollevata dal trasporto
+        """
+        if error is not None:
+            transient = isinstance(error, RETRY_ERRORS) and not isinstance(
+                error, CircuitOpenError
+            )
+        else:
+            transient = getattr(response, "status_code", None) in RETRY_STATUSES
+        if not transient:
+            return None
+        with self._lock:
+            if method.upper() not in IDEMPOTENT_METHODS or attempt > self.max_retries:
+                self.gave_up += 1
+                return None
+            self.retries += 1
+        return self.backoff_delay(attempt)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_retries": self.max_retries,
+                "retries": self.retries,
+                "gave_up": self.gave_up,
+            }
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per host.
+
+    Args:
+        failure_threshold: fallimenti consecutivi che aprono il circuito
+        reset_timeout: secondi prima di lasciar passare una richiesta di prova
+
+    Attributes:
+        opened: volte in cui un circuito si è aperto
+        rejected: richieste rifiutate a circuito aperto
+    """
+
+    def __init__(
+        self,
+        failure_threshold=DEFAULT_BREAKER_THRESHOLD,
+        reset_timeout=DEFAULT_BREAKER_RESET,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold deve essere >= 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.opened = 0
+        self.rejected = 0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        return self._hosts.setdefault(host, {"failures": 0, "opened_at": None})
+
+    def before_request(self, url):
+        """
+        Verifica che l'host di ``url`` sia raggiungibile.
+
+        Raises:
+            CircuitOpenError: circuito aperto e tempo di attesa non scaduto
+        """
+        with self._lock:
+            state = self._host(url)
+            if state["opened_at"] is None:
+                return
+            remaining = state["opened_at"] + self.reset_timeout - time.time()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    f"Circuito aperto per {urlparse(url).netloc}: "
+                    f"troppi errori consecutivi, nuovo tentativo tra {remaining:.0f}s"
+                )
+            # Mezzo aperto: passa questa richiesta, le altre attendono l'esito
+            state["opened_at"] = time.time()
+
+    def record(self, url, success):
+        """Registra l'esito di una richiesta all'host di ``url``."""
+        with self._lock:
+            state = self._host(url)
+            if success:
+                state["failures"] = 0
+                state["opened_at"] = None
+                return
+            state["failures"] += 1
+            if state["failures"] >= self.failure_threshold:
+                if state["opened_at"] is None:
+                    self.opened += 1
+                state["opened_at"] = time.time()
+
+    def state(self, url):
+        """"closed", "open" o "half-open" per l'host di ``url``."""
+        with self._lock:
+            opened_at = self._host(url)["opened_at"]
+            if opened_at is None:
+                return "closed"
+            if time.time() - opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return {
+                "failure_threshold": self.failure_threshold,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "open_hosts": sorted(
+                    host
+                    for host, state in self._hosts.items()
+                    if state["opened_at"] is not None
+                    and now - state["opened_at"] < self.reset_timeout
+                ),
+            }
+
+
+def as_retry_policy(retry):
+    """
+    Normalizza l'opzione ``retry``: None (default), False/0 (nessun
+    ritentativo), numero di ritentativi o ``RetryPolicy``.
+    """
+    if retry is None:
+        return RetryPolicy()
+    if retry is False:
+        return None
+    if isinstance(retry, RetryPolicy):
+        return retry
+    return RetryPolicy(max_retries=int(retry)) if retry else None
+
+
+def as_circuit_breaker(breaker):
+    """
+    Normalizza l'opzione ``circuit_breaker``: None (default), False/0
+    (disattivato), soglia di fallimenti o ``CircuitBreaker``.
+    """
+    if breaker is None:
+        return CircuitBreaker()
+    if breaker is False:
+        return None
+    if isinstance(breaker, CircuitBreaker):
+        return breaker
+    return CircuitBreaker(failure_threshold=int(breaker)) if breaker else None
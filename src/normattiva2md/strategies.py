@@ -0,0 +1,320 @@
+"""
+Download di un atto con più strategie in gara ("hedging").
+
+Un atto può essere scaricato con ``caricaAKN``, con la collezione asincrona
+OpenData o con il form di export HTML. Invece di provarle una dopo l'altra,
+``run_strategies`` avvia la prima e, se dopo ``hedge_delay`` secondi non ha
+ancora finito, avvia anche la successiva (subito, se quelle in corso sono
+fallite): vince il primo documento Akoma Ntoso valido e le altre strategie
+vengono cancellate prima della richiesta successiva, o al blocco successivo
+se stanno già scaricando l'XML (la risposta viene chiusa).
+
+Ogni strategia scrive in un proprio file; quello della vincitrice viene
+rinominato nella destinazione. Latenza ed esiti di ogni strategia sono
+raccolti in ``StrategyStats`` per poter tarare i ritardi.
+"""
+
+import os
+import sys
+import threading
+import time
+
+from .http_client import FlowCancelled, as_client, run_sync
+from .normattiva_api import (
+    download_akoma_ntoso_flow,
+    export_flow,
+    opendata_flow,
+)
+
+# Attesa prima di avviare la strategia successiva (secondi)
+DEFAULT_HEDGE_DELAY = 10.0
+
+
+class Strategy:
+    """
+    Strategia di download.
+
+    Args:
+        name: nome usato nei messaggi e nelle statistiche
+        make_flow: funzione ``make_flow(output_path, cancel)`` che crea il
+            flusso (vedi ``run_sync``); il flusso restituisce
+            ``(success, metadata)`` e può passare ``cancel`` ai download in
+            streaming
+    """
+
+    def __init__(self, name, make_flow):
+        self.name = name
+        self.make_flow = make_flow
+
+
+def caricaakn_metadata(params, url):
+    """Metadata di un documento scaricato con ``caricaAKN``."""
+    return {
+        "dataGU": params["dataGU"],
+        "codiceRedaz": params["codiceRedaz"],
+        "dataVigenza": params["dataVigenza"],
+        "url": url,
+        "url_xml": (
+            "https://www.normattiva.it/do/atto/caricaAKN"
+            f"?dataGU={params['dataGU']}"
+            f"&codiceRedaz={params['codiceRedaz']}"
+            f"&dataVigenza={params['dataVigenza']}"
+        ),
+    }
+
+
+def _caricaakn_flow(params, url, output_path, quiet, cache, on_chunk, cancel):
+    success = yield from download_akoma_ntoso_flow(
+        params,
+        output_path,
+        quiet=quiet,
+        cache=cache,
+        on_chunk=on_chunk,
+        cancel=cancel,
+    )
+    return success, caricaakn_metadata(params, url) if success else None
+
+
+def download_strategies(
+    url,
+    params=None,
+    quiet=False,
+    cache=None,
+    on_chunk=None,
+    keep_file=True,
+    context=None,
+):
+    """
+    Strategie di download di un atto, in ordine di preferenza.
+
+    Args:
+        url: URL normattiva.it dell'atto
+        params: parametri ``caricaAKN`` (None = solo OpenData ed export)
+        quiet: se True, stampa solo errori
+        cache: XMLCache condivisa dalle strategie (opzionale)
+        on_chunk: funzione che riceve i blocchi dell'XML ``caricaAKN`` man
+            mano che arrivano
+        keep_file: se False la strategia ``caricaAKN`` non scrive l'XML su
+            file (solo con ``on_chunk``)
+        context: FetchContext condiviso, così la pagina dell'atto viene
+            caricata una volta sola da tutte le strategie (opzionale)
+
+    Returns:
+        list: ``Strategy``
+    """
+    strategies = []
+    if params:
+        strategies.append(
+            Strategy(
+                "caricaAKN",
+                lambda path, cancel: _caricaakn_flow(
+                    params,
+                    url,
+                    path if keep_file else None,
+                    quiet,
+                    cache,
+                    on_chunk,
+                    cancel,
+                ),
+            )
+        )
+    strategies.append(
+        Strategy(
+            "opendata",
+            lambda path, cancel: opendata_flow(
+                url, path, quiet=quiet, cache=cache, context=context, cancel=cancel
+            ),
+        )
+    )
+    strategies.append(
+        Strategy(
+            "export",
+            lambda path, cancel: export_flow(
+                url, path, quiet=quiet, cache=cache, context=context, cancel=cancel
+            ),
+        )
+    )
+    return strategies
+
+
+class StrategyStats:
+    """
+    Esiti e latenze delle strategie di download.
+
+    Per ogni strategia conta avvii, vittorie, fallimenti e cancellazioni
+    (comprese le strategie riuscite dopo la vincitrice) e la latenza media
+    dei tentativi conclusi.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, outcome, latency=None):
+        """
+        Registra un tentativo.
+
+        Args:
+            outcome: "win", "fail" o "cancelled"
+            latency: secondi dall'avvio alla conclusione (None se cancellato)
+        """
+        with self._lock:
+            entry = self._stats.setdefault(
+                name,
+                {"launched": 0, "win": 0, "fail": 0, "cancelled": 0, "latency": 0.0, "timed": 0},
+            )
+            entry["launched"] += 1
+            entry[outcome] += 1
+            if latency is not None:
+                entry["latency"] += latency
+                entry["timed"] += 1
+
+    def stats(self):
+        """Per strategia: avvii, vittorie, fallimenti, cancellazioni, win rate, latenza media."""
+        with self._lock:
+            return {
+                name: {
+                    "launched": entry["launched"],
+                    "wins": entry["win"],
+                    "failures": entry["fail"],
+                    "cancelled": entry["cancelled"],
+                    "win_rate": entry["win"] / entry["launched"],
+                    "mean_latency": (
+                        entry["latency"] / entry["timed"] if entry["timed"] else None
+                    ),
+                }
+                for name, entry in self._stats.items()
+            }
+
+
+_default_stats = StrategyStats()
+
+
+def get_strategy_stats():
+    """Statistiche delle strategie condivise dal processo."""
+    return _default_stats
+
+
+class _Race:
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.winner = None
+        self.finished = 0
+        self.errors = []
+
+
+def _remove(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _run_strategy(strategy, path, client, race, cancel, stats):
+    started = time.monotonic()
+    success, metadata, error, cancelled = False, None, None, False
+    try:
+        success, metadata = run_sync(
+            strategy.make_flow(path, cancel), client, cancel=cancel
+        )
+    except FlowCancelled:
+        cancelled = True
+    except Exception as e:
+        error = e
+
+    with race.changed:
+        won = success and race.winner is None
+        if won:
+            race.winner = (strategy.name, metadata, path)
+        elif error is not None:
+            race.errors.append(error)
+        race.finished += 1
+        race.changed.notify_all()
+
+    if won:
+        stats.record(strategy.name, "win", time.monotonic() - started)
+    elif cancelled:
+        stats.record(strategy.name, "cancelled")
+    elif success:
+        # Riuscita dopo la vincitrice
+        stats.record(strategy.name, "cancelled", time.monotonic() - started)
+    else:
+        stats.record(strategy.name, "fail", time.monotonic() - started)
+    if not won:
+        _remove(path)
+
+
+def run_strategies(
+    strategies,
+    output_path,
+    session=None,
+    hedge_delay=DEFAULT_HEDGE_DELAY,
+    stats=None,
+    quiet=False,
+):
+    """
+    Esegue le strategie in gara e restituisce la prima riuscita.
+
+    Args:
+        strategies: ``Strategy`` in ordine di preferenza
+        output_path: destinazione dell'XML della vincitrice (None = nessun file)
+        session: NormattivaClient o sessione requests (default: client condiviso)
+        hedge_delay: secondi dopo cui avviare la strategia successiva mentre
+            la precedente è ancora in corso (0 = tutte subito, None = solo
+            dopo un fallimento)
+        stats: ``StrategyStats`` (default: quelle del processo)
+        quiet: se True, stampa solo errori
+
+    Returns:
+        tuple: (nome della strategia vincente, metadata), oppure (None, None)
+
+    Raises:
+        Exception: il primo errore inatteso di una strategia (ad esempio di
+            parsing in ``on_chunk``) se nessuna è riuscita
+    """
+    client = as_client(session)
+    stats = stats or get_strategy_stats()
+    race = _Race()
+    cancels = []
+
+    with race.changed:
+        for strategy in strategies:
+            if cancels and not quiet:
+                print(f"⏩ Avvio strategia di download: {strategy.name}", file=sys.stderr)
+            cancel = threading.Event()
+            cancels.append(cancel)
+            # Ogni strategia scrive in un file proprio
+            path = f"{output_path}.{strategy.name}" if output_path else None
+            threading.Thread(
+                target=_run_strategy,
+                args=(strategy, path, client, race, cancel, stats),
+                daemon=True,
+            ).start()
+
+            deadline = None if hedge_delay is None else time.monotonic() + hedge_delay
+            while race.winner is None and race.finished < len(cancels):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                race.changed.wait(remaining)
+            if race.winner is not None:
+                break
+
+        while race.winner is None and race.finished < len(cancels):
+            race.changed.wait()
+
+    for cancel in cancels:
+        cancel.set()
+
+    if race.winner is None:
+        if race.errors:
+            raise race.errors[0]
+        return None, None
+
+    name, metadata, path = race.winner
+    if path and os.path.exists(path):
+        os.replace(path, output_path)
+    if len(cancels) > 1 and not quiet:
+        print(f"🏁 Download riuscito con la strategia {name}", file=sys.stderr)
+    return name, metadata
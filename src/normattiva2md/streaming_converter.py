@@ -0,0 +1,507 @@
+"""
+Motore di conversione in streaming per documenti Akoma Ntoso molto grandi.
+
+Invece di caricare l'intero albero con ``ET.parse``, il documento viene letto a
+blocchi con ``ET.XMLPullParser``: ogni articolo, capo e allegato viene
+convertito appena arriva il suo evento di chiusura e subito dopo rimosso
+dall'albero, così la memoria occupata resta nell'ordine di un singolo articolo
+indipendentemente dalla dimensione del documento.
+
+Il Markdown prodotto è identico byte per byte a quello delle funzioni che
+attraversano l'albero completo (``generate_markdown_text``).
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+
+from .constants import AKN_NAMESPACE, MAX_FILE_SIZE_BYTES, MAX_FILE_SIZE_MB
+from .xml_parser import ArticleSelection, extract_metadata_from_xml, outermost_articles
+from .normattiva_api import is_normattiva_url
+from .markdown_converter import (
+    clean_text_content,
+    extract_document_title,
+    generate_front_matter,
+    iter_markdown_fragments,
+    print_missing_xml_help,
+    process_article,
+    process_attachment,
+    process_body_element,
+    process_chapter,
+    process_preamble,
+)
+
+# Dimensione dei blocchi letti dal file XML
+CHUNK_SIZE = 64 * 1024
+
+# Oltre questa soglia le sezioni in attesa vengono parcheggiate su disco
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# Sezioni dell'output, nello stesso ordine di iter_markdown_fragments
+_FRONT, _TITLE, _PREAMBLE, _BODY, _ATTACHMENTS = range(5)
+
+
+class _NormattivaLinkMap(dict):
+    """
+    Mappa dei riferimenti usata con ``with_urls``.
+
+    Equivale al dizionario che la conversione classica costruisce scorrendo in
+    anticipo tutti i ``<ref>`` del documento: ogni href che è già un URL
+    normattiva.it punta a se stesso. Qui la verifica avviene al momento della
+    ricerca, senza una seconda lettura del file.
+    """
+
+    def __contains__(self, href):
+        return is_normattiva_url(href) or dict.__contains__(self, href)
+
+    def __getitem__(self, href):
+        if is_normattiva_url(href):
+            return href
+        return dict.__getitem__(self, href)
+
+    def __bool__(self):
+        return True
+
+
+class _Container:
+    """Stato di un `<title>`/`<part>` del body convertito figlio per figlio."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.heading_seen = False
+        self.heading_done = False
+        self.pending = []
+
+
+class StreamingMarkdownConverter:
+    """
+    Converte un documento Akoma Ntoso in Markdown leggendolo a blocchi.
+
+    Uso::
+
+        converter = StreamingMarkdownConverter(output)
+        for chunk in chunks:
+            converter.feed(chunk)
+        converter.close()
+
+    ``output`` è un qualsiasi oggetto testuale con ``write()``. Le sezioni che
+    nel Markdown finale precedono quella in corso (titolo, preambolo, body,
+    allegati) vengono scritte direttamente; quelle che arrivano "in anticipo"
+    sono accumulate in un ``SpooledTemporaryFile`` fino al loro turno.
+
+    Con ``article_ref`` (un eId, una lista di eId o una ``ArticleSelection``)
+    vengono convertiti solo gli articoli indicati: il resto del documento viene
+    scartato man mano, ``article_found`` indica se almeno un articolo è stato
+    trovato e ``missing_articles`` elenca le voci della selezione mancanti.
+
+    Con ``merge_metadata=True`` il front matter combina i metadati del
+    ``<meta>`` del documento con ``metadata`` (che ha la precedenza), come fa
+    l'API sull'albero completo: viene quindi scritto solo alla chiusura di
+    ``<meta>``.
+    """
+
+    def __init__(
+        self,
+        output,
+        metadata=None,
+        article_ref=None,
+        cross_references=None,
+        with_urls=False,
+        ns=AKN_NAMESPACE,
+        merge_metadata=False,
+    ):
+        self.output = output
+        self.ns = ns
+        self.metadata = metadata
+        self.merge_metadata = merge_metadata
+        self.selection = ArticleSelection.coerce(article_ref)
+        self.article_found = False
+        self.missing_articles = []
+        if with_urls:
+            cross_references = _NormattivaLinkMap(cross_references or {})
+        self.cross_references = cross_references
+
+        akn = "{%s}" % ns["akn"]
+        self._meta_tag = f"{akn}meta"
+        self._doc_title_tag = f"{akn}docTitle"
+        self._preamble_tag = f"{akn}preamble"
+        self._body_tag = f"{akn}body"
+        self._attachments_tag = f"{akn}attachments"
+        self._attachment_tag = f"{akn}attachment"
+        self._article_tag = f"{akn}article"
+        self._heading_tag = f"{akn}heading"
+
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._stack = []
+        self._handlers = {}
+        self._keep = set()
+        self._containers = {}
+        self._root_tag = None
+
+        self._meta = None
+        self._doc_title = None
+        self._preamble = None
+        self._body = None
+        self._attachments = None
+        self._attachments_started = False
+        self._match = self.selection.matcher() if self.selection else None
+        self._candidates = []
+        self._candidate_set = set()
+        self._article_body_tag = None
+
+        self._done = [False] * 5
+        self._spools = {}
+        self._live = _FRONT
+        self._closed = False
+
+        if self.selection is None and metadata is not None and not merge_metadata:
+            self._write_front_matter(metadata)
+
+    def feed(self, data):
+        """Passa al parser un blocco di XML (bytes o str) e converte ciò che è completo."""
+        self._parser.feed(data)
+        self._process_events()
+
+    def close(self):
+        """Chiude il parser e scrive le sezioni ancora in sospeso."""
+        if self._closed:
+            return
+        self._parser.close()
+        self._process_events()
+        self._closed = True
+
+        if self.selection is not None:
+            self._write_articles()
+            return
+
+        if not self._done[_FRONT]:
+            self._render_meta(self._meta)
+        for index in range(_TITLE, _ATTACHMENTS + 1):
+            self._finish(index)
+
+    # Gestione degli eventi del parser
+
+    def _process_events(self):
+        for event, element in self._parser.read_events():
+            if event == "start":
+                self._on_start(element)
+            else:
+                self._on_end(element)
+
+    def _on_start(self, element):
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(element)
+        tag = element.tag
+        if parent is None:
+            self._root_tag = tag
+
+        if tag == self._meta_tag and self._meta is None:
+            self._meta = element
+            self._keep_until_end(element)
+            if self.selection is None and (self.metadata is None or self.merge_metadata):
+                self._on_end_call(element, self._render_meta)
+
+        if self.selection is not None:
+            if tag == self._body_tag and self._article_body_tag is None:
+                self._article_body_tag = tag
+            elif tag == self._article_tag and self._match(element.get("eId")):
+                # Candidato: estremo della selezione o dentro un intervallo aperto
+                self._candidates.append(element)
+                self._candidate_set.add(element)
+                self._keep_until_end(element)
+            return
+
+        if tag == self._doc_title_tag and self._doc_title is None:
+            self._doc_title = element
+            self._keep_until_end(element)
+            self._on_end_call(element, self._render_doc_title)
+        elif tag == self._preamble_tag and self._preamble is None:
+            self._preamble = element
+            self._keep_until_end(element)
+            self._on_end_call(element, self._render_preamble)
+        elif tag == self._body_tag and self._body is None:
+            self._body = element
+            self._on_end_call(element, lambda _: self._finish(_BODY))
+        elif tag == self._attachments_tag and self._attachments is None:
+            self._attachments = element
+            self._on_end_call(element, lambda _: self._finish(_ATTACHMENTS))
+
+        if parent is None:
+            return
+        if parent is self._body:
+            self._on_start_body_child(element)
+        elif parent in self._containers:
+            self._on_start_container_child(parent, element)
+        elif parent is self._attachments and tag == self._attachment_tag:
+            self._keep_until_end(element)
+            self._on_end_call(element, self._render_attachment)
+
+    def _on_start_body_child(self, element):
+        # Stesso ordine dei controlli di process_body_element
+        tag = element.tag
+        if tag.endswith("title"):
+            self._open_container(element, "##")
+        elif tag.endswith("part"):
+            self._open_container(element, "###")
+        elif tag.endswith(("chapter", "article", "attachment")):
+            self._keep_until_end(element)
+            self._on_end_call(element, self._render_body_child)
+
+    def _on_start_container_child(self, container_element, element):
+        container = self._containers[container_element]
+        tag = element.tag
+        if tag == self._heading_tag and not container.heading_seen:
+            container.heading_seen = True
+            self._keep_until_end(element)
+            self._on_end_call(
+                element, lambda heading: self._render_heading(container, heading)
+            )
+        elif tag.endswith("chapter") or tag.endswith("article"):
+            self._keep_until_end(element)
+            self._on_end_call(
+                element, lambda child: self._render_container_child(container, child)
+            )
+
+    def _on_end(self, element):
+        self._stack.pop()
+        for handler in self._handlers.pop(element, ()):
+            handler(element)
+        self._keep.discard(element)
+
+        # Un elemento può essere scartato solo se nessun antenato aperto
+        # dovrà ancora essere convertito per intero
+        if self._stack and not self._keep:
+            self._stack[-1].remove(element)
+            if element is not self._meta and element not in self._candidate_set:
+                element.clear()
+
+    def _keep_until_end(self, element):
+        self._keep.add(element)
+
+    def _on_end_call(self, element, handler):
+        self._handlers.setdefault(element, []).append(handler)
+
+    def _open_container(self, element, prefix):
+        self._containers[element] = _Container(prefix)
+        self._on_end_call(element, self._close_container)
+
+    # Conversione delle singole unità
+
+    def _render_meta(self, meta):
+        self._write_front_matter(self._merged(extract_metadata_from_xml(self._wrap(meta))))
+
+    def _merged(self, document_metadata):
+        if self.metadata is None:
+            return document_metadata
+        return {**document_metadata, **self.metadata}
+
+    def _render_doc_title(self, doc_title):
+        self._write(_TITLE, "".join(extract_document_title(self._wrap(doc_title), self.ns)))
+        self._finish(_TITLE)
+
+    def _render_preamble(self, preamble):
+        self._write(
+            _PREAMBLE, "".join(process_preamble(preamble, self.ns, self.cross_references))
+        )
+        self._finish(_PREAMBLE)
+
+    def _render_body_child(self, element):
+        self._write(
+            _BODY,
+            "".join(process_body_element(element, self.ns, self.cross_references)),
+        )
+
+    def _render_heading(self, container, heading):
+        if heading.text:
+            clean_heading = clean_text_content(heading, self.cross_references)
+            self._write(_BODY, f"{container.prefix} {clean_heading}\n\n")
+        self._flush_container(container)
+
+    def _render_container_child(self, container, element):
+        fragments = []
+        if element.tag.endswith("chapter"):
+            fragments = process_chapter(element, self.ns, self.cross_references)
+        else:
+            process_article(
+                element,
+                fragments,
+                self.ns,
+                level=3,
+                cross_references=self.cross_references,
+            )
+        if container.heading_done:
+            self._write(_BODY, "".join(fragments))
+        else:
+            container.pending.extend(fragments)
+
+    def _close_container(self, element):
+        self._flush_container(self._containers.pop(element))
+
+    def _flush_container(self, container):
+        container.heading_done = True
+        self._write(_BODY, "".join(container.pending))
+        container.pending = []
+
+    def _render_attachment(self, attachment):
+        if not self._attachments_started:
+            self._attachments_started = True
+            self._write(_ATTACHMENTS, "## Allegati\n\n")
+        self._write(
+            _ATTACHMENTS,
+            "".join(process_attachment(attachment, self.ns, self.cross_references)),
+        )
+
+    def _write_articles(self):
+        # Stessa risoluzione di AkomaDocument.select_articles, sui soli candidati
+        positions = {}
+        for index, article in enumerate(self._candidates):
+            positions.setdefault(article.get("eId"), index)
+        selected, self.missing_articles = self.selection.resolve(positions)
+        articles = outermost_articles([self._candidates[index] for index in selected])
+        self.article_found = bool(articles)
+
+        # Ricostruisce lo stesso documento ridotto di filter_xml_to_articles
+        root = ET.Element(self._root_tag or "akomaNtoso")
+        if self._meta is not None:
+            root.append(self._meta)
+        if articles:
+            body = ET.SubElement(root, self._article_body_tag or "body")
+            for article in articles:
+                body.append(article)
+        metadata = self.metadata
+        if metadata is None or self.merge_metadata:
+            metadata = self._merged(extract_metadata_from_xml(root))
+        self.metadata = metadata
+        for fragment in iter_markdown_fragments(
+            root, self.ns, metadata, self.cross_references
+        ):
+            self.output.write(fragment)
+
+    def _wrap(self, element):
+        wrapper = ET.Element("wrapper")
+        if element is not None:
+            wrapper.append(element)
+        return wrapper
+
+    # Scrittura ordinata delle sezioni
+
+    def _write_front_matter(self, metadata):
+        self.metadata = metadata
+        if metadata:
+            self._write(_FRONT, generate_front_matter(metadata))
+        self._finish(_FRONT)
+
+    def _write(self, index, text):
+        if not text:
+            return
+        if index == self._live:
+            self.output.write(text)
+            return
+        spool = self._spools.get(index)
+        if spool is None:
+            spool = tempfile.SpooledTemporaryFile(
+                max_size=SPOOL_MAX_SIZE, mode="w+", encoding="utf-8"
+            )
+            self._spools[index] = spool
+        spool.write(text)
+
+    def _finish(self, index):
+        if self._done[index]:
+            return
+        self._done[index] = True
+        while self._live < len(self._done) and self._done[self._live]:
+            self._live += 1
+            spool = self._spools.pop(self._live, None)
+            if spool is not None:
+                spool.seek(0)
+                shutil.copyfileobj(spool, self.output)
+                spool.close()
+
+
+def convert_akomantoso_to_markdown_streaming(
+    xml_file_path,
+    markdown_file_path=None,
+    metadata=None,
+    article_ref=None,
+    cross_references=None,
+    with_urls=False,
+    chunk_size=CHUNK_SIZE,
+):
+    """
+    Variante in streaming di ``convert_akomantoso_to_markdown_improved``.
+
+    Stessi argomenti e stesso valore di ritorno; il file viene letto a blocchi
+    di ``chunk_size`` byte. Se è indicato ``markdown_file_path`` l'output viene
+    scritto in un file temporaneo accanto alla destinazione e rinominato solo a
+    conversione riuscita, così un errore di parsing non lascia file parziali.
+    """
+    try:
+        file_size = os.path.getsize(xml_file_path)
+    except FileNotFoundError:
+        print_missing_xml_help(xml_file_path)
+        return False
+    if file_size > MAX_FILE_SIZE_BYTES:
+        print(
+            f"Errore: file XML troppo grande ({file_size / 1024 / 1024:.1f}MB). Massimo consentito: {MAX_FILE_SIZE_MB}MB",
+            file=sys.stderr,
+        )
+        return False
+
+    partial_path = None
+    if markdown_file_path is None:
+        output = sys.stdout
+    else:
+        partial_path = f"{markdown_file_path}.part"
+        try:
+            output = open(partial_path, "w", encoding="utf-8")
+        except IOError as e:
+            print(f"Errore durante la scrittura del file Markdown: {e}", file=sys.stderr)
+            return False
+
+    try:
+        converter = StreamingMarkdownConverter(
+            output,
+            metadata=metadata,
+            article_ref=article_ref,
+            cross_references=cross_references,
+            with_urls=with_urls,
+        )
+        with open(xml_file_path, "rb") as xml_file:
+            for chunk in iter(lambda: xml_file.read(chunk_size), b""):
+                converter.feed(chunk)
+        converter.close()
+        for label in converter.missing_articles:
+            print(
+                f"⚠️  Warning: Article '{label}' not found in document",
+                file=sys.stderr,
+            )
+        if partial_path is not None:
+            output.close()
+            os.replace(partial_path, markdown_file_path)
+    except ET.ParseError as e:
+        _discard_partial(output, partial_path)
+        print(f"Errore durante il parsing del file XML: {e}", file=sys.stderr)
+        return False
+    except Exception as e:
+        _discard_partial(output, partial_path)
+        print(f"Si è verificato un errore inatteso: {e}", file=sys.stderr)
+        return False
+
+    if partial_path is not None:
+        print(
+            f"Conversione completata. Il file Markdown è stato salvato in '{markdown_file_path}'",
+            file=sys.stderr,
+        )
+    return True
+
+
+def _discard_partial(output, partial_path):
+    if partial_path is None:
+        return
+    output.close()
+    try:
+        os.remove(partial_path)
+    except OSError:
+        pass
@@ -0,0 +1,170 @@
+"""
+Backend di parsing XML intercambiabili.
+
+Tutto il parsing dei documenti Akoma Ntoso passa da qui. Se ``lxml`` è
+installato (extra opzionale ``pip install normattiva2md[lxml]``) il backend
+``auto`` usa il parser C di lxml e XPath compilate per la ricerca degli
+articoli e dei riferimenti; altrimenti si ricade su
+``xml.etree.ElementTree`` della libreria standard, con lo stesso risultato.
+"""
+
+import copy
+import xml.etree.ElementTree as ET
+
+from .constants import AKN_NAMESPACE
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml è opzionale
+    lxml_etree = None
+
+PARSER_CHOICES = ("auto", "lxml", "etree")
+
+if lxml_etree is not None:
+    PARSE_ERRORS = (ET.ParseError, lxml_etree.XMLSyntaxError)
+else:
+    PARSE_ERRORS = (ET.ParseError,)
+
+
+class EtreeBackend:
+    """Backend basato su ``xml.etree.ElementTree`` (sempre disponibile)."""
+
+    name = "etree"
+    supports_xpath = False
+
+    def parse(self, source):
+        return ET.parse(source).getroot()
+
+    def Element(self, tag, attrib=None):
+        return ET.Element(tag, dict(attrib or {}))
+
+    def SubElement(self, parent, tag, attrib=None):
+        return ET.SubElement(parent, tag, dict(attrib or {}))
+
+    def graft(self, element):
+        """Elemento da inserire in un nuovo albero (in ElementTree è condivisibile)."""
+        return element
+
+    def declare_namespaces(self, element, ns):
+        for prefix, uri in ns.items():
+            if prefix:
+                element.set(f"xmlns:{prefix}", uri)
+            else:
+                element.set("xmlns", uri)
+
+    def find_article(self, root, article_eid, ns=AKN_NAMESPACE):
+        return root.find(f'.//akn:article[@eId="{article_eid}"]', ns)
+
+    def serialize(self, element):
+        """Serializzazione UTF-8 dell'elemento (senza dichiarazione XML)."""
+        return ET.tostring(element, encoding="utf-8", xml_declaration=False)
+
+
+class LxmlBackend:
+    """Backend basato su ``lxml.etree`` con XPath compilate."""
+
+    name = "lxml"
+    supports_xpath = True
+
+    def __init__(self):
+        # Commenti e processing instruction vengono scartati come fa
+        # ElementTree, così il renderer vede lo stesso albero; entità esterne
+        # e accesso alla rete restano disabilitati.
+        self._parser = lxml_etree.XMLParser(
+            remove_comments=True,
+            remove_pis=True,
+            resolve_entities=False,
+            no_network=True,
+        )
+        self._article_xpath = lxml_etree.XPath(
+            "(//akn:article[@eId = $eid])[1]", namespaces=AKN_NAMESPACE
+        )
+        # Gli attributi restituiti sono "smart string": getparent() dà
+        # l'elemento senza una seconda interrogazione dell'albero
+        self._href_xpath = lxml_etree.XPath("//@href")
+
+    def parse(self, source):
+        return lxml_etree.parse(source, self._parser).getroot()
+
+    def Element(self, tag, attrib=None):
+        return lxml_etree.Element(tag, dict(attrib or {}))
+
+    def SubElement(self, parent, tag, attrib=None):
+        return lxml_etree.SubElement(parent, tag, dict(attrib or {}))
+
+    def graft(self, element):
+        """Copia dell'elemento: in lxml ``append`` lo sposterebbe dall'albero originale."""
+        return copy.deepcopy(element)
+
+    def declare_namespaces(self, element, ns):
+        # lxml gestisce i namespace in modo nativo (nsmap)
+        pass
+
+    def find_article(self, root, article_eid, ns=AKN_NAMESPACE):
+        if ns.get("akn") == AKN_NAMESPACE["akn"]:
+            matches = self._article_xpath(root, eid=article_eid)
+        else:
+            matches = root.xpath(
+                "(//akn:article[@eId = $eid])[1]", namespaces=ns, eid=article_eid
+            )
+        return matches[0] if matches else None
+
+    def serialize(self, element):
+        """Serializzazione UTF-8 dell'elemento (senza dichiarazione XML)."""
+        return lxml_etree.tostring(element, encoding="UTF-8", xml_declaration=False)
+
+    def collect_hrefs(self, root):
+        return [
+            (href.getparent().tag, str(href))
+            for href in self._href_xpath(root)
+            if href
+        ]
+
+
+ETREE_BACKEND = EtreeBackend()
+_lxml_backend = None
+
+
+def lxml_available():
+    """True se lxml è installato."""
+    return lxml_etree is not None
+
+
+def get_backend(parser="auto"):
+    """
+    Restituisce il backend XML richiesto.
+
+    Args:
+        parser: "auto" (lxml se disponibile, altrimenti etree), "lxml" o "etree"
+
+    Returns:
+        EtreeBackend o LxmlBackend
+
+    Raises:
+        ValueError: nome del parser non valido
+        ImportError: richiesto "lxml" ma la libreria non è installata
+    """
+    global _lxml_backend
+
+    if parser is None:
+        parser = "auto"
+    if parser not in PARSER_CHOICES:
+        raise ValueError(
+            f"Parser XML non valido: '{parser}'. Valori ammessi: {', '.join(PARSER_CHOICES)}"
+        )
+    if parser == "etree" or (parser == "auto" and lxml_etree is None):
+        return ETREE_BACKEND
+    if lxml_etree is None:
+        raise ImportError(
+            "Il parser 'lxml' richiede la libreria lxml: pip install normattiva2md[lxml]"
+        )
+    if _lxml_backend is None:
+        _lxml_backend = LxmlBackend()
+    return _lxml_backend
+
+
+def backend_for(element):
+    """Backend a cui appartiene un elemento già analizzato."""
+    if lxml_etree is not None and isinstance(element, lxml_etree._Element):
+        return get_backend("lxml")
+    return ETREE_BACKEND
@@ -0,0 +1,552 @@
+"""
+Cache su disco dei documenti Akoma Ntoso scaricati.
+
+Un documento ``caricaAKN`` identificato da ``(dataGU, codiceRedaz,
+dataVigenza)`` non cambia: la cache lo conserva compresso (gzip) e
+indirizzato per contenuto (SHA-256), così versioni identiche di chiavi diverse
+occupano spazio una sola volta.
+
+Struttura della directory::
+
+    index.json               chiave -> hash, dimensioni, ultimo accesso
+    index.lock               lock tra processi per le modifiche all'indice
+    objects/ab/abcdef...gz   contenuti XML compressi
+
+Tutte le scritture sono atomiche (file temporaneo + ``os.replace``); oltre
+``max_bytes`` le voci usate meno di recente vengono eliminate (LRU).
+
+Con ``revalidate=True`` una voce presente non viene usata alla cieca: il
+download la rivalida con ``If-None-Match``/``If-Modified-Since`` (ETag e
+Last-Modified salvati nella voce) oppure, se il server non li supporta,
+confrontando l'hash del contenuto scaricato.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: lock dell'indice solo all'interno del processo
+    fcntl = None
+
+DEFAULT_CACHE_MAX_MB = 500
+INDEX_NAME = "index.json"
+LOCK_NAME = "index.lock"
+OBJECTS_DIR = "objects"
+# Ogni quanto una lettura salva comunque l'ultimo accesso (secondi)
+ACCESS_PERSIST_INTERVAL = 3600
+# File non referenziati più recenti di così possono essere scritture in corso
+ORPHAN_GRACE_PERIOD = 15 * 60
+_TEMP_PREFIX = ".tmp-"
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir():
+    """
+    Directory di cache predefinita.
+
+    ``NORMATTIVA2MD_CACHE_DIR`` se impostata, altrimenti
+    ``$XDG_CACHE_HOME/normattiva2md`` (default ``~/.cache/normattiva2md``).
+    """
+    env_dir = os.getenv("NORMATTIVA2MD_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "normattiva2md")
+
+
+def cache_key(params):
+    """Chiave della cache per i parametri ``dataGU``, ``codiceRedaz``, ``dataVigenza``."""
+    return f"{params['codiceRedaz']}_{params['dataGU']}_{params['dataVigenza']}"
+
+
+def _atomic_write(path, data):
+    """Scrive ``data`` (bytes, o funzione che riceve il file aperto) in modo atomico."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if callable(data):
+                data(f)
+            else:
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class XMLCache:
+    """
+    Cache LRU limitata per dimensione dei file XML Akoma Ntoso.
+
+    Più processi possono usare la stessa directory: ogni modifica rilegge
+    l'indice sotto ``fcntl.flock`` (dove ``fcntl`` non c'è, il lock vale
+    solo all'interno del processo). Gli accessi in lettura aggiornano
+    ``last_access`` in memoria e vengono salvati con la modifica successiva,
+    o al più ogni ``ACCESS_PERSIST_INTERVAL`` secondi.
+
+    Args:
+        cache_dir: directory della cache (creata se non esiste)
+        max_bytes: spazio massimo su disco dei contenuti compressi
+        revalidate: se True i download rivalidano le voci presenti col server
+
+    Attributes:
+        hits, misses: contatori delle letture in questo processo
+        revalidated, redownloaded: voci rivalidate e confermate invariate
+            oppure sostituite da un contenuto diverso
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024,
+        revalidate=False,
+    ):
+        self.cache_dir = os.path.abspath(cache_dir or default_cache_dir())
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.redownloaded = 0
+        self._lock = threading.RLock()
+        # Ultima versione letta dell'indice: (identità del file, contenuto)
+        self._index_version = None
+        self._index = {}
+        # Accessi non ancora salvati nell'indice: chiave -> istante
+        self._accessed = {}
+
+    # Indice
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, INDEX_NAME)
+
+    def _read_index(self):
+        """
+        Indice su disco, riletto solo se il file è cambiato (``os.replace``
+        crea ogni volta un nuovo file).
+        """
+        try:
+            st = os.stat(self.index_path)
+        except OSError:
+            self._index_version, self._index = None, {}
+            return self._index
+        version = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if version != self._index_version:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+            self._index_version = version
+        return self._index
+
+    @contextmanager
+    def _update_index(self):
+        """
+        Lettura, modifica e salvataggio dell'indice in esclusiva.
+
+        Restituisce l'indice appena riletto dal disco, con gli accessi in
+        sospeso già applicati; viene salvato all'uscita dal blocco.
+        """
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, LOCK_NAME), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # Sempre dal disco: un altro processo può averlo cambiato
+                    self._index_version = None
+                    index = self._read_index()
+                    for key, accessed in self._accessed.items():
+                        entry = index.get(key)
+                        if entry is not None:
+                            entry["last_access"] = max(entry["last_access"], accessed)
+                    yield index
+                    data = json.dumps(index, indent=1, sort_keys=True).encode("utf-8")
+                    _atomic_write(self.index_path, data)
+                    self._accessed = {}
+                    self._index_version = None
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, OBJECTS_DIR, digest[:2], f"{digest}.gz")
+
+    # Lettura e scrittura
+
+    def get(self, params):
+        """
+        Contenuto XML in cache per ``params`` oppure None.
+
+        Un contenuto mancante o che non corrisponde al proprio hash viene
+        rimosso dall'indice e conta come miss.
+        """
+        key = cache_key(params)
+        with self._lock:
+            entry = self._read_index().get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with gzip.open(self._object_path(entry["sha256"]), "rb") as f:
+                    content = f.read()
+            except (OSError, EOFError):
+                content = None
+            if content is None or hashlib.sha256(content).hexdigest() != entry["sha256"]:
+                with self._update_index() as index:
+                    # Un altro processo può averla già sostituita
+                    if index.get(key, {}).get("sha256") == entry["sha256"]:
+                        del index[key]
+                self.misses += 1
+                return None
+            now = time.time()
+            self._accessed[key] = now
+            if now - entry["last_access"] > ACCESS_PERSIST_INTERVAL:
+                with self._update_index():
+                    pass
+            self.hits += 1
+            return content
+
+    def entry(self, params):
+        """Metadati della voce (hash, dimensioni, ``url_xml``...) oppure None."""
+        with self._lock:
+            entry = self._read_index().get(cache_key(params))
+            return dict(entry) if entry else None
+
+    def put(self, params, content, url_xml=None, validators=None):
+        """
+        Salva ``content`` (bytes) per ``params`` e applica il limite di spazio.
+
+        ``validators`` (``etag``, ``last_modified``) vengono salvati nella
+        voce per le successive rivalidazioni.
+
+        Returns:
+            str: hash SHA-256 del contenuto
+        """
+        compressed = gzip.compress(content, compresslevel=6)
+        return self._put(
+            params,
+            hashlib.sha256(content).hexdigest(),
+            len(content),
+            lambda object_path: _atomic_write(object_path, compressed),
+            url_xml,
+            validators,
+        )
+
+    def put_file(self, params, path, url_xml=None, validators=None, sha256=None):
+        """
+        Come ``put``, ma comprime a blocchi il file ``path`` senza caricarlo
+        in memoria.
+
+        Args:
+            sha256: hash del file se già noto (ad esempio calcolato durante il
+                download), altrimenti viene calcolato qui
+
+        Returns:
+            str: hash SHA-256 del contenuto
+        """
+        if sha256 is None:
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(_COPY_CHUNK_SIZE), b""):
+                    hasher.update(block)
+            sha256 = hasher.hexdigest()
+
+        def compress(dst):
+            with open(path, "rb") as src, gzip.GzipFile(
+                filename="", fileobj=dst, mode="wb", compresslevel=6
+            ) as gz:
+                shutil.copyfileobj(src, gz, _COPY_CHUNK_SIZE)
+
+        return self._put(
+            params,
+            sha256,
+            os.path.getsize(path),
+            lambda object_path: _atomic_write(object_path, compress),
+            url_xml,
+            validators,
+        )
+
+    def writer(self, params, url_xml=None):
+        """
+        Scrittura incrementale di una voce, per contenuti che arrivano a blocchi.
+
+        Returns:
+            CacheWriter: ``write(chunk)`` per ogni blocco, poi ``commit()``
+            oppure ``abort()``
+        """
+        return CacheWriter(self, params, url_xml)
+
+    def _put(self, params, digest, size, store, url_xml, validators):
+        """
+        Registra la voce; ``store(object_path)`` scrive l'oggetto se manca.
+
+        Oggetto e indice vengono aggiornati nella stessa sezione esclusiva,
+        così un'eviction concorrente non vede mai un oggetto senza voce.
+        """
+        object_path = self._object_path(digest)
+        key = cache_key(params)
+        with self._update_index() as index:
+            if not os.path.exists(object_path):
+                store(object_path)
+            now = time.time()
+            entry = {
+                "sha256": digest,
+                "size": size,
+                "stored_size": os.path.getsize(object_path),
+                "created": index.get(key, {}).get("created", now),
+                "last_access": now,
+            }
+            if url_xml:
+                entry["url_xml"] = url_xml
+            entry.update(validators or {})
+            index[key] = entry
+            self._evict(index, self.max_bytes)
+        return digest
+
+    def count_revalidation(self, changed):
+        """Registra l'esito di una rivalidazione (contenuto cambiato o no)."""
+        with self._lock:
+            if changed:
+                self.redownloaded += 1
+            else:
+                self.revalidated += 1
+
+    # Manutenzione
+
+    @staticmethod
+    def _stored_objects(index):
+        """Oggetti referenziati dall'indice: hash -> dimensione su disco."""
+        objects = {}
+        for entry in index.values():
+            objects[entry["sha256"]] = entry.get("stored_size", 0)
+        return objects
+
+    def _evict(self, index, max_bytes, older_than=None):
+        """Rimuove voci (LRU, e più vecchie di ``older_than`` secondi) fino al limite."""
+        before = set(self._stored_objects(index))
+        removed = 0
+        if older_than is not None:
+            limit = time.time() - older_than
+            for key in [k for k, e in index.items() if e["last_access"] < limit]:
+                del index[key]
+                removed += 1
+
+        references = {}
+        for entry in index.values():
+            references[entry["sha256"]] = references.get(entry["sha256"], 0) + 1
+        total = sum(self._stored_objects(index).values())
+        by_age = sorted(index.items(), key=lambda item: item[1]["last_access"])
+        for key, entry in by_age:
+            if total <= max_bytes:
+                break
+            del index[key]
+            removed += 1
+            references[entry["sha256"]] -= 1
+            if not references[entry["sha256"]]:
+                total -= entry.get("stored_size", 0)
+
+        if removed:
+            self._remove_orphans(index, before - set(self._stored_objects(index)))
+        return removed
+
+    def _remove_orphans(self, index, evicted=(), include_temp=False):
+        """
+        Elimina gli oggetti non referenziati da ``index``.
+
+        Gli oggetti appena tolti dall'indice (``evicted``) vengono eliminati
+        subito; gli altri file, che possono appartenere a scritture in corso
+        di altri processi, solo se non modificati da ``ORPHAN_GRACE_PERIOD``
+        secondi. I file temporanei vengono considerati solo da ``prune()``.
+        """
+        referenced = set(self._stored_objects(index))
+        stale = time.time() - ORPHAN_GRACE_PERIOD
+        objects_root = os.path.join(self.cache_dir, OBJECTS_DIR)
+        for dirpath, _, filenames in os.walk(objects_root):
+            for filename in filenames:
+                if filename.startswith(_TEMP_PREFIX) and not include_temp:
+                    continue
+                digest = filename[: -len(".gz")] if filename.endswith(".gz") else None
+                if digest in referenced:
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    if digest not in evicted and os.path.getmtime(path) > stale:
+                        continue
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def prune(self, max_bytes=None, older_than=None):
+        """
+        Riduce la cache sotto ``max_bytes`` (default: limite configurato).
+
+        Rimuove anche le voci non usate da più di ``older_than`` secondi, gli
+        oggetti non più referenziati e i file temporanei rimasti da scritture
+        interrotte (più vecchi di ``ORPHAN_GRACE_PERIOD``).
+
+        Returns:
+            int: numero di voci rimosse
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        with self._update_index() as index:
+            removed = self._evict(index, max_bytes, older_than)
+            self._remove_orphans(index, include_temp=True)
+        return removed
+
+    def stats(self):
+        """Statistiche della cache (voci, spazio su disco, rapporto di compressione)."""
+        with self._lock:
+            index = self._read_index()
+            objects = self._stored_objects(index)
+            stored = sum(objects.values())
+            original = sum(entry["size"] for entry in index.values())
+            accesses = [
+                max(entry["last_access"], self._accessed.get(key, 0))
+                for key, entry in index.items()
+            ]
+            return {
+                "cache_dir": self.cache_dir,
+                "entries": len(index),
+                "objects": len(objects),
+                "stored_bytes": stored,
+                "original_bytes": original,
+                "max_bytes": self.max_bytes,
+                "compression_ratio": (original / stored) if stored else 0.0,
+                "oldest_access": min(accesses) if accesses else None,
+                "newest_access": max(accesses) if accesses else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "redownloaded": self.redownloaded,
+            }
+
+
+class CacheWriter:
+    """
+    Voce di ``XMLCache`` scritta a blocchi: il contenuto viene compresso in un
+    file temporaneo mentre arriva e l'hash calcolato al volo, così non serve
+    tenerlo tutto in memoria.
+    """
+
+    def __init__(self, cache, params, url_xml=None):
+        self.cache = cache
+        self.params = params
+        self.url_xml = url_xml
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        directory = os.path.join(cache.cache_dir, OBJECTS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=directory)
+        self._file = os.fdopen(fd, "wb")
+        self._gzip = gzip.GzipFile(
+            filename="", fileobj=self._file, mode="wb", compresslevel=6
+        )
+
+    def write(self, chunk):
+        self._hasher.update(chunk)
+        self._gzip.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self, validators=None):
+        """
+        Completa la voce.
+
+        Returns:
+            str: hash SHA-256 del contenuto
+        """
+        self._gzip.close()
+        self._file.close()
+
+        def store(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(self._tmp_path, object_path)
+
+        try:
+            return self.cache._put(
+                self.params,
+                self._hasher.hexdigest(),
+                self.size,
+                store,
+                self.url_xml,
+                validators,
+            )
+        finally:
+            # Oggetto già presente: il temporaneo non è stato usato
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+
+    def abort(self):
+        """Scarta il contenuto scritto finora."""
+        self._gzip.close()
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+def open_cache(cache, revalidate=False):
+    """
+    Normalizza l'opzione ``cache`` dell'API.
+
+    Args:
+        cache: None/False (nessuna cache), True (directory predefinita), path
+            della directory oppure un ``XMLCache`` già creato
+        revalidate: per una cache creata qui, rivalida le voci col server
+
+    Returns:
+        XMLCache o None
+    """
+    if cache is None or cache is False:
+        return None
+    if isinstance(cache, XMLCache):
+        return cache
+    if cache is True:
+        return XMLCache(revalidate=revalidate)
+    return XMLCache(os.fspath(cache), revalidate=revalidate)
+
+
+def load_cached_xml(cache, params, output_path, quiet=False, on_chunk=None):
+    """
+    Copia in ``output_path`` il documento in cache per ``params``.
+
+    Args:
+        output_path: file di destinazione (None = nessun file)
+        on_chunk: funzione a cui passare anche il contenuto (opzionale)
+
+    Returns:
+        bool: True se il documento era in cache
+    """
+    if cache is None:
+        return False
+    content = cache.get(params)
+    if content is None:
+        return False
+    if output_path is not None:
+        with open(output_path, "wb") as f:
+            f.write(content)
+    if on_chunk is not None:
+        on_chunk(content)
+    if not quiet:
+        print(f"📦 File XML dalla cache: {cache_key(params)}", file=sys.stderr)
+    return True
@@ -1,6 +1,6 @@
-import xml.etree.ElementTree as ET
 from datetime import datetime
 from .constants import AKN_NAMESPACE, GU_NAMESPACE, ELI_NAMESPACE
+from .xml_backend import backend_for, get_backend
 
 def build_permanent_url(dataGU, codiceRedaz, dataVigenza):
     """
@@ -152,46 +152,380 @@ def construct_article_eid(user_input):
         return f"art_{numero}"
 
 
-def filter_xml_to_article(root, article_eid, ns):
+def parse_article_selection(user_input):
+    """
+    Costruisce una selezione di articoli dal formato user-friendly.
+
+    Accetta articoli singoli e intervalli separati da virgola (es: "4",
+    "1,3,5-7,16bis") oppure una lista di valori (es: ["1", "5-7"]).
+
+    Args:
+        user_input: stringa o lista con la selezione
+
+    Returns:
+        ArticleSelection o None se il formato è invalido
+
+    Raises:
+        ValueError: se un intervallo ha gli estremi invertiti (es: "7-5")
+    """
+    if not user_input:
+        return None
+    if not isinstance(user_input, str):
+        user_input = ",".join(str(item) for item in user_input)
+
+    ranges = []
+    for token in user_input.split(","):
+        token = token.strip().lower()
+        start, separator, end = token.partition("-")
+        start_eid = construct_article_eid(start)
+        end_eid = construct_article_eid(end) if separator else start_eid
+        if not start_eid or not end_eid:
+            return None
+        ranges.append((token, start_eid, end_eid))
+    return ArticleSelection(ranges)
+
+
+# Ordine degli avverbi numerali latini nelle estensioni degli articoli
+_ARTICLE_EXTENSIONS = (
+    "", "bis", "ter", "quater", "quinquies", "sexies", "septies", "octies",
+    "novies", "decies", "undecies", "duodecies", "terdecies", "quaterdecies",
+    "quinquiesdecies", "sexiesdecies", "septiesdecies", "duodevicies",
+    "undevicies", "vicies",
+)
+
+
+def _article_order_key(eid):
+    """
+    Chiave d'ordinamento di un eId di articolo (es: "art_16-bis" -> (16, 1)).
+
+    Returns:
+        tuple (numero, indice estensione) o None se l'estensione non è nota
+    """
+    number, _separator, extension = eid[len("art_"):].partition("-")
+    if not number.isdigit() or extension not in _ARTICLE_EXTENSIONS:
+        return None
+    return int(number), _ARTICLE_EXTENSIONS.index(extension)
+
+
+class ArticleSelection:
+    """
+    Selezione di uno o più articoli per eId: articoli singoli e intervalli.
+
+    Ogni voce è una tupla ``(etichetta, eId iniziale, eId finale)``; per un
+    articolo singolo i due eId coincidono. Un intervallo comprende tutti gli
+    articoli che nel documento stanno tra i due estremi, inclusi bis/ter
+    intermedi. Gli articoli selezionati restano nell'ordine del documento.
+
+    Args:
+        ranges: iterabile di tuple ``(etichetta, eId iniziale, eId finale)``
+
+    Raises:
+        ValueError: se un intervallo ha l'estremo iniziale dopo quello finale
+    """
+
+    def __init__(self, ranges):
+        self.ranges = list(ranges)
+        for label, start, end in self.ranges:
+            first = _article_order_key(start)
+            last = _article_order_key(end)
+            if first is not None and last is not None and first > last:
+                raise ValueError(f"Intervallo di articoli invertito: '{label}'")
+
+    @classmethod
+    def from_eids(cls, eids):
+        """Selezione di articoli singoli a partire da uno o più eId."""
+        if isinstance(eids, str):
+            eids = [eids]
+        return cls((eid, eid, eid) for eid in eids)
+
+    @classmethod
+    def coerce(cls, value):
+        """Accetta ArticleSelection, un eId o una lista di eId; None se vuoto."""
+        if not value:
+            return None
+        if isinstance(value, cls):
+            return value
+        return cls.from_eids(value)
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def __str__(self):
+        return ",".join(label for label, _start, _end in self.ranges)
+
+    def metadata_value(self):
+        """
+        Valore del campo ``article`` del front matter: l'eId per un articolo
+        singolo (come per i riferimenti ``~artN`` negli URL), altrimenti
+        l'elenco delle etichette (es: "1,3,5-7").
+        """
+        if len(self.ranges) == 1:
+            _label, start, end = self.ranges[0]
+            if start == end:
+                return start
+        return str(self)
+
+    def resolve(self, positions):
+        """
+        Risolve la selezione su una sequenza ordinata di articoli.
+
+        Args:
+            positions: dizionario eId -> posizione dell'articolo nella sequenza
+
+        Returns:
+            tuple: (posizioni selezionate in ordine crescente, etichette non trovate)
+        """
+        selected = set()
+        missing = []
+        for label, start, end in self.ranges:
+            first = positions.get(start)
+            last = positions.get(end)
+            if first is None or last is None or last < first:
+                missing.append(label)
+                continue
+            selected.update(range(first, last + 1))
+        return sorted(selected), missing
+
+    def matcher(self):
+        """
+        Funzione ``eId -> bool`` da chiamare sugli articoli in ordine di documento.
+
+        Restituisce True per gli articoli che possono appartenere alla
+        selezione (estremi e articoli dentro un intervallo aperto): serve a chi
+        legge il documento in streaming per tenere solo i candidati, da
+        passare poi a ``resolve``.
+        """
+        ends_by_start = {}
+        for _label, start, end in self.ranges:
+            ends_by_start.setdefault(start, []).append(end)
+        open_ends = []
+
+        def match(eid):
+            selected = bool(open_ends) or eid in ends_by_start
+            if eid in open_ends:
+                open_ends[:] = [end for end in open_ends if end != eid]
+            for end in ends_by_start.get(eid, ()):
+                if end != eid:
+                    open_ends.append(end)
+            return selected
+
+        return match
+
+
+def outermost_articles(articles):
+    """Scarta gli articoli contenuti in un altro articolo della lista (es. citati in una novella)."""
+    nested = set()
+    result = []
+    for article in articles:
+        if article in nested:
+            continue
+        result.append(article)
+        for descendant in article.iter(article.tag):
+            if descendant is not article:
+                nested.add(descendant)
+    return result
+
+
+def filter_xml_to_article(root, article_eid, ns, article=None):
     """
     Filtra il documento XML per estrarre solo l'articolo specificato
 
     Args:
-        root: elemento root del documento XML
+        root: elemento root del documento XML (ElementTree o lxml)
         article_eid: eId dell'articolo da estrarre (es. "art_3")
         ns: namespace Akoma Ntoso
+        article: elemento articolo già individuato (opzionale, evita la ricerca)
 
     Returns:
-        ET.Element or None: nuovo root con solo l'articolo, o None se articolo non trovato
+        Element or None: nuovo root con solo l'articolo, o None se articolo non trovato
     """
-    # Trova l'articolo specifico
-    article = root.find(f'.//akn:article[@eId="{article_eid}"]', ns)
+    # Trova l'articolo specifico (XPath compilata con lxml)
+    if article is None:
+        article = backend_for(root).find_article(root, article_eid, ns)
     if article is None:
         return None
+    return filter_xml_to_articles(root, [article], ns)
+
+
+def filter_xml_to_articles(root, articles, ns):
+    """
+    Costruisce un documento ridotto con meta e gli articoli indicati.
+
+    Args:
+        root: elemento root del documento XML (ElementTree o lxml)
+        articles: elementi articolo in ordine di documento
+        ns: namespace Akoma Ntoso
+
+    Returns:
+        Element: nuovo root con meta e un body contenente solo gli articoli
+    """
+    backend = backend_for(root)
 
-    # Crea un nuovo documento con solo l'articolo
+    # Crea un nuovo documento con solo gli articoli
     # Copia meta e altri elementi di livello superiore
-    new_root = ET.Element(root.tag, root.attrib)
+    new_root = backend.Element(root.tag, root.attrib)
 
     # Copia namespace declarations
-    for prefix, uri in ns.items():
-        if prefix:
-            new_root.set(f"xmlns:{prefix}", uri)
-        else:
-            new_root.set("xmlns", uri)
+    backend.declare_namespaces(new_root, ns)
 
     # Copia meta section
     meta = root.find(".//akn:meta", ns)
     if meta is not None:
-        new_root.append(meta)
+        new_root.append(backend.graft(meta))
 
     # Crea un nuovo body con solo l'articolo
     # Copy namespace from the original body
     original_body = root.find(".//akn:body", ns)
     if original_body is not None:
-        body = ET.SubElement(new_root, original_body.tag, original_body.attrib)
+        body = backend.SubElement(new_root, original_body.tag, original_body.attrib)
     else:
-        body = ET.SubElement(new_root, "body")
-    body.append(article)
+        body = backend.SubElement(new_root, "body")
+    for article in outermost_articles(articles):
+        body.append(backend.graft(article))
 
     return new_root
+
+
+class AkomaDocument:
+    """
+    Documento Akoma Ntoso analizzato una sola volta e condiviso tra le fasi.
+
+    Il parsing avviene al primo accesso a ``root``; metadati, elenco degli
+    href e indice degli eId vengono calcolati su richiesta e memorizzati, così
+    mappatura dei link, filtro articolo, conversione e validazione lavorano
+    sullo stesso albero.
+
+    Args:
+        source: percorso (o file-like) del documento XML
+        root: elemento root già disponibile (in alternativa a ``source``)
+        ns: namespace Akoma Ntoso
+        parser: backend XML ("auto", "lxml" o "etree"); con ``root`` si usa
+            il backend a cui appartiene l'elemento
+    """
+
+    def __init__(self, source=None, root=None, ns=AKN_NAMESPACE, parser="auto"):
+        self.source = source
+        self.ns = ns
+        self.backend = backend_for(root) if root is not None else get_backend(parser)
+        self._root = root
+        self._metadata = None
+        self._hrefs = None
+        self._eid_index = None
+        self._articles = None
+        self._article_positions = None
+
+    @property
+    def root(self):
+        """Elemento root del documento (esegue il parsing al primo accesso)."""
+        if self._root is None:
+            self._root = self.backend.parse(self.source)
+        return self._root
+
+    @property
+    def metadata(self):
+        """Copia dei metadati estratti con ``extract_metadata_from_xml``."""
+        if self._metadata is None:
+            self._metadata = extract_metadata_from_xml(self.root)
+        return dict(self._metadata)
+
+    @property
+    def hrefs(self):
+        """Lista di tuple ``(tag, href)`` per ogni elemento con attributo href."""
+        if self._hrefs is None:
+            if self.backend.supports_xpath:
+                self._hrefs = self.backend.collect_hrefs(self.root)
+            else:
+                self._build_index()
+        return self._hrefs
+
+    @property
+    def eid_index(self):
+        """Dizionario eId -> primo elemento con quell'eId."""
+        if self._eid_index is None:
+            self._build_index()
+        return self._eid_index
+
+    @property
+    def articles(self):
+        """Elementi ``<article>`` in ordine di documento."""
+        if self._articles is None:
+            self._build_index()
+        return self._articles
+
+    @property
+    def article_positions(self):
+        """Dizionario eId -> posizione del primo articolo con quell'eId in ``articles``."""
+        if self._article_positions is None:
+            self._build_index()
+        return self._article_positions
+
+    def _build_index(self):
+        # Un solo attraversamento dell'albero per href, eId e articoli
+        hrefs = []
+        eid_index = {}
+        articles = []
+        article_positions = {}
+        article_tag = f"{{{self.ns['akn']}}}article"
+        for element in self.root.iter():
+            href = element.get("href")
+            if href:
+                hrefs.append((element.tag, href))
+            eid = element.get("eId")
+            if eid is not None and eid not in eid_index:
+                eid_index[eid] = element
+            if element.tag == article_tag:
+                if eid is not None and eid not in article_positions:
+                    article_positions[eid] = len(articles)
+                articles.append(element)
+        if self._hrefs is None:
+            self._hrefs = hrefs
+        self._eid_index = eid_index
+        self._articles = articles
+        self._article_positions = article_positions
+
+    def find_article(self, article_eid):
+        """Restituisce l'elemento ``<article>`` con l'eId indicato o None."""
+        if self.backend.supports_xpath:
+            return self.backend.find_article(self.root, article_eid, self.ns)
+        element = self.eid_index.get(article_eid)
+        if element is None:
+            return None
+        if element.tag == f"{{{self.ns['akn']}}}article":
+            return element
+        # eId duplicato su un elemento diverso: ricerca completa
+        return self.root.find(f'.//akn:article[@eId="{article_eid}"]', self.ns)
+
+    def filter_to_article(self, article_eid):
+        """Come ``filter_xml_to_article`` ma usando l'indice degli eId."""
+        article = self.find_article(article_eid)
+        if article is None:
+            return None
+        return filter_xml_to_article(self.root, article_eid, self.ns, article=article)
+
+    def select_articles(self, selection):
+        """
+        Articoli della selezione, risolti con l'indice degli eId.
+
+        Args:
+            selection: ArticleSelection, un eId o una lista di eId
+
+        Returns:
+            tuple: (elementi articolo in ordine di documento, etichette non trovate)
+        """
+        selection = ArticleSelection.coerce(selection)
+        if selection is None:
+            return [], []
+        positions, missing = selection.resolve(self.article_positions)
+        return [self.articles[position] for position in positions], missing
+
+    def filter_to_articles(self, selection):
+        """
+        Documento ridotto con tutti gli articoli della selezione (un solo parsing).
+
+        Returns:
+            tuple: (nuovo root o None se nessun articolo trovato, etichette non trovate)
+        """
+        articles, missing = self.select_articles(selection)
+        if not articles:
+            return None, missing
+        return filter_xml_to_articles(self.root, articles, self.ns), missing
@@ -5,7 +5,11 @@ import unittest
 sys.path.insert(0, "src")
 
 from normattiva2md.akoma_utils import (
+    AKN_TYPE_URN_PREFIX,
     akoma_uri_to_normattiva_url,
+    akoma_url_cache_stats,
+    citation_key,
+    clear_akoma_url_cache,
     extract_akoma_uris_from_xml,
     extract_cited_laws,
     parse_article_reference,
@@ -14,6 +18,21 @@ from normattiva2md.constants import AKN_NAMESPACE
 
 
 class TestAkomaUtils(unittest.TestCase):
+    def test_citation_key_merges_spellings_of_the_same_act(self):
+        base = "https://www.normattiva.it/uri-res/N2Ls?"
+        variants = [
+            base + "urn:nir:stato:decreto.legislativo:2005-03-07;82",
+            base + "urn:nir:stato:decreto.legislativo:2005;82~art5",
+            base + "urn:nir:stato:decreto-legislativo:2005-03-07;82!vig=2020-01-01",
+            base + "URN:NIR:STATO:DECRETO.LEGISLATIVO:2005;82",
+        ]
+        keys = {citation_key(url) for url in variants}
+        self.assertEqual(keys, {"urn:nir:stato:decreto.legislativo:2005;82"})
+        self.assertNotEqual(
+            citation_key(base + "urn:nir:stato:legge:2005;82"),
+            citation_key(variants[0]),
+        )
+
     def test_parse_article_reference(self):
         url = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020-01-01;1~art16bis"
         self.assertEqual(parse_article_reference(url), "art_16bis")
@@ -36,6 +55,31 @@ class TestAkomaUtils(unittest.TestCase):
         uri = "/akn/it/act/unknown/stato/2003-07-29/229/!main"
         self.assertIsNone(akoma_uri_to_normattiva_url(uri))
 
+    def test_akoma_uri_to_normattiva_url_type_table(self):
+        uri = "/akn/it/act/decretoLegislativo/stato/2005-03-07/82/!main#art_16-bis"
+        self.assertEqual(
+            akoma_uri_to_normattiva_url(uri),
+            "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:decreto.legislativo:2005-03-07;82~art16",
+        )
+        for tipo, (prefix, _numbered) in AKN_TYPE_URN_PREFIX.items():
+            url = akoma_uri_to_normattiva_url(f"/akn/it/act/{tipo}/stato/2000-01-01/5/!main")
+            self.assertIn(f"?{prefix}:2000-01-01", url)
+
+    def test_akoma_uri_to_normattiva_url_invalid_input(self):
+        self.assertIsNone(akoma_uri_to_normattiva_url(None))
+        self.assertIsNone(akoma_uri_to_normattiva_url("/akn/it/act/legge/stato/2020-01-01"))
+
+    def test_akoma_url_cache_stats(self):
+        clear_akoma_url_cache()
+        uri = "/akn/it/act/legge/stato/2003-07-29/229/!main#art_1"
+        for _ in range(3):
+            akoma_uri_to_normattiva_url(uri)
+        stats = akoma_url_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["currsize"]), (2, 1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+        clear_akoma_url_cache()
+        self.assertEqual(akoma_url_cache_stats()["hit_rate"], 0.0)
+
     def test_extract_akoma_uris_from_xml(self):
         xml = (
             f"<akn:akomaNtoso xmlns:akn=\"{AKN_NAMESPACE['akn']}\">"
@@ -78,6 +78,45 @@ class TestModels(unittest.TestCase):
         self.assertEqual(result.codice_redaz, "22G00001")
         self.assertEqual(result.data_vigenza, "20250101")
 
+    def test_conversion_result_renders_lazily(self):
+        """Markdown is produced from fragments only when requested."""
+        calls = []
+
+        def fragments():
+            calls.append(1)
+            return iter(["---\nurl: x\n---\n\n", "# Titolo\n\n", "Testo\n"])
+
+        result = ConversionResult(fragments=fragments, metadata={})
+        self.assertEqual(calls, [])
+
+        self.assertEqual(result.title, "Titolo")
+        self.assertEqual(result.markdown, "---\nurl: x\n---\n\n# Titolo\n\nTesto\n")
+        self.assertEqual(str(result), result.markdown)
+        # After materialisation the renderer is no longer called
+        self.assertEqual(len(calls), 2)
+        result.title
+        self.assertEqual(len(calls), 2)
+
+    def test_conversion_result_write_to_and_save_stream(self):
+        """write_to()/save() write fragments without building the full text."""
+        import io
+        import os
+        import tempfile
+
+        result = ConversionResult(
+            fragments=lambda: iter(["# A\n\n", "corpo\n"]), metadata={}
+        )
+        buffer = io.StringIO()
+        self.assertEqual(result.write_to(buffer), len("# A\n\ncorpo\n"))
+        self.assertEqual(buffer.getvalue(), "# A\n\ncorpo\n")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "out.md")
+            result.save(path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "# A\n\ncorpo\n")
+        self.assertIsNone(result._markdown)
+
     def test_search_result_creation(self):
         """Test SearchResult creation."""
         result = SearchResult(
@@ -36,6 +36,20 @@ class TestApiConversion(unittest.TestCase):
             "</akn:akomaNtoso>"
         )
 
+    def test_convert_xml_multiple_articles_single_front_matter(self):
+        xml = self._minimal_xml().replace(
+            "<akn:ref ",
+            "<akn:article eId=\"art_2\"><akn:num>Art. 2</akn:num></akn:article>"
+            "<akn:article eId=\"art_3\"><akn:num>Art. 3</akn:num></akn:article><akn:ref ",
+            1,
+        )
+        path = self._write_xml(xml)
+        result = convert_xml(path, article=["1", "2-3"], quiet=True)
+        self.assertEqual(result.markdown.count("legal_notice:"), 1)
+        self.assertIn("## Art. 2", result.markdown)
+        self.assertIn("## Art. 3", result.markdown)
+        self.assertIsNone(convert_xml(path, article="9", quiet=True))
+
     def test_convert_xml_missing_file(self):
         with self.assertRaises(XMLFileNotFoundError):
             convert_xml("/tmp/does-not-exist.xml")
@@ -52,10 +66,13 @@ class TestApiConversion(unittest.TestCase):
     def test_convert_xml_with_urls_builds_cross_references(self):
         xml_path = self._write_xml(self._minimal_xml())
 
-        with mock.patch("normattiva2md.api.generate_markdown_text", return_value="MD") as mock_generate:
+        with mock.patch(
+            "normattiva2md.api.iter_markdown_fragments", return_value=iter(["MD"])
+        ) as mock_generate:
             result = convert_xml(xml_path, with_urls=True, quiet=True)
+            self.assertIsNotNone(result)
+            self.assertEqual(result.markdown, "MD")
 
-        self.assertIsNotNone(result)
         cross_references = mock_generate.call_args.kwargs["cross_references"]
         self.assertIn(
             "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2004-01-01;10~art2",
@@ -70,7 +87,7 @@ class TestApiConversion(unittest.TestCase):
         xml_path = self._write_xml(self._minimal_xml())
 
         with mock.patch(
-            "normattiva2md.api.extract_metadata_from_xml",
+            "normattiva2md.xml_parser.extract_metadata_from_xml",
             return_value={
                 "dataGU": "20200101",
                 "codiceRedaz": "XYZ",
@@ -79,13 +96,14 @@ class TestApiConversion(unittest.TestCase):
             },
         ):
             with mock.patch(
-                "normattiva2md.api.generate_markdown_text", return_value="MD"
+                "normattiva2md.api.iter_markdown_fragments", return_value=iter(["MD"])
             ) as mock_generate:
-                convert_xml(
+                result = convert_xml(
                     xml_path,
                     metadata={"dataGU": "20221212", "custom": "value"},
                     quiet=True,
                 )
+                self.assertEqual(result.markdown, "MD")
 
         merged_metadata = mock_generate.call_args.kwargs["metadata"]
         self.assertEqual(merged_metadata["dataGU"], "20221212")
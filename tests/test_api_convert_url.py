@@ -1,21 +1,47 @@
 import os
 import tempfile
 import unittest
+from pathlib import Path
 from unittest import mock
 
-from normattiva2md.api import convert_url
+from normattiva2md.api import convert_url, convert_xml
+from normattiva2md.exceptions import ConversionError
+from normattiva2md.xml_cache import XMLCache
+
+FIXTURE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "test_data"
+    / "20050516_005G0104_VIGENZA_20250130.xml"
+)
+
+MINIMAL_XML = (
+    '<akn:akomaNtoso xmlns:akn="http://docs.oasis-open.org/legaldocml/ns/akn/3.0">'
+    "<akn:meta/>"
+    "<akn:body/>"
+    "</akn:akomaNtoso>"
+)
+
+
+class ChunkedResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        # Blocchi piccoli: il parser riceve elementi spezzati a metà
+        for start in range(0, len(self.content), 1000):
+            yield self.content[start : start + 1000]
 
 
 class TestApiConvertUrl(unittest.TestCase):
     def _write_minimal_xml(self, path):
-        content = (
-            '<akn:akomaNtoso xmlns:akn="http://docs.oasis-open.org/legaldocml/ns/akn/3.0">'
-            "<akn:meta/>"
-            "<akn:body/>"
-            "</akn:akomaNtoso>"
-        )
         with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
+            f.write(MINIMAL_XML)
 
     def test_convert_url_success(self):
         params = {
@@ -26,16 +52,27 @@ class TestApiConvertUrl(unittest.TestCase):
         with tempfile.TemporaryDirectory() as tmpdir:
             xml_path = os.path.join(tmpdir, "doc.xml")
 
-            def fake_download(_params, output_path, _session, quiet=False):
-                self._write_minimal_xml(output_path)
+            def fake_flow(
+                _params,
+                output_path,
+                quiet=False,
+                cache=None,
+                on_chunk=None,
+                cancel=None,
+            ):
+                if output_path:
+                    self._write_minimal_xml(output_path)
+                if on_chunk:
+                    on_chunk(MINIMAL_XML.encode("utf-8"))
                 return True
+                yield
 
             with mock.patch(
                 "normattiva2md.api.extract_params_from_normattiva_url",
                 return_value=(params, object()),
             ), mock.patch(
-                "normattiva2md.api.download_akoma_ntoso",
-                side_effect=fake_download,
+                "normattiva2md.strategies.download_akoma_ntoso_flow",
+                side_effect=fake_flow,
             ):
                 result = convert_url(
                     "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1",
@@ -45,6 +82,53 @@ class TestApiConvertUrl(unittest.TestCase):
         self.assertEqual(result.metadata["codiceRedaz"], "X")
         self.assertTrue(result.url.startswith("https://www.normattiva.it/uri-res/N2Ls"))
 
+    def test_convert_url_parses_while_downloading(self):
+        params = {"dataGU": "20050516", "codiceRedaz": "005G0104", "dataVigenza": "20250130"}
+        xml = FIXTURE_PATH.read_bytes()
+        session = mock.Mock()
+        session.get.return_value = ChunkedResponse(xml)
+        url = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:decreto.legislativo:2005-03-07;82"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            keep_path = os.path.join(tmpdir, "doc.xml")
+            cache = XMLCache(os.path.join(tmpdir, "cache"))
+            with mock.patch(
+                "normattiva2md.api.extract_params_from_normattiva_url",
+                return_value=(params, session),
+            ), mock.patch("tempfile.NamedTemporaryFile") as named_temporary_file:
+                result = convert_url(
+                    url, quiet=True, client=session, cache=cache, keep_xml=keep_path
+                )
+                selected = convert_url(url, article="1-2", quiet=True, client=session)
+
+            named_temporary_file.assert_not_called()
+            with open(keep_path, "rb") as f:
+                self.assertEqual(f.read(), xml)
+            self.assertEqual(cache.get(params), xml)
+
+            expected = convert_xml(str(FIXTURE_PATH), metadata=result.metadata, quiet=True)
+            self.assertEqual(result.markdown, expected.markdown)
+            self.assertIn("urn_nir", result.metadata)
+            self.assertEqual(selected.metadata["article"], "1-2")
+            self.assertIn("Art. 2", selected.markdown)
+            self.assertNotIn("Art. 3", selected.markdown)
+
+    def test_reversed_article_range_fails_before_any_request(self):
+        with mock.patch(
+            "normattiva2md.api.extract_params_from_normattiva_url"
+        ) as extract, mock.patch("normattiva2md.api.run_strategies") as run:
+            with self.assertRaises(ConversionError):
+                convert_url(
+                    "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1",
+                    article="7-5",
+                    quiet=True,
+                )
+        extract.assert_not_called()
+        run.assert_not_called()
+
+        with self.assertRaises(ConversionError):
+            convert_xml(str(FIXTURE_PATH), article="1,7-5", quiet=True)
+
 
 if __name__ == "__main__":
     unittest.main()
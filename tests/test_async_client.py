@@ -0,0 +1,201 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from normattiva2md import async_client
+from normattiva2md.async_client import (
+    AsyncNormattivaClient,
+    download_akoma_ntoso_async,
+    extract_params_async,
+    fetch_document_async,
+)
+from normattiva2md.http_client import NormattivaClient, Request, Sleep, run_sync
+from normattiva2md.normattiva_api import extract_params_from_normattiva_url
+
+URL = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;{}"
+PAGE = '<a href="/do/atto/caricaAKN?dataGU=20200102&codiceRedaz={}&dataVigenza=20200103">x</a>'
+XML = b"<?xml version='1.0'?><akomaNtoso><body>A</body></akomaNtoso>"
+
+
+class FakeResponse:
+    def __init__(self, text="", content=b"", status_code=200):
+        self.text = text
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+
+class FakeAsyncTransport:
+    """Trasporto asincrono che registra la concorrenza massima raggiunta."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def request(self, method, url, headers=None, **kwargs):
+        self.calls.append((method, url, headers, kwargs))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if "caricaAKN" in url:
+            return FakeResponse(content=XML)
+        return FakeResponse(text=PAGE.format(url.rsplit(";", 1)[1]))
+
+    async def aclose(self):
+        pass
+
+
+class TestRunSync(unittest.TestCase):
+    def test_sleep_and_errors_are_handled_inside_the_flow(self):
+        def flow():
+            try:
+                yield Request("GET", "https://www.normattiva.it/a")
+            except requests.ConnectionError:
+                pass
+            yield Sleep(2)
+            response = yield Request("GET", "https://www.normattiva.it/b")
+            return response.text
+
+        session = mock.Mock()
+        session.get.side_effect = [requests.ConnectionError("x"), FakeResponse("ok")]
+        client = NormattivaClient(session=session, retry=False)
+        with mock.patch("normattiva2md.http_client.time.sleep") as sleep:
+            self.assertEqual(run_sync(flow(), client), "ok")
+        sleep.assert_called_once_with(2)
+
+
+class TestAsyncEngine(unittest.TestCase):
+    def test_async_and_sync_share_the_same_flow(self):
+        transport = FakeAsyncTransport()
+        client = AsyncNormattivaClient(client=transport)
+        params = asyncio.run(extract_params_async(URL.format(1), client, quiet=True))
+
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(text=PAGE.format(1))
+        expected, _ = extract_params_from_normattiva_url(
+            URL.format(1), session=session, quiet=True
+        )
+
+        self.assertEqual(params, expected)
+        _, _, headers, kwargs = transport.calls[0]
+        sync_headers = session.get.call_args[1]["headers"]
+        self.assertEqual(headers["User-Agent"], sync_headers["User-Agent"])
+        self.assertIn("timeout", kwargs)
+
+    def test_per_host_semaphore_limits_concurrency(self):
+        transport = FakeAsyncTransport()
+        client = AsyncNormattivaClient(
+            client=transport, max_per_host=3, rate_limiter=False
+        )
+
+        async def main():
+            return await asyncio.gather(
+                *(
+                    extract_params_async(URL.format(n), client, quiet=True)
+                    for n in range(20)
+                )
+            )
+
+        results = asyncio.run(main())
+        self.assertEqual([r["codiceRedaz"] for r in results], [str(n) for n in range(20)])
+        self.assertEqual(transport.max_in_flight, 3)
+
+    def test_fetch_document(self):
+        client = AsyncNormattivaClient(client=FakeAsyncTransport())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, "doc.xml")
+            metadata = asyncio.run(
+                fetch_document_async(URL.format(7), output_path, client, quiet=True)
+            )
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), XML)
+        self.assertEqual(metadata["codiceRedaz"], "7")
+        self.assertIn("caricaAKN", metadata["url_xml"])
+
+    def test_download_error_is_reported_not_raised(self):
+        class Failing(FakeAsyncTransport):
+            async def request(self, method, url, headers=None, **kwargs):
+                raise requests.ConnectionError("offline")
+
+        client = AsyncNormattivaClient(client=Failing())
+        params = {"dataGU": "20200102", "codiceRedaz": "A", "dataVigenza": "20200103"}
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch("sys.stderr"):
+            ok = asyncio.run(
+                download_akoma_ntoso_async(
+                    params, os.path.join(tmpdir, "doc.xml"), client, quiet=True
+                )
+            )
+        self.assertFalse(ok)
+
+    @unittest.skipIf(async_client.httpx is not None, "httpx installato")
+    def test_default_transport_requires_httpx(self):
+        with self.assertRaises(ImportError):
+            AsyncNormattivaClient()
+
+    @unittest.skipIf(async_client.httpx is None, "httpx non installato")
+    def test_httpx_transport(self):
+        httpx = async_client.httpx
+
+        def handler(request):
+            if request.url.path.endswith("caricaAKN"):
+                return httpx.Response(200, content=XML)
+            return httpx.Response(500)
+
+        async def main(output_path):
+            transport = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with AsyncNormattivaClient(client=transport) as client:
+                params = {"dataGU": "1", "codiceRedaz": "A", "dataVigenza": "2"}
+                return await download_akoma_ntoso_async(
+                    params, output_path, client, quiet=True
+                )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.assertTrue(asyncio.run(main(os.path.join(tmpdir, "doc.xml"))))
+
+    @unittest.skipIf(async_client.httpx is None, "httpx non installato")
+    def test_httpx_stream_stops_at_size_limit(self):
+        httpx = async_client.httpx
+        sent = []
+
+        async def body():
+            yield XML
+            for _ in range(100):
+                sent.append(1)
+                yield b"x" * 1024
+
+        def handler(request):
+            return httpx.Response(200, content=body())
+
+        async def main(output_path):
+            transport = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with AsyncNormattivaClient(client=transport) as client:
+                params = {"dataGU": "1", "codiceRedaz": "A", "dataVigenza": "2"}
+                return await download_akoma_ntoso_async(
+                    params, output_path, client, quiet=True
+                )
+
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch(
+            "normattiva2md.normattiva_api.MAX_FILE_SIZE_BYTES", 4096
+        ), mock.patch("sys.stderr"):
+            output_path = os.path.join(tmpdir, "doc.xml")
+            self.assertFalse(asyncio.run(main(output_path)))
+            self.assertFalse(os.path.exists(output_path))
+        self.assertLess(len(sent), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -48,6 +48,27 @@ class TestCliMore(unittest.TestCase):
                     with self.assertRaises(SystemExit):
                         cli.main()
 
+    def test_local_file_conversion_streaming_flag(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = os.path.join(tmpdir, "doc.xml")
+            with open(input_path, "w", encoding="utf-8") as f:
+                f.write("<root/>")
+
+            with mock.patch(
+                "normattiva2md.cli.convert_akomantoso_to_markdown_streaming",
+                return_value=True,
+            ) as streaming, mock.patch(
+                "normattiva2md.cli.convert_akomantoso_to_markdown_improved"
+            ) as improved:
+                with mock.patch(
+                    "sys.argv",
+                    ["normattiva2md", "--streaming", input_path, os.path.join(tmpdir, "out.md")],
+                ):
+                    cli.main()
+
+            streaming.assert_called_once()
+            improved.assert_not_called()
+
     def test_url_conversion_happy_path(self):
         params = {
             "dataGU": "20200101",
@@ -66,7 +87,8 @@ class TestCliMore(unittest.TestCase):
                 "normattiva2md.cli.extract_params_from_normattiva_url",
                 return_value=(params, object()),
             ), mock.patch(
-                "normattiva2md.cli.download_akoma_ntoso", return_value=True
+                "normattiva2md.cli.run_strategies",
+                return_value=("caricaAKN", {**params, "url": "", "url_xml": ""}),
             ), mock.patch(
                 "normattiva2md.cli.convert_akomantoso_to_markdown_improved",
                 return_value=True,
@@ -11,8 +11,8 @@ class TestCLIValidation(unittest.TestCase):
     @patch('normattiva2md.cli.convert_akomantoso_to_markdown_improved')
     @patch('normattiva2md.cli.MarkdownValidator')
     @patch('normattiva2md.cli.StructureComparer')
-    @patch('normattiva2md.cli.download_akoma_ntoso')
-    @patch('normattiva2md.cli.ET.parse')
+    @patch('normattiva2md.cli.run_strategies')
+    @patch('xml.etree.ElementTree.parse')
     @patch('os.path.exists')
     @patch('normattiva2md.cli.open', new_callable=mock_open, read_data="# MD Content")
     def test_validate_flag_triggers_validation(self, mock_cli_open, mock_exists, mock_et_parse, mock_download, mock_comparer, mock_validator, mock_convert, mock_parse):
@@ -34,7 +34,22 @@ class TestCLIValidation(unittest.TestCase):
             auto_select=True,
             exa_api_key=None,
             version=False,
-            article_filter=None
+            article_filter=None,
+            streaming=False,
+            parser="etree",
+            jobs=None,
+            cache_dir=None,
+            vigenza_ttl=24.0,
+            revalidate=False,
+            rate=5.0,
+            burst=10,
+            retries=2,
+            breaker_threshold=5,
+            hedge_delay=10.0,
+            ref_workers=4,
+            max_per_host=6,
+            depth=1,
+            max_documents=None
         )
         mock_parse.return_value = mock_args
         mock_exists.return_value = True
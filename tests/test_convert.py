@@ -6,6 +6,10 @@ import tempfile
 import os
 
 from normattiva2md.markdown_converter import (
+    INLINE_DISPATCH,
+    _paragraph_number_pattern,
+    TagDispatcher,
+    convert_akomantoso_to_markdown_improved,
     generate_markdown_text,
     clean_text_content,
     process_table,
@@ -13,6 +17,9 @@ from normattiva2md.markdown_converter import (
     process_part,
     process_attachment,
     generate_front_matter,
+    iter_markdown_fragments,
+    write_markdown,
+    MarkdownSink,
 )
 from normattiva2md.xml_parser import extract_metadata_from_xml
 from normattiva2md.normattiva_api import (
@@ -60,6 +67,70 @@ class ConvertAkomaNtosoTest(unittest.TestCase):
             "La formattazione del capitolo dovrebbe includere numero romano e titolo",
         )
 
+    def test_conversion_parses_xml_once(self):
+        """with_urls + article filter must reuse a single parsed tree"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, "art1.md")
+            with patch(
+                "normattiva2md.xml_backend.ET.parse", wraps=ET.parse
+            ) as mock_parse:
+                success = convert_akomantoso_to_markdown_improved(
+                    str(FIXTURE_PATH),
+                    output_path,
+                    article_ref="art_1",
+                    with_urls=True,
+                    parser="etree",
+                )
+            self.assertTrue(success)
+            self.assertEqual(mock_parse.call_count, 1)
+
+    def test_tag_dispatcher_matches_endswith_rules(self):
+        """Unknown tags fall back to the suffix rules and are memoized"""
+        dispatcher = TagDispatcher([("ref", "ref"), (("ins", "del"), "mod")], default="text")
+        akn = "{http://docs.oasis-open.org/legaldocml/ns/akn/3.0}"
+        self.assertEqual(dispatcher.get(f"{akn}ref"), "ref")
+        self.assertEqual(dispatcher.get(f"{akn}mref"), "ref")
+        self.assertEqual(dispatcher.get("del"), "mod")
+        self.assertEqual(dispatcher.get(f"{akn}p"), "text")
+        self.assertIn(f"{akn}mref", dispatcher._table)
+
+    def test_inline_dispatch_prebuilt_for_akoma_tags(self):
+        akn = "{http://docs.oasis-open.org/legaldocml/ns/akn/3.0}"
+        for name in ("strong", "emphasis", "ref", "ins", "del", "footnote"):
+            self.assertIn(f"{akn}{name}", INLINE_DISPATCH._table)
+
+    def test_clean_text_content_normalises_each_nesting_level(self):
+        """Whitespace and dash cleanup match per-level normalisation"""
+        xml = (
+            '<akn:p xmlns:akn="http://docs.oasis-open.org/legaldocml/ns/akn/3.0">'
+            "Testo \n <akn:ins>  nuovo <akn:strong> forte </akn:strong>\t</akn:ins>"
+            " -- <akn:span>-- AGGIORNAMENTO (1)</akn:span>"
+            "<akn:del>((gia' marcato))</akn:del>  fine  </akn:p>"
+        )
+        result = clean_text_content(ET.fromstring(xml))
+        self.assertEqual(
+            result, "Testo ((nuovo **forte**)) AGGIORNAMENTO (1)((gia' marcato)) fine"
+        )
+
+    def test_clean_text_content_handles_deep_nesting(self):
+        """Deeply nested amendments must not hit the recursion limit"""
+        root = ET.Element("{http://docs.oasis-open.org/legaldocml/ns/akn/3.0}p")
+        current = root
+        for _ in range(3000):
+            current = ET.SubElement(
+                current, "{http://docs.oasis-open.org/legaldocml/ns/akn/3.0}emphasis"
+            )
+        current.text = " x "
+        result = clean_text_content(root)
+        self.assertEqual(result, "*" * 3000 + "x" + "*" * 3000)
+
+    def test_paragraph_number_patterns_are_cached(self):
+        """Repeated paragraph numbers reuse the same compiled pattern"""
+        pattern = _paragraph_number_pattern("2-bis")
+        self.assertIs(_paragraph_number_pattern("2-bis"), pattern)
+        self.assertEqual(pattern.sub("", "2-bis. Testo", 1), "Testo")
+        self.assertEqual(_paragraph_number_pattern("1").sub("", "10. Testo", 1), "0. Testo")
+
     def test_footnote_element_handling(self):
         """Test that footnote elements are handled without errors"""
         # Create a simple XML element with footnote
@@ -277,6 +348,84 @@ dataGU: 20231201
         self.assertIn("codiceRedaz: 005G0104", markdown_with_frontmatter)
 
 
+class _RecordingOutput:
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        self.flushes += 1
+
+
+class StreamingWriterTests(unittest.TestCase):
+    """Incremental Markdown output (fragment generators and MarkdownSink)"""
+
+    def test_iter_fragments_yields_front_matter_first(self):
+        root = ET.parse(FIXTURE_PATH).getroot()
+        metadata = extract_metadata_from_xml(root)
+        fragments = iter_markdown_fragments(root, metadata=metadata)
+
+        self.assertEqual(next(fragments), generate_front_matter(metadata))
+        self.assertTrue(next(fragments).startswith("# "))
+        self.assertEqual(
+            "".join(iter_markdown_fragments(root, metadata=metadata)),
+            generate_markdown_text(root, metadata=metadata),
+        )
+
+    def test_sink_flushes_first_fragment_then_buffers(self):
+        output = _RecordingOutput()
+        sink = MarkdownSink(output, buffer_size=10)
+
+        sink.write("---\n")
+        self.assertEqual(output.writes, ["---\n"])
+        self.assertEqual(output.flushes, 1)
+
+        sink.write("abc")
+        sink.write("")
+        self.assertEqual(len(output.writes), 1)
+        sink.write("defghijk")
+        self.assertEqual(output.writes[-1], "abcdefghijk")
+
+        sink.write("tail")
+        sink.flush()
+        self.assertEqual("".join(output.writes), "---\nabcdefghijktail")
+        self.assertEqual(sink.chars_written, len("---\nabcdefghijktail"))
+
+    def test_write_markdown_matches_generate_markdown_text(self):
+        root = ET.parse(FIXTURE_PATH).getroot()
+        output = _RecordingOutput()
+        written = write_markdown(root, output)
+        expected = generate_markdown_text(root)
+
+        self.assertEqual("".join(output.writes), expected)
+        self.assertEqual(written, len(expected))
+
+    def test_file_output_leaves_no_partial_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, "out.md")
+            self.assertTrue(
+                convert_akomantoso_to_markdown_improved(str(FIXTURE_PATH), output_path)
+            )
+            self.assertEqual(os.listdir(tmpdir), ["out.md"])
+
+    def test_failed_render_removes_partial_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, "out.md")
+            with patch(
+                "normattiva2md.markdown_converter.process_body_element",
+                side_effect=RuntimeError("boom"),
+            ):
+                self.assertFalse(
+                    convert_akomantoso_to_markdown_improved(
+                        str(FIXTURE_PATH), output_path
+                    )
+                )
+            self.assertEqual(os.listdir(tmpdir), [])
+
+
 class SecurityTests(unittest.TestCase):
     """Test security features: URL validation, path sanitization, file size limits"""
 
@@ -0,0 +1,141 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from requests.adapters import HTTPAdapter
+
+from normattiva2md import http_client, normattiva_api
+from normattiva2md.constants import CONNECT_TIMEOUT, DEFAULT_TIMEOUT, USER_AGENT
+from normattiva2md.http_client import NormattivaClient, as_client, get_default_client
+
+
+class FakeResponse:
+    def __init__(self, text="", status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+
+class TestNormattivaClient(unittest.TestCase):
+    def test_pooled_adapter_is_mounted(self):
+        client = NormattivaClient(pool_connections=2, pool_maxsize=16)
+        adapter = client.session.get_adapter("https://www.normattiva.it/")
+        self.assertIsInstance(adapter, HTTPAdapter)
+        self.assertEqual(adapter._pool_maxsize, 16)
+        self.assertIs(client.session.get_adapter("http://example.com/"), adapter)
+        client.close()
+
+    def test_request_applies_defaults_and_merges_headers(self):
+        session = mock.Mock()
+        client = NormattivaClient(session=session)
+
+        client.get("https://www.normattiva.it/", headers={"Accept": "text/html"})
+
+        _, kwargs = session.get.call_args
+        self.assertEqual(kwargs["timeout"], (CONNECT_TIMEOUT, DEFAULT_TIMEOUT))
+        self.assertTrue(kwargs["verify"])
+        self.assertEqual(kwargs["headers"]["User-Agent"], USER_AGENT)
+        self.assertEqual(kwargs["headers"]["Accept"], "text/html")
+
+    def test_explicit_timeout_wins(self):
+        session = mock.Mock()
+        NormattivaClient(session=session).post("https://x", timeout=5, data="a")
+        _, kwargs = session.post.call_args
+        self.assertEqual(kwargs["timeout"], 5)
+        self.assertEqual(kwargs["data"], "a")
+
+    def test_as_client(self):
+        client = NormattivaClient(session=mock.Mock())
+        self.assertIs(as_client(client), client)
+        self.assertIs(as_client(None), get_default_client())
+        self.assertIs(get_default_client(), get_default_client())
+
+        session = mock.Mock()
+        wrapped = as_client(session)
+        self.assertIsInstance(wrapped, NormattivaClient)
+        self.assertIs(wrapped.session, session)
+
+    def test_context_manager_closes_session(self):
+        session = mock.Mock()
+        with NormattivaClient(session=session):
+            pass
+        session.close.assert_called_once()
+
+    def test_max_per_host_bounds_concurrent_requests(self):
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def slow_get(url, **kwargs):
+            with lock:
+                active.append(url)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(url)
+            return FakeResponse()
+
+        session = mock.Mock()
+        session.get.side_effect = slow_get
+        client = NormattivaClient(session=session, rate_limiter=False, max_per_host=2)
+        threads = [
+            threading.Thread(target=client.get, args=("https://www.normattiva.it/",))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(session.get.call_count, 6)
+        self.assertEqual(max(peak), 2)
+
+    def test_streamed_response_holds_host_slot_until_closed(self):
+        session = mock.Mock()
+        client = NormattivaClient(session=session, rate_limiter=False, max_per_host=1)
+        url = "https://www.normattiva.it/do/atto/caricaAKN"
+
+        first = client.get(url, stream=True)
+        second = []
+        thread = threading.Thread(
+            target=lambda: second.append(client.get(url, stream=True))
+        )
+        thread.start()
+        thread.join(0.1)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(session.get.call_count, 1)
+
+        first.close()
+        first.close()
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(session.get.call_count, 2)
+        second[0].close()
+        client.get(url)
+        self.assertEqual(session.get.call_count, 3)
+
+
+class TestSharedClientUsage(unittest.TestCase):
+    def test_functions_reuse_the_default_client(self):
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(
+            text='<a href="/do/atto/caricaAKN?dataGU=20200102&codiceRedaz=A&dataVigenza=20200103">x</a>'
+        )
+        shared = NormattivaClient(session=session)
+
+        with mock.patch.object(http_client, "_default_client", shared):
+            params, returned = normattiva_api.extract_params_from_normattiva_url(
+                "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1",
+                quiet=True,
+            )
+
+        self.assertEqual(params["codiceRedaz"], "A")
+        self.assertIs(returned, shared)
+        session.get.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
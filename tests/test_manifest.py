@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from normattiva2md.manifest import MANIFEST_NAME, RunManifest
+
+URL = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1"
+CITED = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2019;2"
+PARAMS = {"dataGU": "20190101", "codiceRedaz": "19G00002", "dataVigenza": "20200101"}
+
+
+class TestRunManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = self.tmpdir.name
+        os.makedirs(os.path.join(self.folder, "refs"))
+        self.output = os.path.join(self.folder, "refs", "19G00002_20190101.md")
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write("# Legge")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_record_is_persisted_and_reloaded(self):
+        manifest = RunManifest(self.folder, URL)
+        manifest.record(
+            CITED, "done", params=PARAMS, output="refs/19G00002_20190101.md", cited=["b", "a"]
+        )
+        # Nessun file temporaneo rimasto accanto al manifest
+        self.assertEqual(sorted(os.listdir(self.folder)), [MANIFEST_NAME, "refs"])
+
+        reloaded = RunManifest(self.folder, URL)
+        entry = reloaded.completed(CITED)
+        self.assertEqual(entry["params"], PARAMS)
+        self.assertEqual(entry["cited"], ["a", "b"])
+        self.assertEqual(reloaded.outputs(), ["refs/19G00002_20190101.md"])
+        self.assertEqual(reloaded.stats()["done"], 1)
+
+    def test_changed_output_or_other_law_is_not_resumed(self):
+        manifest = RunManifest(self.folder, URL)
+        manifest.record(CITED, "done", params=PARAMS, output="refs/19G00002_20190101.md")
+        self.assertIsNone(RunManifest(self.folder, CITED).completed(CITED))
+
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write("# Modificata")
+        self.assertIsNone(RunManifest(self.folder, URL).completed(CITED))
+
+        manifest.record(CITED, "failed", error="download")
+        self.assertIsNone(manifest.completed(CITED))
+        self.assertEqual(manifest.outputs(), [])
+
+    def test_failed_save_keeps_previous_manifest(self):
+        manifest = RunManifest(self.folder, URL)
+        manifest.record(CITED, "done", params=PARAMS, output="refs/19G00002_20190101.md")
+
+        with mock.patch("normattiva2md.manifest.json.dump", side_effect=OSError("disco pieno")):
+            with self.assertRaises(OSError):
+                manifest.record(URL, "failed")
+
+        with open(os.path.join(self.folder, MANIFEST_NAME), encoding="utf-8") as f:
+            self.assertEqual(list(json.load(f)["items"]), [CITED])
+        self.assertFalse([name for name in os.listdir(self.folder) if name.endswith(".tmp")])
+
+
+if __name__ == "__main__":
+    unittest.main()
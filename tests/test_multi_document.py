@@ -1,9 +1,13 @@
+import contextlib
+import json
 import os
 import tempfile
+import time
 import unittest
 from unittest import mock
 
 from normattiva2md import multi_document
+from normattiva2md.manifest import MANIFEST_NAME
 
 
 class TestMultiDocument(unittest.TestCase):
@@ -33,32 +37,57 @@ class TestMultiDocument(unittest.TestCase):
             self.assertIn("main.md", content)
             self.assertIn("refs/a.md", content)
 
-    def test_convert_with_references_success(self):
-        def fake_convert(xml_path, md_path, metadata=None, cross_references=None):
+    @contextlib.contextmanager
+    def _fake_pipeline(self, code_for, cited, broken=(), render=None, document=None, delay=0):
+        """
+        Sostituisce risoluzione, download, citazioni e conversione di multi_document.
+
+        ``code_for(url)`` dà il codice redazionale (None = non risolvibile),
+        ``cited`` le citazioni (lista o funzione del documento), ``broken`` i
+        codici il cui download fallisce, ``render(metadata, cross_references)``
+        il testo del markdown. Restituisce gli URL risolti, i codici scaricati
+        e le conversioni (file, parser, processi).
+        """
+        calls = {"resolved": [], "downloaded": [], "converted": []}
+
+        def fake_extract(url, session=None, quiet=False, resolution_cache=None):
+            calls["resolved"].append(url)
+            code = code_for(url)
+            if code is None:
+                return None, session
+            return {"dataGU": "20200101", "codiceRedaz": code, "dataVigenza": "20200102"}, session
+
+        def fake_download(params, output_path, session=None, quiet=False, cache=None):
+            time.sleep(delay)
+            calls["downloaded"].append(params["codiceRedaz"])
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(params["codiceRedaz"])
+            return params["codiceRedaz"] not in broken
+
+        def fake_convert(
+            xml_path, md_path, metadata=None, cross_references=None, document=None,
+            parser="auto", workers=None,
+        ):
+            calls["converted"].append((os.path.basename(md_path), parser, workers))
             with open(md_path, "w", encoding="utf-8") as f:
-                f.write("ok")
+                f.write(render(metadata, cross_references) if render else metadata["codiceRedaz"])
             return True
 
-        params = {
-            "dataGU": "20200101",
-            "codiceRedaz": "X",
-            "dataVigenza": "20200102",
-        }
+        cited_option = {"side_effect": cited} if callable(cited) else {"return_value": cited}
+        with contextlib.ExitStack() as stack:
+            for name, options in (
+                ("extract_params_from_normattiva_url", {"side_effect": fake_extract}),
+                ("download_akoma_ntoso", {"side_effect": fake_download}),
+                ("extract_cited_laws", cited_option),
+                ("AkomaDocument", {"side_effect": document}),
+                ("convert_akomantoso_to_markdown_improved", {"side_effect": fake_convert}),
+            ):
+                stack.enter_context(mock.patch.object(multi_document, name, **options))
+            yield calls
 
+    def test_convert_with_references_success(self):
         with tempfile.TemporaryDirectory() as tmpdir:
-            with mock.patch.object(
-                multi_document, "extract_params_from_normattiva_url", return_value=(params, object())
-            ), mock.patch.object(
-                multi_document, "download_akoma_ntoso", return_value=True
-            ), mock.patch.object(
-                multi_document, "extract_cited_laws", return_value={"https://a", "https://b"}
-            ), mock.patch.object(
-                multi_document,
-                "convert_akomantoso_to_markdown_improved",
-                side_effect=fake_convert,
-            ), mock.patch.object(
-                multi_document.time, "sleep"
-            ):
+            with self._fake_pipeline(lambda url: "X", {"https://a", "https://b"}):
                 success = multi_document.convert_with_references(
                     "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1",
                     output_dir=tmpdir,
@@ -71,6 +100,187 @@ class TestMultiDocument(unittest.TestCase):
             refs_dir = os.path.join(tmpdir, "refs")
             self.assertTrue(os.listdir(refs_dir))
 
+    def test_parser_and_jobs_reach_every_conversion(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self._fake_pipeline(
+                lambda url: "X" + url.rsplit(";", 1)[1],
+                ["https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;2"],
+            ) as calls:
+                self.assertTrue(
+                    multi_document.convert_with_references(
+                        "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1",
+                        output_dir=tmpdir,
+                        quiet=True,
+                        depth=2,
+                        parser="etree",
+                        jobs=2,
+                    )
+                )
+                documents = multi_document.AkomaDocument.call_args_list
+
+        self.assertEqual({call.kwargs["parser"] for call in documents}, {"etree"})
+        self.assertEqual(len(documents), 2)
+        # Processi solo per la principale: le citate girano già nel pool di thread
+        self.assertEqual(
+            sorted(calls["converted"]),
+            [("X2_20200101.md", "etree", None), ("main.md", "etree", 2), ("main.md", "etree", 2)],
+        )
+
+    def test_parallel_crawl_matches_serial_output(self):
+        cited = [f"https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;{n}" for n in range(8)]
+        # Due URL dello stesso atto e un URL non risolvibile
+        cited.append(cited[3] + "~art2")
+        cited.append("https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:1900;0")
+
+        def code_for(url):
+            if url.endswith("1900;0"):
+                return None
+            return "X" + (url.split(";")[1].split("~")[0] if ";" in url else "main")
+
+        def run(tmpdir, workers):
+            with self._fake_pipeline(
+                code_for,
+                cited,
+                broken={"X5"},
+                render=lambda metadata, refs: f"{metadata['codiceRedaz']} {sorted(refs or {})}",
+                delay=0.01,
+            ):
+                self.assertTrue(
+                    multi_document.convert_with_references(
+                        "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020",
+                        output_dir=tmpdir,
+                        quiet=True,
+                        workers=workers,
+                    )
+                )
+            tree = {}
+            for dirpath, _, names in os.walk(tmpdir):
+                for name in names:
+                    path = os.path.join(dirpath, name)
+                    if name == MANIFEST_NAME:
+                        # Stati del manifest senza gli orari di aggiornamento
+                        with open(path, encoding="utf-8") as f:
+                            items = json.load(f)["items"]
+                        tree[name] = {url: item["status"] for url, item in items.items()}
+                        continue
+                    with open(path, encoding="utf-8") as f:
+                        tree[os.path.relpath(path, tmpdir)] = f.read()
+            return tree
+
+        with tempfile.TemporaryDirectory() as serial, tempfile.TemporaryDirectory() as parallel:
+            expected = run(serial, workers=1)
+            self.assertEqual(run(parallel, workers=4), expected)
+
+        # Le due grafie dello stesso atto vengono visitate una volta sola
+        self.assertIn("**Le leggi citate scaricate:** 7", expected["index.md"])
+        self.assertIn("**Le leggi citate non scaricate:** 2", expected["index.md"])
+        self.assertNotIn(os.path.join("refs", "X5_20200101.md"), expected)
+
+    def test_crawl_follows_citations_up_to_depth_once_per_act(self):
+        base = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:"
+        graph = {
+            "A": [base + "2001-01-01;2", base + "2001;3"],
+            "B": [base + "2001;3~art4", base + "2000;1", base + "2001;4"],
+            "C": [base + "2001-01-01;2"],
+            "D": [base + "2001;5"],
+        }
+        names = {"2000;1": "A", "2001;2": "B", "2001;3": "C", "2001;4": "D", "2001;5": "E"}
+
+        def fake_document(path, parser="auto"):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+
+        def crawl(tmpdir, depth, max_documents=None):
+            os.makedirs(os.path.join(tmpdir, "refs"), exist_ok=True)
+            with self._fake_pipeline(
+                lambda url: names[url.split("legge:")[1].split("~")[0].replace("-01-01", "")],
+                lambda document: set(graph.get(document, ())),
+                render=lambda metadata, refs: metadata["url"],
+                document=fake_document,
+            ) as calls:
+                result = multi_document.crawl_cited_laws(
+                    graph["A"],
+                    tmpdir,
+                    session=None,
+                    workers=3,
+                    quiet=True,
+                    depth=depth,
+                    max_documents=max_documents,
+                    visited={multi_document.citation_key(base + "2000-01-01;1")},
+                )
+            return result + (calls["resolved"],)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            mapping, successful, failed, _ = crawl(tmpdir, depth=1)
+            self.assertEqual(sorted(os.listdir(os.path.join(tmpdir, "refs"))), ["B_20200101.md", "C_20200101.md"])
+            self.assertEqual((successful, failed), (2, 0))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            mapping, successful, failed, resolved = crawl(tmpdir, depth=3)
+            refs = sorted(os.listdir(os.path.join(tmpdir, "refs")))
+            self.assertEqual(refs, ["B_20200101.md", "C_20200101.md", "D_20200101.md", "E_20200101.md"])
+            # Ogni atto risolto una volta, principale (A) mai
+            self.assertEqual(len(resolved), 4)
+            self.assertEqual((successful, failed), (4, 0))
+            self.assertEqual(mapping[base + "2001;3~art4"], "refs/C_20200101.md")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            crawl(tmpdir, depth=3, max_documents=3)
+            self.assertEqual(len(os.listdir(os.path.join(tmpdir, "refs"))), 3)
+
+        # Il limite predefinito vale solo oltre il primo livello
+        with mock.patch.object(multi_document, "REFERENCES_MAX_DOCUMENTS", 1):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                crawl(tmpdir, depth=1)
+                self.assertEqual(len(os.listdir(os.path.join(tmpdir, "refs"))), 2)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                crawl(tmpdir, depth=2)
+                self.assertEqual(len(os.listdir(os.path.join(tmpdir, "refs"))), 1)
+
+    def test_rerun_resumes_from_manifest(self):
+        cited = [f"https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;{n}" for n in range(1, 5)]
+        broken = {"X2", "X4"}
+
+        def code_for(url):
+            return "X" + (url.rsplit(";", 1)[1] if url.count(";") else "0")
+
+        def run(tmpdir):
+            with self._fake_pipeline(code_for, set(cited), broken=broken) as calls:
+                self.assertTrue(
+                    multi_document.convert_with_references(
+                        "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;0",
+                        output_dir=tmpdir,
+                        quiet=True,
+                    )
+                )
+            with open(os.path.join(tmpdir, MANIFEST_NAME), encoding="utf-8") as f:
+                return json.load(f)["items"], calls["downloaded"]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            items, _ = run(tmpdir)
+            self.assertEqual(
+                sorted(item["status"] for item in items.values()),
+                ["done", "done", "failed", "failed"],
+            )
+            self.assertEqual(items[cited[0]]["output"], "refs/X1_20200101.md")
+            self.assertEqual(items[cited[0]]["params"]["codiceRedaz"], "X1")
+
+            # Seconda esecuzione: solo i falliti (più la legge principale)
+            broken.clear()
+            items, downloads = run(tmpdir)
+            self.assertEqual(sorted(downloads), ["X0", "X2", "X4"])
+            self.assertEqual({item["status"] for item in items.values()}, {"done"})
+            with open(os.path.join(tmpdir, "index.md"), encoding="utf-8") as f:
+                index = f.read()
+            for n in range(1, 5):
+                self.assertIn(f"refs/X{n}_20200101.md", index)
+
+            # Un file modificato a mano viene rigenerato
+            with open(os.path.join(tmpdir, "refs", "X3_20200101.md"), "w", encoding="utf-8") as f:
+                f.write("modificato")
+            _, downloads = run(tmpdir)
+            self.assertEqual(sorted(downloads), ["X0", "X3"])
+
     def test_convert_with_references_no_params(self):
         with mock.patch.object(
             multi_document, "extract_params_from_normattiva_url", return_value=(None, None)
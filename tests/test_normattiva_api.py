@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import tempfile
@@ -6,6 +7,8 @@ from io import BytesIO
 from unittest import mock
 import zipfile
 
+import requests
+
 sys.path.insert(0, "src")
 
 from normattiva2md import normattiva_api as api
@@ -33,6 +36,10 @@ class FakeResponse:
     def json(self):
         return self._json_data
 
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
 class TestNormattivaApi(unittest.TestCase):
     def test_normalize_and_validate(self):
         url = "https:\\/\\/www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1"
@@ -105,6 +112,29 @@ class TestNormattivaApi(unittest.TestCase):
                     params, output_path, session=session, quiet=True
                 )
             )
+            _, kwargs = session.get.call_args
+            self.assertTrue(kwargs["stream"])
+            with open(output_path + ".debug.html", "rb") as f:
+                self.assertEqual(f.read(), b"<html></html>")
+
+    def test_download_akoma_ntoso_stops_at_size_cap(self):
+        params = {"dataGU": "20200101", "codiceRedaz": "X", "dataVigenza": "20200102"}
+        content = b"<?xml version='1.0'?><akomaNtoso>" + b"x" * 5000
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, "doc.xml")
+            session = mock.Mock()
+            # Nessun Content-Length: il limite vale sui byte ricevuti
+            session.get.return_value = FakeResponse(content=content)
+
+            with mock.patch.object(api, "MAX_FILE_SIZE_BYTES", 1024), mock.patch(
+                "sys.stderr"
+            ):
+                self.assertFalse(
+                    api.download_akoma_ntoso(
+                        params, output_path, session=session, quiet=True
+                    )
+                )
+            self.assertEqual(os.listdir(tmpdir), [])
 
     def test_download_akoma_ntoso_via_opendata(self):
         html = """
@@ -154,6 +184,183 @@ class TestNormattivaApi(unittest.TestCase):
             self.assertEqual(metadata["codiceRedaz"], "24G00001")
             self.assertEqual(metadata["dataVigenza"], "20240202")
 
+    def test_fetch_context_loads_page_once_across_fallbacks(self):
+        url = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2024-01-01;1"
+        page = """
+        <input name="atto.dataPubblicazioneGazzetta" value="2024-01-01"/>
+        <input name="atto.codiceRedazionale" value="24G00001"/>
+        <input name="dataVigenza" value="02/02/2024"/>
+        """
+        menu = '<form id="anteprima"><input name="atto.codiceRedazionale" value="24G00001"/></form>'
+        xml = b"<?xml version='1.0'?><akomaNtoso></akomaNtoso>"
+
+        session = mock.Mock()
+        session.get.side_effect = lambda target, **kwargs: FakeResponse(
+            text=menu if "vediMenuExport" in target else page
+        )
+
+        def post(target, **kwargs):
+            if "/do/atto/export" in target:
+                return FakeResponse(content=xml)
+            raise requests.ConnectionError("OpenData non raggiungibile")
+
+        session.post.side_effect = post
+        context = api.FetchContext()
+
+        with tempfile.TemporaryDirectory() as tmpdir, mock.patch("sys.stderr"):
+            output_path = os.path.join(tmpdir, "doc.xml")
+            params, _ = api.extract_params_from_normattiva_url(
+                url, session=session, quiet=True, context=context
+            )
+            self.assertIsNone(params)
+            success, _, _ = api.download_akoma_ntoso_via_opendata(
+                url, output_path, session=session, quiet=True, context=context
+            )
+            self.assertFalse(success)
+            success, metadata, _ = api.download_akoma_ntoso_via_export(
+                url, output_path, session=session, quiet=True, context=context
+            )
+
+        self.assertTrue(success)
+        self.assertEqual(metadata["codiceRedaz"], "24G00001")
+        page_loads = [c for c in session.get.call_args_list if c.args[0] == url]
+        self.assertEqual(len(page_loads), 1)
+        self.assertEqual(context.reused, 2)
+
+    def test_poll_delays_back_off_until_deadline(self):
+        clock = [0.0]
+        delays = []
+        with mock.patch("normattiva2md.normattiva_api.time.monotonic", lambda: clock[0]):
+            for delay in api._poll_delays(10):
+                delays.append(delay)
+                clock[0] += delay
+        self.assertEqual(delays, [0.5, 1, 2, 4, 2.5])
+
+    def test_opendata_batch_uses_one_search_for_many_laws(self):
+        pages = {
+            1: ("2024-01-01", "24G00001"),
+            2: ("2024-01-10", "24G00002"),
+        }
+        zip_bytes = BytesIO()
+        with zipfile.ZipFile(zip_bytes, "w") as zf:
+            for gu, codice in pages.values():
+                zf.writestr(
+                    f"LEGGE/{gu}_{codice}_VIGENZA_2024-02-01_V1.xml",
+                    f"<?xml version='1.0'?><akomaNtoso>{codice}</akomaNtoso>",
+                )
+            zf.writestr(
+                "LEGGE/2024-01-05_24G00099_VIGENZA_2024-02-01_V1.xml",
+                "<?xml version='1.0'?><akomaNtoso>altro</akomaNtoso>",
+            )
+
+        def get(url, **kwargs):
+            if "check-status" in url:
+                return FakeResponse(json_data={"stato": 3, "totAtti": 3})
+            if "collection-asincrona" in url:
+                return FakeResponse(content=zip_bytes.getvalue())
+            gu, codice = pages[int(url.rsplit(";", 1)[1])]
+            return FakeResponse(
+                text=f"""
+                <input name="atto.dataPubblicazioneGazzetta" value="{gu}"/>
+                <input name="atto.codiceRedazionale" value="{codice}"/>
+                <input name="dataVigenza" value="02/02/2024"/>
+                """
+            )
+
+        session = mock.Mock()
+        session.get.side_effect = get
+        session.post.return_value = FakeResponse(text="token-123")
+        session.put.return_value = FakeResponse(json_data={"stato": 2})
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            urls = [
+                f"https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2024-01-01;{n}"
+                for n in pages
+            ]
+            items = [(url, os.path.join(tmpdir, f"{n}.xml")) for n, url in enumerate(urls)]
+            results = api.download_akoma_ntoso_via_opendata_batch(
+                items, session=session, quiet=True
+            )
+
+            self.assertEqual(session.post.call_count, 1)
+            _, kwargs = session.post.call_args
+            search = json.loads(kwargs["data"])["parametriRicerca"]
+            self.assertTrue(search["dataInizioPubblicazione"].startswith("2024-01-01"))
+            self.assertTrue(search["dataFinePubblicazione"].startswith("2024-01-10"))
+            self.assertEqual(results[urls[1]]["codiceRedaz"], "24G00002")
+            for _, path in items:
+                with open(path, "rb") as f:
+                    self.assertNotIn(b"altro", f.read())
+            with open(items[1][1], "rb") as f:
+                self.assertIn(b"24G00002", f.read())
+
+    def test_collection_members_are_size_capped_and_sniffed(self):
+        meta = {"codiceRedaz": "24G00001", "dataVigenza": "20240202"}
+        name = "LEGGE/2024-01-01_24G00001_VIGENZA_2024-02-01_V1.xml"
+        cases = {
+            "xml": (b"<?xml version='1.0'?><akomaNtoso/>", True),
+            "html": (b"<html>errore</html>", False),
+            "large": (b"<?xml version='1.0'?>" + b"x" * 2048, False),
+        }
+        for label, (member, expected) in cases.items():
+            with self.subTest(label), tempfile.TemporaryDirectory() as tmpdir:
+                buffer = BytesIO()
+                with zipfile.ZipFile(buffer, "w") as zf:
+                    zf.writestr(name, member)
+                output_path = os.path.join(tmpdir, "doc.xml")
+                cache = mock.Mock()
+                with zipfile.ZipFile(buffer) as zf, mock.patch.object(
+                    api, "MAX_FILE_SIZE_BYTES", 1024
+                ), mock.patch("sys.stderr"):
+                    found = api._extract_from_collection(
+                        zf, meta, output_path, cache, "https://example.org/zip"
+                    )
+                self.assertEqual(found, expected)
+                self.assertEqual(os.listdir(tmpdir), ["doc.xml"] if expected else [])
+                self.assertEqual(cache.put_file.called, expected)
+
+    def test_opendata_batch_gives_each_search_its_own_deadline(self):
+        clock = [0.0]
+        deadlines = []
+
+        def page_flow(url, context=None):
+            number = url.rsplit(";", 1)[1]
+            return {
+                "dataGU_human": "2024-01-01",
+                "dataGU": "20240101",
+                "codiceRedaz": f"24G0000{number}",
+                "dataVigenza": "20240202",
+            }
+            yield
+
+        def collection_flow(payload, deadline, quiet, cancel=None):
+            # Ogni ricerca fallisce dopo 100 secondi
+            deadlines.append(deadline)
+            clock[0] += 100
+            return None
+            yield
+
+        urls = [
+            f"https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2024-01-01;{n}"
+            for n in (1, 2)
+        ]
+        with mock.patch.object(api, "_opendata_page_flow", page_flow), mock.patch.object(
+            api, "_opendata_collection_flow", collection_flow
+        ), mock.patch.object(api.time, "monotonic", lambda: clock[0]), mock.patch(
+            "sys.stderr"
+        ):
+            results = api.run_sync(
+                api.opendata_batch_flow([(url, None) for url in urls], quiet=True),
+                mock.Mock(),
+            )
+
+        self.assertEqual(results, {urls[0]: None, urls[1]: None})
+        # Ricerca della finestra, poi le due ricerche di ciascun atto
+        limit = api.OPENDATA_DEADLINE
+        self.assertEqual(
+            deadlines, [limit, 100 + limit, 100 + limit, 300 + limit, 300 + limit]
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,115 @@
+import os
+import unittest
+from unittest import mock
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from normattiva2md.api import convert_xml
+from normattiva2md.constants import AKN_NAMESPACE
+from normattiva2md.exceptions import ConversionError
+from normattiva2md.markdown_converter import (
+    build_url_cross_references,
+    generate_markdown_text,
+    process_body_element,
+)
+from normattiva2md.parallel_renderer import (
+    iter_body_fragments_parallel,
+    render_chunk,
+    resolve_workers,
+    serialize_chunk,
+    split_body,
+)
+from normattiva2md.xml_parser import AkomaDocument
+
+
+FIXTURE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "test_data"
+    / "20050516_005G0104_VIGENZA_20250130.xml"
+)
+
+
+class TestSplitBody(unittest.TestCase):
+    def setUp(self):
+        root = ET.parse(FIXTURE_PATH).getroot()
+        self.body = root.find(".//akn:body", AKN_NAMESPACE)
+        self.elements = list(self.body)
+
+    def test_fixed_chunk_size_keeps_document_order(self):
+        chunks = split_body(self.elements, workers=2, chunk_size=5)
+        self.assertEqual([len(chunk) for chunk in chunks], [5, 5, 5, 2])
+        self.assertEqual([e for chunk in chunks for e in chunk], self.elements)
+
+    def test_balanced_chunks_cover_all_elements(self):
+        chunks = split_body(self.elements, workers=2)
+        self.assertLessEqual(len(chunks), 2 * 4 + 1)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([e for chunk in chunks for e in chunk], self.elements)
+
+    def test_empty_body(self):
+        self.assertEqual(split_body([], workers=4), [])
+
+    def test_resolve_workers(self):
+        self.assertEqual(resolve_workers(None), 1)
+        self.assertEqual(resolve_workers(3), 3)
+        self.assertEqual(resolve_workers(0), os.cpu_count() or 1)
+        with self.assertRaises(ValueError):
+            resolve_workers(-1)
+
+
+class TestParallelRendering(unittest.TestCase):
+    def test_render_chunk_matches_sequential(self):
+        root = ET.parse(FIXTURE_PATH).getroot()
+        elements = list(root.find(".//akn:body", AKN_NAMESPACE))[:3]
+        expected = "".join(
+            fragment
+            for element in elements
+            for fragment in process_body_element(element, AKN_NAMESPACE)
+        )
+        self.assertEqual(render_chunk(serialize_chunk(elements), AKN_NAMESPACE), expected)
+
+    def test_process_pool_output_is_identical(self):
+        document = AkomaDocument(str(FIXTURE_PATH), parser="etree")
+        cross_references = build_url_cross_references(document)
+        expected = generate_markdown_text(
+            document.root, metadata=document.metadata, cross_references=cross_references
+        )
+        fragments = list(
+            iter_body_fragments_parallel(
+                document.root,
+                cross_references=cross_references,
+                workers=2,
+                chunk_size=4,
+            )
+        )
+        self.assertEqual(len(fragments), 5)
+        actual = generate_markdown_text(
+            document.root,
+            metadata=document.metadata,
+            cross_references=cross_references,
+            workers=2,
+        )
+        self.assertEqual(actual, expected)
+        self.assertIn("".join(fragments), expected)
+
+    def test_serialized_chunks_without_fork(self):
+        document = AkomaDocument(str(FIXTURE_PATH), parser="etree")
+        expected = generate_markdown_text(document.root)
+        with mock.patch(
+            "normattiva2md.parallel_renderer._fork_context", return_value=None
+        ):
+            actual = generate_markdown_text(document.root, workers=2)
+        self.assertEqual(actual, expected)
+
+    def test_api_workers(self):
+        expected = convert_xml(str(FIXTURE_PATH), quiet=True, parser="etree")
+        actual = convert_xml(str(FIXTURE_PATH), quiet=True, parser="etree", workers=2)
+        self.assertEqual(actual.markdown, expected.markdown)
+
+    def test_api_rejects_negative_workers(self):
+        with self.assertRaises(ConversionError):
+            convert_xml(str(FIXTURE_PATH), quiet=True, workers=-2)
+
+
+if __name__ == "__main__":
+    unittest.main()
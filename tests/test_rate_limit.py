@@ -0,0 +1,95 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from normattiva2md import rate_limit
+from normattiva2md.http_client import NormattivaClient
+from normattiva2md.rate_limit import RateLimiter, parse_retry_after
+
+URL = "https://www.normattiva.it/uri-res/N2Ls"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("normattiva2md.rate_limit.time.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_paced_by_rate(self):
+        limiter = RateLimiter(rate=2, burst=3)
+        delays = [limiter.reserve(URL) for _ in range(5)]
+        self.assertEqual(delays, [0, 0, 0, 0.5, 1.0])
+
+        self.clock.now += 10
+        self.assertEqual(limiter.reserve(URL), 0)
+        self.assertEqual(limiter.reserve("https://api.normattiva.it/x"), 0)
+        self.assertEqual(limiter.stats()["waits"], 2)
+
+    def test_retry_after_blocks_the_host(self):
+        limiter = RateLimiter(rate=10, burst=10)
+        headers = {"Retry-After": "5"}
+        self.assertIsNone(limiter.observe(URL, FakeResponse(200, headers)))
+        self.assertEqual(limiter.observe(URL, FakeResponse(429, headers)), 5)
+        self.assertEqual(limiter.reserve(URL), 5)
+        self.assertEqual(limiter.reserve("https://api.normattiva.it/x"), 0)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("12"), 12)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("domani"))
+        self.assertEqual(
+            parse_retry_after("Thu, 01 Jan 1970 00:01:40 GMT", now=40), 60
+        )
+
+    @unittest.skipIf(rate_limit.fcntl is None, "fcntl non disponibile")
+    def test_state_is_shared_through_the_state_dir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = RateLimiter(rate=1, burst=2, state_dir=tmpdir)
+            second = RateLimiter(rate=1, burst=2, state_dir=tmpdir)
+            self.assertEqual(first.reserve(URL), 0)
+            self.assertEqual(second.reserve(URL), 0)
+            self.assertEqual(first.reserve(URL), 1)
+            self.assertEqual(second.reserve(URL), 2)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+
+
+class TestClientUsesLimiter(unittest.TestCase):
+    def test_every_request_waits_and_observes(self):
+        limiter = mock.Mock()
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(503, {"Retry-After": "1"})
+        client = NormattivaClient(session=session, rate_limiter=limiter, retry=False)
+
+        response = client.get(URL)
+
+        limiter.wait.assert_called_once_with(URL)
+        limiter.observe.assert_called_once_with(URL, response)
+
+    def test_default_and_disabled_limiter(self):
+        session = mock.Mock()
+        with mock.patch.object(rate_limit, "_default_limiter", mock.Mock()) as shared:
+            NormattivaClient(session=session).get(URL)
+            NormattivaClient(session=session, rate_limiter=False).get(URL)
+        shared.wait.assert_called_once_with(URL)
+
+
+if __name__ == "__main__":
+    unittest.main()
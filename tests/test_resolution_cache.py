@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import requests
+
+from normattiva2md import normattiva_api
+from normattiva2md.http_client import NormattivaClient
+from normattiva2md.resolution_cache import (
+    RESOLUTION_DB_NAME,
+    ResolutionCache,
+    open_resolution_cache,
+)
+from normattiva2md.xml_cache import XMLCache
+
+URL = "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020;1"
+PARAMS = {"dataGU": "20200102", "codiceRedaz": "A", "dataVigenza": "20200103"}
+PAGE = '<a href="/do/atto/caricaAKN?dataGU=20200102&codiceRedaz=A&dataVigenza=20200103">x</a>'
+
+
+class FakeResponse:
+    def __init__(self, text="", status_code=200, headers=None):
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class TestResolutionCache(unittest.TestCase):
+    def test_vigenza_expires_but_immutable_fields_stay(self):
+        cache = ResolutionCache(ttl=60)
+        self.assertIsNone(cache.get(URL))
+        cache.put(URL, PARAMS)
+        self.assertEqual(cache.get(URL), PARAMS)
+
+        with mock.patch("normattiva2md.resolution_cache.time.time", return_value=2e9):
+            self.assertIsNone(cache.get(URL))
+            self.assertEqual(
+                cache.get_immutable(URL), {"dataGU": "20200102", "codiceRedaz": "A"}
+            )
+            pinned = URL + "!vig=2020-01-03"
+            cache.put(pinned, PARAMS)
+        self.assertEqual(cache.get(pinned), PARAMS)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["stale"], stats["misses"]), (2, 1, 1))
+
+    def test_empty_vig_entry_goes_stale(self):
+        cache = ResolutionCache(ttl=0)
+        today = URL + "!vig="
+        cache.put(today, PARAMS)
+        self.assertIsNone(cache.get(today))
+        cache.put(URL + "!vig=2020-01-03", PARAMS)
+        self.assertEqual(cache.get(URL + "!vig=2020-01-03"), PARAMS)
+
+    def test_sqlite_persistence(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "sub", RESOLUTION_DB_NAME)
+            cache = ResolutionCache(path)
+            cache.put(URL, PARAMS)
+            cache.close()
+
+            reopened = ResolutionCache(path)
+            self.assertEqual(reopened.get(URL), PARAMS)
+            reopened.close()
+
+    def test_old_database_gains_validator_columns(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, RESOLUTION_DB_NAME)
+            db = sqlite3.connect(path)
+            db.execute(
+                "CREATE TABLE resolutions (url TEXT PRIMARY KEY, data_gu TEXT NOT NULL, "
+                "codice_redaz TEXT NOT NULL, data_vigenza TEXT NOT NULL, resolved_at REAL NOT NULL)"
+            )
+            db.execute(
+                "INSERT INTO resolutions VALUES (?, ?, ?, ?, ?)",
+                (URL, "20200102", "A", "20200103", 1.0),
+            )
+            db.commit()
+            db.close()
+
+            cache = ResolutionCache(path)
+            self.assertIsNone(cache.entry(URL)["etag"])
+            cache.put(URL, PARAMS, validators={"etag": '"v1"'})
+            cache.close()
+            self.assertEqual(ResolutionCache(path).entry(URL)["etag"], '"v1"')
+
+    def test_open_resolution_cache(self):
+        cache = ResolutionCache()
+        self.assertIs(open_resolution_cache(cache), cache)
+        self.assertIsNone(open_resolution_cache(None))
+        self.assertIsNone(open_resolution_cache(False, object()))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            opened = open_resolution_cache(None, XMLCache(tmpdir), ttl=5)
+            self.assertEqual(opened.path, os.path.join(tmpdir, RESOLUTION_DB_NAME))
+            self.assertEqual(opened.ttl, 5)
+            opened.close()
+
+
+class TestExtractParamsUsesCache(unittest.TestCase):
+    def test_second_resolution_skips_page_fetch(self):
+        cache = ResolutionCache()
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(PAGE)
+
+        for _ in range(2):
+            params, _ = normattiva_api.extract_params_from_normattiva_url(
+                URL, session=session, quiet=True, resolution_cache=cache
+            )
+            self.assertEqual(params, PARAMS)
+        session.get.assert_called_once()
+
+    def test_stale_entry_survives_page_failure(self):
+        cache = ResolutionCache(ttl=0)
+        cache.put(URL, PARAMS)
+        session = NormattivaClient(session=mock.Mock(), retry=False)
+        session.session.get.side_effect = requests.ConnectionError("offline")
+
+        with mock.patch("sys.stderr"):
+            params, _ = normattiva_api.extract_params_from_normattiva_url(
+                URL, session=session, quiet=True, resolution_cache=cache
+            )
+
+        self.assertEqual(params["codiceRedaz"], "A")
+        self.assertEqual(params["dataVigenza"], datetime.now().strftime("%Y%m%d"))
+        self.assertEqual(cache.get_immutable(URL)["dataGU"], "20200102")
+        self.assertIsNone(cache.get(URL))
+
+    def test_pinned_url_reuses_base_urn_resolution(self):
+        cache = ResolutionCache(ttl=0)
+        cache.put(URL, PARAMS)
+        pinned = URL + "!vig=2021-05-06"
+        session = mock.Mock()
+
+        params, _ = normattiva_api.extract_params_from_normattiva_url(
+            pinned, session=session, quiet=True, resolution_cache=cache
+        )
+
+        expected = {"dataGU": "20200102", "codiceRedaz": "A", "dataVigenza": "20210506"}
+        self.assertEqual(params, expected)
+        session.get.assert_not_called()
+        self.assertEqual(cache.get(pinned), expected)
+
+    def test_stale_entry_is_revalidated_with_validators(self):
+        cache = ResolutionCache(ttl=0)
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(PAGE, headers={"ETag": '"v1"'})
+        normattiva_api.extract_params_from_normattiva_url(
+            URL, session=session, quiet=True, resolution_cache=cache
+        )
+
+        session.get.return_value = FakeResponse(status_code=304)
+        params, _ = normattiva_api.extract_params_from_normattiva_url(
+            URL, session=session, quiet=True, resolution_cache=cache
+        )
+
+        self.assertEqual(params, PARAMS)
+        _, kwargs = session.get.call_args
+        self.assertEqual(kwargs["headers"]["If-None-Match"], '"v1"')
+        self.assertEqual((cache.revalidated, cache.redownloaded), (1, 0))
+
+    def test_content_hash_fallback_without_validators(self):
+        cache = ResolutionCache(ttl=0)
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(PAGE)
+        for _ in range(2):
+            normattiva_api.extract_params_from_normattiva_url(
+                URL, session=session, quiet=True, resolution_cache=cache
+            )
+        self.assertNotIn("If-None-Match", session.get.call_args[1]["headers"])
+
+        session.get.return_value = FakeResponse(PAGE.replace("20200103", "20240101"))
+        params, _ = normattiva_api.extract_params_from_normattiva_url(
+            URL, session=session, quiet=True, resolution_cache=cache
+        )
+
+        self.assertEqual(params["dataVigenza"], "20240101")
+        self.assertEqual((cache.revalidated, cache.redownloaded), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
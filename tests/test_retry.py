@@ -0,0 +1,133 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from normattiva2md.api import Converter
+from normattiva2md.http_client import NormattivaClient
+from normattiva2md.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    as_circuit_breaker,
+    as_retry_policy,
+)
+
+URL = "https://www.normattiva.it/uri-res/N2Ls"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.headers = {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_client(retry=None, circuit_breaker=False):
+    session = mock.Mock()
+    client = NormattivaClient(
+        session=session,
+        rate_limiter=False,
+        retry=retry if retry is not None else RetryPolicy(max_retries=2, jitter=False),
+        circuit_breaker=circuit_breaker,
+    )
+    return client, session
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_backoff_is_exponential_and_capped(self):
+        policy = RetryPolicy(backoff=0.5, max_backoff=3, jitter=False)
+        self.assertEqual([policy.backoff_delay(n) for n in range(1, 5)], [0.5, 1, 2, 3])
+        jittered = RetryPolicy(backoff=0.5, max_backoff=3)
+        self.assertTrue(all(0 <= jittered.backoff_delay(4) <= 3 for _ in range(20)))
+
+    def test_only_transient_failures_are_retried(self):
+        policy = RetryPolicy(jitter=False)
+        self.assertIsNone(policy.next_delay("GET", 1, response=FakeResponse(404)))
+        self.assertIsNone(policy.next_delay("POST", 1, response=FakeResponse(503)))
+        self.assertEqual(policy.next_delay("GET", 1, response=FakeResponse(503)), 0.5)
+        self.assertIsNone(policy.next_delay("GET", 1, error=CircuitOpenError("x")))
+        self.assertEqual(policy.stats()["gave_up"], 1)
+
+    def test_as_retry_policy_and_breaker(self):
+        self.assertIsInstance(as_retry_policy(None), RetryPolicy)
+        self.assertIsNone(as_retry_policy(False))
+        self.assertIsNone(as_retry_policy(0))
+        self.assertEqual(as_retry_policy(4).max_retries, 4)
+        self.assertIsNone(as_circuit_breaker(0))
+        self.assertEqual(as_circuit_breaker(3).failure_threshold, 3)
+
+
+@mock.patch("normattiva2md.http_client.time.sleep")
+class TestClientRetries(unittest.TestCase):
+    def test_get_is_retried_after_server_error(self, sleep):
+        client, session = make_client()
+        failed, ok = FakeResponse(503), FakeResponse(200)
+        session.get.side_effect = [failed, ok]
+
+        self.assertIs(client.get(URL), ok)
+        self.assertEqual(session.get.call_count, 2)
+        self.assertTrue(failed.closed)
+        self.assertFalse(ok.closed)
+        sleep.assert_called_once_with(0.5)
+        self.assertEqual(client.metrics()["retry"]["retries"], 1)
+
+    def test_post_is_not_retried(self, sleep):
+        client, session = make_client()
+        session.post.return_value = FakeResponse(503)
+
+        self.assertEqual(client.post(URL).status_code, 503)
+        self.assertEqual(session.post.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_connection_error_is_raised_after_last_attempt(self, sleep):
+        client, session = make_client()
+        session.get.side_effect = requests.ConnectionError("giù")
+
+        with self.assertRaises(requests.ConnectionError):
+            client.get(URL)
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1])
+        self.assertEqual(client.metrics()["retry"]["gave_up"], 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold_then_probes(self):
+        now = [1000.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        client, session = make_client(retry=False, circuit_breaker=breaker)
+        session.get.return_value = FakeResponse(500)
+
+        with mock.patch("normattiva2md.retry.time.time", lambda: now[0]):
+            client.get(URL)
+            client.get(URL)
+            self.assertEqual(breaker.state(URL), "open")
+            with self.assertRaises(CircuitOpenError):
+                client.get(URL)
+            self.assertEqual(session.get.call_count, 2)
+            # Gli altri host non sono coinvolti
+            self.assertEqual(breaker.state("https://api.normattiva.it/x"), "closed")
+
+            now[0] += 31
+            self.assertEqual(breaker.state(URL), "half-open")
+            session.get.return_value = FakeResponse(200)
+            self.assertEqual(client.get(URL).status_code, 200)
+            self.assertEqual(breaker.state(URL), "closed")
+
+        stats = client.metrics()["circuit_breaker"]
+        self.assertEqual((stats["opened"], stats["rejected"]), (1, 1))
+
+
+class TestConverterConfiguration(unittest.TestCase):
+    def test_converter_applies_retry_and_breaker(self):
+        converter = Converter(retry=5, circuit_breaker=False)
+        metrics = converter.metrics()
+        self.assertEqual(metrics["retry"]["max_retries"], 5)
+        self.assertIsNone(metrics["circuit_breaker"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from normattiva2md.http_client import FlowCancelled, Request, Sleep, run_sync
+from normattiva2md.normattiva_api import download_akoma_ntoso_flow
+from normattiva2md.strategies import Strategy, StrategyStats, run_strategies
+
+
+def flow(content, steps=1, pause=0.0, ok=True):
+    """Strategia finta: ``steps`` richieste intervallate da ``pause`` secondi."""
+
+    def make_flow(path, cancel):
+        for _ in range(steps):
+            if pause:
+                yield Sleep(pause)
+            yield Request("GET", "https://example.org/" + content)
+        if not ok:
+            return False, None
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return True, {"source": content}
+
+    return make_flow
+
+
+class TestRunStrategies(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmpdir.name, "doc.xml")
+        self.session = mock.Mock()
+        self.stats = StrategyStats()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _run(self, strategies, hedge_delay):
+        return run_strategies(
+            strategies,
+            self.output,
+            self.session,
+            hedge_delay=hedge_delay,
+            stats=self.stats,
+            quiet=True,
+        )
+
+    def test_hedged_strategy_wins_and_slow_one_is_cancelled(self):
+        name, metadata = self._run(
+            [
+                Strategy("lenta", flow("lenta", steps=50, pause=0.05)),
+                Strategy("veloce", flow("veloce")),
+            ],
+            hedge_delay=0.05,
+        )
+
+        self.assertEqual(name, "veloce")
+        self.assertEqual(metadata, {"source": "veloce"})
+        with open(self.output, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "veloce")
+        deadline = time.monotonic() + 2
+        while "lenta" not in self.stats.stats() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = self.stats.stats()
+        self.assertEqual(stats["lenta"]["cancelled"], 1)
+        self.assertEqual(stats["veloce"]["wins"], 1)
+        self.assertLess(self.session.get.call_count, 50)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["doc.xml"])
+
+    def test_failure_starts_next_strategy_without_waiting(self):
+        started = time.monotonic()
+        name, _ = self._run(
+            [
+                Strategy("errore", flow("errore", ok=False)),
+                Strategy("riserva", flow("riserva")),
+            ],
+            hedge_delay=30,
+        )
+
+        self.assertEqual(name, "riserva")
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(self.stats.stats()["errore"]["failures"], 1)
+
+    def test_first_strategy_wins_without_hedging(self):
+        name, _ = self._run(
+            [Strategy("prima", flow("prima")), Strategy("seconda", flow("seconda"))],
+            hedge_delay=30,
+        )
+        self.assertEqual(name, "prima")
+        self.assertNotIn("seconda", self.stats.stats())
+
+    def test_all_failed(self):
+        self.assertEqual(
+            self._run([Strategy("errore", flow("errore", ok=False))], hedge_delay=0),
+            (None, None),
+        )
+        self.assertFalse(os.path.exists(self.output))
+
+    def test_unexpected_error_is_raised_when_nobody_wins(self):
+        def broken(path, cancel):
+            raise ValueError("XML non valido")
+            yield
+
+        with self.assertRaises(ValueError):
+            self._run([Strategy("rotta", broken)], hedge_delay=0)
+
+
+class TestRunSyncCancel(unittest.TestCase):
+    def test_cancel_closes_flow(self):
+        cancel = threading.Event()
+        closed = []
+
+        def cancellable():
+            try:
+                yield Request("GET", "https://example.org/")
+                cancel.set()
+                yield Request("GET", "https://example.org/")
+            finally:
+                closed.append(True)
+
+        session = mock.Mock()
+        with self.assertRaises(FlowCancelled):
+            run_sync(cancellable(), session, cancel=cancel)
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(closed, [True])
+
+    def test_cancel_interrupts_sleep(self):
+        cancel = threading.Event()
+        threading.Timer(0.05, cancel.set).start()
+        started = time.monotonic()
+
+        def sleepy():
+            yield Sleep(30)
+            raise requests.RequestException("non raggiunto")
+
+        with self.assertRaises(FlowCancelled):
+            run_sync(sleepy(), mock.Mock(), cancel=cancel)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_cancel_stops_streamed_download_and_closes_response(self):
+        cancel = threading.Event()
+        response = mock.Mock(status_code=200, headers={})
+        sent = []
+
+        def iter_content(chunk_size):
+            for chunk in (b"<?xml version='1.0'?>", b"<akomaNtoso>", b"</akomaNtoso>"):
+                sent.append(chunk)
+                if len(sent) == 2:
+                    # La gara è persa mentre il corpo sta arrivando
+                    cancel.set()
+                yield chunk
+
+        response.iter_content.side_effect = iter_content
+        session = mock.Mock()
+        session.get.return_value = response
+        params = {"dataGU": "20200101", "codiceRedaz": "X", "dataVigenza": "20200102"}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "doc.xml")
+            with self.assertRaises(FlowCancelled):
+                run_sync(
+                    download_akoma_ntoso_flow(params, output, quiet=True, cancel=cancel),
+                    session,
+                    cancel=cancel,
+                )
+            self.assertEqual(os.listdir(tmpdir), [])
+        self.assertEqual(len(sent), 2)
+        response.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import io
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from contextlib import redirect_stderr
+from pathlib import Path
+
+from normattiva2md.markdown_converter import (
+    convert_akomantoso_to_markdown_improved,
+    generate_markdown_text,
+)
+from normattiva2md.streaming_converter import (
+    StreamingMarkdownConverter,
+    convert_akomantoso_to_markdown_streaming,
+)
+from normattiva2md.xml_parser import extract_metadata_from_xml, parse_article_selection
+
+
+FIXTURE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "test_data"
+    / "20050516_005G0104_VIGENZA_20250130.xml"
+)
+
+AKN = "http://docs.oasis-open.org/legaldocml/ns/akn/3.0"
+
+# Documento con heading del titolo dopo i figli, parti, allegati nel body e
+# nella sezione attachments, per coprire i casi di riordino dell'output.
+SYNTHETIC_XML = f"""<?xml version="1.0" encoding="UTF-8"?>
+<akomaNtoso xmlns="{AKN}" xmlns:eli="http://data.europa.eu/eli/ontology#">
+<act>
+<preface><docTitle>Legge di prova</docTitle></preface>
+<meta><identification>
+<FRBRExpression><FRBRdate date="2021-02-03"/></FRBRExpression>
+<eli:id_local>20G00001</eli:id_local><eli:date_document>2020-01-01</eli:date_document>
+</identification></meta>
+<preamble><formula>IL <strong>PRESIDENTE</strong></formula></preamble>
+<body>
+<title>
+ <article eId="art_1"><num>Art. 1</num><paragraph><num>1.</num><content><p>1. Testo <ins>nuovo</ins></p></content></paragraph></article>
+ <heading>TITOLO I</heading>
+ <chapter><heading>Capo I PRINCIPI</heading>
+  <article eId="art_2"><num>Art. 2</num><heading>Oggetto</heading>
+   <paragraph><num>1.</num><content><p>Vedi <ref href="/akn/it/act/legge/stato/1990-08-07/241/!main#art_3">legge</ref></p></content></paragraph>
+  </article>
+ </chapter>
+</title>
+<part><heading>PARTE II</heading><article eId="art_3"><num>Art. 3</num></article></part>
+<attachment><heading>Allegato interno</heading></attachment>
+</body>
+<attachments>
+ <attachment><heading>Tabella A</heading><article eId="att_1"><num>Art. 1</num></article></attachment>
+</attachments>
+</act>
+</akomaNtoso>
+"""
+
+
+def tree_markdown(xml_text):
+    root = ET.fromstring(xml_text)
+    return generate_markdown_text(root, metadata=extract_metadata_from_xml(root))
+
+
+def stream_markdown(xml_text, chunk_size=64, **kwargs):
+    output = io.StringIO()
+    converter = StreamingMarkdownConverter(output, **kwargs)
+    data = xml_text.encode("utf-8")
+    for start in range(0, len(data), chunk_size):
+        converter.feed(data[start : start + chunk_size])
+    converter.close()
+    return output.getvalue(), converter
+
+
+class StreamingMarkdownConverterTest(unittest.TestCase):
+    def test_synthetic_document_matches_tree_conversion(self):
+        markdown, _ = stream_markdown(SYNTHETIC_XML)
+        self.assertEqual(markdown, tree_markdown(SYNTHETIC_XML))
+
+    def test_title_heading_is_emitted_before_earlier_children(self):
+        markdown, _ = stream_markdown(SYNTHETIC_XML, chunk_size=1)
+        self.assertLess(markdown.index("## TITOLO I"), markdown.index("### Art. 1"))
+        self.assertLess(markdown.index("# Legge di prova"), markdown.index("IL **PRESIDENTE**"))
+
+    def test_article_filter(self):
+        markdown, converter = stream_markdown(SYNTHETIC_XML, article_ref="art_2")
+        self.assertTrue(converter.article_found)
+        self.assertIn("## Art. 2 - Oggetto", markdown)
+        self.assertNotIn("Art. 3", markdown)
+        self.assertNotIn("# Legge di prova", markdown)
+
+    def test_missing_article_outputs_front_matter_only(self):
+        markdown, converter = stream_markdown(SYNTHETIC_XML, article_ref="art_99")
+        self.assertFalse(converter.article_found)
+        self.assertTrue(markdown.startswith("---\n"))
+        self.assertTrue(markdown.endswith("---\n\n"))
+
+    def test_with_urls_links_akoma_references(self):
+        markdown, _ = stream_markdown(SYNTHETIC_XML, with_urls=True)
+        self.assertIn(
+            "[legge](https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:1990-08-07;241~art3)",
+            markdown,
+        )
+
+    def test_converted_elements_are_released(self):
+        output = io.StringIO()
+        converter = StreamingMarkdownConverter(output)
+        converter.feed(SYNTHETIC_XML.encode("utf-8"))
+        body = converter._body
+        converter.close()
+        self.assertEqual(len(body), 0)
+
+
+class StreamingFileConversionTest(unittest.TestCase):
+    def convert_both(self, **kwargs):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tree_path = os.path.join(tmpdir, "tree.md")
+            stream_path = os.path.join(tmpdir, "stream.md")
+            with redirect_stderr(io.StringIO()):
+                self.assertTrue(
+                    convert_akomantoso_to_markdown_improved(
+                        str(FIXTURE_PATH), tree_path, **kwargs
+                    )
+                )
+                self.assertTrue(
+                    convert_akomantoso_to_markdown_streaming(
+                        str(FIXTURE_PATH), stream_path, **kwargs
+                    )
+                )
+            with open(tree_path, "rb") as f:
+                expected = f.read()
+            with open(stream_path, "rb") as f:
+                actual = f.read()
+            self.assertFalse(os.path.exists(stream_path + ".part"))
+        return expected, actual
+
+    def test_fixture_is_byte_identical(self):
+        expected, actual = self.convert_both()
+        self.assertEqual(actual, expected)
+
+    def test_fixture_with_urls_is_byte_identical(self):
+        expected, actual = self.convert_both(with_urls=True)
+        self.assertEqual(actual, expected)
+
+    def test_fixture_article_filter_is_byte_identical(self):
+        expected, actual = self.convert_both(article_ref="art_3-bis")
+        self.assertEqual(actual, expected)
+
+    def test_fixture_multi_article_selection_is_byte_identical(self):
+        selection = parse_article_selection("1,3,5-7,99")
+        expected, actual = self.convert_both(article_ref=selection)
+        self.assertEqual(actual, expected)
+        self.assertIn(b"## Art. 6-bis.", actual)
+        self.assertNotIn(b"## Art. 8.", actual)
+
+    def test_parse_error_leaves_no_output_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            xml_path = os.path.join(tmpdir, "broken.xml")
+            md_path = os.path.join(tmpdir, "out.md")
+            with open(xml_path, "w", encoding="utf-8") as f:
+                f.write(f'<akomaNtoso xmlns="{AKN}"><act><body>')
+            with redirect_stderr(io.StringIO()):
+                self.assertFalse(convert_akomantoso_to_markdown_streaming(xml_path, md_path))
+            self.assertEqual(os.listdir(tmpdir), ["broken.xml"])
+
+    def test_missing_file_returns_false(self):
+        with redirect_stderr(io.StringIO()):
+            self.assertFalse(convert_akomantoso_to_markdown_streaming("missing.xml"))
+
+
+if __name__ == "__main__":
+    unittest.main()
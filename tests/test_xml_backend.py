@@ -0,0 +1,81 @@
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from normattiva2md.api import convert_xml
+from normattiva2md.exceptions import ConversionError
+from normattiva2md.xml_backend import (
+    EtreeBackend,
+    backend_for,
+    get_backend,
+    lxml_available,
+)
+from normattiva2md.xml_parser import AkomaDocument
+
+
+FIXTURE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "test_data"
+    / "20050516_005G0104_VIGENZA_20250130.xml"
+)
+
+
+class TestGetBackend(unittest.TestCase):
+    def test_etree_backend(self):
+        backend = get_backend("etree")
+        self.assertIsInstance(backend, EtreeBackend)
+        self.assertFalse(backend.supports_xpath)
+
+    def test_auto_prefers_lxml_when_installed(self):
+        expected = "lxml" if lxml_available() else "etree"
+        self.assertEqual(get_backend("auto").name, expected)
+        self.assertEqual(get_backend(None).name, expected)
+
+    def test_invalid_parser_name(self):
+        with self.assertRaises(ValueError):
+            get_backend("sax")
+
+    @unittest.skipIf(lxml_available(), "lxml installato")
+    def test_lxml_requested_but_missing(self):
+        with self.assertRaises(ImportError):
+            get_backend("lxml")
+
+    def test_backend_for_etree_element(self):
+        self.assertIs(backend_for(ET.Element("a")), get_backend("etree"))
+
+    def test_convert_xml_rejects_unknown_parser(self):
+        with self.assertRaises(ConversionError):
+            convert_xml(str(FIXTURE_PATH), quiet=True, parser="sax")
+
+
+@unittest.skipUnless(lxml_available(), "lxml non installato")
+class TestLxmlBackend(unittest.TestCase):
+    def test_hrefs_match_etree(self):
+        etree_doc = AkomaDocument(str(FIXTURE_PATH), parser="etree")
+        lxml_doc = AkomaDocument(str(FIXTURE_PATH), parser="lxml")
+        self.assertEqual(lxml_doc.hrefs, etree_doc.hrefs)
+
+    def test_find_article_uses_xpath(self):
+        document = AkomaDocument(str(FIXTURE_PATH), parser="lxml")
+        article = document.find_article("art_3-bis")
+        self.assertEqual(article.get("eId"), "art_3-bis")
+        self.assertIsNone(document.find_article("art_999"))
+
+    def test_filter_keeps_original_tree_intact(self):
+        document = AkomaDocument(str(FIXTURE_PATH), parser="lxml")
+        expected_metadata = document.metadata
+        filtered = document.filter_to_article("art_1")
+        self.assertIsNotNone(filtered)
+        self.assertIsNotNone(document.find_article("art_1"))
+        self.assertEqual(document.metadata, expected_metadata)
+
+    def test_conversion_matches_etree(self):
+        for options in ({}, {"with_urls": True}, {"article": "3bis"}, {"article": "1,3,5-7"}):
+            with self.subTest(options=options):
+                expected = convert_xml(str(FIXTURE_PATH), quiet=True, parser="etree", **options)
+                actual = convert_xml(str(FIXTURE_PATH), quiet=True, parser="lxml", **options)
+                self.assertEqual(actual.markdown, expected.markdown)
+
+
+if __name__ == "__main__":
+    unittest.main()
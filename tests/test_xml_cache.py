@@ -0,0 +1,264 @@
+import gzip
+import io
+import os
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from normattiva2md import normattiva_api
+from normattiva2md.cli import run_cache_command
+from normattiva2md.xml_cache import ORPHAN_GRACE_PERIOD, XMLCache, cache_key, open_cache
+
+XML = b"<?xml version='1.0'?><akomaNtoso>" + b"<p>testo</p>" * 200 + b"</akomaNtoso>"
+PARAMS = {"dataGU": "20200101", "codiceRedaz": "20G00001", "dataVigenza": "20200102"}
+
+
+def params_for(n):
+    return {**PARAMS, "codiceRedaz": f"20G{n:05d}"}
+
+
+class FakeResponse:
+    def __init__(self, text="", content=b"", status_code=200, headers=None):
+        self.text = text
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+
+class TestXMLCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = XMLCache(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _files(self):
+        return [
+            os.path.join(dirpath, name)
+            for dirpath, _, names in os.walk(self.tmpdir.name)
+            for name in names
+        ]
+
+    def _makedirs(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def test_concurrent_instances_do_not_lose_entries(self):
+        first = XMLCache(self.tmpdir.name)
+        second = XMLCache(self.tmpdir.name)
+        self.assertIsNone(first.entry(PARAMS))
+        second.put(params_for(2), XML + b"2")
+        first.put(PARAMS, XML)
+
+        fresh = XMLCache(self.tmpdir.name)
+        self.assertEqual(fresh.get(params_for(2)), XML + b"2")
+        self.assertEqual(fresh.get(PARAMS), XML)
+        self.assertEqual(second.entry(PARAMS)["size"], len(XML))
+
+    def test_reads_do_not_rewrite_the_index(self):
+        self.cache.put(PARAMS, XML)
+        before = os.stat(self.cache.index_path)
+        for _ in range(3):
+            self.assertEqual(self.cache.get(PARAMS), XML)
+        after = os.stat(self.cache.index_path)
+        self.assertEqual(
+            (before.st_ino, before.st_mtime_ns), (after.st_ino, after.st_mtime_ns)
+        )
+        self.assertEqual(self.cache.stats()["hits"], 3)
+
+    def test_round_trip_is_compressed_and_content_addressed(self):
+        self.assertIsNone(self.cache.get(PARAMS))
+        digest = self.cache.put(PARAMS, XML)
+        self.cache.put(params_for(2), XML)
+
+        self.assertEqual(self.cache.get(PARAMS), XML)
+        objects = [path for path in self._files() if path.endswith(".gz")]
+        self.assertEqual(len(objects), 1)
+        self.assertTrue(objects[0].endswith(f"{digest}.gz"))
+        self.assertLess(os.path.getsize(objects[0]), len(XML))
+        self.assertFalse([p for p in self._files() if ".tmp-" in p])
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["entries"], stats["objects"]), (2, 1))
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_put_file_matches_put(self):
+        path = os.path.join(self.tmpdir.name, "doc.xml")
+        with open(path, "wb") as f:
+            f.write(XML)
+        digest = self.cache.put_file(params_for(2), path, url_xml="https://example/xml")
+
+        self.assertEqual(digest, self.cache.put(PARAMS, XML))
+        self.assertEqual(self.cache.get(params_for(2)), XML)
+        self.assertEqual(self.cache.entry(params_for(2))["size"], len(XML))
+        self.assertEqual(self.cache.stats()["objects"], 1)
+
+    def test_index_is_shared_between_instances(self):
+        self.cache.put(PARAMS, XML, url_xml="https://example/xml")
+        other = XMLCache(self.tmpdir.name)
+        self.assertEqual(other.get(PARAMS), XML)
+        self.assertEqual(other.entry(PARAMS)["url_xml"], "https://example/xml")
+
+    def test_corrupted_object_is_a_miss(self):
+        digest = self.cache.put(PARAMS, XML)
+        path = self.cache._object_path(digest)
+        with open(path, "wb") as f:
+            f.write(gzip.compress(b"altro"))
+        self.assertIsNone(self.cache.get(PARAMS))
+        self.assertIsNone(self.cache.entry(PARAMS))
+
+    def test_lru_eviction_keeps_recently_used(self):
+        contents = [XML + str(n).encode() for n in range(3)]
+        for n, content in enumerate(contents):
+            self.cache.put(params_for(n), content)
+        stored = self.cache.stats()["stored_bytes"]
+
+        small = XMLCache(self.tmpdir.name, max_bytes=stored * 2 // 3 + 1)
+        small.get(params_for(0))
+        time.sleep(0.01)
+        small.put(params_for(3), XML + b"3")
+
+        self.assertIsNotNone(small.entry(params_for(0)))
+        self.assertIsNone(small.entry(params_for(1)))
+        self.assertIsNotNone(small.entry(params_for(3)))
+        self.assertEqual(
+            len([p for p in self._files() if p.endswith(".gz")]),
+            small.stats()["objects"],
+        )
+
+    def test_prune(self):
+        self.cache.put(PARAMS, XML)
+        self.cache.put(params_for(2), XML + b"2")
+        objects = os.path.join(self.tmpdir.name, "objects")
+        leftover = os.path.join(objects, ".tmp-stale")
+        in_progress = os.path.join(objects, ".tmp-writing")
+        orphan = os.path.join(objects, "ab", "ab" + "0" * 62 + ".gz")
+        for path in (leftover, in_progress, orphan):
+            with open(self._makedirs(path), "wb") as f:
+                f.write(b"x")
+        old = time.time() - ORPHAN_GRACE_PERIOD - 60
+        os.utime(leftover, (old, old))
+
+        self.assertEqual(self.cache.prune(older_than=3600), 0)
+        self.assertFalse(os.path.exists(leftover))
+        # File recenti: possono essere scritture in corso di altri processi
+        self.assertTrue(os.path.exists(in_progress))
+        self.assertTrue(os.path.exists(orphan))
+        os.utime(orphan, (old, old))
+        self.cache.prune()
+        self.assertFalse(os.path.exists(orphan))
+        self.assertEqual(self.cache.prune(max_bytes=0), 2)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+        self.assertFalse([p for p in self._files() if p.endswith(".gz")])
+
+    def test_open_cache(self):
+        self.assertIsNone(open_cache(None))
+        self.assertIs(open_cache(self.cache), self.cache)
+        self.assertEqual(open_cache(self.tmpdir.name).cache_dir, self.cache.cache_dir)
+
+    def test_cache_command(self):
+        self.cache.put(PARAMS, XML)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = run_cache_command(["stats", "--cache-dir", self.tmpdir.name])
+        self.assertEqual(code, 0)
+        self.assertIn("voci: 1", output.getvalue())
+
+        with redirect_stdout(io.StringIO()), mock.patch("sys.stderr", io.StringIO()):
+            run_cache_command(["prune", "--cache-dir", self.tmpdir.name, "--max-size", "0"])
+        self.assertEqual(XMLCache(self.tmpdir.name).stats()["entries"], 0)
+
+
+class TestDownloadsUseCache(unittest.TestCase):
+    def test_download_akoma_ntoso_hits_cache_on_second_call(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = XMLCache(os.path.join(tmpdir, "cache"))
+            output_path = os.path.join(tmpdir, "doc.xml")
+            session = mock.Mock()
+            session.get.return_value = FakeResponse(content=XML)
+
+            for _ in range(2):
+                self.assertTrue(
+                    normattiva_api.download_akoma_ntoso(
+                        PARAMS, output_path, session=session, quiet=True, cache=cache
+                    )
+                )
+            self.assertEqual(session.get.call_count, 1)
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), XML)
+            self.assertIn("caricaAKN", cache.entry(PARAMS)["url_xml"])
+
+    def test_revalidation_uses_validators_then_content_hash(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = XMLCache(os.path.join(tmpdir, "cache"), revalidate=True)
+            output_path = os.path.join(tmpdir, "doc.xml")
+            session = mock.Mock()
+
+            def download():
+                return normattiva_api.download_akoma_ntoso(
+                    PARAMS, output_path, session=session, quiet=True, cache=cache
+                )
+
+            session.get.return_value = FakeResponse(
+                content=XML, headers={"Last-Modified": "Wed, 01 Jan 2020 00:00:00 GMT"}
+            )
+            self.assertTrue(download())
+
+            session.get.return_value = FakeResponse(status_code=304)
+            self.assertTrue(download())
+            _, kwargs = session.get.call_args
+            self.assertEqual(
+                kwargs["headers"]["If-Modified-Since"], "Wed, 01 Jan 2020 00:00:00 GMT"
+            )
+
+            # Server senza validatori: decide l'hash del contenuto
+            session.get.return_value = FakeResponse(content=XML)
+            self.assertTrue(download())
+            session.get.return_value = FakeResponse(content=XML + b"<!-- nuovo -->")
+            self.assertTrue(download())
+
+            self.assertEqual((cache.revalidated, cache.redownloaded), (2, 1))
+            with open(output_path, "rb") as f:
+                self.assertTrue(f.read().endswith(b"<!-- nuovo -->"))
+            self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_opendata_skips_async_search_when_cached(self):
+        html = """
+        <input name="atto.dataPubblicazioneGazzetta" value="2020-01-01"/>
+        <input name="atto.codiceRedazionale" value="20G00001"/>
+        <input name="dataVigenza" value="02/01/2020"/>
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = XMLCache(tmpdir)
+            cache.put(PARAMS, XML, url_xml="https://example/collection")
+            session = mock.Mock()
+            session.get.return_value = FakeResponse(text=html)
+            output_path = os.path.join(tmpdir, "doc.xml")
+
+            success, metadata, _ = normattiva_api.download_akoma_ntoso_via_opendata(
+                "https://www.normattiva.it/uri-res/N2Ls?urn:nir:stato:legge:2020-01-01;1",
+                output_path,
+                session=session,
+                quiet=True,
+                cache=cache,
+            )
+
+            self.assertTrue(success)
+            self.assertEqual(metadata["codiceRedaz"], "20G00001")
+            self.assertEqual(metadata["url_xml"], "https://example/collection")
+            session.post.assert_not_called()
+            self.assertEqual(cache_key(metadata), cache_key(PARAMS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,17 @@
+import os
+import tempfile
 import unittest
 import xml.etree.ElementTree as ET
+from unittest import mock
 
 from normattiva2md.xml_parser import (
+    AkomaDocument,
+    ArticleSelection,
     build_permanent_url,
     construct_article_eid,
     extract_metadata_from_xml,
     filter_xml_to_article,
+    parse_article_selection,
 )
 from normattiva2md.constants import AKN_NAMESPACE, ELI_NAMESPACE
 
@@ -22,6 +28,48 @@ class TestXmlParser(unittest.TestCase):
         self.assertIsNone(construct_article_eid("bad-1"))
         self.assertIsNone(construct_article_eid(""))
 
+    def test_parse_article_selection(self):
+        selection = parse_article_selection("1, 3,5-7,16BIS")
+        self.assertEqual(
+            selection.ranges,
+            [
+                ("1", "art_1", "art_1"),
+                ("3", "art_3", "art_3"),
+                ("5-7", "art_5", "art_7"),
+                ("16bis", "art_16-bis", "art_16-bis"),
+            ],
+        )
+        self.assertEqual(str(selection), "1,3,5-7,16bis")
+        self.assertEqual(selection.metadata_value(), "1,3,5-7,16bis")
+        self.assertEqual(parse_article_selection("16bis").metadata_value(), "art_16-bis")
+        self.assertEqual(str(parse_article_selection(["2", "4-5"])), "2,4-5")
+        for invalid in ("", "1,,3", "5-", "a-3", "1-2-3"):
+            self.assertIsNone(parse_article_selection(invalid), invalid)
+
+    def test_reversed_article_range_is_rejected(self):
+        for reversed_range in ("7-5", "1,3-1", "16bis-16", "2ter-2bis"):
+            with self.assertRaises(ValueError, msg=reversed_range):
+                parse_article_selection(reversed_range)
+        with self.assertRaises(ValueError):
+            ArticleSelection([("7-5", "art_7", "art_5")])
+        self.assertEqual(
+            parse_article_selection("16-16bis").ranges,
+            [("16-16bis", "art_16", "art_16-bis")],
+        )
+
+    def test_article_selection_resolve_and_matcher(self):
+        order = ["art_1", "art_2", "art_2-bis", "art_3", "art_4"]
+        positions = {eid: index for index, eid in enumerate(order)}
+        selection = parse_article_selection("4,2-3,9")
+        selected, missing = selection.resolve(positions)
+        self.assertEqual([order[index] for index in selected], order[1:])
+        self.assertEqual(missing, ["9"])
+
+        match = parse_article_selection("2-3").matcher()
+        self.assertEqual([match(eid) for eid in order], [False, True, True, True, False])
+        self.assertIsNone(ArticleSelection.coerce([]))
+        self.assertEqual(ArticleSelection.coerce("art_3").ranges, [("art_3", "art_3", "art_3")])
+
     def test_extract_metadata_from_xml(self):
         xml = (
             f'<akn:akomaNtoso xmlns:akn="{AKN_NAMESPACE["akn"]}" '
@@ -64,5 +112,96 @@ class TestXmlParser(unittest.TestCase):
         self.assertIsNotNone(filtered.find('.//akn:article[@eId="art_1"]', AKN_NAMESPACE))
 
 
+class TestAkomaDocument(unittest.TestCase):
+    XML = (
+        f'<akn:akomaNtoso xmlns:akn="{AKN_NAMESPACE["akn"]}">'
+        "<akn:meta/>"
+        "<akn:body>"
+        '<akn:heading eId="art_2"/>'
+        '<akn:article eId="art_1"><akn:content><akn:p>'
+        '<akn:ref href="/akn/it/act/legge/stato/2004-01-01/10/!main">l</akn:ref>'
+        "</akn:p></akn:content></akn:article>"
+        '<akn:article eId="art_2"/>'
+        "</akn:body>"
+        "</akn:akomaNtoso>"
+    )
+
+    MULTI_XML = (
+        f'<akn:akomaNtoso xmlns:akn="{AKN_NAMESPACE["akn"]}">'
+        "<akn:meta/>"
+        "<akn:body>"
+        '<akn:article eId="art_1"/>'
+        '<akn:article eId="art_2"/>'
+        '<akn:article eId="art_2-bis"><akn:quotedStructure>'
+        '<akn:article eId="art_2-bis__art_1"/>'
+        "</akn:quotedStructure></akn:article>"
+        '<akn:article eId="art_3"/>'
+        '<akn:article eId="art_4"/>'
+        "</akn:body>"
+        "</akn:akomaNtoso>"
+    )
+
+    def setUp(self):
+        fd, self.xml_path = tempfile.mkstemp(suffix=".xml")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.XML)
+
+    def tearDown(self):
+        os.remove(self.xml_path)
+
+    def test_parses_lazily_and_only_once(self):
+        document = AkomaDocument(self.xml_path, parser="etree")
+        with mock.patch(
+            "normattiva2md.xml_backend.ET.parse", wraps=ET.parse
+        ) as parse:
+            self.assertEqual(parse.call_count, 0)
+            document.hrefs
+            document.metadata
+            document.filter_to_article("art_1")
+            document.root
+        self.assertEqual(parse.call_count, 1)
+
+    def test_hrefs_and_eid_index(self):
+        document = AkomaDocument(self.xml_path)
+        self.assertEqual(
+            document.hrefs,
+            [(f"{{{AKN_NAMESPACE['akn']}}}ref", "/akn/it/act/legge/stato/2004-01-01/10/!main")],
+        )
+        self.assertIn("art_1", document.eid_index)
+
+    def test_find_article_skips_non_article_with_same_eid(self):
+        document = AkomaDocument(self.xml_path)
+        article = document.find_article("art_2")
+        self.assertTrue(article.tag.endswith("article"))
+        self.assertIsNone(document.find_article("art_9"))
+
+    def test_filter_to_article_matches_filter_xml_to_article(self):
+        document = AkomaDocument(root=ET.fromstring(self.XML))
+        filtered = document.filter_to_article("art_1")
+        expected = filter_xml_to_article(document.root, "art_1", AKN_NAMESPACE)
+        self.assertEqual(ET.tostring(filtered), ET.tostring(expected))
+
+    def test_filter_to_articles_with_ranges(self):
+        document = AkomaDocument(root=ET.fromstring(self.MULTI_XML))
+        filtered, missing = document.filter_to_articles(parse_article_selection("4,1-3,7"))
+        body = filtered.find("akn:body", AKN_NAMESPACE)
+        # Articolo citato dentro art_2-bis non duplicato; ordine del documento
+        self.assertEqual(
+            [article.get("eId") for article in body],
+            ["art_1", "art_2", "art_2-bis", "art_3", "art_4"],
+        )
+        self.assertIsNotNone(filtered.find("akn:meta", AKN_NAMESPACE))
+        self.assertEqual(missing, ["7"])
+
+    def test_filter_to_articles_none_found(self):
+        document = AkomaDocument(root=ET.fromstring(self.MULTI_XML))
+        self.assertEqual(document.filter_to_articles(["art_8"]), (None, ["art_8"]))
+
+    def test_metadata_is_a_copy(self):
+        document = AkomaDocument(root=ET.fromstring(self.XML))
+        document.metadata["article"] = "art_1"
+        self.assertNotIn("article", document.metadata)
+
+
 if __name__ == "__main__":
     unittest.main()